@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""Orchestration benchmark with stand-in ArgyllCMS executables.
+
+The tests replace run_external_process, so they never measure the cost of running
+the tools. This benchmark runs ICCGenerator against the fake_argyll executables,
+which write realistic artifacts with a configurable latency and output volume, and
+measures:
+
+- spawn: the wall time of running a tool that exits right away, and of running
+  the bare interpreter for reference.
+- streaming: the output lines per second through the piped and the pseudo terminal
+  runners.
+- pipeline: the profiling sessions per minute running all the stages, targen to
+  profcheck, and the average wall time of every stage.
+- batch: the images per second of the batch color correction by worker count.
+
+The results are compared with a baseline saved earlier and the exit code is 1 if a
+metric regresses more than the tolerance.
+
+Usage:
+
+    python benchmarks/argyll_benchmark.py --save-baseline
+    python benchmarks/argyll_benchmark.py --tolerance 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+HERE = pathlib.Path(__file__).parent.absolute()
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(HERE.parent))
+
+import fake_argyll  # noqa: E402
+
+from icc_generator import batch, interactive  # noqa: E402
+from icc_generator.api import ICCGenerator  # noqa: E402
+from icc_generator.tiff import TiffWriter  # noqa: E402
+
+
+DEFAULT_BASELINE_PATH = HERE / "argyll_benchmark.baseline.json"
+STAGES = ["target", "tif", "read", "profile", "check"]
+
+# the metrics where the lower values are better, the rest are rates
+LOWER_IS_BETTER = ["python_spawn_ms", "spawn_ms"]
+
+
+@contextlib.contextmanager
+def fake_environment(bin_path: pathlib.Path, **variables):
+    """Put the fake executables to the PATH and set the fake_argyll variables.
+
+    Args:
+        bin_path (pathlib.Path): The directory of the fake executables.
+        variables: The FAKE_ARGYLL_* variables without the prefix, i.e. lines=100.
+    """
+    environment = dict(os.environ)
+    os.environ["PATH"] = f"{bin_path}{os.pathsep}{os.environ['PATH']}"
+    for name, value in variables.items():
+        os.environ[f"FAKE_ARGYLL_{name.upper()}"] = str(value)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(environment)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Discard the console output and detach the console input of the stages."""
+    stdin, stdout = sys.stdin, sys.stdout
+    sys.stdin, sys.stdout = io.StringIO(), io.StringIO()
+    try:
+        yield
+    finally:
+        sys.stdin, sys.stdout = stdin, stdout
+
+
+def measure_spawn(command: List[str], count: int) -> float:
+    """Return the average wall time of running a command that exits right away.
+
+    Args:
+        command (List[str]): The command.
+        count (int): The number of runs.
+
+    Returns:
+        float: The wall time in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        list(ICCGenerator.run_external_process(command))
+    return (time.perf_counter() - start) / count * 1000.0
+
+
+def measure_streaming(bin_path: pathlib.Path, line_count: int) -> Dict[str, float]:
+    """Return the output lines per second through the process runners.
+
+    Args:
+        bin_path (pathlib.Path): The directory of the fake executables.
+        line_count (int): The number of output lines.
+
+    Returns:
+        Dict[str, float]: The lines per second of the "pipe" and "pty" runners.
+    """
+    rates = {}
+    with fake_environment(bin_path, lines=line_count):
+        start = time.perf_counter()
+        list(ICCGenerator.run_external_process(["targen", "-?"]))
+        rates["pipe"] = line_count / (time.perf_counter() - start)
+
+        if interactive.pty is not None:
+            start = time.perf_counter()
+            list(
+                interactive.run_interactive_process(
+                    ["chartread", "-?"], echo=lambda text: None
+                )
+            )
+            rates["pty"] = line_count / (time.perf_counter() - start)
+    return rates
+
+
+def measure_pipeline(
+    bin_path: pathlib.Path, work_path: pathlib.Path, session_count: int, latency: float
+) -> Dict[str, float]:
+    """Run the profiling sessions from targen to profcheck.
+
+    Args:
+        bin_path (pathlib.Path): The directory of the fake executables.
+        work_path (pathlib.Path): The directory to write the sessions to.
+        session_count (int): The number of sessions.
+        latency (float): The latency of the tools in seconds.
+
+    Returns:
+        Dict[str, float]: The sessions per minute and the average wall time of the
+            stages in seconds.
+    """
+    stage_times = {stage: [] for stage in STAGES}
+    start = time.perf_counter()
+    for i in range(session_count):
+        icc_gen = ICCGenerator()
+        icc_gen._profile_path_template = str(work_path / f"session{i}")
+        icc_gen.target_cache = None
+        with fake_environment(
+            bin_path, latency=latency, pages=icc_gen.number_of_pages
+        ), quiet():
+            icc_gen.generate_target()
+            icc_gen.generate_tif()
+            icc_gen.read_charts()
+            icc_gen.generate_profile()
+            icc_gen.check_profile()
+        for stats in icc_gen.run_stats:
+            stage_times[stats.stage].append(stats.wall_time)
+    duration = time.perf_counter() - start
+    results = {"sessions_per_minute": session_count / duration * 60.0}
+    for stage, times in stage_times.items():
+        results[f"{stage}_s"] = float(np.mean(times)) if times else 0.0
+    return results
+
+
+def measure_batch(
+    work_path: pathlib.Path, image_count: int, worker_counts: List[int]
+) -> Dict[str, float]:
+    """Return the images per second of the batch color correction.
+
+    Args:
+        work_path (pathlib.Path): The directory to write the images to.
+        image_count (int): The number of images.
+        worker_counts (List[int]): The worker counts to measure.
+
+    Returns:
+        Dict[str, float]: The images per second by the worker count.
+    """
+    input_path = work_path / "images"
+    input_path.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(image_count):
+        with TiffWriter(input_path / f"image{i}.tif", 1024, 1024) as writer:
+            writer.write(rng.integers(0, 256, (1024, 1024, 3), dtype=np.uint8))
+
+    profile_path = fake_argyll.REPOSITORY_PATH / "data" / "sRGB.icc"
+    rates = {}
+    for workers in worker_counts:
+        output_path = work_path / f"output{workers}"
+        report = batch.correct_images(
+            profile_path, [input_path], output_dir=output_path, workers=workers
+        )
+        rates[str(workers)] = image_count / report.duration
+    return rates
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    """Return the nested results as a flat dictionary.
+
+    Args:
+        results (dict): The results.
+        prefix (str): The key prefix.
+
+    Returns:
+        Dict[str, float]: The metrics, i.e. {"batch.4": 12.3}.
+    """
+    metrics = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{prefix}{key}."))
+        else:
+            metrics[f"{prefix}{key}"] = value
+    return metrics
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Compare the results with the baseline.
+
+    The stage times depend on the tool latency and are not compared.
+
+    Args:
+        results (dict): The results.
+        baseline (dict): The baseline results.
+        tolerance (float): The allowed regression ratio, i.e. 0.2 for 20%.
+
+    Returns:
+        List[str]: The regressions.
+    """
+    regressions = []
+    baseline_metrics = flatten(baseline)
+    for name, value in flatten(results).items():
+        reference = baseline_metrics.get(name)
+        if not reference or name.startswith("pipeline.") and name.endswith("_s"):
+            continue
+        if name.split(".")[-1] in LOWER_IS_BETTER:
+            change = value / reference - 1.0
+        else:
+            change = 1.0 - value / reference
+        if change > tolerance:
+            regressions.append(f"{name}: {value:.2f} vs {reference:.2f} baseline")
+    return regressions
+
+
+def main(argv=None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv (list): The command line arguments.
+
+    Returns:
+        int: The exit code, 1 if a metric regressed more than ``--tolerance``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--spawns", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--workers", type=str, default="1,2,4")
+    parser.add_argument("--baseline", type=pathlib.Path, default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_path:
+        temp_path = pathlib.Path(temp_path)
+        bin_path = fake_argyll.install(temp_path / "bin")
+
+        # the interpreter startup of the fake tools is measured separately
+        results["python_spawn_ms"] = measure_spawn(
+            [sys.executable, "-c", ""], args.spawns
+        )
+        with fake_environment(bin_path):
+            results["spawn_ms"] = measure_spawn(["targen", "-?"], args.spawns)
+        print(f"{'python':>10}: {results['python_spawn_ms']:8.2f} ms")
+        print(f"{'spawn':>10}: {results['spawn_ms']:8.2f} ms")
+
+        results["streaming"] = measure_streaming(bin_path, args.lines)
+        for runner, rate in results["streaming"].items():
+            print(f"{runner:>10}: {rate / 1e3:8.2f} K lines/s")
+
+        pipeline_path = temp_path / "sessions"
+        results["pipeline"] = measure_pipeline(
+            bin_path, pipeline_path, args.sessions, args.latency
+        )
+        print(
+            f"{'pipeline':>10}: "
+            f"{results['pipeline']['sessions_per_minute']:8.2f} sessions/min"
+        )
+        for stage in STAGES:
+            print(f"{stage:>10}: {results['pipeline'][f'{stage}_s']:8.3f} s")
+
+        worker_counts = [int(workers) for workers in args.workers.split(",")]
+        results["batch"] = measure_batch(temp_path, args.images, worker_counts)
+        for workers, rate in results["batch"].items():
+            print(f"{f'batch x{workers}':>10}: {rate:8.2f} images/s")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=4))
+        print(f"Saved the baseline: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        return 0
+
+    regressions = compare(
+        results, json.loads(args.baseline.read_text()), args.tolerance
+    )
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Throughput benchmark of the colorimetry module.
+
+NumPy runs the element-wise math on a single core, so the numbers are per core.
+
+Usage:
+
+    python benchmarks/colorimetry_benchmark.py --pairs 1000000 --min-rate 1000000
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+import numpy as np
+
+HERE = pathlib.Path(__file__).parent.absolute()
+sys.path.insert(0, str(HERE.parent))
+
+from icc_generator import colorimetry  # noqa: E402
+
+
+def measure(function, *args, repeat: int = 3) -> float:
+    """Return the best wall time of the given function call.
+
+    Args:
+        function (callable): The function to measure.
+        *args: The function arguments.
+        repeat (int): The number of repeats.
+
+    Returns:
+        float: The best wall time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv (list): The command line arguments.
+
+    Returns:
+        int: The exit code, 1 if CIEDE2000 is slower than ``--min-rate``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--pairs", type=int, default=1000000)
+    parser.add_argument("--min-rate", type=float, default=1000000)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    lab1 = rng.random((args.pairs, 3)) * [100.0, 256.0, 256.0] - [0.0, 128.0, 128.0]
+    lab2 = lab1 + rng.normal(scale=2.0, size=lab1.shape)
+    xyz = colorimetry.lab_to_xyz(lab1)
+
+    cases = [
+        ("xyz_to_lab", colorimetry.xyz_to_lab, xyz),
+        ("lab_to_xyz", colorimetry.lab_to_xyz, lab1),
+        ("lab_to_lch", colorimetry.lab_to_lch, lab1),
+        ("adapt", colorimetry.adapt, xyz, colorimetry.D65),
+        ("delta_e_76", colorimetry.delta_e_76, lab1, lab2),
+        ("delta_e_94", colorimetry.delta_e_94, lab1, lab2),
+        ("delta_e_2000", colorimetry.delta_e_2000, lab1, lab2),
+    ]
+    rates = {}
+    for name, function, *function_args in cases:
+        rates[name] = args.pairs / measure(function, *function_args)
+        print(f"{name:>14}: {rates[name] / 1e6:8.2f} M/s")
+
+    if rates["delta_e_2000"] < args.min_rate:
+        print(
+            f"delta_e_2000 is slower than {args.min_rate / 1e6:.2f} M pairs/s",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""Stand-in ArgyllCMS executables for the benchmarks.
+
+A single script plays targen, printtarg, chartread, colprof, profcheck and cctiff,
+chosen by the name it is run as. Every tool reads the same inputs and writes the
+same kind of artifacts as the real one, so ICCGenerator runs its stages unchanged:
+
+- targen writes the .ti1 file with the requested patch and gray patch counts.
+- printtarg writes the .ti2 file and the full resolution chart pages as TIFFs.
+- chartread writes the .ti3 file with the measurements of a simulated printer.
+- colprof writes the .icc file.
+- profcheck prints a line per patch and the summary.
+- cctiff copies the input image to the output.
+
+The tools are configured with the environment variables:
+
+- FAKE_ARGYLL_LATENCY: Seconds to wait before exiting, default is 0.
+- FAKE_ARGYLL_LINES: The number of extra progress lines written to stderr, default
+  is 0.
+- FAKE_ARGYLL_PAGES: The number of chart pages printtarg writes, default is 1.
+
+Use install() to create the executables in a directory and put it to the front of
+PATH, or run this script with the directory as the argument:
+
+    python benchmarks/fake_argyll.py /tmp/fake_argyll/bin
+"""
+
+import os
+import pathlib
+import shutil
+import sys
+import time
+from typing import List
+
+HERE = pathlib.Path(__file__).parent.absolute()
+REPOSITORY_PATH = HERE.parent
+
+sys.path.insert(0, str(REPOSITORY_PATH))
+
+import numpy as np  # noqa: E402
+
+from icc_generator.cgats import CGATS, CGATSTable  # noqa: E402
+from icc_generator.colorimetry import lab_to_xyz  # noqa: E402
+from icc_generator.tiff import TiffWriter  # noqa: E402
+
+
+TOOLS = ["targen", "printtarg", "chartread", "colprof", "profcheck", "cctiff"]
+VERSION = "3.0.0"
+RGB_FIELDS = ["RGB_R", "RGB_G", "RGB_B"]
+XYZ_FIELDS = ["XYZ_X", "XYZ_Y", "XYZ_Z"]
+MM_PER_INCH = 25.4
+
+
+def install(bin_path: pathlib.Path) -> pathlib.Path:
+    """Create the stand-in executables in the given directory.
+
+    Args:
+        bin_path (pathlib.Path): The directory, put it to the front of PATH to use
+            the executables.
+
+    Returns:
+        pathlib.Path: The directory.
+    """
+    bin_path = pathlib.Path(bin_path)
+    os.makedirs(bin_path, exist_ok=True)
+    for tool in TOOLS:
+        path = bin_path / tool
+        path.write_text(
+            f"#!{sys.executable}\n"
+            "import sys\n"
+            f"sys.path.insert(0, {str(HERE)!r})\n"
+            "import fake_argyll\n"
+            "sys.exit(fake_argyll.main())\n"
+        )
+        path.chmod(0o755)
+    return bin_path
+
+
+def _option(argv: List[str], name: str, default: str) -> str:
+    """Return the value of the given option, i.e. "-f" of "-f210" or "-f 210".
+
+    Args:
+        argv (List[str]): The arguments.
+        name (str): The option name.
+        default (str): The value if the option is not given.
+
+    Returns:
+        str: The value.
+    """
+    for i, argument in enumerate(argv):
+        if argument == name and i + 1 < len(argv):
+            return argv[i + 1]
+        if argument.startswith(name) and len(argument) > len(name):
+            return argument[len(name) :].strip()
+    return default
+
+
+def device_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Simulate a printer, converting the device RGB (0-1) to L*a*b*.
+
+    Args:
+        rgb (np.ndarray): The (n, 3) device values.
+
+    Returns:
+        np.ndarray: The (n, 3) L*a*b* values.
+    """
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    return np.stack(
+        [
+            5.0 + 90.0 * (0.25 * r + 0.65 * g + 0.1 * b) ** 0.8,
+            80.0 * (r - g),
+            70.0 * (g - b),
+        ],
+        axis=-1,
+    )
+
+
+def targen(argv: List[str]):
+    """Write the .ti1 file.
+
+    Args:
+        argv (List[str]): The arguments.
+    """
+    patch_count = int(_option(argv, "-f", "836"))
+    gray_patch_count = int(_option(argv, "-g", "0"))
+    rng = np.random.default_rng(patch_count)
+    gray = np.repeat(np.linspace(0.0, 1.0, max(gray_patch_count, 2))[:, None], 3, 1)
+    rgb = np.concatenate([gray, rng.random((patch_count, 3))])[:patch_count]
+
+    table = CGATSTable(file_type="CTI1")
+    table.keywords["COLOR_REP"] = "RGB"
+    table["SAMPLE_ID"] = np.arange(1, patch_count + 1)
+    table.set_columns(RGB_FIELDS, rgb * 100.0)
+    CGATS([table]).write(f"{argv[-1]}.ti1")
+
+
+def printtarg(argv: List[str]):
+    """Write the .ti2 file and the chart pages.
+
+    Args:
+        argv (List[str]): The arguments.
+    """
+    base_path = argv[-1]
+    ti1 = CGATS.read(f"{base_path}.ti1")[0]
+    table = CGATSTable(file_type="CTI2", keywords=ti1.keywords)
+    table["SAMPLE_ID"] = ti1["SAMPLE_ID"]
+    table["SAMPLE_LOC"] = np.array(
+        [f"{chr(65 + i // 26 % 26)}{i % 26 + 1}" for i in range(len(ti1))]
+    )
+    table.set_columns(RGB_FIELDS, ti1.get_columns(RGB_FIELDS))
+    CGATS([table]).write(f"{base_path}.ti2")
+
+    width_mm, height_mm = map(float, _option(argv, "-p", "210x297").split("x"))
+    dpi = float(_option(argv, "-T", "300"))
+    width = int(round(width_mm / MM_PER_INCH * dpi))
+    height = int(round(height_mm / MM_PER_INCH * dpi))
+    page_count = int(os.environ.get("FAKE_ARGYLL_PAGES", "1"))
+    rgb = (ti1.get_columns(RGB_FIELDS) * 2.55).astype(np.uint8)
+    for page in range(page_count):
+        suffix = "" if page_count == 1 else f"_{page + 1:02}"
+        with TiffWriter(f"{base_path}{suffix}.tif", width, height, dpi=dpi) as writer:
+            for row in range(0, height, 64):
+                rows = min(64, height - row)
+                # vertical strips of patches
+                patches = rgb[(np.arange(width) // 64 + row // 64) % len(rgb)]
+                writer.write(np.broadcast_to(patches, (rows, width, 3)))
+
+
+def chartread(argv: List[str]):
+    """Write the .ti3 file with the simulated measurements.
+
+    Args:
+        argv (List[str]): The arguments.
+    """
+    base_path = argv[-1]
+    ti2 = CGATS.read(f"{base_path}.ti2")[0]
+    rgb = ti2.get_columns(RGB_FIELDS) / 100.0
+    strip_count = (len(ti2) + 25) // 26
+    print(f"Chart has {len(ti2)} patches", flush=True)
+    for strip in range(strip_count):
+        name = chr(65 + strip % 26)
+        print(f"Ready to read strip pass {name} ({strip + 1} of {strip_count})")
+    print("Writing output file", flush=True)
+
+    rng = np.random.default_rng(len(ti2))
+    lab = device_to_lab(rgb) + rng.normal(scale=0.2, size=rgb.shape)
+    table = CGATSTable(file_type="CTI3", keywords=ti2.keywords)
+    table.keywords["COLOR_REP"] = "RGB_XYZ"
+    table["SAMPLE_ID"] = ti2["SAMPLE_ID"]
+    table.set_columns(RGB_FIELDS, rgb * 100.0)
+    table.set_columns(XYZ_FIELDS, lab_to_xyz(lab) * 100.0)
+    CGATS([table]).write(f"{base_path}.ti3")
+
+
+def colprof(argv: List[str]):
+    """Write the .icc file.
+
+    Args:
+        argv (List[str]): The arguments.
+    """
+    base_path = argv[-1]
+    CGATS.read(f"{base_path}.ti3")
+    shutil.copyfile(REPOSITORY_PATH / "data" / "sRGB.icc", f"{base_path}.icc")
+
+
+def profcheck(argv: List[str]):
+    """Print the dE of every patch and the summary.
+
+    Args:
+        argv (List[str]): The arguments.
+    """
+    ti3 = CGATS.read(argv[-2])[0]
+    rng = np.random.default_rng(len(ti3))
+    delta_e = np.abs(rng.normal(scale=0.8, size=len(ti3)))
+    rgb = ti3.get_columns(RGB_FIELDS)
+    for sample_id, values, error in zip(ti3["SAMPLE_ID"], rgb, delta_e):
+        print(
+            f"[{error:f}] {sample_id}: {values[0]:f} {values[1]:f} {values[2]:f}",
+            file=sys.stderr,
+        )
+    print(
+        f"Profile check complete, peak err = {delta_e.max():f}, "
+        f"avg err = {delta_e.mean():f}, 95% err = {np.percentile(delta_e, 95):f}",
+        file=sys.stderr,
+    )
+
+
+def cctiff(argv: List[str]):
+    """Copy the input image to the output.
+
+    Args:
+        argv (List[str]): The arguments.
+    """
+    shutil.copyfile(argv[-2], argv[-1])
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the tool the script is called as.
+
+    Args:
+        argv (List[str]): The arguments, default is sys.argv.
+
+    Returns:
+        int: The exit code.
+    """
+    if argv is None:
+        argv = sys.argv
+    tool = pathlib.Path(argv[0]).stem
+    arguments = argv[1:]
+
+    if tool not in TOOLS:
+        # run as a script, install the executables
+        print(install(pathlib.Path(arguments[0]) if arguments else HERE / "bin"))
+        return 0
+
+    for i in range(int(os.environ.get("FAKE_ARGYLL_LINES", "0"))):
+        sys.stderr.write(f"{tool}: progress {i}\n")
+
+    if not arguments or arguments == ["-?"]:
+        sys.stderr.write(f"{tool}: Fake ArgyllCMS Version {VERSION}\n")
+    else:
+        globals()[tool](arguments)
+
+    sys.stderr.flush()
+    time.sleep(float(os.environ.get("FAKE_ARGYLL_LATENCY", "0")))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
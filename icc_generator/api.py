@@ -1,17 +1,34 @@
 # -*- coding: utf-8 -*-
 """The API of the library."""
 
+import concurrent.futures
 import datetime
 import json
+import math
 import os
 import pathlib
 import platform
 import shutil
 import subprocess
+import time
 import traceback
-from typing import Union
-
-from icc_generator import logger
+from typing import Callable, List, Tuple, Union
+
+from icc_generator import (
+    async_runner,
+    batch,
+    chart_renderer,
+    icc,
+    interactive,
+    layout,
+    logger,
+    output_capture,
+    profile_check,
+    run_stats,
+    sweep,
+    target_generator,
+    transform,
+)
 
 
 HERE = pathlib.Path(__file__).parent.absolute()
@@ -322,121 +339,19 @@ class ICCGenerator(object):
 
     """
 
-    NORMAL_DENSITY = "normal_density"
-    HIGH_DENSITY = "high_density"
-
-    __data__ = {
-        "paper_size": {
-            PaperSizeLibrary.p11x17: {
-                "patch_count": {
-                    NORMAL_DENSITY: int(
-                        210
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["11x17"].area
-                    ),
-                    HIGH_DENSITY: int(
-                        672
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["11x17"].area
-                    ),
-                }
-            },
-            PaperSizeLibrary.p4x6: {
-                "patch_count": {
-                    NORMAL_DENSITY: int(
-                        210
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["4x6"].area
-                    ),
-                    HIGH_DENSITY: int(
-                        672
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["4x6"].area
-                    ),
-                }
-            },
-            PaperSizeLibrary.A2: {
-                "patch_count": {
-                    NORMAL_DENSITY: int(
-                        445
-                        / PaperSizeLibrary.paper_sizes["A3"].area
-                        * PaperSizeLibrary.paper_sizes["A2"].area
-                    ),
-                    HIGH_DENSITY: int(
-                        1392
-                        / PaperSizeLibrary.paper_sizes["A3"].area
-                        * PaperSizeLibrary.paper_sizes["A2"].area
-                    ),
-                }
-            },
-            PaperSizeLibrary.A3: {
-                "patch_count": {
-                    NORMAL_DENSITY: 445,
-                    HIGH_DENSITY: 1392,
-                }
-            },
-            PaperSizeLibrary.A3R: {
-                "patch_count": {
-                    NORMAL_DENSITY: 445,
-                    HIGH_DENSITY: 1392,
-                }
-            },
-            PaperSizeLibrary.A4: {
-                "patch_count": {
-                    NORMAL_DENSITY: 210,
-                    HIGH_DENSITY: 672,
-                }
-            },
-            PaperSizeLibrary.A4R: {
-                "patch_count": {
-                    NORMAL_DENSITY: 210,
-                    HIGH_DENSITY: 672,
-                }
-            },
-            PaperSizeLibrary.Legal: {
-                "patch_count": {
-                    NORMAL_DENSITY: int(
-                        210
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["Legal"].area
-                    ),
-                    HIGH_DENSITY: int(
-                        672
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["Legal"].area
-                    ),
-                }
-            },
-            PaperSizeLibrary.Letter: {
-                "patch_count": {
-                    NORMAL_DENSITY: int(
-                        210
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["Letter"].area
-                    ),
-                    HIGH_DENSITY: int(
-                        672
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["Letter"].area
-                    ),
-                }
-            },
-            PaperSizeLibrary.LetterR: {
-                "patch_count": {
-                    NORMAL_DENSITY: int(
-                        210
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["LetterR"].area
-                    ),
-                    HIGH_DENSITY: int(
-                        672
-                        / PaperSizeLibrary.paper_sizes["A4"].area
-                        * PaperSizeLibrary.paper_sizes["LetterR"].area
-                    ),
-                }
-            },
-        }
-    }
+    # colprof quality levels, from the fastest to the most accurate
+    PROFILE_QUALITIES = ["l", "m", "h", "u"]
+
+    # the generated targets and charts are shared between the sessions with the same
+    # settings if this is set to a target_cache.TargetCache
+    target_cache = None
+
+    # the resource usage of the external processes is appended to this
+    # run_stats.RunStatsLog if it is set
+    run_stats_log = None
+
+    # the sessions are recorded to this catalog.ProfileCatalog if it is set
+    catalog = None
 
     def __init__(
         self,
@@ -502,6 +417,9 @@ class ICCGenerator(object):
         self.profile_date = date_str
         self.profile_time = time_str
 
+        # the resource usage of the external processes run by this instance
+        self.run_stats = []
+
         # Profile Path template
         self._profile_path_template = (
             "~/.cache/ICCGenerator/{printer_brand}_" "{printer_model}/{profile_date}"
@@ -569,6 +487,9 @@ class ICCGenerator(object):
         with open(path, "w+") as f:
             json.dump(data, f)
 
+        if self.catalog is not None:
+            self.catalog.record_session(self)
+
     def load_settings(self, path: Union[str, pathlib.Path]):
         """Load the settings from the given path.
 
@@ -974,21 +895,52 @@ class ICCGenerator(object):
         """
         self._profile_name = profile_name
 
+    @property
+    def instrument(self) -> layout.Instrument:
+        """Return the instrument the charts are read with.
+
+        Returns:
+            layout.Instrument: The i1Pro in the high density mode, otherwise the
+                ColorMunki.
+        """
+        return layout.I1PRO if self.use_high_density_mode else layout.COLORMUNKI
+
+    @property
+    def page_layout(self) -> layout.PageLayout:
+        """Return the layout of the patches on a chart page.
+
+        Returns:
+            layout.PageLayout: The layout computed from the paper size, the
+                instrument, the margins and the resolution of the charts. The
+                library paper sizes keep the patch counts printtarg fits on them.
+        """
+        page_layout = layout.page_layout(
+            self.paper_size.width,
+            self.paper_size.height,
+            self.instrument,
+            margin=layout.DEFAULT_MARGIN,
+            dpi=layout.DEFAULT_DPI,
+        )
+        if PaperSizeLibrary.get_paper_size(self.paper_size.name) == self.paper_size:
+            page_layout = layout.PageLayout(
+                page_layout.instrument,
+                page_layout.strip_count,
+                page_layout.strip_length,
+                page_layout.along_width,
+                patch_count=layout.LIBRARY_PATCH_COUNTS[self.paper_size.name][
+                    self.instrument.name
+                ],
+            )
+        return page_layout
+
     @property
     def per_page_patch_count(self) -> int:
         """Return the per_page_patch_count attribute value.
 
         Returns:
-            int: The per page patch count value.
+            int: The number of patches that fit on a page of the paper size.
         """
-        # Per Page Patch Count is Defined by the Paper Size and
-        # the High Resolution mode
-        resolution_str = (
-            self.HIGH_DENSITY if self.use_high_density_mode else self.NORMAL_DENSITY
-        )
-        return self.__data__["paper_size"][self.paper_size]["patch_count"][
-            resolution_str
-        ]
+        return self.page_layout.patch_count
 
     @property
     def patch_count(self) -> int:
@@ -1030,12 +982,25 @@ class ICCGenerator(object):
         self._gray_patch_count = gray_patch_count
 
     @classmethod
-    def run_external_process(cls, command: list, shell: bool = False):
+    def run_external_process(
+        cls,
+        command: list,
+        shell: bool = False,
+        capture: Union[None, output_capture.OutputCapture] = None,
+    ):
         """Run an external process and yields the output.
 
+        The output is read in chunks and only the last part of it is kept in memory
+        to report the errors.
+
         Args:
             command (list): The command to run.
-            shell (bool): A bool value for executing the command in shell or not.
+            shell (bool): Run the command interactively. The command is run in a
+                pseudo terminal, its output is echoed to the console as it arrives
+                and the key presses are forwarded to it.
+            capture (Union[None, output_capture.OutputCapture]): The capture to keep
+                the output in, use one with a log_path to write the complete output
+                to a file. Default keeps the last 64 KB.
 
         Raises:
             RuntimeError: If the command return code is not 0.
@@ -1044,37 +1009,61 @@ class ICCGenerator(object):
             str: The command output.
         """
         if not shell:
+            if capture is None:
+                capture = output_capture.OutputCapture()
+            started = time.time()
             process = subprocess.Popen(command, stderr=subprocess.PIPE)
-            # loop until process finishes and capture stderr output
-            stderr_buffer = []
-            while True:
-                stderr = process.stderr.readline()
+            try:
+                # loop until process closes stderr and capture the output
+                yield from output_capture.read_lines(process.stderr, capture)
+            finally:
+                capture.close()
+                process.stderr.close()
 
-                if stderr == b"" and process.poll() is not None:
-                    break
-
-                if stderr != b"":
-                    stderr = stderr.decode("utf-8").strip()
-                    stderr_buffer.append(stderr)
-                    yield stderr
-
-            # flatten the buffer
-            stderr_buffer = "\n".join(stderr_buffer)
-            return_code = process.returncode
+            # reap the process with its resource usage
+            return_code, rusage = run_stats.wait(process)
+            run_stats.collect(command, started, return_code, rusage)
 
             if return_code:
                 # there is an error
-                raise RuntimeError(stderr_buffer)
+                raise RuntimeError(capture.tail())
         else:
-            command = " ".join(command)
-            os.system(command)
+            yield from interactive.run_interactive_process(command, capture=capture)
 
-    def generate_target(self):
-        """Generate the required ti1 file."""
-        os.makedirs(self.profile_absolute_path, exist_ok=True)
+    def recording_run_stats(self, stage: str):
+        """Return a context recording the resource usage of the external processes.
 
-        # ************************
-        # targen command
+        The measurements are tagged with the given stage, the patch count and the
+        paper size, appended to run_stats and to the run_stats_log if it is set.
+
+        Args:
+            stage (str): The profiling stage name.
+
+        Returns:
+            contextlib.AbstractContextManager: The context.
+        """
+        return run_stats.recording(
+            self.run_stats,
+            log=self.run_stats_log,
+            stage=stage,
+            patch_count=self.patch_count,
+            paper_size=self.paper_size.name,
+        )
+
+    def generate_target_command(
+        self, precondition_profile_path: Union[None, str] = None
+    ) -> List[str]:
+        """Return the targen command.
+
+        Args:
+            precondition_profile_path (Union[None, str]): The profile to precondition
+                the target with, default is the precondition_profile_path.
+
+        Returns:
+            List[str]: The command.
+        """
+        if precondition_profile_path is None:
+            precondition_profile_path = self.precondition_profile_path
         command = [
             "targen",
             "-v",
@@ -1086,48 +1075,360 @@ class ICCGenerator(object):
             "-f",
             f"{self.patch_count}",
         ]
-        if self.precondition_profile_path:
-            command += ["-c", self.precondition_profile_path]
+        if precondition_profile_path:
+            command += ["-c", precondition_profile_path]
         command += [str(self.profile_absolute_full_path)]
+        return command
+
+    def _saved_sessions(self) -> List[dict]:
+        """Return the settings of the sessions saved next to this session.
+
+        With the default profile path template these are all the sessions of the
+        same printer.
+
+        Returns:
+            List[dict]: The settings with the "profile_path" without the extension.
+        """
+        sessions = []
+        for settings_path in sorted(self.profile_absolute_path.parent.glob("*/*.json")):
+            try:
+                with open(settings_path, "r") as f:
+                    session = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(session, dict) or "printer_model" not in session:
+                # not a settings file
+                continue
+            session["profile_path"] = str(settings_path.with_suffix(""))
+            sessions.append(session)
+        return sessions
+
+    def find_precondition_profile(self) -> Union[None, pathlib.Path]:
+        """Return the closest earlier profile to precondition the target with.
+
+        The profiles of the same printer and ink with the same paper finish are
+        looked up in the catalog if it is set, otherwise in the sessions saved next
+        to this session. The latest profile of the same paper is preferred, then
+        the latest one of any paper.
+
+        Returns:
+            Union[None, pathlib.Path]: The profile path or None if there is none.
+        """
+        if self.catalog is not None:
+            sessions = self.catalog.find(
+                printer_brand=self.printer_brand, printer_model=self.printer_model
+            )
+        else:
+            sessions = self._saved_sessions()
+
+        candidates = []
+        for session in sessions:
+            if (
+                session.get("printer_brand") != self.printer_brand
+                or session.get("printer_model") != self.printer_model
+                or session.get("ink_brand") != self.ink_brand
+                or (session.get("paper_finish") or "").lower()
+                != self.paper_finish.lower()
+                or session["profile_path"] == str(self.profile_absolute_full_path)
+            ):
+                continue
+            for extension in icc.PROFILE_EXTENSIONS:
+                path = pathlib.Path(f"{session['profile_path']}{extension}")
+                if path.exists():
+                    paper = (session.get("paper_brand"), session.get("paper_model"))
+                    order = (
+                        paper == (self.paper_brand, self.paper_model),
+                        session.get("profile_date") or "",
+                        session.get("profile_time") or "",
+                    )
+                    candidates.append((order, path))
+                    break
+
+        if not candidates:
+            return None
+        return max(candidates, key=lambda candidate: candidate[0])[1]
+
+    def generate_target(
+        self,
+        engine: str = "targen",
+        seed: int = target_generator.DEFAULT_SEED,
+        auto_precondition: bool = False,
+    ):
+        """Generate the required ti1 file.
+
+        Args:
+            engine (str): The engine to use, one of the following:
+
+                targen = call ArgyllCMS targen (default)
+                native = generate the target in process, the gray axis and the fill
+                    patches spread by farthest point sampling
+
+            seed (int): The random seed of the native engine, the same seed always
+                generates the same target.
+            auto_precondition (bool): Precondition the target with the closest
+                earlier profile if precondition_profile_path is not set, see
+                find_precondition_profile(). The found profile is only used for
+                this target, the precondition_profile_path is not changed.
+
+        Raises:
+            TypeError: If engine is not a str.
+            ValueError: If engine is not one of "targen" or "native".
+        """
+        if not isinstance(engine, str):
+            raise TypeError(f"engine should be a str, not {engine.__class__.__name__}")
+
+        if engine not in ["targen", "native"]:
+            raise ValueError(f"engine should be one of targen or native, not {engine}")
+
+        precondition_profile_path = self.precondition_profile_path
+        if auto_precondition and not precondition_profile_path:
+            profile_path = self.find_precondition_profile()
+            if profile_path is not None:
+                logger.info(f"Preconditioning the target with: {profile_path}")
+                precondition_profile_path = str(profile_path)
+
+        os.makedirs(self.profile_absolute_path, exist_ok=True)
+
+        if engine == "native":
+            target_generator.generate_target(
+                self.profile_absolute_full_path,
+                self.patch_count,
+                self.gray_patch_count,
+                seed=seed,
+                profile_path=precondition_profile_path or None,
+            )
+            return
+
+        # ************************
+        # targen command
+        command = self.generate_target_command(precondition_profile_path)
+
+        if self.target_cache is not None and self.target_cache.get_target(
+            self, precondition_profile_path
+        ):
+            return
 
         # first call the targen command
         # yield from self.run_external_process(command)
         if self.output_commands:
             print("command: {}".format(" ".join(command)))
-        for output in self.run_external_process(command):
-            print(output)
+        with self.recording_run_stats("target"):
+            for output in self.run_external_process(command):
+                print(output)
 
-    def generate_tif(self):
-        """Generate the required Tiff file or files depending on the page count."""
-        os.makedirs(self.profile_absolute_path, exist_ok=True)
+        if self.target_cache is not None:
+            self.target_cache.put_target(self, precondition_profile_path)
 
-        # ************************
-        # printtarg command
-        command = ["printtarg", "-v"]
-        if self.use_high_density_mode:
-            command += ["-ii1", "-a 0.875"]  # Use an i1 Pro
-        else:
-            command += ["-iCM", "-h", "-P"]  # Use a ColorMunki
+    def generate_tif_command(self) -> List[str]:
+        """Return the printtarg command.
 
+        Returns:
+            List[str]: The command.
+        """
+        command = ["printtarg", "-v"] + self.instrument.printtarg_arguments
         command += [
             "-R1",
-            "-T300",
-            "-M2",
+            f"-T{layout.DEFAULT_DPI}",
+            f"-M{layout.DEFAULT_MARGIN}",
             "-L",
             "-p",
             "{:0.1f}x{:0.1f}".format(*self.paper_size.size),
             str(self.profile_absolute_full_path),
         ]
+        return command
+
+    def generate_tif(
+        self,
+        engine: str = "printtarg",
+        compression: str = "none",
+        workers: Union[None, int] = None,
+        split_pages: bool = False,
+    ) -> List[pathlib.Path]:
+        """Generate the required Tiff file or files depending on the page count.
+
+        Args:
+            engine (str): The engine to use, one of the following:
+
+                printtarg = call ArgyllCMS printtarg (default)
+                native = render the chart in process with the layout engine, the
+                    pages are written row by row in parallel. The charts of the
+                    library paper sizes may need more pages than printtarg, see
+                    native_page_patch_count().
+
+            compression (str): The Tiff compression of the native engine, "none"
+                (default) or "deflate".
+            workers (Union[None, int]): The number of worker processes, default is
+                the number of CPUs.
+            split_pages (bool): Split the target in to page sized parts and render
+                every page on its own in parallel with the native engine, see
+                generate_tif_pages().
+
+        Raises:
+            TypeError: If engine is not a str.
+            ValueError: If engine is not one of "printtarg" or "native".
+
+        Returns:
+            List[pathlib.Path]: The Tiff file paths.
+        """
+        if not isinstance(engine, str):
+            raise TypeError(f"engine should be a str, not {engine.__class__.__name__}")
+
+        if engine not in ["printtarg", "native"]:
+            raise ValueError(
+                f"engine should be one of printtarg or native, not {engine}"
+            )
+
+        os.makedirs(self.profile_absolute_path, exist_ok=True)
+
+        if engine == "native":
+            chart = chart_renderer.render_chart(
+                self.profile_absolute_full_path,
+                self.paper_size.width,
+                self.paper_size.height,
+                self.instrument,
+                margin=layout.DEFAULT_MARGIN,
+                dpi=layout.DEFAULT_DPI,
+                compression=compression,
+                workers=workers,
+                page_patch_count=self.native_page_patch_count(),
+            )
+            self.tif_files = [path.resolve() for path in chart.tif_paths]
+            return self.tif_files
+
+        if split_pages and self.number_of_pages > 1:
+            self.tif_files = self.generate_tif_pages(workers=workers)
+            return self.tif_files
+
+        # ************************
+        # printtarg command
+        command = self.generate_tif_command()
 
         self.update_tif_files()
 
+        if self.target_cache is not None and self.target_cache.get_chart(self):
+            return self.tif_files
+
         # first call the targen command
         # print("generate_tif_files command: {}".format(' '.join(command)))
         # yield from self.run_external_process(command)
         if self.output_commands:
             print("command: {}".format(" ".join(command)))
-        for output in self.run_external_process(command):
-            print(output)
+        with self.recording_run_stats("tif"):
+            for output in self.run_external_process(command):
+                print(output)
+
+        if self.target_cache is not None:
+            self.target_cache.put_chart(self)
+
+        return self.tif_files
+
+    def native_page_patch_count(self) -> int:
+        """Return the patches per page of the charts of the native engine.
+
+        The library paper sizes keep the patch counts printtarg fits on them, which
+        may be more than the native layout fits on a page. Then the target is spread
+        evenly over as many pages as the native layout needs.
+
+        Returns:
+            int: The patches per page.
+        """
+        per_page_patch_count = self.per_page_patch_count
+        capacity = self.page_layout.capacity
+        if per_page_patch_count <= capacity or capacity == 0:
+            return per_page_patch_count
+
+        page_count = math.ceil(self.patch_count / capacity)
+        logger.warning(
+            f"The native charts fit {capacity} of the {per_page_patch_count} "
+            f"patches on a {self.paper_size.name} page, the {self.patch_count} "
+            f"patches are printed on {page_count} pages"
+        )
+        return math.ceil(self.patch_count / page_count)
+
+    def generate_tif_pages(
+        self, workers: Union[None, int] = None
+    ) -> List[pathlib.Path]:
+        """Generate the Tiff files by rendering every page on its own in parallel.
+
+        The target is split in to page sized parts and every part is rendered as a
+        single page chart by the native engine, with the strip labels continuing
+        from the strips of the earlier pages. The .ti2 files of the pages are merged,
+        so chartread reads the pages the same way as a single chart and the labels
+        printed on every page are the ones chartread asks for. printtarg labels the
+        strips of every page from "A" again, so it is not used for the pages.
+
+        Args:
+            workers (Union[None, int]): The number of pages to render at the same
+                time, default is the number of CPUs. With 1 the pages are rendered
+                in this process.
+
+        Raises:
+            TypeError: If workers is not an int.
+            ValueError: If workers is not positive.
+
+        Returns:
+            List[pathlib.Path]: The Tiff file paths.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if not isinstance(workers, int):
+            raise TypeError(
+                f"workers should be an int, not {workers.__class__.__name__}"
+            )
+
+        if workers < 1:
+            raise ValueError(f"workers should be a positive integer, not {workers}")
+
+        base_path = self.profile_absolute_full_path
+        pages_path = self.profile_absolute_path / f"{self.profile_name}_pages"
+        os.makedirs(pages_path, exist_ok=True)
+        page_patch_count = self.native_page_patch_count()
+        strip_length = self.page_layout.strip_length
+        try:
+            page_base_paths = chart_renderer.split_ti1(
+                f"{base_path}.ti1", page_patch_count, pages_path / "page"
+            )
+            # the patches fill the strips of every page in order
+            strips_per_page = math.ceil(page_patch_count / strip_length)
+            jobs = [
+                (
+                    page_base_path,
+                    self.paper_size.width,
+                    self.paper_size.height,
+                    self.instrument,
+                    layout.DEFAULT_MARGIN,
+                    layout.DEFAULT_DPI,
+                    "none",
+                    1,
+                    chart_renderer.DEFAULT_SEED,
+                    page_patch_count,
+                    page * strips_per_page,
+                )
+                for page, page_base_path in enumerate(page_base_paths)
+            ]
+            workers = min(workers, len(jobs))
+            if workers == 1:
+                charts = [chart_renderer.render_chart(*job) for job in jobs]
+            else:
+                with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers
+                ) as executor:
+                    futures = [
+                        executor.submit(chart_renderer.render_chart, *job)
+                        for job in jobs
+                    ]
+                    charts = [future.result() for future in futures]
+
+            tif_paths = chart_renderer.chart_paths(base_path, len(charts))
+            for chart, tif_path in zip(charts, tif_paths):
+                os.replace(chart.tif_paths[0], tif_path)
+            chart_renderer.merge_ti2(
+                [chart.ti2_path for chart in charts], f"{base_path}.ti2"
+            )
+        finally:
+            shutil.rmtree(pages_path, ignore_errors=True)
+        return [tif_path.resolve() for tif_path in tif_paths]
 
     def update_tif_files(self):
         """Update the tiff file paths."""
@@ -1182,9 +1483,17 @@ class ICCGenerator(object):
         for output in self.run_external_process(command):
             print(output)
 
-    def read_charts(self, resume: bool = False, read_mode: int = 0):
+    def read_charts(
+        self,
+        resume: bool = False,
+        read_mode: int = 0,
+        on_event: Union[None, Callable[[interactive.ChartReadEvent], None]] = None,
+    ) -> interactive.ChartReadSession:
         """Read the printed chart using the device.
 
+        chartread stays interactive, its output is parsed into progress events while
+        the charts are read.
+
         Args:
             resume (bool): If a .ti3 files already exists and ``resume`` is set to True.
                 The process will start from where it left before. Default value is
@@ -1194,6 +1503,16 @@ class ICCGenerator(object):
                 1: Patch-By-Patch
                 Use ``read_mode=1`` (Patch-By-Patch) with ``resume=True`` to fix
                 erroneously read patches.
+            on_event (Union[None, Callable[[interactive.ChartReadEvent], None]]):
+                Called with every progress event, the read strips, the patch count
+                and the misread warnings, as they happen.
+
+        Raises:
+            RuntimeError: If chartread fails.
+
+        Returns:
+            interactive.ChartReadSession: The progress events, the throughput and
+                the errors of the session.
         """
         os.makedirs(self.profile_absolute_path, exist_ok=True)
 
@@ -1211,22 +1530,60 @@ class ICCGenerator(object):
         # first call the targen command
         if self.output_commands:
             print("command: {}".format(" ".join(command)))
-        for output in self.run_external_process(command, shell=True):
-            print(output)
+        session = interactive.ChartReadSession(on_event=on_event)
+        try:
+            # the output is already echoed to the console
+            with self.recording_run_stats("read"):
+                for output in self.run_external_process(command, shell=True):
+                    session.add_line(output)
+        finally:
+            session.finish()
+        return session
+
+    def generate_profile_command(
+        self,
+        quality: str = "h",
+        smoothing: float = 0.5,
+        source_profile: Union[str, pathlib.Path] = "AdobeRGB",
+        base_path: Union[None, str, pathlib.Path] = None,
+    ) -> List[str]:
+        """Return the colprof command.
 
-    def generate_profile(self):
-        """Generate the profile."""
-        os.makedirs(self.profile_absolute_path, exist_ok=True)
+        Args:
+            quality (str): The profile quality, one of "l" (low), "m" (medium), "h"
+                (high) or "u" (ultra). Default is "h".
+            smoothing (float): The average deviation of the device and the
+                instrument in percent, higher values smooth the profile more.
+                Default is 0.5.
+            source_profile (Union[str, pathlib.Path]): The source gamut to optimize
+                the gamut mapping for, one of "sRGB", "AdobeRGB" or "ProPhoto" or a
+                path to an ICC/ICM file. Default is "AdobeRGB".
+            base_path (Union[None, str, pathlib.Path]): The path of the .ti3 input
+                and the .icc output without the extension, default is the
+                profile_absolute_full_path.
+
+        Raises:
+            ValueError: If quality is not one of "l", "m", "h" or "u".
+
+        Returns:
+            List[str]: The command.
+        """
+        if quality not in self.PROFILE_QUALITIES:
+            raise ValueError(
+                f"quality should be one of {', '.join(self.PROFILE_QUALITIES[:-1])} "
+                f"or {self.PROFILE_QUALITIES[-1]}, not {quality}"
+            )
+
+        if base_path is None:
+            base_path = self.profile_absolute_full_path
 
-        # ************************
-        # colprof command
         command = [
             "colprof",
             "-v",
-            "-qh",
-            "-r0.5",
+            f"-q{quality}",
+            f"-r{smoothing}",
             "-S",
-            str(HERE.parent / "data" / "AdobeRGB.icc"),
+            str(transform.get_image_profile_path(source_profile)),
             "-cmt",
             "-dpp",
             "-Zr",
@@ -1237,25 +1594,108 @@ class ICCGenerator(object):
         if self.copyright_info:
             command.append(f"-C{self.copyright_info}")
 
-        command += [str(self.profile_absolute_full_path)]
+        command += [str(base_path)]
+        return command
+
+    def generate_profile(self):
+        """Generate the profile."""
+        os.makedirs(self.profile_absolute_path, exist_ok=True)
+
+        # ************************
+        # colprof command
+        command = self.generate_profile_command()
 
         # call the command
         # yield from self.run_external_process(command)
         if self.output_commands:
             print("command: {}".format(" ".join(command)))
-        for output in self.run_external_process(command):
-            print(output)
+        with self.recording_run_stats("profile"):
+            for output in self.run_external_process(command):
+                print(output)
 
-    def check_profile(self, sort_by_de: bool = False):
-        """Check the profile quality.
+        if self.catalog is not None:
+            self.catalog.record_session(self, profile_command=command)
+
+    def generate_profile_sweep(
+        self,
+        qualities: Union[None, List[str]] = None,
+        smoothing_values: Union[None, List[float]] = None,
+        source_profiles: Union[None, List[str]] = None,
+        holdout: float = sweep.DEFAULT_HOLDOUT,
+        metric: str = "average",
+        workers: Union[None, int] = None,
+    ) -> sweep.SweepReport:
+        """Generate profile variants in parallel and use the most accurate one.
+
+        The variants are built from a subset of the measurements and scored by the
+        CIEDE2000 error on the rest, the best one is built again from all the
+        measurements to the profile path.
 
         Args:
-            sort_by_de (bool): Sort by dE value or not. Default is False.
+            qualities (Union[None, List[str]]): The colprof quality levels, default
+                is "m" and "h".
+            smoothing_values (Union[None, List[float]]): The colprof smoothing
+                values, default is 0.25, 0.5 and 1.0.
+            source_profiles (Union[None, List[str]]): The source gamuts, default is
+                "AdobeRGB" and "ProPhoto".
+            holdout (float): The ratio of the patches to score the variants with,
+                default is 0.1.
+            metric (str): The dE statistic to compare the variants with, one of
+                "average", "rms", "percentile_95" or "maximum".
+            workers (Union[None, int]): The number of worker processes, default is
+                the number of CPUs.
+
+        Returns:
+            sweep.SweepReport: The results of the variants.
         """
-        os.makedirs(self.profile_absolute_path, exist_ok=True)
+        report = sweep.sweep_profiles(
+            self,
+            qualities=qualities,
+            smoothing_values=smoothing_values,
+            source_profiles=source_profiles,
+            holdout=holdout,
+            metric=metric,
+            workers=workers,
+        )
+        print(report.format())
+
+        if self.catalog is not None:
+            variant = report.best.variant
+            self.catalog.record_session(
+                self,
+                profile_command=self.generate_profile_command(
+                    quality=variant.quality,
+                    smoothing=variant.smoothing,
+                    source_profile=variant.source_profile,
+                ),
+            )
+        return report
 
-        # ************************
-        # prof_check
+    def check_profile_paths(self) -> Tuple[str, str]:
+        """Return the paths of the measurement and the profile files to check.
+
+        Returns:
+            Tuple[str, str]: The ti3 and the icc file paths.
+        """
+        ti3_path = f"{self.profile_absolute_full_path}.ti3"
+        system_name = platform.system().lower()
+        if "win32" in system_name:
+            # windows uses *.icm file extension
+            icc_path = f"{self.profile_absolute_full_path}.icm"
+        else:
+            # OSX and Linux uses *.icc file extension
+            icc_path = f"{self.profile_absolute_full_path}.icc"
+        return ti3_path, icc_path
+
+    def check_profile_command(self, sort_by_de: bool = False) -> List[str]:
+        """Return the profcheck command.
+
+        Args:
+            sort_by_de (bool): Sort by dE value or not. Default is False.
+
+        Returns:
+            List[str]: The command.
+        """
         command = [
             "profcheck",
             "-k",
@@ -1264,22 +1704,189 @@ class ICCGenerator(object):
         if sort_by_de:
             command.append("-s")
 
-        command.append(f"{self.profile_absolute_full_path}.ti3")
+        command += list(self.check_profile_paths())
+        return command
 
-        system_name = platform.system().lower()
-        if "win32" in system_name:
-            # windows uses *.icm file extension
-            command.append(f"{self.profile_absolute_full_path}.icm")
-        else:
-            # OSX and Linux uses *.icc file extension
-            command.append(f"{self.profile_absolute_full_path}.icc")
+    def check_profile(self, sort_by_de: bool = False, engine: str = "profcheck"):
+        """Check the profile quality.
+
+        Args:
+            sort_by_de (bool): Sort by dE value or not. Default is False.
+            engine (str): The engine to use, one of the following:
+
+                profcheck = call ArgyllCMS profcheck (default)
+                native = check the profile in process and return a report
+
+        Raises:
+            TypeError: If engine is not a str.
+            ValueError: If engine is not one of "profcheck" or "native".
+
+        Returns:
+            Union[None, ProfileCheckReport]: The ProfileCheckReport if the engine is
+                "native", None otherwise.
+        """
+        if not isinstance(engine, str):
+            raise TypeError(f"engine should be a str, not {engine.__class__.__name__}")
+
+        if engine not in ["profcheck", "native"]:
+            raise ValueError(
+                f"engine should be one of profcheck or native, not {engine}"
+            )
+
+        os.makedirs(self.profile_absolute_path, exist_ok=True)
+
+        if engine == "native":
+            ti3_path, icc_path = self.check_profile_paths()
+            report = profile_check.check_profile(ti3_path, icc_path)
+            print(report.format(sort_by_de=sort_by_de))
+            if self.catalog is not None:
+                self.catalog.record_check(
+                    self,
+                    report.average,
+                    report.maximum,
+                    percentile_95=report.percentile_95,
+                    patch_count=len(report),
+                )
+            return report
+
+        # ************************
+        # prof_check
+        command = self.check_profile_command(sort_by_de=sort_by_de)
 
         # call the command
         # yield from self.run_external_process(command)
         if self.output_commands:
             print("command: {}".format(" ".join(command)))
-        for output in self.run_external_process(command):
-            print(output)
+        outputs = []
+        with self.recording_run_stats("check"):
+            for output in self.run_external_process(command):
+                print(output)
+                outputs.append(output)
+
+        if self.catalog is not None:
+            self.catalog.record_check_output(self, outputs)
+
+    async def run_external_process_async(
+        self,
+        command: List[str],
+        timeout: Union[None, float] = None,
+        on_output: Union[None, Callable[[str, str], None]] = None,
+    ) -> async_runner.ProcessResult:
+        """Run the given command without blocking the event loop.
+
+        Args:
+            command (List[str]): The command.
+            timeout (Union[None, float]): The maximum run time of the process in
+                seconds, None means no limit.
+            on_output (Union[None, Callable[[str, str], None]]): Called with the
+                stream name and the line for every output line. The lines are
+                printed if skipped.
+
+        Raises:
+            TimeoutError: If the process doesn't finish in time.
+            RuntimeError: If the command return code is not 0.
+
+        Returns:
+            async_runner.ProcessResult: The result of the process.
+        """
+        if self.output_commands:
+            print("command: {}".format(" ".join(map(str, command))))
+        if on_output is None:
+
+            def on_output(stream, line):
+                print(line)
+
+        return await async_runner.run_command(
+            command, timeout=timeout, on_output=on_output
+        )
+
+    async def generate_target_async(
+        self,
+        timeout: Union[None, float] = None,
+        on_output: Union[None, Callable[[str, str], None]] = None,
+    ) -> async_runner.ProcessResult:
+        """Generate the required ti1 file without blocking the event loop.
+
+        Args:
+            timeout (Union[None, float]): The maximum run time of targen in seconds.
+            on_output (Union[None, Callable[[str, str], None]]): Called with the
+                stream name and the line for every output line.
+
+        Returns:
+            async_runner.ProcessResult: The result of the process.
+        """
+        os.makedirs(self.profile_absolute_path, exist_ok=True)
+        return await self.run_external_process_async(
+            self.generate_target_command(), timeout=timeout, on_output=on_output
+        )
+
+    async def generate_tif_async(
+        self,
+        timeout: Union[None, float] = None,
+        on_output: Union[None, Callable[[str, str], None]] = None,
+    ) -> async_runner.ProcessResult:
+        """Generate the Tiff files without blocking the event loop.
+
+        Args:
+            timeout (Union[None, float]): The maximum run time of printtarg in
+                seconds.
+            on_output (Union[None, Callable[[str, str], None]]): Called with the
+                stream name and the line for every output line.
+
+        Returns:
+            async_runner.ProcessResult: The result of the process.
+        """
+        os.makedirs(self.profile_absolute_path, exist_ok=True)
+        command = self.generate_tif_command()
+        self.update_tif_files()
+        return await self.run_external_process_async(
+            command, timeout=timeout, on_output=on_output
+        )
+
+    async def generate_profile_async(
+        self,
+        timeout: Union[None, float] = None,
+        on_output: Union[None, Callable[[str, str], None]] = None,
+    ) -> async_runner.ProcessResult:
+        """Generate the profile without blocking the event loop.
+
+        Args:
+            timeout (Union[None, float]): The maximum run time of colprof in seconds.
+            on_output (Union[None, Callable[[str, str], None]]): Called with the
+                stream name and the line for every output line.
+
+        Returns:
+            async_runner.ProcessResult: The result of the process.
+        """
+        os.makedirs(self.profile_absolute_path, exist_ok=True)
+        return await self.run_external_process_async(
+            self.generate_profile_command(), timeout=timeout, on_output=on_output
+        )
+
+    async def check_profile_async(
+        self,
+        sort_by_de: bool = False,
+        timeout: Union[None, float] = None,
+        on_output: Union[None, Callable[[str, str], None]] = None,
+    ) -> async_runner.ProcessResult:
+        """Check the profile quality with profcheck without blocking the event loop.
+
+        Args:
+            sort_by_de (bool): Sort by dE value or not. Default is False.
+            timeout (Union[None, float]): The maximum run time of profcheck in
+                seconds.
+            on_output (Union[None, Callable[[str, str], None]]): Called with the
+                stream name and the line for every output line.
+
+        Returns:
+            async_runner.ProcessResult: The result of the process.
+        """
+        os.makedirs(self.profile_absolute_path, exist_ok=True)
+        return await self.run_external_process_async(
+            self.check_profile_command(sort_by_de=sort_by_de),
+            timeout=timeout,
+            on_output=on_output,
+        )
 
     def install_profile(self):
         """Install the generated profile to appropriate folders for the current OS.
@@ -1310,6 +1917,19 @@ class ICCGenerator(object):
             traceback.print_exc()
         else:
             logger.info(f"Profile installed: {self.profile_absolute_path}")
+            if self.catalog is not None:
+                self.catalog.record_install(self, profile_install_path)
+
+    def installed_profiles(self) -> list:
+        """Return the profiles installed to the output_path.
+
+        Only the headers of the profiles are read and their files are closed, the
+        tags are read and decoded when they are accessed.
+
+        Returns:
+            List[ICCProfile]: The installed profiles sorted by file name.
+        """
+        return list(icc.list_profiles(self.output_path))
 
     @classmethod
     def color_correct_image(
@@ -1319,10 +1939,15 @@ class ICCGenerator(object):
         output_image_path: Union[str, pathlib.Path, None] = None,
         image_profile: Union[str, pathlib.Path] = "AdobeRGB",
         intent: str = "r",
-    ):
+        engine: str = "cctiff",
+    ) -> pathlib.Path:
         """Apply color correction to the given image.
 
-        Accepts TIFF or JPEG files.
+        Accepts TIFF or JPEG files. The "cctiff" engine calls Argyll's cctiff, the
+        "native" engine applies the transform in-process, which avoids starting a new
+        process and parsing the profiles again for every image. The native engine
+        streams TIFF files band by band, so the memory use doesn't depend on the image
+        size.
 
         cctiff
          ~/.local/share/icc/Canon_iX6850_Generic_Plain_Matte_A4_CanonInk_20210207_1402.icc
@@ -1339,8 +1964,9 @@ class ICCGenerator(object):
         Args:
             printer_profile_path (Union[str, pathlib.Path]): The path of the ICC/ICM
                 file of the printer profile.
-            image_profile (Union[str, pathlib.Path]): Can be either "sRGB" or
-                "AdobeRGB", default is "AdobeRGB".
+            image_profile (Union[str, pathlib.Path]): Can be either "sRGB",
+                "AdobeRGB" or "ProPhoto" or a path to an ICC/ICM file, default is
+                "AdobeRGB".
             input_image_path (Union[str, pathlib.Path]): The input JPG/TIFF image path.
             output_image_path (Uniton[str, pathlib.Path, None]): The output TIFF image
                 path. Can be set to None then a suitable path will be generated
@@ -1350,6 +1976,9 @@ class ICCGenerator(object):
                 p = perceptual, r = relative colorimetric (default)
                 s = saturation, a = absolute colorimetric
 
+            engine (str): The engine used to apply the correction, one of "cctiff"
+                (default) or "native".
+
         Raises:
             ValueError: Raises ValueError in following conditions:
                 - If printer_profile_path doesn't exist.
@@ -1359,13 +1988,27 @@ class ICCGenerator(object):
                 - If input_image_path suffix is not one of ".jpg", ".tif" or ".tiff"
                 - If output_image_path suffix is not one of ".jpg", ".tif" or ".tiff"
                 - If intent is not one of ["p", "r", "s", "a"].
-                - If image_profile filename isn't one of "AdobeRGB" or "sRGB".
+                - If image_profile filename isn't one of "AdobeRGB", "sRGB" or
+                  "ProPhoto".
+                - If engine is not one of "cctiff" or "native".
             TypeError: Raises TypeError in following conditions:
                 - If printer_profile_path is not a str or pathlib.Path instance.
                 - If input_path is not a str or pathlib.Path instance.
                 - If intent is not a str.
                 - If image_profile is not a str or pathlib.Path.
+                - If engine is not a str.
+
+        Returns:
+            pathlib.Path: The output image path.
         """
+        # ---------------------
+        # Engine
+        if not isinstance(engine, str):
+            raise TypeError(f"engine should be a str, not {engine.__class__.__name__}")
+
+        if engine not in ["cctiff", "native"]:
+            raise ValueError(f"engine should be one of cctiff or native, not {engine}")
+
         # ---------------------
         # Printer Profile Path
         if printer_profile_path is None or not isinstance(
@@ -1441,26 +2084,17 @@ class ICCGenerator(object):
 
         # ---------------------
         # Image Profile
-        if image_profile is None:
-            image_profile = "AdobeRGB"
-
-        if not isinstance(image_profile, (str, pathlib.Path)):
-            raise TypeError(
-                f"image_profile should be one of sRGB or AdobeRGB, not {image_profile}"
+        image_profile_path = transform.get_image_profile_path(image_profile)
+
+        if engine == "native":
+            return transform.correct_image(
+                image_profile_path,
+                printer_profile_path,
+                input_image_path,
+                output_image_path,
+                intent=intent,
             )
 
-        image_profile = pathlib.Path(image_profile)
-        if not image_profile.is_file():
-            base_name = image_profile.stem
-            if base_name.lower() not in ["adobergb", "srgb"]:
-                raise ValueError(
-                    f"image_profile should be one of sRGB or AdobeRGB, not "
-                    f"{image_profile}"
-                )
-            image_profile_path = HERE.parent / f"{image_profile}.icc"
-        else:
-            image_profile_path = image_profile
-
         # ************************
         # cctiff
         command = [
@@ -1479,3 +2113,57 @@ class ICCGenerator(object):
         print("command: {}".format(" ".join(command)))
         for output in cls.run_external_process(command):
             print(output)
+
+        return output_image_path
+
+    @classmethod
+    def color_correct_images(
+        cls,
+        printer_profile_path: Union[str, pathlib.Path] = None,
+        inputs: Union[None, list] = None,
+        output_dir: Union[None, str, pathlib.Path] = None,
+        image_profile: Union[str, pathlib.Path] = "AdobeRGB",
+        intent: str = "r",
+        workers: Union[None, int] = None,
+    ) -> batch.BatchReport:
+        """Apply color correction to a batch of images in a process pool.
+
+        Uses the native engine, the output names are generated as in
+        color_correct_image() but decided once for the whole batch.
+
+        Args:
+            printer_profile_path (Union[str, pathlib.Path]): The path of the ICC/ICM
+                file of the printer profile.
+            inputs (list): The JPG/TIFF image paths, directories or glob patterns.
+            output_dir (Union[None, str, pathlib.Path]): The output directory, default
+                is the directory of each input image.
+            image_profile (Union[str, pathlib.Path]): Can be either "sRGB",
+                "AdobeRGB" or "ProPhoto" or a path to an ICC/ICM file, default is
+                "AdobeRGB".
+            intent (str): Rendering intent, one of p, r, s, a, default is "r".
+            workers (Union[None, int]): The number of worker processes, default is
+                the number of CPUs.
+
+        Raises:
+            TypeError: If printer_profile_path is not a str or pathlib.Path instance
+                or inputs is not a list.
+
+        Returns:
+            batch.BatchReport: The per image results and the throughput.
+        """
+        if printer_profile_path is None or not isinstance(
+            printer_profile_path, (str, pathlib.Path)
+        ):
+            raise TypeError("Please specify a proper printer_profile_path!")
+
+        if not isinstance(inputs, list):
+            raise TypeError(f"inputs should be a list, not {inputs.__class__.__name__}")
+
+        return batch.correct_images(
+            printer_profile_path,
+            inputs,
+            output_dir=output_dir,
+            image_profile=image_profile,
+            intent=intent,
+            workers=workers,
+        )
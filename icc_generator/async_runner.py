@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Asynchronous counterpart of ``ICCGenerator.run_external_process``.
+
+The external processes are started with ``asyncio.create_subprocess_exec`` and their
+stdout and stderr are read at the same time, so a single event loop can drive many
+targen, colprof or profcheck processes in parallel without a thread for each child.
+
+The processes are terminated when their timeout is reached or when the awaiting task
+is cancelled.
+"""
+
+import asyncio
+import time
+from typing import Callable, List, Union
+
+from icc_generator import logger
+
+
+STDOUT = "stdout"
+STDERR = "stderr"
+
+TERMINATE_TIMEOUT = 5.0
+
+
+class ProcessResult(object):
+    """The result of an external process.
+
+    Args:
+        command (List[str]): The command.
+        return_code (int): The return code of the process.
+        stdout (List[str]): The stdout lines.
+        stderr (List[str]): The stderr lines.
+        duration (float): The wall time of the process in seconds.
+    """
+
+    def __init__(
+        self,
+        command: List[str],
+        return_code: int,
+        stdout: List[str],
+        stderr: List[str],
+        duration: float,
+    ):
+        self.command = command
+        self.return_code = return_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+
+
+async def _terminate(process: asyncio.subprocess.Process):
+    """Terminate the given process and kill it if it doesn't exit in time.
+
+    Args:
+        process (asyncio.subprocess.Process): The process.
+    """
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(process.wait(), TERMINATE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.debug(f"Killing process: {process.pid}")
+        process.kill()
+        await process.wait()
+
+
+async def _pump(stream: asyncio.StreamReader, name: str, lines: asyncio.Queue):
+    """Put the lines of the given stream to the queue.
+
+    Args:
+        stream (asyncio.StreamReader): The stream.
+        name (str): The stream name, one of "stdout" or "stderr".
+        lines (asyncio.Queue): The queue of (stream name, line) pairs, None is put
+            at the end of the stream.
+    """
+    try:
+        async for line in stream:
+            await lines.put((name, line.decode("utf-8", errors="replace").strip()))
+    finally:
+        await lines.put(None)
+
+
+def _remaining(deadline: Union[None, float]) -> Union[None, float]:
+    """Return the remaining time to the given deadline.
+
+    Args:
+        deadline (Union[None, float]): The deadline in event loop time.
+
+    Raises:
+        asyncio.TimeoutError: If the deadline is passed.
+
+    Returns:
+        Union[None, float]: The remaining time in seconds or None if there is no
+            deadline.
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - asyncio.get_running_loop().time()
+    if remaining <= 0:
+        raise asyncio.TimeoutError()
+    return remaining
+
+
+async def run_external_process_async(
+    command: List[str], timeout: Union[None, float] = None
+):
+    """Run the given command and yield its stdout and stderr lines as they arrive.
+
+    Args:
+        command (List[str]): The command.
+        timeout (Union[None, float]): The maximum run time of the process in
+            seconds, None means no limit.
+
+    Raises:
+        TimeoutError: If the process doesn't finish in time.
+        RuntimeError: If the command return code is not 0.
+
+    Yields:
+        Tuple[str, str]: The stream name, one of "stdout" or "stderr", and the line.
+    """
+    command = [str(argument) for argument in command]
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    lines = asyncio.Queue()
+    pumps = [
+        asyncio.create_task(_pump(process.stdout, STDOUT, lines)),
+        asyncio.create_task(_pump(process.stderr, STDERR, lines)),
+    ]
+
+    stderr_buffer = []
+    try:
+        open_streams = len(pumps)
+        while open_streams:
+            item = await asyncio.wait_for(lines.get(), _remaining(deadline))
+            if item is None:
+                open_streams -= 1
+                continue
+            if item[0] == STDERR:
+                stderr_buffer.append(item[1])
+            yield item
+        return_code = await asyncio.wait_for(process.wait(), _remaining(deadline))
+    except asyncio.TimeoutError:
+        raise TimeoutError(
+            f"{command[0]} did not finish in {timeout} seconds"
+        ) from None
+    finally:
+        # also runs when the awaiting task is cancelled
+        await _terminate(process)
+        for pump in pumps:
+            pump.cancel()
+
+    if return_code:
+        # there is an error
+        raise RuntimeError("\n".join(stderr_buffer))
+
+
+async def run_command(
+    command: List[str],
+    timeout: Union[None, float] = None,
+    on_output: Union[None, Callable[[str, str], None]] = None,
+) -> ProcessResult:
+    """Run the given command and collect its output.
+
+    Args:
+        command (List[str]): The command.
+        timeout (Union[None, float]): The maximum run time of the process in
+            seconds, None means no limit.
+        on_output (Union[None, Callable[[str, str], None]]): Called with the stream
+            name and the line for every output line as it arrives.
+
+    Raises:
+        TimeoutError: If the process doesn't finish in time.
+        RuntimeError: If the command return code is not 0.
+
+    Returns:
+        ProcessResult: The result of the process.
+    """
+    start = time.perf_counter()
+    output = {STDOUT: [], STDERR: []}
+    async for stream, line in run_external_process_async(command, timeout=timeout):
+        output[stream].append(line)
+        if on_output is not None:
+            on_output(stream, line)
+    return ProcessResult(
+        [str(argument) for argument in command],
+        0,
+        output[STDOUT],
+        output[STDERR],
+        time.perf_counter() - start,
+    )
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""Batch color correction of images with a process pool.
+
+The input images are collected from files, directories and glob patterns, the output
+names are decided once for the whole batch and the images are corrected with the
+native engine in a bounded pool of worker processes. The device link is built (or
+loaded from the on-disk LUT cache) once in the main process, so the workers only load
+the cached table.
+
+Example:
+
+    python -m icc_generator.batch printer.icc ~/Pictures/prints/*.jpg -o ~/corrected
+
+    from icc_generator import batch
+
+    report = batch.correct_images("printer.icc", ["~/Pictures/prints"], workers=8)
+    print(report.format())
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import pathlib
+import re
+import sys
+import time
+from typing import List, Union
+
+from icc_generator import image, transform
+from icc_generator.lut_cache import LUTCache
+
+
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".tif", ".tiff"]
+
+OUTPUT_SUFFIX = "_corrected"
+OUTPUT_PATTERN = re.compile(rf"{OUTPUT_SUFFIX}_\d+$")
+
+
+def collect_images(inputs: List[Union[str, pathlib.Path]]) -> List[pathlib.Path]:
+    """Collect the images from the given files, directories and glob patterns.
+
+    Only the files with a JPG/TIFF extension are collected from the directories and
+    the glob patterns, the directories are not searched recursively (use a "**"
+    pattern for that). The outputs of the earlier batches, i.e.
+    ``{name}_corrected_{i}{ext}``, are skipped unless they are given as files, so
+    running a batch again on the same directory doesn't correct its own outputs.
+
+    Args:
+        inputs (List[Union[str, pathlib.Path]]): The file paths, directory paths or
+            glob patterns.
+
+    Raises:
+        ValueError: If an input doesn't match any file.
+
+    Returns:
+        List[pathlib.Path]: The unique image paths in the given order.
+    """
+    image_paths = []
+    for item in inputs:
+        path = pathlib.Path(item).expanduser()
+        if path.is_file():
+            candidates = [path]
+        else:
+            if path.is_dir():
+                candidates = sorted(path.iterdir())
+            else:
+                candidates = [
+                    pathlib.Path(match)
+                    for match in sorted(glob.glob(str(path), recursive=True))
+                ]
+                if not candidates:
+                    raise ValueError(f"No images found: {item}")
+            candidates = [
+                candidate
+                for candidate in candidates
+                if not OUTPUT_PATTERN.search(candidate.stem)
+            ]
+
+        image_paths += [
+            candidate
+            for candidate in candidates
+            if candidate.suffix.lower() in IMAGE_EXTENSIONS and candidate.is_file()
+        ]
+
+    # remove duplicates while keeping the order
+    return list(dict.fromkeys(image_paths))
+
+
+def plan_outputs(
+    input_paths: List[pathlib.Path],
+    output_dir: Union[None, str, pathlib.Path] = None,
+) -> List[pathlib.Path]:
+    """Decide the output paths of the whole batch at once.
+
+    The outputs are named as ``{name}_corrected_{i}{ext}`` like the
+    ICCGenerator.color_correct_image() does, with the smallest i that is not used by
+    an existing file or another image in the batch. Every output directory is listed
+    only once.
+
+    Args:
+        input_paths (List[pathlib.Path]): The input image paths.
+        output_dir (Union[None, str, pathlib.Path]): The output directory, default is
+            the directory of each input image.
+
+    Returns:
+        List[pathlib.Path]: The output paths in the same order with the inputs.
+    """
+    if output_dir is not None:
+        output_dir = pathlib.Path(output_dir).expanduser()
+
+    used_names = {}
+    output_paths = []
+    for input_path in input_paths:
+        directory = output_dir or input_path.parent
+        if directory not in used_names:
+            used_names[directory] = (
+                set(os.listdir(directory)) if directory.is_dir() else set()
+            )
+        names = used_names[directory]
+
+        i = 1
+        while f"{input_path.stem}{OUTPUT_SUFFIX}_{i}{input_path.suffix}" in names:
+            i += 1
+        name = f"{input_path.stem}{OUTPUT_SUFFIX}_{i}{input_path.suffix}"
+        names.add(name)
+        output_paths.append(directory / name)
+    return output_paths
+
+
+class BatchResult(object):
+    """The result of a single image in a batch.
+
+    Args:
+        input_path (pathlib.Path): The input image path.
+        output_path (pathlib.Path): The output image path.
+        duration (float): The time spent on the image in seconds.
+        pixel_count (int): The number of pixels in the image.
+        error (Union[None, str]): The error message if the correction failed.
+    """
+
+    def __init__(
+        self,
+        input_path: pathlib.Path,
+        output_path: pathlib.Path,
+        duration: float = 0.0,
+        pixel_count: int = 0,
+        error: Union[None, str] = None,
+    ):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.duration = duration
+        self.pixel_count = pixel_count
+        self.error = error
+
+    @property
+    def succeeded(self) -> bool:
+        """Return True if the image is corrected.
+
+        Returns:
+            bool: True if there is no error.
+        """
+        return self.error is None
+
+    def to_dict(self) -> dict:
+        """Return the result as a dictionary.
+
+        Returns:
+            dict: The result.
+        """
+        return {
+            "input_path": str(self.input_path),
+            "output_path": str(self.output_path),
+            "duration": self.duration,
+            "pixel_count": self.pixel_count,
+            "error": self.error,
+        }
+
+
+class BatchReport(object):
+    """The results of a batch.
+
+    Args:
+        results (List[BatchResult]): The results in the input order.
+        duration (float): The wall clock time of the batch in seconds.
+        workers (int): The number of worker processes.
+    """
+
+    def __init__(self, results: List[BatchResult], duration: float, workers: int):
+        self.results = results
+        self.duration = duration
+        self.workers = workers
+
+    @property
+    def succeeded(self) -> List[BatchResult]:
+        """Return the results of the corrected images.
+
+        Returns:
+            List[BatchResult]: The successful results.
+        """
+        return [result for result in self.results if result.succeeded]
+
+    @property
+    def failed(self) -> List[BatchResult]:
+        """Return the results of the images that couldn't be corrected.
+
+        Returns:
+            List[BatchResult]: The failed results.
+        """
+        return [result for result in self.results if not result.succeeded]
+
+    @property
+    def images_per_second(self) -> float:
+        """Return the number of corrected images per second.
+
+        Returns:
+            float: The throughput in images per second.
+        """
+        if not self.duration:
+            return 0.0
+        return len(self.succeeded) / self.duration
+
+    @property
+    def megapixels_per_second(self) -> float:
+        """Return the number of corrected megapixels per second.
+
+        Returns:
+            float: The throughput in megapixels per second.
+        """
+        if not self.duration:
+            return 0.0
+        pixel_count = sum(result.pixel_count for result in self.succeeded)
+        return pixel_count / 1e6 / self.duration
+
+    def to_dict(self) -> dict:
+        """Return the report as a dictionary.
+
+        Returns:
+            dict: The report.
+        """
+        return {
+            "duration": self.duration,
+            "workers": self.workers,
+            "succeeded": len(self.succeeded),
+            "failed": len(self.failed),
+            "images_per_second": self.images_per_second,
+            "megapixels_per_second": self.megapixels_per_second,
+            "results": [result.to_dict() for result in self.results],
+        }
+
+    def format(self) -> str:
+        """Format the report.
+
+        Returns:
+            str: One line for every image and the summary.
+        """
+        lines = []
+        for result in self.results:
+            if result.succeeded:
+                lines.append(
+                    f"{result.input_path} -> {result.output_path} "
+                    f"({result.duration:.2f}s)"
+                )
+            else:
+                lines.append(f"{result.input_path} FAILED: {result.error}")
+        lines.append(
+            f"Corrected {len(self.succeeded)} of {len(self.results)} images in "
+            f"{self.duration:.2f}s with {self.workers} workers, "
+            f"{self.images_per_second:.2f} images/s, "
+            f"{self.megapixels_per_second:.2f} MP/s"
+        )
+        return "\n".join(lines)
+
+
+def _initialize_worker(disk_cache: Union[None, LUTCache]):
+    """Use the LUT cache of the main process in the worker process.
+
+    Args:
+        disk_cache (Union[None, LUTCache]): The LUT cache.
+    """
+    transform.disk_cache = disk_cache
+
+
+def _correct_image(
+    image_profile_path: pathlib.Path,
+    printer_profile_path: pathlib.Path,
+    input_path: pathlib.Path,
+    output_path: pathlib.Path,
+    intent: str,
+    grid_points: int,
+) -> BatchResult:
+    """Correct a single image, runs in the worker processes.
+
+    Args:
+        image_profile_path (pathlib.Path): The image profile path.
+        printer_profile_path (pathlib.Path): The printer profile path.
+        input_path (pathlib.Path): The input image path.
+        output_path (pathlib.Path): The output image path.
+        intent (str): The rendering intent letter.
+        grid_points (int): The number of grid points of the device link.
+
+    Returns:
+        BatchResult: The result.
+    """
+    start = time.perf_counter()
+    try:
+        transform.correct_image(
+            image_profile_path,
+            printer_profile_path,
+            input_path,
+            output_path,
+            intent=intent,
+            grid_points=grid_points,
+        )
+        width, height = image.image_size(output_path)
+    except Exception as error:
+        return BatchResult(
+            input_path,
+            output_path,
+            duration=time.perf_counter() - start,
+            error=f"{error.__class__.__name__}: {error}",
+        )
+    return BatchResult(
+        input_path,
+        output_path,
+        duration=time.perf_counter() - start,
+        pixel_count=width * height,
+    )
+
+
+def correct_images(
+    printer_profile_path: Union[str, pathlib.Path],
+    inputs: List[Union[str, pathlib.Path]],
+    output_dir: Union[None, str, pathlib.Path] = None,
+    image_profile: Union[None, str, pathlib.Path] = "AdobeRGB",
+    intent: str = "r",
+    workers: Union[None, int] = None,
+    grid_points: int = transform.DEFAULT_GRID_POINTS,
+) -> BatchReport:
+    """Color correct the given images in a process pool.
+
+    Args:
+        printer_profile_path (Union[str, pathlib.Path]): The printer profile path.
+        inputs (List[Union[str, pathlib.Path]]): The image paths, directories or glob
+            patterns.
+        output_dir (Union[None, str, pathlib.Path]): The output directory, default is
+            the directory of each input image.
+        image_profile (Union[None, str, pathlib.Path]): One of "sRGB", "AdobeRGB" or
+            "ProPhoto" or a path to an ICC/ICM file, default is "AdobeRGB".
+        intent (str): The rendering intent letter, one of p, r, s, a.
+        workers (Union[None, int]): The number of worker processes, default is the
+            number of CPUs. With 1 the images are corrected in this process.
+        grid_points (int): The number of grid points of the device link.
+
+    Raises:
+        TypeError: If workers is not an int.
+        ValueError: If workers is not positive, the intent is not valid or an input
+            doesn't match any file.
+        RuntimeError: If the printer profile doesn't exist.
+
+    Returns:
+        BatchReport: The report.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if not isinstance(workers, int):
+        raise TypeError(f"workers should be an int, not {workers.__class__.__name__}")
+
+    if workers < 1:
+        raise ValueError(f"workers should be a positive integer, not {workers}")
+
+    if intent not in transform.INTENTS:
+        raise ValueError(f"intent should be one of p, r, s, a, not {intent}")
+
+    printer_profile_path = pathlib.Path(printer_profile_path).expanduser()
+    image_profile_path = transform.get_image_profile_path(image_profile)
+    input_paths = collect_images(inputs)
+    output_paths = plan_outputs(input_paths, output_dir)
+    if output_dir is not None:
+        pathlib.Path(output_dir).expanduser().mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    # build the device link once, the workers load it from the LUT cache
+    transform.get_transform(
+        image_profile_path, printer_profile_path, intent, grid_points
+    )
+
+    arguments = [
+        (image_profile_path, printer_profile_path, input_path, output_path)
+        for input_path, output_path in zip(input_paths, output_paths)
+    ]
+    workers = min(workers, max(len(arguments), 1))
+    if workers == 1:
+        results = [
+            _correct_image(*argument, intent, grid_points) for argument in arguments
+        ]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_initialize_worker,
+            initargs=(transform.disk_cache,),
+        ) as executor:
+            futures = [
+                executor.submit(_correct_image, *argument, intent, grid_points)
+                for argument in arguments
+            ]
+            results = [future.result() for future in futures]
+
+    return BatchReport(results, time.perf_counter() - start, workers)
+
+
+def main(argv: Union[None, List[str]] = None) -> int:
+    """Run the batch correction from the command line.
+
+    Args:
+        argv (Union[None, List[str]]): The command line arguments.
+
+    Returns:
+        int: The exit code, 1 if any of the images couldn't be corrected.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m icc_generator.batch",
+        description="Color correct images for printing with the given profile.",
+    )
+    parser.add_argument("printer_profile", help="The printer ICC/ICM profile.")
+    parser.add_argument(
+        "inputs", nargs="+", help="The JPG/TIFF files, directories or glob patterns."
+    )
+    parser.add_argument(
+        "-o", "--output-dir", help="The output directory, default is next to inputs."
+    )
+    parser.add_argument(
+        "-p",
+        "--image-profile",
+        default="AdobeRGB",
+        help="sRGB, AdobeRGB, ProPhoto or an ICC/ICM file, default is AdobeRGB.",
+    )
+    parser.add_argument(
+        "-i",
+        "--intent",
+        default="r",
+        choices=sorted(transform.INTENTS),
+        help="The rendering intent, default is r (relative colorimetric).",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, help="The number of worker processes."
+    )
+    parser.add_argument(
+        "--grid-points",
+        type=int,
+        default=transform.DEFAULT_GRID_POINTS,
+        help="The number of grid points of the device link.",
+    )
+    args = parser.parse_args(argv)
+
+    report = correct_images(
+        args.printer_profile,
+        args.inputs,
+        output_dir=args.output_dir,
+        image_profile=args.image_profile,
+        intent=args.intent,
+        workers=args.workers,
+        grid_points=args.grid_points,
+    )
+    print(report.format())
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,570 @@
+# -*- coding: utf-8 -*-
+"""Garbage collection of the ICCGenerator cache folder.
+
+The profiling sessions, the target cache and the lookup table cache all live under
+~/.cache/ICCGenerator and none of the sessions are ever removed, so the high
+resolution charts add up to many gigabytes. The garbage collector keeps the folder
+within a size budget by removing the least recently used bulky files first:
+
+- The charts (.tif) and the output logs of the finished sessions.
+- The intermediate profiles of the smoothing and quality sweeps.
+- The target cache entries and the cached lookup tables, which are all generated
+  again when they are needed.
+
+The measurements (.ti3), the profiles (.icc/.icm), the targets (.ti1/.ti2) and the
+settings and state JSON files are small and never removed. A session that is in
+progress, i.e. one of its stages is running, any of its files is changed recently
+or its charts are not read or profiled yet and it is not abandoned, is never
+touched.
+
+The size of a hard linked file is only freed when all of its links are removed.
+The target cache entries are reflinked to the sessions on the copy on write file
+systems, where removing an entry frees less than its size.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import pathlib
+import re
+import shutil
+import stat as stat_module
+import sys
+import time
+import uuid
+from typing import Dict, List, Tuple, Union
+
+from icc_generator import logger
+
+
+DEFAULT_CACHE_PATH = "~/.cache/ICCGenerator"
+DEFAULT_MIN_AGE = 60 * 60
+DEFAULT_MAX_UNPROFILED_AGE = 30 * 24 * 60 * 60
+
+TARGET_CACHE_FOLDER = "targets"
+LUT_CACHE_FOLDER = "luts"
+SWEEP_FOLDER = "sweep"
+
+BULKY_EXTENSIONS = [".tif", ".tiff", ".log"]
+PROFILE_EXTENSIONS = [".icc", ".icm"]
+
+CHART = "chart"
+SWEEP = "sweep"
+TARGET_CACHE = "target_cache"
+LUT_CACHE = "lut_cache"
+
+SIZE_PATTERN = re.compile(r"^(?P<value>\d+(\.\d+)?)\s*(?P<unit>[KMGT]?)B?$", re.I)
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size(size: Union[int, str]) -> int:
+    """Return the given size in bytes.
+
+    Args:
+        size (Union[int, str]): The size in bytes or a str with a K, M, G or T
+            suffix, i.e. "500M" or "20G".
+
+    Raises:
+        TypeError: If size is not an int or str.
+        ValueError: If size is not a valid size.
+
+    Returns:
+        int: The size in bytes.
+    """
+    if isinstance(size, bool) or not isinstance(size, (int, str)):
+        raise TypeError(
+            f"size should be an int or str, not {size.__class__.__name__}"
+        )
+    if isinstance(size, str):
+        match = SIZE_PATTERN.match(size.strip())
+        if not match:
+            raise ValueError(
+                f"size should be a number with a K, M, G or T suffix, not {size}"
+            )
+        size = int(
+            float(match.group("value")) * SIZE_UNITS[match.group("unit").upper()]
+        )
+    if size < 0:
+        raise ValueError(f"size should be a positive integer, not {size}")
+    return size
+
+
+def format_size(size: int) -> str:
+    """Format the given size in bytes.
+
+    Args:
+        size (int): The size in bytes.
+
+    Returns:
+        str: The size with the largest unit it is at least one of, i.e. "1.5 GB".
+    """
+    for unit in ["T", "G", "M", "K"]:
+        if size >= SIZE_UNITS[unit]:
+            return f"{size / SIZE_UNITS[unit]:.1f} {unit}B"
+    return f"{size} B"
+
+
+class CacheItem(object):
+    """A file or folder that can be removed from the cache.
+
+    Args:
+        path (pathlib.Path): The file or folder path.
+        kind (str): One of "chart", "sweep", "target_cache" or "lut_cache".
+        files (List[Tuple[Tuple[int, int], int, float]]): The device and inode, the
+            size and the last use time of every file in it.
+    """
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        kind: str,
+        files: List[Tuple[Tuple[int, int], int, float]],
+    ):
+        self.path = path
+        self.kind = kind
+        self.files = files
+        self.freed = 0
+
+    @property
+    def size(self) -> int:
+        """Return the total size of the files.
+
+        Returns:
+            int: The size in bytes, the hard linked files are counted once.
+        """
+        return sum(dict((inode, size) for inode, size, _ in self.files).values())
+
+    @property
+    def last_used(self) -> float:
+        """Return the last time any of the files is used.
+
+        Returns:
+            float: The last access or modification time, whichever is later.
+        """
+        return max((used for _, _, used in self.files), default=0.0)
+
+    def remove(self):
+        """Remove the file or folder.
+
+        A target cache entry is renamed first, so the others never see a partial
+        entry.
+        """
+        if not self.path.is_dir():
+            self.path.unlink(missing_ok=True)
+            return
+        path = self.path
+        if self.kind == TARGET_CACHE:
+            path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.gc")
+            os.replace(self.path, path)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def to_dict(self) -> dict:
+        """Return the item as a dictionary.
+
+        Returns:
+            dict: The item.
+        """
+        return {
+            "path": str(self.path),
+            "kind": self.kind,
+            "size": self.size,
+            "freed": self.freed,
+            "last_used": datetime.datetime.fromtimestamp(self.last_used).isoformat(),
+        }
+
+
+class GCReport(object):
+    """The result of a garbage collection.
+
+    Args:
+        budget (int): The size budget in bytes.
+        size (int): The size of the cache before the collection in bytes.
+        removed (List[CacheItem]): The removed items, least recently used first.
+        in_progress (List[pathlib.Path]): The folders of the sessions in progress.
+        dry_run (bool): True if nothing is actually removed.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        size: int,
+        removed: List[CacheItem],
+        in_progress: List[pathlib.Path],
+        dry_run: bool = False,
+    ):
+        self.budget = budget
+        self.size = size
+        self.removed = removed
+        self.in_progress = in_progress
+        self.dry_run = dry_run
+
+    @property
+    def freed(self) -> int:
+        """Return the freed size.
+
+        Returns:
+            int: The freed size in bytes.
+        """
+        return sum(item.freed for item in self.removed)
+
+    @property
+    def size_after(self) -> int:
+        """Return the size of the cache after the collection.
+
+        Returns:
+            int: The size in bytes.
+        """
+        return self.size - self.freed
+
+    @property
+    def within_budget(self) -> bool:
+        """Check if the cache is within the budget after the collection.
+
+        Returns:
+            bool: False if removing all the bulky files is not enough.
+        """
+        return self.size_after <= self.budget
+
+    def to_dict(self) -> dict:
+        """Return the report as a dictionary.
+
+        Returns:
+            dict: The report.
+        """
+        return {
+            "budget": self.budget,
+            "size": self.size,
+            "size_after": self.size_after,
+            "freed": self.freed,
+            "within_budget": self.within_budget,
+            "dry_run": self.dry_run,
+            "removed": [item.to_dict() for item in self.removed],
+            "in_progress": [str(path) for path in self.in_progress],
+        }
+
+    def format(self) -> str:
+        """Format the report.
+
+        Returns:
+            str: One line for every removed item and the summary.
+        """
+        verb = "Would remove" if self.dry_run else "Removed"
+        lines = [
+            f"{verb} {item.path} ({item.kind}, {format_size(item.freed)})"
+            for item in self.removed
+        ]
+        lines.extend(
+            f"Skipped the session in progress: {path}" for path in self.in_progress
+        )
+        lines.append(
+            f"{verb} {len(self.removed)} items, freed {format_size(self.freed)}, "
+            f"the cache is {format_size(self.size_after)} of "
+            f"{format_size(self.budget)}"
+        )
+        if not self.within_budget:
+            lines.append("The cache is still over the budget")
+        return "\n".join(lines)
+
+
+def _is_running(state) -> bool:
+    """Check if any stage or job in the given saved state is running.
+
+    Args:
+        state: The loaded JSON state of a SessionState or a ProfilingCampaign.
+
+    Returns:
+        bool: True if any "status" in it is "running".
+    """
+    if isinstance(state, dict):
+        if state.get("status") == "running":
+            return True
+        state = list(state.values())
+    if isinstance(state, list):
+        return any(_is_running(value) for value in state)
+    return False
+
+
+def is_in_progress(
+    session_path: pathlib.Path,
+    min_age: float = DEFAULT_MIN_AGE,
+    max_unprofiled_age: float = DEFAULT_MAX_UNPROFILED_AGE,
+    now: Union[None, float] = None,
+) -> bool:
+    """Check if the session in the given folder is in progress.
+
+    Args:
+        session_path (pathlib.Path): The session folder.
+        min_age (float): The seconds since the last change of the files of a
+            finished session.
+        max_unprofiled_age (float): The seconds since the last change of the
+            files of a session that is not profiled yet, the older ones are
+            abandoned.
+        now (Union[None, float]): The current time, default is time.time().
+
+    Returns:
+        bool: True if any stage of it is running, any file in it is changed in the
+            last min_age seconds or a target in it is not profiled yet and its
+            files are changed in the last max_unprofiled_age seconds.
+    """
+    if now is None:
+        now = time.time()
+    names = set()
+    last_changed = 0.0
+    for path in session_path.rglob("*"):
+        try:
+            stat = path.stat()
+        except OSError:
+            # removed in the meantime
+            return True
+        if stat_module.S_ISDIR(stat.st_mode):
+            continue
+        if now - stat.st_mtime < min_age:
+            return True
+        last_changed = max(last_changed, stat.st_mtime)
+        if path.parent == session_path:
+            names.add(path.name)
+
+    for name in names:
+        if name.endswith(".state.json"):
+            try:
+                with open(session_path / name, "r") as f:
+                    if _is_running(json.load(f)):
+                        return True
+            except (OSError, ValueError):
+                return True
+        elif name.endswith(".ti1") and now - last_changed < max_unprofiled_age:
+            # the charts are not read or profiled yet
+            stem = name[: -len(".ti1")]
+            if not any(f"{stem}{ext}" in names for ext in PROFILE_EXTENSIONS):
+                return True
+    return False
+
+
+def _file_info(path: pathlib.Path) -> Tuple[Tuple[int, int], int, float, int]:
+    """Return the inode, size, last use time and the number of links of a file.
+
+    Args:
+        path (pathlib.Path): The file path.
+
+    Returns:
+        Tuple[Tuple[int, int], int, float, int]: The device and inode, the size in
+            bytes, the last access or modification time and the number of links.
+    """
+    stat = path.stat()
+    return (
+        (stat.st_dev, stat.st_ino),
+        stat.st_size,
+        max(stat.st_atime, stat.st_mtime),
+        stat.st_nlink,
+    )
+
+
+def scan(
+    root: Union[None, str, pathlib.Path] = None,
+    min_age: float = DEFAULT_MIN_AGE,
+    max_unprofiled_age: float = DEFAULT_MAX_UNPROFILED_AGE,
+) -> Tuple[List[CacheItem], Dict[Tuple[int, int], List[int]], List[pathlib.Path]]:
+    """Scan the cache folder.
+
+    Args:
+        root (Union[None, str, pathlib.Path]): The cache folder, default is
+            ~/.cache/ICCGenerator.
+        min_age (float): The seconds since the last change of the files of a
+            finished session.
+        max_unprofiled_age (float): The seconds since the last change of the
+            files of a session that is not profiled yet, the older ones are
+            abandoned.
+
+    Returns:
+        Tuple[List[CacheItem], Dict[Tuple[int, int], List[int]], List[pathlib.Path]]:
+            The removable items, the size and the number of links of every file by
+            their device and inode and the folders of the sessions in progress.
+    """
+    root = pathlib.Path(root or DEFAULT_CACHE_PATH).expanduser()
+    items = []
+    inodes = {}
+    in_progress = []
+    now = time.time()
+
+    def file_entry(path: pathlib.Path) -> Tuple[Tuple[int, int], int, float]:
+        inode, size, used, links = _file_info(path)
+        inodes[inode] = [size, links]
+        return inode, size, used
+
+    def folder_item(path: pathlib.Path, kind: str) -> CacheItem:
+        files = [file_entry(p) for p in sorted(path.rglob("*")) if p.is_file()]
+        return CacheItem(path, kind, files)
+
+    for folder, folder_names, file_names in os.walk(root):
+        folder = pathlib.Path(folder)
+        folder_names.sort()
+        relative_parts = folder.relative_to(root).parts
+
+        if relative_parts == (TARGET_CACHE_FOLDER,):
+            for name in folder_names:
+                if not name.startswith("."):
+                    items.append(folder_item(folder / name, TARGET_CACHE))
+            folder_names[:] = []
+            continue
+
+        if relative_parts == (LUT_CACHE_FOLDER,):
+            for name in sorted(file_names):
+                if name.endswith(".npy") and not name.startswith("."):
+                    items.append(
+                        CacheItem(folder / name, LUT_CACHE, [file_entry(folder / name)])
+                    )
+            folder_names[:] = []
+            continue
+
+        if folder == root or not file_names:
+            # the catalog
+            for name in file_names:
+                file_entry(folder / name)
+            continue
+
+        # a session folder
+        for name in file_names:
+            file_entry(folder / name)
+        if is_in_progress(
+            folder, min_age=min_age, max_unprofiled_age=max_unprofiled_age, now=now
+        ):
+            in_progress.append(folder)
+            # count the sizes without removing anything
+            for path in folder.rglob("*"):
+                if path.is_file():
+                    file_entry(path)
+            folder_names[:] = []
+            continue
+
+        for name in sorted(file_names):
+            path = folder / name
+            if path.suffix.lower() in BULKY_EXTENSIONS and not name.startswith("."):
+                items.append(CacheItem(path, CHART, [file_entry(path)]))
+        if SWEEP_FOLDER in folder_names:
+            folder_names.remove(SWEEP_FOLDER)
+            items.append(folder_item(folder / SWEEP_FOLDER, SWEEP))
+
+    return items, inodes, in_progress
+
+
+def collect_garbage(
+    budget: Union[int, str],
+    root: Union[None, str, pathlib.Path] = None,
+    min_age: float = DEFAULT_MIN_AGE,
+    max_unprofiled_age: float = DEFAULT_MAX_UNPROFILED_AGE,
+    dry_run: bool = False,
+) -> GCReport:
+    """Remove the least recently used bulky files until the cache is within budget.
+
+    Args:
+        budget (Union[int, str]): The size budget in bytes or with a K, M, G or T
+            suffix.
+        root (Union[None, str, pathlib.Path]): The cache folder, default is
+            ~/.cache/ICCGenerator.
+        min_age (float): The seconds since the last change of the files of a
+            finished session, the recently changed sessions are never touched.
+        max_unprofiled_age (float): The seconds since the last change of the
+            files of a session that is not profiled yet, the older ones are
+            abandoned and their charts can be removed.
+        dry_run (bool): Only report the items that would be removed.
+
+    Raises:
+        TypeError: If budget is not an int or str.
+        ValueError: If budget is not a valid size.
+
+    Returns:
+        GCReport: The report.
+    """
+    try:
+        budget = parse_size(budget)
+    except TypeError:
+        raise TypeError(
+            f"budget should be an int or str, not {budget.__class__.__name__}"
+        ) from None
+    except ValueError as e:
+        raise ValueError(str(e).replace("size", "budget", 1)) from None
+
+    items, inodes, in_progress = scan(
+        root, min_age=min_age, max_unprofiled_age=max_unprofiled_age
+    )
+    size = sum(inode_size for inode_size, _ in inodes.values())
+    removed = []
+    remaining = size
+    for item in sorted(items, key=lambda item: item.last_used):
+        if remaining <= budget:
+            break
+        for inode, _, _ in item.files:
+            inodes[inode][1] -= 1
+            if inodes[inode][1] == 0:
+                # the last link is removed
+                item.freed += inodes[inode][0]
+        if not dry_run:
+            logger.info(f"Removing {item.path}")
+            try:
+                item.remove()
+            except OSError as e:
+                logger.warning(f"Can not remove {item.path}: {e}")
+                continue
+        remaining -= item.freed
+        removed.append(item)
+
+    return GCReport(budget, size, removed, in_progress, dry_run=dry_run)
+
+
+def main(argv: Union[None, List[str]] = None) -> int:
+    """Run the garbage collection from the command line.
+
+    Args:
+        argv (Union[None, List[str]]): The command line arguments.
+
+    Returns:
+        int: The exit code, 1 if the cache is still over the budget.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m icc_generator.cache_gc",
+        description="Remove the least recently used charts and cached files until "
+        "the cache is within the given size budget.",
+    )
+    parser.add_argument("budget", help="The size budget, i.e. 500M or 20G.")
+    parser.add_argument(
+        "--root", help=f"The cache folder, default is {DEFAULT_CACHE_PATH}."
+    )
+    parser.add_argument(
+        "--min-age",
+        type=float,
+        default=DEFAULT_MIN_AGE,
+        help="The seconds since the last change of a finished session, default is "
+        f"{DEFAULT_MIN_AGE}.",
+    )
+    parser.add_argument(
+        "--max-unprofiled-age",
+        type=float,
+        default=DEFAULT_MAX_UNPROFILED_AGE,
+        help="The seconds since the last change of a session that is not profiled "
+        f"yet, the older ones are abandoned, default is {DEFAULT_MAX_UNPROFILED_AGE}.",
+    )
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Only print the files that would be removed.",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        report = collect_garbage(
+            args.budget,
+            root=args.root,
+            min_age=args.min_age,
+            max_unprofiled_age=args.max_unprofiled_age,
+            dry_run=args.dry_run,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(report.format())
+    return 0 if report.within_budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
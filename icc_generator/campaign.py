@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+"""Profiling campaigns for printer and paper fleets.
+
+A campaign profiles many printer, paper and ink combinations. Every combination is a
+job running the profiling stages in order, and the jobs run in parallel:
+
+- The CPU bound stages, targen, printtarg, colprof and profcheck, share a budget of
+  cores, so the machine is not oversubscribed.
+- The chart reading stage needs the physical instrument and the operator, so the
+  jobs using the same device read their charts one after the other. The reads also
+  share the single console, which is put in raw mode to read the key presses, so
+  only one chart read runs at a time even on different devices.
+
+The state of the jobs is saved to a JSON file after every stage, so an interrupted
+campaign can be resumed, skipping the finished stages.
+"""
+
+import contextlib
+import json
+import os
+import pathlib
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Union
+
+from icc_generator import logger
+from icc_generator.api import ICCGenerator, PaperSizeLibrary
+from icc_generator.pipeline import Pipeline
+
+
+CPU = "cpu"
+DEVICE = "device"
+
+STAGES = [
+    ("target", CPU),
+    ("tif", CPU),
+    ("read", DEVICE),
+    ("profile", CPU),
+    ("check", CPU),
+]
+STAGE_NAMES = [name for name, _ in STAGES]
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class CampaignJob(object):
+    """A printer, paper and ink combination to profile.
+
+    Args:
+        name (str): The unique name of the job.
+        settings (dict): The JSON serializable ICCGenerator arguments, the paper
+            size is given with its name.
+        device (str): The name of the instrument to read the charts with.
+
+    Raises:
+        TypeError: If name or device is not a str or settings is not a dict.
+    """
+
+    def __init__(self, name: str, settings: Union[None, dict] = None, device: str = ""):
+        if not isinstance(name, str):
+            raise TypeError(f"name should be a str, not {name.__class__.__name__}")
+        if settings is None:
+            settings = {}
+        if not isinstance(settings, dict):
+            raise TypeError(
+                f"settings should be a dict, not {settings.__class__.__name__}"
+            )
+        if not isinstance(device, str):
+            raise TypeError(f"device should be a str, not {device.__class__.__name__}")
+        self.name = name
+        self.settings = settings
+        self.device = device
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CampaignJob":
+        """Create a job from the given manifest entry.
+
+        Args:
+            data (dict): The job with "name", "settings" and "device" keys.
+
+        Returns:
+            CampaignJob: The job.
+        """
+        return cls(data["name"], data.get("settings"), data.get("device", ""))
+
+    def to_dict(self) -> dict:
+        """Return the job as a manifest entry.
+
+        Returns:
+            dict: The job.
+        """
+        return {"name": self.name, "settings": self.settings, "device": self.device}
+
+    def create_icc_generator(self) -> ICCGenerator:
+        """Return the ICCGenerator of the job.
+
+        Returns:
+            ICCGenerator: The ICCGenerator.
+        """
+        settings = dict(self.settings)
+        if isinstance(settings.get("paper_size"), str):
+            settings["paper_size"] = PaperSizeLibrary.get_paper_size(
+                settings["paper_size"]
+            )
+        return ICCGenerator(**settings)
+
+
+class ProfilingCampaign(object):
+    """Runs the profiling stages of many jobs in parallel.
+
+    Args:
+        jobs (List[CampaignJob]): The jobs.
+        state_path (Union[str, pathlib.Path]): The JSON file to save the progress
+            and the results of the jobs to. The campaign resumes from it if it
+            exists.
+        core_budget (Union[None, int]): The maximum number of the CPU bound stages
+            running at the same time, default is the number of CPUs.
+
+    Raises:
+        TypeError: If jobs is not a list of CampaignJobs or core_budget is not an
+            int.
+        ValueError: If the job names are not unique or core_budget is not positive.
+    """
+
+    def __init__(
+        self,
+        jobs: List[CampaignJob],
+        state_path: Union[str, pathlib.Path],
+        core_budget: Union[None, int] = None,
+    ):
+        if not isinstance(jobs, list) or not all(
+            isinstance(job, CampaignJob) for job in jobs
+        ):
+            raise TypeError(
+                "jobs should be a list of CampaignJobs, "
+                f"not {jobs.__class__.__name__}"
+            )
+        names = [job.name for job in jobs]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Job names should be unique: {', '.join(duplicates)}")
+
+        if core_budget is None:
+            core_budget = os.cpu_count() or 1
+        if not isinstance(core_budget, int):
+            raise TypeError(
+                f"core_budget should be an int, not {core_budget.__class__.__name__}"
+            )
+        if core_budget < 1:
+            raise ValueError(
+                f"core_budget should be a positive integer, not {core_budget}"
+            )
+
+        self.jobs = jobs
+        self.state_path = pathlib.Path(state_path)
+        self.core_budget = core_budget
+
+        self._cores = threading.BoundedSemaphore(core_budget)
+        self._device_locks = {job.device: threading.Lock() for job in jobs}
+        # the interactive reads share the stdin and the terminal attributes
+        self._console_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self.state = self.load_state()
+
+    @classmethod
+    def from_manifest(
+        cls,
+        manifest_path: Union[str, pathlib.Path],
+        state_path: Union[None, str, pathlib.Path] = None,
+        core_budget: Union[None, int] = None,
+    ) -> "ProfilingCampaign":
+        """Create a campaign from the given manifest file.
+
+        The manifest is a JSON file with a "jobs" list, each job has a "name", the
+        ICCGenerator "settings" and the "device" to read the charts with.
+
+        Args:
+            manifest_path (Union[str, pathlib.Path]): The manifest file path.
+            state_path (Union[None, str, pathlib.Path]): The state file path,
+                default is the manifest path with ".state.json" extension.
+            core_budget (Union[None, int]): The maximum number of the CPU bound
+                stages running at the same time.
+
+        Raises:
+            RuntimeError: If the manifest file doesn't exist.
+
+        Returns:
+            ProfilingCampaign: The campaign.
+        """
+        manifest_path = pathlib.Path(manifest_path)
+        if not manifest_path.exists():
+            raise RuntimeError(f"File does not exist!: {manifest_path}")
+
+        with open(manifest_path, "r") as f:
+            data = json.load(f)
+
+        if state_path is None:
+            state_path = manifest_path.with_suffix(".state.json")
+
+        return cls(
+            [CampaignJob.from_dict(job) for job in data["jobs"]],
+            state_path,
+            core_budget=core_budget,
+        )
+
+    def load_state(self) -> dict:
+        """Return the saved state of the jobs merged with the current jobs.
+
+        Returns:
+            dict: The state of the jobs by their names.
+        """
+        saved_state = {}
+        if self.state_path.exists():
+            with open(self.state_path, "r") as f:
+                saved_state = json.load(f)
+
+        state = {}
+        for job in self.jobs:
+            job_state = saved_state.get(job.name)
+            if job_state is None or job_state.get("job") != job.to_dict():
+                # a new job or the settings are changed
+                job_state = {
+                    "job": job.to_dict(),
+                    "status": PENDING,
+                    "error": None,
+                    "profile_date": None,
+                    "profile_time": None,
+                    "stages": {},
+                }
+            state[job.name] = job_state
+        return state
+
+    def _save_state(self):
+        """Save the state of the jobs."""
+        os.makedirs(self.state_path.parent, exist_ok=True)
+        temp_path = self.state_path.with_name(
+            f".{self.state_path.name}.{uuid.uuid4().hex}.tmp"
+        )
+        with open(temp_path, "w") as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(temp_path, self.state_path)
+
+    def _update(self, job: CampaignJob, stage: Union[None, str] = None, **kwargs):
+        """Update and save the state of the given job or its stage.
+
+        Args:
+            job (CampaignJob): The job.
+            stage (Union[None, str]): The stage name, the job itself is updated if
+                skipped.
+            kwargs: The values to update.
+        """
+        with self._state_lock:
+            job_state = self.state[job.name]
+            if stage is not None:
+                job_state = job_state["stages"].setdefault(stage, {})
+            job_state.update(kwargs)
+            self._save_state()
+
+    def _resource(self, job: CampaignJob, kind: str) -> threading.Semaphore:
+        """Return the resource to hold while running a stage of the given kind.
+
+        Args:
+            job (CampaignJob): The job.
+            kind (str): The stage kind, one of "cpu" or "device".
+
+        Returns:
+            threading.Semaphore: The core budget or the lock of the job device.
+        """
+        return self._cores if kind == CPU else self._device_locks[job.device]
+
+    def _console(self, kind: str) -> contextlib.AbstractContextManager:
+        """Return the console lock to hold while running a stage of the given kind.
+
+        The device stages read the key presses from the console, the device lock is
+        taken first so the jobs waiting for a busy device don't hold the console.
+
+        Args:
+            kind (str): The stage kind, one of "cpu" or "device".
+
+        Returns:
+            contextlib.AbstractContextManager: The console lock for the device
+                stages, otherwise a context doing nothing.
+        """
+        return self._console_lock if kind == DEVICE else contextlib.nullcontext()
+
+    @classmethod
+    def run_stage(cls, icc_generator: ICCGenerator, stage: str) -> Union[None, dict]:
+        """Run the given stage.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator of the job.
+            stage (str): The stage name.
+
+        Returns:
+            Union[None, dict]: The result of the stage, if there is any.
+        """
+        if stage == "read":
+            # continue reading the charts if the last session is interrupted
+            ti3_path = pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti3")
+            session = icc_generator.read_charts(resume=ti3_path.exists())
+            return session.to_dict() if session is not None else None
+
+        if stage == "check":
+            icc_generator.check_profile()
+            return None
+
+        Pipeline(icc_generator).run(stage)
+        return None
+
+    def _run_job(self, job: CampaignJob, stages: List[str]):
+        """Run the given stages of the given job.
+
+        Args:
+            job (CampaignJob): The job.
+            stages (List[str]): The stage names.
+        """
+        job_state = self.state[job.name]
+        icc_generator = job.create_icc_generator()
+        if job_state["profile_date"] is None:
+            # keep the profile path the same when the campaign is resumed
+            self._update(
+                job,
+                profile_date=icc_generator.profile_date,
+                profile_time=icc_generator.profile_time,
+            )
+        icc_generator.profile_date = job_state["profile_date"]
+        icc_generator.profile_time = job_state["profile_time"]
+        self._update(job, status=RUNNING, error=None)
+
+        for stage, kind in STAGES:
+            if stage not in stages:
+                continue
+            if job_state["stages"].get(stage, {}).get("status") == DONE:
+                logger.info(f"{job.name}: Skipping {stage}, it is already done")
+                continue
+
+            with self._resource(job, kind), self._console(kind):
+                logger.info(f"{job.name}: Running {stage}")
+                self._update(job, stage, status=RUNNING)
+                start = time.perf_counter()
+                try:
+                    result = self.run_stage(icc_generator, stage)
+                except Exception as e:
+                    logger.debug(traceback.format_exc())
+                    error = f"{e.__class__.__name__}: {e}"
+                    self._update(
+                        job,
+                        stage,
+                        status=FAILED,
+                        duration=time.perf_counter() - start,
+                    )
+                    self._update(job, status=FAILED, error=error)
+                    logger.error(f"{job.name}: {stage} failed: {error}")
+                    return
+
+            self._update(
+                job,
+                stage,
+                status=DONE,
+                duration=time.perf_counter() - start,
+                result=result,
+            )
+
+        stage_states = job_state["stages"]
+        finished = all(
+            stage_states.get(stage, {}).get("status") == DONE for stage in STAGE_NAMES
+        )
+        self._update(job, status=DONE if finished else PENDING)
+
+    def run(self, stages: Union[None, List[str]] = None) -> dict:
+        """Run the unfinished stages of the jobs.
+
+        Args:
+            stages (Union[None, List[str]]): The stage names to run, default is all
+                the stages: target, tif, read, profile and check.
+
+        Raises:
+            ValueError: If a stage name is not valid.
+
+        Returns:
+            dict: The state of the jobs by their names.
+        """
+        if stages is None:
+            stages = STAGE_NAMES
+        for stage in stages:
+            if stage not in STAGE_NAMES:
+                raise ValueError(
+                    f"stage should be one of {', '.join(STAGE_NAMES[:-1])} or "
+                    f"{STAGE_NAMES[-1]}, not {stage}"
+                )
+
+        jobs = [
+            job
+            for job in self.jobs
+            if any(
+                self.state[job.name]["stages"].get(stage, {}).get("status") != DONE
+                for stage in stages
+            )
+        ]
+        if jobs:
+            # the jobs mostly wait for the external processes and the resources
+            with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+                for future in [
+                    executor.submit(self._run_job, job, stages) for job in jobs
+                ]:
+                    future.result()
+        return self.state
+
+    @property
+    def succeeded(self) -> List[str]:
+        """Return the names of the finished jobs.
+
+        Returns:
+            List[str]: The job names.
+        """
+        return [name for name, state in self.state.items() if state["status"] == DONE]
+
+    @property
+    def failed(self) -> List[str]:
+        """Return the names of the failed jobs.
+
+        Returns:
+            List[str]: The job names.
+        """
+        return [
+            name for name, state in self.state.items() if state["status"] == FAILED
+        ]
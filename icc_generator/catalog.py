@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""SQLite catalog of the profiling sessions and the installed profiles.
+
+Every session is stored in its own folder and the folder and file names are
+rendered from the settings, so finding a past session means walking the whole
+cache. The catalog records the settings, the files, the profile check summary and
+the install location of every session in an indexed SQLite database instead, and
+is updated as the sessions are saved, profiled, checked and installed.
+
+The catalog is opt-in, set ICCGenerator.catalog to a ProfileCatalog to use it.
+index() adds the sessions already in the cache, from their settings files.
+"""
+
+import contextlib
+import datetime
+import os
+import pathlib
+import re
+import sqlite3
+import time
+from typing import Iterator, List, Union
+
+from icc_generator import logger
+from icc_generator.api import ICCGenerator
+
+
+DEFAULT_CATALOG_PATH = "~/.cache/ICCGenerator/catalog.sqlite"
+TIMEOUT = 30.0
+
+# the columns added to the tables of the earlier catalogs
+MIGRATIONS = [("sessions", "quality", "TEXT")]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    profile_path TEXT NOT NULL UNIQUE,
+    profile_name TEXT NOT NULL,
+    printer_brand TEXT,
+    printer_model TEXT,
+    paper_brand TEXT,
+    paper_model TEXT,
+    paper_finish TEXT,
+    paper_size TEXT,
+    ink_brand TEXT,
+    profile_date TEXT,
+    profile_time TEXT,
+    patch_count INTEGER,
+    number_of_pages INTEGER,
+    quality TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_printer
+    ON sessions (printer_brand, printer_model);
+CREATE INDEX IF NOT EXISTS sessions_paper
+    ON sessions (paper_brand, paper_model);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions (profile_date, profile_time);
+CREATE INDEX IF NOT EXISTS sessions_quality ON sessions (quality);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    modified REAL NOT NULL,
+    PRIMARY KEY (session_id, path)
+);
+
+CREATE TABLE IF NOT EXISTS checks (
+    session_id INTEGER PRIMARY KEY REFERENCES sessions (id) ON DELETE CASCADE,
+    average REAL NOT NULL,
+    percentile_95 REAL,
+    maximum REAL NOT NULL,
+    patch_count INTEGER,
+    checked REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checks_average ON checks (average);
+
+CREATE TABLE IF NOT EXISTS installs (
+    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    installed REAL NOT NULL,
+    PRIMARY KEY (session_id, path)
+);
+"""
+
+# the summary line of profcheck
+PROFCHECK_SUMMARY_PATTERN = re.compile(
+    r"peak err = (?P<maximum>[\d.]+), avg err = (?P<average>[\d.]+)"
+    r"(?:, 95% err = (?P<percentile_95>[\d.]+))?"
+)
+
+
+def profile_quality(command: List[str]) -> Union[None, str]:
+    """Return the quality of the given colprof command.
+
+    Args:
+        command (List[str]): The colprof command.
+
+    Returns:
+        Union[None, str]: The value of the -q argument, i.e. "h", or None if it is
+            not set.
+    """
+    for argument in command[1:-1]:
+        if argument.startswith("-q") and len(argument) > 2:
+            return argument[2:]
+    return None
+
+
+class ProfileCatalog(object):
+    """An SQLite catalog of the profiling sessions.
+
+    Every method opens its own connection, so the catalog can be shared between
+    threads and processes.
+
+    Args:
+        path (Union[None, str, pathlib.Path]): The database path, default is
+            ~/.cache/ICCGenerator/catalog.sqlite. It is created on first use.
+    """
+
+    def __init__(self, path: Union[None, str, pathlib.Path] = None):
+        self.path = pathlib.Path(path or DEFAULT_CATALOG_PATH).expanduser()
+        self._initialized = False
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection in a transaction.
+
+        Yields:
+            sqlite3.Connection: The connection, committed when the context exits
+                without an error.
+        """
+        os.makedirs(self.path.parent, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=TIMEOUT)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("PRAGMA foreign_keys = ON")
+            if not self._initialized:
+                # readers don't block the writers
+                connection.execute("PRAGMA journal_mode = WAL")
+                self._migrate(connection)
+                connection.executescript(SCHEMA)
+                self._initialized = True
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @classmethod
+    def _migrate(cls, connection: sqlite3.Connection):
+        """Add the missing columns to the tables of an earlier catalog.
+
+        Args:
+            connection (sqlite3.Connection): The connection.
+        """
+        for table, column, column_type in MIGRATIONS:
+            columns = [
+                row["name"] for row in connection.execute(f"PRAGMA table_info({table})")
+            ]
+            if columns and column not in columns:
+                connection.execute(
+                    f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"
+                )
+
+    @classmethod
+    def _session_id(
+        cls,
+        connection: sqlite3.Connection,
+        icc_generator,
+        quality: Union[None, str] = None,
+    ) -> int:
+        """Insert or update the session of the given ICCGenerator.
+
+        Args:
+            connection (sqlite3.Connection): The connection.
+            icc_generator (ICCGenerator): The ICCGenerator.
+            quality (Union[None, str]): The colprof quality of the profile, the
+                recorded one is kept if it is None.
+
+        Returns:
+            int: The session id.
+        """
+        values = {
+            "profile_path": str(icc_generator.profile_absolute_full_path),
+            "profile_name": icc_generator.profile_name,
+            "printer_brand": icc_generator.printer_brand,
+            "printer_model": icc_generator.printer_model,
+            "paper_brand": icc_generator.paper_brand,
+            "paper_model": icc_generator.paper_model,
+            "paper_finish": icc_generator.paper_finish,
+            "paper_size": icc_generator.paper_size.name,
+            "ink_brand": icc_generator.ink_brand,
+            "profile_date": icc_generator.profile_date,
+            "profile_time": icc_generator.profile_time,
+            "patch_count": icc_generator.patch_count,
+            "number_of_pages": icc_generator.number_of_pages,
+            "quality": quality,
+            "updated": time.time(),
+        }
+        columns = ", ".join(values)
+        placeholders = ", ".join(f":{column}" for column in values)
+        updates = ", ".join(
+            f"{column} = excluded.{column}"
+            if column != "quality"
+            else f"{column} = COALESCE(excluded.{column}, {column})"
+            for column in values
+        )
+        connection.execute(
+            f"INSERT INTO sessions ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT (profile_path) DO UPDATE SET {updates}",
+            values,
+        )
+        return connection.execute(
+            "SELECT id FROM sessions WHERE profile_path = ?", (values["profile_path"],)
+        ).fetchone()["id"]
+
+    @classmethod
+    def _update_artifacts(
+        cls, connection: sqlite3.Connection, session_id: int, icc_generator
+    ):
+        """Record the current files of the given session.
+
+        Args:
+            connection (sqlite3.Connection): The connection.
+            session_id (int): The session id.
+            icc_generator (ICCGenerator): The ICCGenerator.
+        """
+        connection.execute("DELETE FROM artifacts WHERE session_id = ?", (session_id,))
+        profile_path = icc_generator.profile_absolute_path
+        if not profile_path.is_dir():
+            return
+        rows = []
+        profile_name = icc_generator.profile_name
+        for path in profile_path.iterdir():
+            if not path.is_file() or not path.name.startswith(profile_name):
+                continue
+            stat = path.stat()
+            kind = path.suffix.lstrip(".").lower()
+            rows.append((session_id, str(path), kind, stat.st_size, stat.st_mtime))
+        connection.executemany("INSERT INTO artifacts VALUES (?, ?, ?, ?, ?)", rows)
+
+    def record_session(
+        self, icc_generator, profile_command: Union[None, List[str]] = None
+    ) -> int:
+        """Record the settings and the files of the given session.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+            profile_command (Union[None, List[str]]): The colprof command the
+                profile is generated with, its quality is recorded.
+
+        Returns:
+            int: The session id.
+        """
+        quality = None
+        if profile_command is not None:
+            quality = profile_quality(profile_command)
+        with self._connect() as connection:
+            session_id = self._session_id(connection, icc_generator, quality=quality)
+            self._update_artifacts(connection, session_id, icc_generator)
+        return session_id
+
+    def record_check(
+        self,
+        icc_generator,
+        average: float,
+        maximum: float,
+        percentile_95: Union[None, float] = None,
+        patch_count: Union[None, int] = None,
+    ):
+        """Record the profile check summary of the given session.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+            average (float): The average dE.
+            maximum (float): The peak dE.
+            percentile_95 (Union[None, float]): The 95th percentile dE.
+            patch_count (Union[None, int]): The number of checked patches.
+        """
+        with self._connect() as connection:
+            session_id = self._session_id(connection, icc_generator)
+            connection.execute(
+                "INSERT OR REPLACE INTO checks VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, average, percentile_95, maximum, patch_count, time.time()),
+            )
+
+    def record_check_output(self, icc_generator, lines: List[str]) -> bool:
+        """Record the profile check summary from the given profcheck output.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+            lines (List[str]): The profcheck output lines.
+
+        Returns:
+            bool: True if the output has the summary line.
+        """
+        for line in reversed(lines):
+            match = PROFCHECK_SUMMARY_PATTERN.search(line)
+            if match:
+                percentile_95 = match.group("percentile_95")
+                self.record_check(
+                    icc_generator,
+                    float(match.group("average")),
+                    float(match.group("maximum")),
+                    None if percentile_95 is None else float(percentile_95),
+                )
+                return True
+        return False
+
+    def record_install(self, icc_generator, path: Union[str, pathlib.Path]):
+        """Record the install location of the profile of the given session.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+            path (Union[str, pathlib.Path]): The installed profile path.
+        """
+        with self._connect() as connection:
+            session_id = self._session_id(connection, icc_generator)
+            connection.execute(
+                "INSERT OR REPLACE INTO installs VALUES (?, ?, ?)",
+                (session_id, str(path), time.time()),
+            )
+
+    def find(
+        self,
+        printer_brand: Union[None, str] = None,
+        printer_model: Union[None, str] = None,
+        paper_brand: Union[None, str] = None,
+        paper_model: Union[None, str] = None,
+        quality: Union[None, str] = None,
+        date_from: Union[None, str, datetime.date] = None,
+        date_to: Union[None, str, datetime.date] = None,
+        max_average_de: Union[None, float] = None,
+        max_peak_de: Union[None, float] = None,
+        installed: Union[None, bool] = None,
+        limit: Union[None, int] = None,
+    ) -> List[dict]:
+        """Return the sessions matching all the given filters, the latest first.
+
+        Args:
+            printer_brand (Union[None, str]): The printer brand.
+            printer_model (Union[None, str]): The printer model.
+            paper_brand (Union[None, str]): The paper brand.
+            paper_model (Union[None, str]): The paper model.
+            quality (Union[None, str]): The colprof quality of the profile, one of
+                "l", "m", "h" or "u".
+            date_from (Union[None, str, datetime.date]): The first profile date,
+                i.e. "20240131".
+            date_to (Union[None, str, datetime.date]): The last profile date.
+            max_average_de (Union[None, float]): The maximum average dE, the
+                sessions that are not checked are excluded.
+            max_peak_de (Union[None, float]): The maximum peak dE.
+            installed (Union[None, bool]): Only the installed or the not installed
+                sessions.
+            limit (Union[None, int]): The maximum number of sessions to return.
+
+        Returns:
+            List[dict]: The sessions with their settings, the check summary under the
+                "check" key and the install paths under the "installs" key.
+        """
+        conditions = []
+        parameters = []
+        for column, value in [
+            ("printer_brand", printer_brand),
+            ("printer_model", printer_model),
+            ("paper_brand", paper_brand),
+            ("paper_model", paper_model),
+            ("quality", quality),
+        ]:
+            if value is not None:
+                conditions.append(f"s.{column} = ?")
+                parameters.append(value)
+        for operator, value in [(">=", date_from), ("<=", date_to)]:
+            if value is not None:
+                if isinstance(value, datetime.date):
+                    value = value.strftime("%Y%m%d")
+                conditions.append(f"s.profile_date {operator} ?")
+                parameters.append(value)
+        for column, value in [("average", max_average_de), ("maximum", max_peak_de)]:
+            if value is not None:
+                conditions.append(f"c.{column} <= ?")
+                parameters.append(value)
+        if installed is not None:
+            conditions.append(
+                f"{'' if installed else 'NOT '}EXISTS "
+                "(SELECT 1 FROM installs i WHERE i.session_id = s.id)"
+            )
+
+        query = (
+            "SELECT s.*, c.average, c.percentile_95, c.maximum, "
+            "c.patch_count AS checked_patch_count, c.checked "
+            "FROM sessions s LEFT JOIN checks c ON c.session_id = s.id"
+        )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY s.profile_date DESC, s.profile_time DESC, s.id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+
+        sessions = []
+        with self._connect() as connection:
+            for row in connection.execute(query, parameters):
+                session = {
+                    key: row[key]
+                    for key in row.keys()
+                    if key
+                    not in [
+                        "average",
+                        "percentile_95",
+                        "maximum",
+                        "checked_patch_count",
+                        "checked",
+                    ]
+                }
+                session["check"] = None
+                if row["checked"] is not None:
+                    session["check"] = {
+                        "average": row["average"],
+                        "percentile_95": row["percentile_95"],
+                        "maximum": row["maximum"],
+                        "patch_count": row["checked_patch_count"],
+                        "checked": row["checked"],
+                    }
+                session["installs"] = [
+                    install["path"]
+                    for install in connection.execute(
+                        "SELECT path FROM installs WHERE session_id = ? ORDER BY path",
+                        (row["id"],),
+                    )
+                ]
+                sessions.append(session)
+        return sessions
+
+    def artifacts(self, session_id: int) -> List[dict]:
+        """Return the files of the given session.
+
+        Args:
+            session_id (int): The session id.
+
+        Returns:
+            List[dict]: The "path", "kind", "size" and "modified" time of the files.
+        """
+        with self._connect() as connection:
+            return [
+                {key: row[key] for key in ["path", "kind", "size", "modified"]}
+                for row in connection.execute(
+                    "SELECT * FROM artifacts WHERE session_id = ? ORDER BY path",
+                    (session_id,),
+                )
+            ]
+
+    def index(self, root: Union[None, str, pathlib.Path] = None) -> int:
+        """Record the sessions in the given folder from their settings files.
+
+        Args:
+            root (Union[None, str, pathlib.Path]): The folder to search the settings
+                files in, default is ~/.cache/ICCGenerator.
+
+        Returns:
+            int: The number of recorded sessions.
+        """
+        root = pathlib.Path(root or "~/.cache/ICCGenerator").expanduser()
+        count = 0
+        for settings_path in sorted(root.rglob("*.json")):
+            icc_generator = ICCGenerator()
+            try:
+                icc_generator.load_settings(settings_path)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                # not a settings file
+                continue
+            icc_generator._profile_path_template = str(settings_path.parent)
+            icc_generator.profile_name = settings_path.stem
+            self.record_session(icc_generator)
+            count += 1
+        logger.info(f"Indexed {count} sessions in {root}")
+        return count
@@ -0,0 +1,551 @@
+# -*- coding: utf-8 -*-
+"""Reader and writer for the CGATS files used by ArgyllCMS (.ti1, .ti2, .ti3).
+
+The data section of every table is parsed in one go into NumPy arrays, integer
+fields (i.e. ``SAMPLE_ID``) become ``int64`` columns, the other numeric fields become
+``float64`` columns and the rest (i.e. ``SAMPLE_LOC``) become ``str`` arrays. Files
+bigger than ``MMAP_THRESHOLD`` bytes are memory-mapped instead of being read into
+memory. The float columns are written with the shortest representation that reads
+back to the same value, so reading and writing a file never loses precision.
+
+Example:
+
+    from icc_generator.cgats import CGATS
+
+    ti3 = CGATS.read("Canon_iX6850_Kodak_UPPP_Glossy_A4_CanonInk.ti3")
+    table = ti3[0]
+    rgb = table.rgb  # (N, 3) float64 array
+    xyz = table.xyz  # (N, 3) float64 array
+    wavelengths, spectra = table.spectral
+"""
+
+import mmap
+import pathlib
+import re
+from typing import Dict, List, Union
+
+import numpy as np
+
+
+MMAP_THRESHOLD = 1024 * 1024
+
+# keywords defined by the CGATS standard itself, all the others should be declared
+# with a KEYWORD statement before they are used.
+STANDARD_KEYWORDS = [
+    "ORIGINATOR",
+    "DESCRIPTOR",
+    "CREATED",
+    "MANUFACTURER",
+    "MANUFACTURE",
+    "PROD_DATE",
+    "SERIAL",
+    "MATERIAL",
+    "INSTRUMENTATION",
+    "MEASUREMENT_SOURCE",
+    "PRINT_CONDITIONS",
+    "SAMPLE_BACKING",
+    "CHISQ_DOF",
+    "WEIGHTING_FUNCTION",
+    "FILTER",
+]
+
+# the column groups that are commonly used by ArgyllCMS
+COLUMN_GROUPS = {
+    "RGB": ["RGB_R", "RGB_G", "RGB_B"],
+    "CMYK": ["CMYK_C", "CMYK_M", "CMYK_Y", "CMYK_K"],
+    "XYZ": ["XYZ_X", "XYZ_Y", "XYZ_Z"],
+    "LAB": ["LAB_L", "LAB_A", "LAB_B"],
+}
+
+_DATA_BLOCK_END = re.compile(rb"^[ \t]*END_DATA[ \t]*\r?$", re.MULTILINE)
+_QUOTED_TOKENS = re.compile(rb'"[^"]*"|\S+')
+
+
+class CGATSTable(object):
+    """A single table in a CGATS file.
+
+    Args:
+        file_type (str): The file identifier of the table, i.e. "CTI1", "CTI3".
+        keywords (Dict[str, str]): The header keywords and their values in order.
+        fields (List[str]): The DATA_FORMAT field names in order.
+        data (Dict[str, np.ndarray]): The column data, keyed by field name. All
+            columns should be of the same length.
+    """
+
+    def __init__(
+        self,
+        file_type: str = "CTI3",
+        keywords: Union[None, Dict[str, str]] = None,
+        fields: Union[None, List[str]] = None,
+        data: Union[None, Dict[str, np.ndarray]] = None,
+    ):
+        self._file_type = None
+        self.file_type = file_type
+
+        self.keywords = {} if keywords is None else dict(keywords)
+        # keywords that are written without quotes
+        self.unquoted_keywords = set()
+        # the keywords that needs a KEYWORD declaration
+        self.declared_keywords = []
+
+        self.fields = [] if fields is None else list(fields)
+        self.data = {} if data is None else dict(data)
+
+    @property
+    def file_type(self) -> str:
+        """Return the file_type attribute value.
+
+        Returns:
+            str: The file_type attribute value.
+        """
+        return self._file_type
+
+    @file_type.setter
+    def file_type(self, file_type: str):
+        """Set the file_type attribute value.
+
+        Args:
+            file_type (str): The file identifier, i.e. "CTI1", "CTI2", "CTI3".
+
+        Raises:
+            TypeError: If the given file_type is not a str.
+        """
+        if not file_type or not isinstance(file_type, str):
+            raise TypeError(
+                f"{self.__class__.__name__}.file_type should be a str, "
+                f"not {file_type.__class__.__name__}"
+            )
+        self._file_type = file_type
+
+    def __len__(self) -> int:
+        """Return the number of sets (rows) in the table.
+
+        Returns:
+            int: The number of sets.
+        """
+        if not self.fields:
+            return 0
+        return len(self.data[self.fields[0]])
+
+    def __contains__(self, field: str) -> bool:
+        """Check if the given field exists in this table.
+
+        Args:
+            field (str): The field name.
+
+        Returns:
+            bool: True if the field exists.
+        """
+        return field in self.data
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """Return the column of the given field.
+
+        Args:
+            field (str): The field name.
+
+        Raises:
+            KeyError: If the field doesn't exist.
+
+        Returns:
+            np.ndarray: The column data.
+        """
+        return self.data[field]
+
+    def __setitem__(self, field: str, values: Union[list, np.ndarray]):
+        """Set or add the column of the given field.
+
+        Args:
+            field (str): The field name.
+            values (Union[list, np.ndarray]): The column data.
+
+        Raises:
+            ValueError: If the given values length doesn't match the table length.
+        """
+        values = np.asarray(values)
+        if values.ndim != 1:
+            raise ValueError(
+                f"{self.__class__.__name__} columns should be 1 dimensional, "
+                f"not {values.ndim}"
+            )
+        if self.fields and field not in self.data and len(values) != len(self):
+            raise ValueError(
+                f"{field} should have {len(self)} values, not {len(values)}"
+            )
+        if field not in self.data:
+            self.fields.append(field)
+        self.data[field] = values
+
+    def has_columns(self, fields: List[str]) -> bool:
+        """Check if all the given fields exist.
+
+        Args:
+            fields (List[str]): The field names.
+
+        Returns:
+            bool: True if all the given fields exist in this table.
+        """
+        return all(field in self.data for field in fields)
+
+    def get_columns(self, fields: List[str]) -> np.ndarray:
+        """Return the given fields stacked in to a (N, len(fields)) float array.
+
+        Args:
+            fields (List[str]): The field names.
+
+        Raises:
+            KeyError: If any of the fields doesn't exist.
+
+        Returns:
+            np.ndarray: The C contiguous (N, len(fields)) array.
+        """
+        missing = [field for field in fields if field not in self.data]
+        if missing:
+            raise KeyError(f"Missing fields: {', '.join(missing)}")
+        return np.ascontiguousarray(
+            np.stack([self.data[field] for field in fields], axis=1),
+            dtype=np.float64,
+        )
+
+    def set_columns(self, fields: List[str], values: np.ndarray):
+        """Set the given fields from a (N, len(fields)) array.
+
+        Args:
+            fields (List[str]): The field names.
+            values (np.ndarray): The (N, len(fields)) array.
+
+        Raises:
+            ValueError: If the values shape doesn't match with the fields.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(fields):
+            raise ValueError(
+                f"values should be of shape (N, {len(fields)}), not {values.shape}"
+            )
+        for i, field in enumerate(fields):
+            self[field] = values[:, i]
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """Return the RGB_R, RGB_G, RGB_B columns as a (N, 3) array.
+
+        Returns:
+            np.ndarray: The device RGB values (in 0-100 range).
+        """
+        return self.get_columns(COLUMN_GROUPS["RGB"])
+
+    @property
+    def cmyk(self) -> np.ndarray:
+        """Return the CMYK_C, CMYK_M, CMYK_Y, CMYK_K columns as a (N, 4) array.
+
+        Returns:
+            np.ndarray: The device CMYK values (in 0-100 range).
+        """
+        return self.get_columns(COLUMN_GROUPS["CMYK"])
+
+    @property
+    def xyz(self) -> np.ndarray:
+        """Return the XYZ_X, XYZ_Y, XYZ_Z columns as a (N, 3) array.
+
+        Returns:
+            np.ndarray: The XYZ values (in 0-100 range).
+        """
+        return self.get_columns(COLUMN_GROUPS["XYZ"])
+
+    @property
+    def lab(self) -> np.ndarray:
+        """Return the LAB_L, LAB_A, LAB_B columns as a (N, 3) array.
+
+        Returns:
+            np.ndarray: The L*a*b* values.
+        """
+        return self.get_columns(COLUMN_GROUPS["LAB"])
+
+    @property
+    def spectral_fields(self) -> List[str]:
+        """Return the spectral field names (SPEC_XXX) in wavelength order.
+
+        Returns:
+            List[str]: The spectral field names.
+        """
+        return sorted(
+            [field for field in self.fields if field.startswith("SPEC_")],
+            key=lambda x: float(x[5:]),
+        )
+
+    @property
+    def spectral(self) -> tuple:
+        """Return the spectral data.
+
+        Returns:
+            (np.ndarray, np.ndarray): The (M,) wavelengths in nm and the (N, M)
+                spectral values.
+        """
+        fields = self.spectral_fields
+        wavelengths = np.array([float(field[5:]) for field in fields])
+        if not fields:
+            return wavelengths, np.empty((len(self), 0), dtype=np.float64)
+        return wavelengths, self.get_columns(fields)
+
+    def format_header(self) -> str:
+        """Return the header part of this table.
+
+        Returns:
+            str: The header including the file identifier and the keywords.
+        """
+        lines = [self.file_type, ""]
+        for keyword, value in self.keywords.items():
+            if keyword in self.declared_keywords or (
+                keyword not in STANDARD_KEYWORDS
+                and keyword not in self.unquoted_keywords
+            ):
+                lines.append(f'KEYWORD "{keyword}"')
+            if keyword in self.unquoted_keywords:
+                lines.append(f"{keyword} {value}")
+            else:
+                lines.append(f'{keyword} "{value}"')
+        return "\n".join(lines)
+
+    def format_data(self) -> str:
+        """Return the data format and data sections of this table.
+
+        Returns:
+            str: The data format and the data sections.
+        """
+        lines = [
+            "",
+            f"NUMBER_OF_FIELDS {len(self.fields)}",
+            "BEGIN_DATA_FORMAT",
+            " ".join(self.fields),
+            "END_DATA_FORMAT",
+            "",
+            f"NUMBER_OF_SETS {len(self)}",
+            "BEGIN_DATA",
+        ]
+        columns = []
+        for field in self.fields:
+            column = self.data[field]
+            if column.dtype.kind in "iu":
+                columns.append(column.astype(str))
+            elif column.dtype.kind == "f":
+                # the shortest text that reads back to the same float64
+                columns.append(column.astype(str))
+            else:
+                columns.append(np.char.add(np.char.add('"', column.astype(str)), '"'))
+        if columns:
+            rows = columns[0]
+            for column in columns[1:]:
+                rows = np.char.add(np.char.add(rows, " "), column)
+            lines.extend(rows.tolist())
+        lines.append("END_DATA")
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        """Return the CGATS representation of this table.
+
+        Returns:
+            str: The CGATS text.
+        """
+        return f"{self.format_header()}\n{self.format_data()}\n"
+
+
+class CGATS(object):
+    """A CGATS file, which is a list of tables.
+
+    Args:
+        tables (List[CGATSTable]): The tables.
+    """
+
+    def __init__(self, tables: Union[None, List[CGATSTable]] = None):
+        self.tables = [] if tables is None else list(tables)
+
+    def __len__(self) -> int:
+        """Return the number of tables.
+
+        Returns:
+            int: The number of tables.
+        """
+        return len(self.tables)
+
+    def __getitem__(self, index: int) -> CGATSTable:
+        """Return the table with the given index.
+
+        Args:
+            index (int): The table index.
+
+        Returns:
+            CGATSTable: The table.
+        """
+        return self.tables[index]
+
+    def __iter__(self):
+        """Iterate over the tables.
+
+        Yields:
+            CGATSTable: The tables.
+        """
+        yield from self.tables
+
+    @classmethod
+    def read(cls, path: Union[str, pathlib.Path]) -> "CGATS":
+        """Read the given CGATS file.
+
+        Args:
+            path (Union[str, pathlib.Path]): The path of the CGATS file.
+
+        Raises:
+            TypeError: If the given path is not a str or pathlib.Path instance.
+            RuntimeError: If the given path doesn't exist.
+            ValueError: If the file is not a valid CGATS file.
+
+        Returns:
+            CGATS: The parsed CGATS instance.
+        """
+        if not path or not isinstance(path, (str, pathlib.Path)):
+            raise TypeError("Please specify a valid path")
+
+        path = pathlib.Path(path)
+        if not path.exists():
+            raise RuntimeError(f"File does not exist!: {path}")
+
+        with open(path, "rb") as f:
+            size = path.stat().st_size
+            if size > MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    return cls.parse(buffer)
+            return cls.parse(f.read())
+
+    @classmethod
+    def parse(cls, buffer: Union[bytes, mmap.mmap]) -> "CGATS":
+        """Parse the CGATS data from the given buffer.
+
+        Args:
+            buffer (Union[bytes, mmap.mmap]): The raw file content.
+
+        Raises:
+            ValueError: If the buffer is not a valid CGATS data.
+
+        Returns:
+            CGATS: The parsed CGATS instance.
+        """
+        cgats = cls()
+        size = len(buffer)
+        pos = 0
+        table = None
+        in_data_format = False
+
+        while pos < size:
+            end = buffer.find(b"\n", pos)
+            if end == -1:
+                end = size
+            line = buffer[pos:end].strip().decode("utf-8", errors="replace")
+            pos = end + 1
+
+            if not line or line.startswith("#"):
+                continue
+
+            if in_data_format:
+                if line == "END_DATA_FORMAT":
+                    in_data_format = False
+                else:
+                    table.fields.extend(line.split())
+                continue
+
+            keyword, _, value = line.partition(" ")
+            value = value.strip()
+
+            if table is None or (not value and table.data and keyword.isalnum()):
+                # a file identifier starts a new table
+                table = CGATSTable(file_type=keyword)
+                cgats.tables.append(table)
+                if value:
+                    raise ValueError(f"Invalid CGATS file identifier: {line}")
+                continue
+
+            if keyword == "BEGIN_DATA_FORMAT":
+                in_data_format = True
+            elif keyword == "BEGIN_DATA":
+                match = _DATA_BLOCK_END.search(buffer, pos)
+                if match is None:
+                    raise ValueError("Missing END_DATA")
+                cls._parse_data_block(table, buffer[pos : match.start()])
+                pos = match.end() + 1
+            elif keyword in ["NUMBER_OF_FIELDS", "NUMBER_OF_SETS", "END_DATA_FORMAT"]:
+                # these are derived from the data
+                continue
+            elif keyword == "KEYWORD":
+                table.declared_keywords.append(value.strip('"'))
+            else:
+                if value.startswith('"'):
+                    table.keywords[keyword] = value.strip('"')
+                else:
+                    table.keywords[keyword] = value
+                    table.unquoted_keywords.add(keyword)
+
+        if not cgats.tables:
+            raise ValueError("No CGATS table found")
+
+        return cgats
+
+    @classmethod
+    def _parse_data_block(cls, table: CGATSTable, block: bytes):
+        """Parse the given data block in to the table columns.
+
+        Args:
+            table (CGATSTable): The table that the data belongs to.
+            block (bytes): The raw data between BEGIN_DATA and END_DATA.
+
+        Raises:
+            ValueError: If the number of values is not a multiple of the field count.
+        """
+        field_count = len(table.fields)
+        if not field_count:
+            raise ValueError("BEGIN_DATA found before DATA_FORMAT")
+
+        if b'"' in block:
+            tokens = _QUOTED_TOKENS.findall(block)
+        else:
+            tokens = block.split()
+
+        if len(tokens) % field_count:
+            raise ValueError(
+                f"Data has {len(tokens)} values which is not a multiple of "
+                f"{field_count} fields"
+            )
+
+        raw = np.array(tokens, dtype=bytes).reshape(-1, field_count)
+        for i, field in enumerate(table.fields):
+            column = raw[:, i]
+            for dtype in (np.int64, np.float64):
+                try:
+                    table.data[field] = column.astype(dtype)
+                    break
+                except ValueError:
+                    continue
+            else:
+                table.data[field] = np.char.strip(
+                    np.char.decode(column, "utf-8"), '"'
+                )
+
+    def __str__(self) -> str:
+        """Return the CGATS representation.
+
+        Returns:
+            str: The CGATS text.
+        """
+        return "\n".join(str(table) for table in self.tables)
+
+    def write(self, path: Union[str, pathlib.Path]):
+        """Write the CGATS data to the given path.
+
+        Args:
+            path (Union[str, pathlib.Path]): The output path.
+
+        Raises:
+            TypeError: If the given path is not a str or pathlib.Path instance.
+        """
+        if not path or not isinstance(path, (str, pathlib.Path)):
+            raise TypeError("Please specify a valid path")
+
+        with open(path, "w") as f:
+            f.write(str(self))
@@ -0,0 +1,781 @@
+# -*- coding: utf-8 -*-
+"""In process replacement of ArgyllCMS ``printtarg`` for the RGB printer charts.
+
+The patches of the .ti1 file are placed on the pages with the layout engine, the
+.ti2 file recording the strip and the position of every patch is written for
+chartread and the chart pages are rendered to TIFF files. The patches are shuffled
+over the strips with a seeded permutation as printtarg does, so the neighbouring
+patches are in contrast and the instruments find the patch edges, and every strip is
+labelled at its start so the strip chartread asks for is found on the page.
+
+A chart page is mostly made of rows repeating many times: every pixel row crossing a
+strip of patches is the same as its neighbours. So the pages are described as bands
+of identical rows and every band is written by repeating a single row. A page is
+never held in memory as a whole, the 100 MB A2 page at 300 DPI is rendered with a
+few megabytes of memory. The pages are rendered in parallel, one page per worker
+process.
+
+The .ti1 file can also be split in to page sized parts that are rendered as single
+page charts, with the strip labels continuing from the strips of the earlier pages,
+and the .ti2 files of the pages are then merged in to the .ti2 file of the whole
+chart. The labels printed on the pages are always the ones chartread asks for.
+
+Example:
+
+    from icc_generator import chart_renderer
+
+    chart = chart_renderer.render_chart("~/Profile/Profile", 297.0, 420.0, "i1")
+    print(chart.tif_paths)
+"""
+
+import concurrent.futures
+import os
+import pathlib
+import re
+import string
+from typing import List, Union
+
+import numpy as np
+
+from icc_generator import layout, logger, tiff
+from icc_generator.cgats import CGATS, CGATSTable, COLUMN_GROUPS
+
+
+DESCRIPTOR = "Argyll Calibration Target chart information 2"
+ORIGINATOR = "ICCGenerator chart_renderer"
+
+RGB_FIELDS = COLUMN_GROUPS["RGB"]
+
+STRIP_INDEX_PATTERN = "A-Z, A-Z"
+PATCH_INDEX_PATTERN = "1-999"
+
+# the digits of the per page strip counts in PASSES_IN_STRIPS2
+BASE62_DIGITS = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+DEFAULT_SEED = 0
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+
+# the gap between the strip labels and the first patches in millimeters
+LABEL_GAP = 1.0
+# the maximum height of the strip labels in millimeters
+LABEL_HEIGHT = 3.0
+
+# 5 x 7 pixel glyphs of the strip labels
+GLYPHS = {
+    "A": [" ### ", "#   #", "#   #", "#####", "#   #", "#   #", "#   #"],
+    "B": ["#### ", "#   #", "#   #", "#### ", "#   #", "#   #", "#### "],
+    "C": [" ### ", "#   #", "#    ", "#    ", "#    ", "#   #", " ### "],
+    "D": ["#### ", "#   #", "#   #", "#   #", "#   #", "#   #", "#### "],
+    "E": ["#####", "#    ", "#    ", "#### ", "#    ", "#    ", "#####"],
+    "F": ["#####", "#    ", "#    ", "#### ", "#    ", "#    ", "#    "],
+    "G": [" ### ", "#   #", "#    ", "# ###", "#   #", "#   #", " ####"],
+    "H": ["#   #", "#   #", "#   #", "#####", "#   #", "#   #", "#   #"],
+    "I": [" ### ", "  #  ", "  #  ", "  #  ", "  #  ", "  #  ", " ### "],
+    "J": ["  ###", "   # ", "   # ", "   # ", "   # ", "#  # ", " ##  "],
+    "K": ["#   #", "#  # ", "# #  ", "##   ", "# #  ", "#  # ", "#   #"],
+    "L": ["#    ", "#    ", "#    ", "#    ", "#    ", "#    ", "#####"],
+    "M": ["#   #", "## ##", "# # #", "# # #", "#   #", "#   #", "#   #"],
+    "N": ["#   #", "#   #", "##  #", "# # #", "#  ##", "#   #", "#   #"],
+    "O": [" ### ", "#   #", "#   #", "#   #", "#   #", "#   #", " ### "],
+    "P": ["#### ", "#   #", "#   #", "#### ", "#    ", "#    ", "#    "],
+    "Q": [" ### ", "#   #", "#   #", "#   #", "# # #", "#  # ", " ## #"],
+    "R": ["#### ", "#   #", "#   #", "#### ", "# #  ", "#  # ", "#   #"],
+    "S": [" ####", "#    ", "#    ", " ### ", "    #", "    #", "#### "],
+    "T": ["#####", "  #  ", "  #  ", "  #  ", "  #  ", "  #  ", "  #  "],
+    "U": ["#   #", "#   #", "#   #", "#   #", "#   #", "#   #", " ### "],
+    "V": ["#   #", "#   #", "#   #", "#   #", "#   #", " # # ", "  #  "],
+    "W": ["#   #", "#   #", "#   #", "# # #", "# # #", "# # #", " # # "],
+    "X": ["#   #", "#   #", " # # ", "  #  ", " # # ", "#   #", "#   #"],
+    "Y": ["#   #", "#   #", " # # ", "  #  ", "  #  ", "  #  ", "  #  "],
+    "Z": ["#####", "    #", "   # ", "  #  ", " #   ", "#    ", "#####"],
+}
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+
+_SAMPLE_LOC = re.compile(r"^([A-Z]+)([0-9]+)$")
+
+
+class Chart(object):
+    """The files of a rendered chart.
+
+    Args:
+        ti2_path (pathlib.Path): The .ti2 file path.
+        tif_paths (List[pathlib.Path]): The chart page paths in page order.
+        page_layout (layout.PageLayout): The layout of the pages.
+    """
+
+    def __init__(
+        self,
+        ti2_path: pathlib.Path,
+        tif_paths: List[pathlib.Path],
+        page_layout: layout.PageLayout,
+    ):
+        self.ti2_path = ti2_path
+        self.tif_paths = tif_paths
+        self.page_layout = page_layout
+
+    def to_dict(self) -> dict:
+        """Return the chart as a dictionary.
+
+        Returns:
+            dict: The chart.
+        """
+        return {
+            "ti2_path": str(self.ti2_path),
+            "tif_paths": [str(path) for path in self.tif_paths],
+            "page_layout": self.page_layout.to_dict(),
+        }
+
+
+def strip_label(index: int) -> str:
+    """Return the label of the strip with the given index.
+
+    The strips are labelled A to Z, then AA, AB and so on.
+
+    Args:
+        index (int): The zero based strip index.
+
+    Returns:
+        str: The label.
+    """
+    label = ""
+    index += 1
+    while index:
+        index, digit = divmod(index - 1, 26)
+        label = string.ascii_uppercase[digit] + label
+    return label
+
+
+def strip_index(label: str) -> int:
+    """Return the index of the strip with the given label.
+
+    Args:
+        label (str): The label, see strip_label().
+
+    Returns:
+        int: The zero based strip index.
+    """
+    index = 0
+    for letter in label:
+        index = index * 26 + string.ascii_uppercase.index(letter) + 1
+    return index - 1
+
+
+def text_width(text: str, scale: int = 1) -> int:
+    """Return the width of the given text in pixels.
+
+    Args:
+        text (str): The text.
+        scale (int): The size of a glyph pixel in image pixels.
+
+    Returns:
+        int: The width.
+    """
+    return max(len(text) * (GLYPH_WIDTH + 1) - 1, 0) * scale
+
+
+def text_runs(text: str, scale: int = 1) -> List[List[tuple]]:
+    """Return the inked runs of every glyph row of the given text.
+
+    Args:
+        text (str): The text in upper case letters.
+        scale (int): The size of a glyph pixel in image pixels.
+
+    Returns:
+        List[List[tuple]]: The first column and the column after the last of the
+            runs of each of the glyph rows, relative to the start of the text.
+    """
+    rows = []
+    for glyph_row in range(GLYPH_HEIGHT):
+        line = " ".join(GLYPHS[letter][glyph_row] for letter in text)
+        runs = []
+        start = None
+        for column, pixel in enumerate(line + " "):
+            if pixel == "#" and start is None:
+                start = column
+            elif pixel != "#" and start is not None:
+                runs.append((start * scale, column * scale))
+                start = None
+        rows.append(runs)
+    return rows
+
+
+def to_pixels(length: float, dpi: int) -> int:
+    """Return the given length in the pixels of the chart image.
+
+    Args:
+        length (float): The length in millimeters.
+        dpi (int): The resolution of the chart image.
+
+    Returns:
+        int: The length in pixels.
+    """
+    return round(length / layout.MM_PER_INCH * dpi)
+
+
+def patch_locations(
+    patch_count: int,
+    page_layout: layout.PageLayout,
+    seed: Union[None, int] = DEFAULT_SEED,
+) -> tuple:
+    """Return the page, the strip and the position in the strip of every patch.
+
+    The patch positions fill the strips in order, the reserved patch positions are
+    left empty at the end of the last strip of every page. The strips are numbered
+    continuously over the pages. The patches are shuffled over the positions, so the
+    similar patches next to each other in the .ti1 file, like the gray axis steps,
+    are spread over the chart.
+
+    Args:
+        patch_count (int): The number of patches.
+        page_layout (layout.PageLayout): The layout of the pages.
+        seed (Union[None, int]): The seed of the patch shuffling, None keeps the
+            .ti1 order.
+
+    Raises:
+        ValueError: If there is no room for the patches on the page.
+
+    Returns:
+        tuple: The page, the strip and the step index arrays.
+    """
+    if page_layout.patch_count == 0:
+        raise ValueError("page_layout should have room for the patches")
+    positions = np.arange(patch_count)
+    if seed is not None:
+        positions = np.random.default_rng(seed).permutation(patch_count)
+    pages, on_page = np.divmod(positions, page_layout.patch_count)
+    strips, steps = np.divmod(on_page, page_layout.strip_length)
+    return pages, pages * page_layout.strip_count + strips, steps
+
+
+def _copy_table(
+    table: CGATSTable,
+    file_type: Union[None, str] = None,
+    start: int = 0,
+    stop: Union[None, int] = None,
+) -> CGATSTable:
+    """Return a copy of the given table.
+
+    Args:
+        table (CGATSTable): The table.
+        file_type (Union[None, str]): The file identifier of the copy, default is
+            the one of the table.
+        start (int): The first row to copy.
+        stop (Union[None, int]): The row after the last row to copy, default is the
+            end of the table.
+
+    Returns:
+        CGATSTable: The copy.
+    """
+    copy = CGATSTable(file_type or table.file_type, keywords=table.keywords)
+    copy.unquoted_keywords = set(table.unquoted_keywords)
+    copy.declared_keywords = list(table.declared_keywords)
+    for field in table.fields:
+        copy[field] = table[field][start:stop]
+    return copy
+
+
+def build_ti2(
+    ti1: CGATS,
+    page_layout: layout.PageLayout,
+    seed: Union[None, int] = DEFAULT_SEED,
+    strip_offset: int = 0,
+) -> CGATS:
+    """Return the .ti2 file placing the patches of the given .ti1 file.
+
+    Args:
+        ti1 (CGATS): The .ti1 file, the tables after the patches table, like the
+            density extremes, are passed through.
+        page_layout (layout.PageLayout): The layout of the pages.
+        seed (Union[None, int]): The seed of the patch shuffling, None keeps the
+            .ti1 order.
+        strip_offset (int): The number of the strips before the first strip, i.e.
+            on the earlier pages of a chart rendered page by page.
+
+    Returns:
+        CGATS: The .ti2 file.
+    """
+    ti1_table = ti1[0]
+    instrument = page_layout.instrument
+    pages, strips, steps = patch_locations(len(ti1_table), page_layout, seed=seed)
+    page_count = int(pages.max()) + 1 if len(pages) else 0
+    passes = [len(np.unique(strips[pages == page])) for page in range(page_count)]
+
+    keywords = {"DESCRIPTOR": DESCRIPTOR, "ORIGINATOR": ORIGINATOR}
+    for keyword in ["APPROX_WHITE_POINT", "COLOR_REP"]:
+        if keyword in ti1_table.keywords:
+            keywords[keyword] = ti1_table.keywords[keyword]
+    keywords.update(
+        TARGET_INSTRUMENT=instrument.target_instrument,
+        PATCH_LENGTH=f"{instrument.patch_length:.6f}",
+        GAP_LENGTH="0.000000",
+        TRAILER_LENGTH=f"{instrument.strip_lead / 2:.6f}",
+        STEPS_IN_PASS=str(page_layout.strip_length),
+        PASSES_IN_STRIPS2="".join(BASE62_DIGITS[count] for count in passes),
+        STRIP_INDEX_PATTERN=STRIP_INDEX_PATTERN,
+        PATCH_INDEX_PATTERN=PATCH_INDEX_PATTERN,
+        INDEX_ORDER="STRIP_THEN_PATCH",
+    )
+
+    ti2_table = CGATSTable("CTI2", keywords=keywords)
+    ti2_table["SAMPLE_ID"] = np.arange(1, len(ti1_table) + 1)
+    ti2_table["SAMPLE_LOC"] = np.array(
+        [
+            f"{strip_label(strip + strip_offset)}{step + 1}"
+            for strip, step in zip(strips, steps)
+        ],
+        dtype=str,
+    )
+    for field in ti1_table.fields:
+        if field not in ["SAMPLE_ID", "SAMPLE_LOC"]:
+            ti2_table[field] = ti1_table[field]
+    return CGATS(
+        [ti2_table] + [_copy_table(table, "CTI2") for table in ti1.tables[1:]]
+    )
+
+
+def page_bands(
+    page_layout: layout.PageLayout,
+    strips: List[np.ndarray],
+    margin: float = layout.DEFAULT_MARGIN,
+    dpi: int = layout.DEFAULT_DPI,
+    labels: Union[None, List[str]] = None,
+) -> List[tuple]:
+    """Return the bands of identical pixel rows of a chart page.
+
+    The strip labels are drawn in the unprinted lead before the first patch of
+    every strip, as large as the lead and the strip width allow up to LABEL_HEIGHT.
+
+    Args:
+        page_layout (layout.PageLayout): The layout of the page.
+        strips (List[np.ndarray]): The (N, 3) 8-bit RGB patch colors of every strip
+            on the page, in strip order.
+        margin (float): The page margins in millimeters.
+        dpi (int): The resolution of the chart image.
+        labels (Union[None, List[str]]): The labels of the strips, default draws no
+            labels.
+
+    Returns:
+        List[tuple]: The first row, the row count and the colored spans of every
+            band in row order. The spans are the first column, the column after the
+            last and the RGB color.
+    """
+    instrument = page_layout.instrument
+    patch_length = to_pixels(instrument.patch_length, dpi)
+    strip_pitch = to_pixels(instrument.strip_pitch, dpi)
+    strip_width = to_pixels(instrument.strip_width, dpi)
+    along = to_pixels(margin + instrument.strip_lead / 2, dpi)
+    across = to_pixels(margin + instrument.header, dpi)
+    gap = to_pixels(LABEL_GAP, dpi)
+    label_end = along - gap
+
+    scale = 0
+    if labels:
+        lead = label_end - to_pixels(margin, dpi)
+        columns = text_width(max(labels, key=len))
+        if page_layout.along_width:
+            box_width, box_height = lead, strip_width
+        else:
+            box_width, box_height = strip_width, lead
+        scale = min(
+            box_width // max(columns, 1),
+            box_height // GLYPH_HEIGHT,
+            max(to_pixels(LABEL_HEIGHT, dpi) // GLYPH_HEIGHT, 1),
+        )
+    label_height = GLYPH_HEIGHT * scale
+
+    bands = []
+    if page_layout.along_width:
+        # the strips are rows of patches, the labels are on the left of the strips
+        for strip, colors in enumerate(strips):
+            spans = [
+                (
+                    along + step * patch_length,
+                    along + (step + 1) * patch_length,
+                    tuple(color.tolist()),
+                )
+                for step, color in enumerate(colors)
+            ]
+            top = across + strip * strip_pitch
+            if scale < 1 or not len(colors):
+                bands.append((top, strip_width, spans))
+                continue
+            label = labels[strip]
+            label_start = label_end - text_width(label, scale)
+            label_top = top + (strip_width - label_height) // 2
+            bands.append((top, label_top - top, spans))
+            for glyph_row, runs in enumerate(text_runs(label, scale)):
+                label_spans = [
+                    (label_start + start, label_start + end, BLACK)
+                    for start, end in runs
+                ]
+                bands.append(
+                    (label_top + glyph_row * scale, scale, spans + label_spans)
+                )
+            bands.append(
+                (
+                    label_top + label_height,
+                    top + strip_width - label_top - label_height,
+                    spans,
+                )
+            )
+    else:
+        # the strips are columns of patches, the labels are above the strips
+        if scale >= 1:
+            label_top = label_end - label_height
+            label_runs = [
+                (
+                    across
+                    + strip * strip_pitch
+                    + (strip_width - text_width(label, scale)) // 2,
+                    text_runs(label, scale),
+                )
+                for strip, (label, colors) in enumerate(zip(labels, strips))
+                if len(colors)
+            ]
+            for glyph_row in range(GLYPH_HEIGHT):
+                label_spans = [
+                    (label_start + start, label_start + end, BLACK)
+                    for label_start, runs in label_runs
+                    for start, end in runs[glyph_row]
+                ]
+                bands.append((label_top + glyph_row * scale, scale, label_spans))
+
+        # every band crosses all the strips
+        for step in range(max((len(colors) for colors in strips), default=0)):
+            spans = [
+                (
+                    across + strip * strip_pitch,
+                    across + strip * strip_pitch + strip_width,
+                    tuple(colors[step].tolist()),
+                )
+                for strip, colors in enumerate(strips)
+                if step < len(colors)
+            ]
+            bands.append((along + step * patch_length, patch_length, spans))
+    return bands
+
+
+def _write_rows(writer: tiff.TiffWriter, row: np.ndarray, count: int):
+    """Write the given row the given number of times.
+
+    Args:
+        writer (tiff.TiffWriter): The writer.
+        row (np.ndarray): The (width, 3) pixel row.
+        count (int): The number of rows to write.
+    """
+    for start in range(0, max(count, 0), writer.rows_per_strip):
+        rows = min(writer.rows_per_strip, count - start)
+        writer.write(np.broadcast_to(row, (rows,) + row.shape))
+
+
+def render_page(
+    path: Union[str, pathlib.Path],
+    width: int,
+    height: int,
+    bands: List[tuple],
+    compression: str = "none",
+    dpi: int = layout.DEFAULT_DPI,
+) -> pathlib.Path:
+    """Render a chart page band by band.
+
+    Args:
+        path (Union[str, pathlib.Path]): The output TIFF path.
+        width (int): The page width in pixels.
+        height (int): The page height in pixels.
+        bands (List[tuple]): The bands of the page, see page_bands().
+        compression (str): "none" (default) or "deflate".
+        dpi (int): The resolution of the chart image.
+
+    Returns:
+        pathlib.Path: The output path.
+    """
+    path = pathlib.Path(path)
+    white = np.full((width, 3), WHITE, dtype=np.uint8)
+    writer = tiff.TiffWriter(path, width, height, compression=compression, dpi=dpi)
+    try:
+        row_index = 0
+        for first_row, row_count, spans in bands:
+            first_row = max(first_row, row_index)
+            row_count = min(row_count, height - first_row)
+            if row_count <= 0:
+                continue
+            _write_rows(writer, white, first_row - row_index)
+            row = white.copy()
+            for start, end, color in spans:
+                row[start:end] = color
+            _write_rows(writer, row, row_count)
+            row_index = first_row + row_count
+        _write_rows(writer, white, height - row_index)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return path
+
+
+def chart_paths(base_path: Union[str, pathlib.Path], page_count: int) -> List:
+    """Return the chart page paths named the same way printtarg names them.
+
+    Args:
+        base_path (Union[str, pathlib.Path]): The chart path without the extension.
+        page_count (int): The number of pages.
+
+    Returns:
+        List[pathlib.Path]: The paths in page order.
+    """
+    if page_count == 1:
+        return [pathlib.Path(f"{base_path}.tif")]
+    return [pathlib.Path(f"{base_path}_{i + 1:02}.tif") for i in range(page_count)]
+
+
+def split_ti1(
+    ti1_path: Union[str, pathlib.Path],
+    page_patch_count: int,
+    base_path: Union[str, pathlib.Path],
+) -> List[pathlib.Path]:
+    """Split the given .ti1 file in to page sized parts.
+
+    The parts keep the keywords and the other tables of the .ti1 file.
+
+    Args:
+        ti1_path (Union[str, pathlib.Path]): The .ti1 file path.
+        page_patch_count (int): The number of patches on a page.
+        base_path (Union[str, pathlib.Path]): The path of the parts without the page
+            number and the extension.
+
+    Raises:
+        ValueError: If page_patch_count is not positive.
+        RuntimeError: If the .ti1 file doesn't exist.
+
+    Returns:
+        List[pathlib.Path]: The paths of the parts without the extension, in page
+            order.
+    """
+    if page_patch_count <= 0:
+        raise ValueError(
+            f"page_patch_count should be a positive integer, not {page_patch_count}"
+        )
+    ti1_path = pathlib.Path(ti1_path)
+    if not ti1_path.exists():
+        raise RuntimeError(f"File does not exist!: {ti1_path}")
+
+    ti1 = CGATS.read(ti1_path)
+    patches = ti1[0]
+    page_base_paths = []
+    for page, start in enumerate(range(0, len(patches), page_patch_count)):
+        part = _copy_table(patches, start=start, stop=start + page_patch_count)
+        page_base_path = pathlib.Path(f"{base_path}_{page + 1:02}")
+        CGATS([part] + ti1.tables[1:]).write(f"{page_base_path}.ti1")
+        page_base_paths.append(page_base_path)
+    return page_base_paths
+
+
+def merge_ti2(
+    ti2_paths: List[Union[str, pathlib.Path]],
+    output_path: Union[str, pathlib.Path],
+) -> pathlib.Path:
+    """Merge the .ti2 files of the single page charts in to a multi-page .ti2 file.
+
+    The strips of every page continue from the strips of the previous page and the
+    sample ids are numbered over the pages. The keywords and the other tables are
+    taken from the first page.
+
+    The pages rendered with the strip_offset of render_chart() already continue the
+    strips and keep their labels. The strips of the pages labelled from "A" again,
+    like the printtarg charts, are renumbered, then the labels chartread asks for
+    differ from the printed ones and they are logged for every such page.
+
+    Args:
+        ti2_paths (List[Union[str, pathlib.Path]]): The .ti2 file paths in page
+            order.
+        output_path (Union[str, pathlib.Path]): The merged .ti2 file path.
+
+    Raises:
+        ValueError: If the pages have different strip lengths or a sample location
+            is not a strip label followed by the patch number.
+        RuntimeError: If a .ti2 file doesn't exist.
+
+    Returns:
+        pathlib.Path: The merged .ti2 file path.
+    """
+    pages = []
+    for ti2_path in ti2_paths:
+        ti2_path = pathlib.Path(ti2_path)
+        if not ti2_path.exists():
+            raise RuntimeError(f"File does not exist!: {ti2_path}")
+        pages.append(CGATS.read(ti2_path))
+
+    first = pages[0][0]
+    steps_in_pass = first.keywords.get("STEPS_IN_PASS")
+    merged = CGATSTable(first.file_type, keywords=first.keywords)
+    merged.unquoted_keywords = set(first.unquoted_keywords)
+    merged.declared_keywords = list(first.declared_keywords)
+
+    locations = []
+    passes = []
+    strip_offset = 0
+    for page in pages:
+        table = page[0]
+        if table.keywords.get("STEPS_IN_PASS") != steps_in_pass:
+            raise ValueError(
+                f"STEPS_IN_PASS should be {steps_in_pass} on all the pages, "
+                f"not {table.keywords.get('STEPS_IN_PASS')}"
+            )
+        matches = []
+        for location in table["SAMPLE_LOC"].tolist():
+            match = _SAMPLE_LOC.match(location)
+            if not match:
+                raise ValueError(
+                    "SAMPLE_LOC should be a strip label followed by the patch "
+                    f"number, not {location}"
+                )
+            matches.append((strip_index(match.group(1)), match.group(2)))
+        if not matches:
+            passes.append(table.keywords.get("PASSES_IN_STRIPS2", ""))
+            continue
+        first_strip = min(index for index, _ in matches)
+        last_strip = max(index for index, _ in matches)
+        shift = strip_offset - first_strip
+        locations += [f"{strip_label(index + shift)}{step}" for index, step in matches]
+        if shift:
+            logger.warning(
+                f"Page {len(passes) + 1}: chartread strips "
+                f"{strip_label(first_strip + shift)}-"
+                f"{strip_label(last_strip + shift)} are printed as "
+                f"{strip_label(first_strip)}-{strip_label(last_strip)}"
+            )
+        strip_offset = last_strip + shift + 1
+        passes.append(table.keywords.get("PASSES_IN_STRIPS2", ""))
+
+    if "PASSES_IN_STRIPS2" in merged.keywords:
+        merged.keywords["PASSES_IN_STRIPS2"] = "".join(passes)
+    for field in first.fields:
+        if field == "SAMPLE_ID":
+            merged[field] = np.arange(1, len(locations) + 1)
+        elif field == "SAMPLE_LOC":
+            merged[field] = np.array(locations, dtype=str)
+        else:
+            merged[field] = np.concatenate([page[0][field] for page in pages])
+
+    output_path = pathlib.Path(output_path)
+    CGATS([merged] + pages[0].tables[1:]).write(output_path)
+    return output_path
+
+
+def render_chart(
+    base_path: Union[str, pathlib.Path],
+    width: float,
+    height: float,
+    instrument: Union[str, layout.Instrument],
+    margin: float = layout.DEFAULT_MARGIN,
+    dpi: int = layout.DEFAULT_DPI,
+    compression: str = "none",
+    workers: Union[None, int] = None,
+    seed: Union[None, int] = DEFAULT_SEED,
+    page_patch_count: Union[None, int] = None,
+    strip_offset: int = 0,
+) -> Chart:
+    """Render the chart of the .ti1 file at the given base path.
+
+    Args:
+        base_path (Union[str, pathlib.Path]): The path of the .ti1 file without the
+            extension, the .ti2 and the TIFF files are written next to it.
+        width (float): The page width in millimeters.
+        height (float): The page height in millimeters.
+        instrument (Union[str, layout.Instrument]): The instrument or its printtarg
+            name, "i1" or "CM".
+        margin (float): The page margins in millimeters.
+        dpi (int): The resolution of the chart images.
+        compression (str): The TIFF compression, "none" (default) or "deflate".
+        workers (Union[None, int]): The number of worker processes, default is the
+            number of CPUs. With 1 the pages are rendered in this process.
+        seed (Union[None, int]): The seed of the patch shuffling, the same seed
+            always places the patches the same way. None keeps the .ti1 order.
+        page_patch_count (Union[None, int]): The number of patches on a page,
+            default is as many as the page fits.
+        strip_offset (int): The number of the strips before the first strip, the
+            labels printed on the pages and the .ti2 file continue from them. Used
+            to render a chart page by page.
+
+    Raises:
+        TypeError: If workers is not an int.
+        ValueError: If workers is not positive, the compression is not valid, the
+            .ti1 file has no RGB values, there is no room for the patches on the
+            page or page_patch_count doesn't fit on the page.
+        RuntimeError: If the .ti1 file doesn't exist.
+
+    Returns:
+        Chart: The .ti2 and the TIFF file paths.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if not isinstance(workers, int):
+        raise TypeError(f"workers should be an int, not {workers.__class__.__name__}")
+
+    if workers < 1:
+        raise ValueError(f"workers should be a positive integer, not {workers}")
+
+    if compression not in tiff.COMPRESSIONS:
+        raise ValueError(
+            f"compression should be one of none or deflate, not {compression}"
+        )
+
+    base_path = pathlib.Path(base_path).expanduser()
+    ti1_path = pathlib.Path(f"{base_path}.ti1")
+    if not ti1_path.exists():
+        raise RuntimeError(f"File does not exist!: {ti1_path}")
+
+    ti1 = CGATS.read(ti1_path)
+    ti1_table = ti1[0]
+    if not ti1_table.has_columns(RGB_FIELDS):
+        raise ValueError(f"{ti1_path.name} should have the RGB device values")
+
+    page_layout = layout.page_layout(width, height, instrument, margin, dpi)
+    if page_layout.patch_count == 0:
+        raise ValueError(
+            f"There is no room for the patches on a {width}x{height} mm page"
+        )
+    if page_patch_count is not None:
+        page_layout = page_layout.with_patch_count(page_patch_count)
+
+    ti2_path = pathlib.Path(f"{base_path}.ti2")
+    build_ti2(ti1, page_layout, seed=seed, strip_offset=strip_offset).write(ti2_path)
+
+    colors = np.clip(np.round(ti1_table.rgb * 2.55), 0, 255).astype(np.uint8)
+    pages, strips, steps = patch_locations(len(ti1_table), page_layout, seed=seed)
+    page_count = int(pages.max()) + 1 if len(pages) else 1
+    tif_paths = chart_paths(base_path, page_count)
+
+    arguments = []
+    for page, tif_path in enumerate(tif_paths):
+        page_strips = []
+        labels = []
+        first_strip = page * page_layout.strip_count
+        for strip in range(first_strip, first_strip + page_layout.strip_count):
+            in_strip = strips == strip
+            page_strips.append(colors[in_strip][np.argsort(steps[in_strip])])
+            labels.append(strip_label(strip + strip_offset))
+        arguments.append(
+            (
+                tif_path,
+                to_pixels(width, dpi),
+                to_pixels(height, dpi),
+                page_bands(page_layout, page_strips, margin, dpi, labels),
+                compression,
+                dpi,
+            )
+        )
+
+    workers = min(workers, len(arguments))
+    if workers == 1:
+        return Chart(
+            ti2_path, [render_page(*argument) for argument in arguments], page_layout
+        )
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_page, *argument) for argument in arguments]
+        return Chart(ti2_path, [future.result() for future in futures], page_layout)
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""Vectorized colorimetric conversions and color difference formulas.
+
+All the functions accept (..., 3) shaped arrays and work on the whole array at once
+without any Python loops. XYZ values are in 0-1 range (Y=1.0 for the reference
+white), hue angles are in degrees.
+
+Example:
+
+    import numpy as np
+    from icc_generator import colorimetry
+
+    lab1 = colorimetry.xyz_to_lab(xyz1)
+    lab2 = colorimetry.xyz_to_lab(xyz2)
+    delta_e = colorimetry.delta_e_2000(lab1, lab2)  # (N,) array
+
+Run ``python benchmarks/colorimetry_benchmark.py`` to measure the throughput.
+"""
+
+from typing import Union
+
+import numpy as np
+
+
+# ICC Profile Connection Space illuminant
+D50 = np.array([0.9642, 1.0, 0.8249])
+D65 = np.array([0.95047, 1.0, 1.08883])
+
+BRADFORD = np.array(
+    [
+        [0.8951, 0.2664, -0.1614],
+        [-0.7502, 1.7135, 0.0367],
+        [0.0389, -0.0685, 1.0296],
+    ]
+)
+
+# kL, K1, K2 parameters of the CIE94 formula
+DELTA_E_94_GRAPHIC_ARTS = (1.0, 0.045, 0.015)
+DELTA_E_94_TEXTILES = (2.0, 0.048, 0.014)
+
+_EPSILON = 216.0 / 24389.0
+_KAPPA = 24389.0 / 27.0
+
+_TWO_PI = 2.0 * np.pi
+_25_POW_7 = 25.0**7
+_RAD_6 = np.radians(6.0)
+_RAD_25 = np.radians(25.0)
+_RAD_30 = np.radians(30.0)
+_RAD_63 = np.radians(63.0)
+_RAD_275 = np.radians(275.0)
+
+
+def xyz_to_lab(xyz: np.ndarray, white: Union[None, np.ndarray] = None) -> np.ndarray:
+    """Convert XYZ to CIE L*a*b*.
+
+    Args:
+        xyz (np.ndarray): The (..., 3) XYZ values.
+        white (np.ndarray): The reference white XYZ, default is D50.
+
+    Returns:
+        np.ndarray: The (..., 3) L*a*b* values.
+    """
+    white = D50 if white is None else np.asarray(white, dtype=np.float64)
+    ratio = np.asarray(xyz, dtype=np.float64) / white
+    f = np.where(
+        ratio > _EPSILON, np.cbrt(ratio), (_KAPPA * ratio + 16.0) / 116.0
+    )
+    lab = np.empty_like(f)
+    lab[..., 0] = 116.0 * f[..., 1] - 16.0
+    lab[..., 1] = 500.0 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200.0 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def lab_to_xyz(lab: np.ndarray, white: Union[None, np.ndarray] = None) -> np.ndarray:
+    """Convert CIE L*a*b* to XYZ.
+
+    Args:
+        lab (np.ndarray): The (..., 3) L*a*b* values.
+        white (np.ndarray): The reference white XYZ, default is D50.
+
+    Returns:
+        np.ndarray: The (..., 3) XYZ values.
+    """
+    white = D50 if white is None else np.asarray(white, dtype=np.float64)
+    lab = np.asarray(lab, dtype=np.float64)
+    f = np.empty_like(lab)
+    f[..., 1] = (lab[..., 0] + 16.0) / 116.0
+    f[..., 0] = f[..., 1] + lab[..., 1] / 500.0
+    f[..., 2] = f[..., 1] - lab[..., 2] / 200.0
+    f3 = f**3
+    ratio = np.where(f3 > _EPSILON, f3, (116.0 * f - 16.0) / _KAPPA)
+    # L* is linear below the threshold
+    ratio[..., 1] = np.where(
+        lab[..., 0] > _KAPPA * _EPSILON, f3[..., 1], lab[..., 0] / _KAPPA
+    )
+    return ratio * white
+
+
+def lab_to_lch(lab: np.ndarray) -> np.ndarray:
+    """Convert CIE L*a*b* to L*C*h.
+
+    Args:
+        lab (np.ndarray): The (..., 3) L*a*b* values.
+
+    Returns:
+        np.ndarray: The (..., 3) L*C*h values, h in [0, 360) degrees.
+    """
+    lab = np.asarray(lab, dtype=np.float64)
+    lch = np.empty_like(lab)
+    lch[..., 0] = lab[..., 0]
+    lch[..., 1] = np.hypot(lab[..., 1], lab[..., 2])
+    lch[..., 2] = np.degrees(np.arctan2(lab[..., 2], lab[..., 1])) % 360.0
+    return lch
+
+
+def lch_to_lab(lch: np.ndarray) -> np.ndarray:
+    """Convert L*C*h to CIE L*a*b*.
+
+    Args:
+        lch (np.ndarray): The (..., 3) L*C*h values, h in degrees.
+
+    Returns:
+        np.ndarray: The (..., 3) L*a*b* values.
+    """
+    lch = np.asarray(lch, dtype=np.float64)
+    hue = np.radians(lch[..., 2])
+    lab = np.empty_like(lch)
+    lab[..., 0] = lch[..., 0]
+    lab[..., 1] = lch[..., 1] * np.cos(hue)
+    lab[..., 2] = lch[..., 1] * np.sin(hue)
+    return lab
+
+
+def xyz_to_lch(xyz: np.ndarray, white: Union[None, np.ndarray] = None) -> np.ndarray:
+    """Convert XYZ to L*C*h.
+
+    Args:
+        xyz (np.ndarray): The (..., 3) XYZ values.
+        white (np.ndarray): The reference white XYZ, default is D50.
+
+    Returns:
+        np.ndarray: The (..., 3) L*C*h values.
+    """
+    return lab_to_lch(xyz_to_lab(xyz, white))
+
+
+def lch_to_xyz(lch: np.ndarray, white: Union[None, np.ndarray] = None) -> np.ndarray:
+    """Convert L*C*h to XYZ.
+
+    Args:
+        lch (np.ndarray): The (..., 3) L*C*h values.
+        white (np.ndarray): The reference white XYZ, default is D50.
+
+    Returns:
+        np.ndarray: The (..., 3) XYZ values.
+    """
+    return lab_to_xyz(lch_to_lab(lch), white)
+
+
+def bradford_matrix(source_white: np.ndarray, destination_white: np.ndarray):
+    """Return the Bradford chromatic adaptation matrix.
+
+    Args:
+        source_white (np.ndarray): The source white XYZ.
+        destination_white (np.ndarray): The destination white XYZ.
+
+    Returns:
+        np.ndarray: The 3x3 matrix that adapts column XYZ vectors.
+    """
+    source_cone = BRADFORD @ np.asarray(source_white, dtype=np.float64)
+    destination_cone = BRADFORD @ np.asarray(destination_white, dtype=np.float64)
+    return np.linalg.inv(BRADFORD) @ np.diag(destination_cone / source_cone) @ BRADFORD
+
+
+def adapt(
+    xyz: np.ndarray,
+    source_white: np.ndarray,
+    destination_white: Union[None, np.ndarray] = None,
+) -> np.ndarray:
+    """Chromatically adapt the given XYZ values by using the Bradford transform.
+
+    Args:
+        xyz (np.ndarray): The (..., 3) XYZ values.
+        source_white (np.ndarray): The white XYZ that the values are relative to.
+        destination_white (np.ndarray): The white XYZ to adapt to, default is D50.
+
+    Returns:
+        np.ndarray: The (..., 3) adapted XYZ values.
+    """
+    destination_white = D50 if destination_white is None else destination_white
+    matrix = bradford_matrix(source_white, destination_white)
+    return np.asarray(xyz, dtype=np.float64) @ matrix.T
+
+
+def _flatten_pair(values1: np.ndarray, values2: np.ndarray) -> tuple:
+    """Broadcast the given (..., 3) arrays against each other and flatten them.
+
+    Args:
+        values1 (np.ndarray): The first (..., 3) array.
+        values2 (np.ndarray): The second (..., 3) array.
+
+    Returns:
+        (np.ndarray, np.ndarray, tuple): The (N, 3) float arrays and the original
+            batch shape.
+    """
+    values1 = np.asarray(values1, dtype=np.float64)
+    values2 = np.asarray(values2, dtype=np.float64)
+    shape = np.broadcast_shapes(values1.shape, values2.shape)
+    values1 = np.broadcast_to(values1, shape).reshape(-1, 3)
+    values2 = np.broadcast_to(values2, shape).reshape(-1, 3)
+    return values1, values2, shape[:-1]
+
+
+def delta_e_76(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+    """Calculate the CIE76 color difference.
+
+    Args:
+        lab1 (np.ndarray): The (..., 3) reference L*a*b* values.
+        lab2 (np.ndarray): The (..., 3) sample L*a*b* values.
+
+    Returns:
+        np.ndarray: The (...) dE76 values.
+    """
+    difference = np.asarray(lab1, dtype=np.float64) - np.asarray(
+        lab2, dtype=np.float64
+    )
+    return np.sqrt(np.einsum("...i,...i->...", difference, difference))
+
+
+def delta_e_94(
+    lab1: np.ndarray,
+    lab2: np.ndarray,
+    parameters: tuple = DELTA_E_94_GRAPHIC_ARTS,
+) -> np.ndarray:
+    """Calculate the CIE94 color difference.
+
+    Args:
+        lab1 (np.ndarray): The (..., 3) reference L*a*b* values.
+        lab2 (np.ndarray): The (..., 3) sample L*a*b* values.
+        parameters (tuple): The (kL, K1, K2) parameters, default is
+            DELTA_E_94_GRAPHIC_ARTS, use DELTA_E_94_TEXTILES for textiles.
+
+    Returns:
+        np.ndarray: The (...) dE94 values.
+    """
+    kl, k1, k2 = parameters
+    lab1, lab2, shape = _flatten_pair(lab1, lab2)
+    c1 = np.hypot(lab1[:, 1], lab1[:, 2])
+    c2 = np.hypot(lab2[:, 1], lab2[:, 2])
+    dl = lab1[:, 0] - lab2[:, 0]
+    dc = c1 - c2
+    da = lab1[:, 1] - lab2[:, 1]
+    db = lab1[:, 2] - lab2[:, 2]
+    dh_squared = np.maximum(da * da + db * db - dc * dc, 0.0)
+    sc = 1.0 + k1 * c1
+    sh = 1.0 + k2 * c1
+    return np.sqrt(
+        (dl / kl) ** 2 + (dc / sc) ** 2 + dh_squared / (sh * sh)
+    ).reshape(shape)
+
+
+def delta_e_2000(
+    lab1: np.ndarray,
+    lab2: np.ndarray,
+    kl: float = 1.0,
+    kc: float = 1.0,
+    kh: float = 1.0,
+) -> np.ndarray:
+    """Calculate the CIEDE2000 color difference.
+
+    Args:
+        lab1 (np.ndarray): The (..., 3) reference L*a*b* values.
+        lab2 (np.ndarray): The (..., 3) sample L*a*b* values.
+        kl (float): Lightness weighting factor.
+        kc (float): Chroma weighting factor.
+        kh (float): Hue weighting factor.
+
+    Returns:
+        np.ndarray: The (...) dE00 values.
+    """
+    lab1, lab2, shape = _flatten_pair(lab1, lab2)
+    l1, a1, b1 = lab1[:, 0], lab1[:, 1], lab1[:, 2]
+    l2, a2, b2 = lab2[:, 0], lab2[:, 1], lab2[:, 2]
+
+    c_mean7 = ((np.hypot(a1, b1) + np.hypot(a2, b2)) * 0.5) ** 7
+    g = 1.5 - 0.5 * np.sqrt(c_mean7 / (c_mean7 + _25_POW_7))
+    a1p = g * a1
+    a2p = g * a2
+    c1p = np.hypot(a1p, b1)
+    c2p = np.hypot(a2p, b2)
+    # hue angles are in radians in [0, 2pi)
+    h1p = np.arctan2(b1, a1p) % _TWO_PI
+    h2p = np.arctan2(b2, a2p) % _TWO_PI
+
+    chroma_product = c1p * c2p
+    achromatic = chroma_product == 0.0
+    dhp = h2p - h1p
+    dhp -= _TWO_PI * np.round(dhp / _TWO_PI)
+    dhp[achromatic] = 0.0
+    delta_hp = 2.0 * np.sqrt(chroma_product) * np.sin(dhp * 0.5)
+
+    hp_mean = h1p + h2p
+    wrap = np.abs(h1p - h2p) > np.pi
+    hp_mean[wrap] += np.where(hp_mean[wrap] < _TWO_PI, _TWO_PI, -_TWO_PI)
+    hp_mean *= 0.5
+    hp_mean[achromatic] *= 2.0
+
+    t = (
+        1.0
+        - 0.17 * np.cos(hp_mean - _RAD_30)
+        + 0.24 * np.cos(2.0 * hp_mean)
+        + 0.32 * np.cos(3.0 * hp_mean + _RAD_6)
+        - 0.20 * np.cos(4.0 * hp_mean - _RAD_63)
+    )
+    cp_mean = (c1p + c2p) * 0.5
+    cp_mean7 = cp_mean**7
+    rc = 2.0 * np.sqrt(cp_mean7 / (cp_mean7 + _25_POW_7))
+    delta_theta = _RAD_30 * np.exp(-(((hp_mean - _RAD_275) / _RAD_25) ** 2))
+    lp_offset = ((l1 + l2) * 0.5 - 50.0) ** 2
+    sl = 1.0 + 0.015 * lp_offset / np.sqrt(20.0 + lp_offset)
+    sc = 1.0 + 0.045 * cp_mean
+    sh = 1.0 + 0.015 * cp_mean * t
+    rt = -np.sin(2.0 * delta_theta) * rc
+
+    dl = (l2 - l1) / (kl * sl)
+    dc = (c2p - c1p) / (kc * sc)
+    dh = delta_hp / (kh * sh)
+    return np.sqrt(dl * dl + dc * dc + dh * dh + rt * dc * dh).reshape(shape)
@@ -0,0 +1,962 @@
+# -*- coding: utf-8 -*-
+"""Lazy, memory-mapped ICC profile parser.
+
+The profile file is memory-mapped and only the header and the tag table are parsed
+when an ICCProfile is created. The tags (desc, wtpt, TRCs, A2B/B2A tables etc.) are
+decoded on first access and cached, so listing a folder of profiles only reads the
+first few hundred bytes of every file.
+
+Example:
+
+    from icc_generator.icc import ICCProfile, list_profiles
+
+    for profile in list_profiles("~/.local/share/icc/"):
+        print(profile.path.name, profile.device_class, profile.description)
+
+    with ICCProfile("printer.icc") as profile:
+        lab = profile.device_to_pcs(rgb)  # (N, 3) L*a*b* values
+        rgb = profile.pcs_to_device(lab)
+"""
+
+import datetime
+import itertools
+import mmap
+import pathlib
+import struct
+from typing import Dict, Iterator, List, Union
+
+import numpy as np
+
+from icc_generator import logger
+from icc_generator.colorimetry import D50
+
+
+HEADER_SIZE = 128
+
+PROFILE_EXTENSIONS = [".icc", ".icm"]
+
+
+def s15fixed16(data: bytes, count: int, offset: int = 0) -> np.ndarray:
+    """Decode the given number of s15Fixed16Number values.
+
+    Args:
+        data (bytes): The raw data.
+        count (int): The number of values to decode.
+        offset (int): The offset of the first value in the data.
+
+    Returns:
+        np.ndarray: The decoded float values.
+    """
+    return np.frombuffer(data, dtype=">i4", count=count, offset=offset) / 65536.0
+
+
+class Curve(object):
+    """A one dimensional curve (curveType or parametricCurveType).
+
+    Args:
+        table (np.ndarray): The curve samples in 0-1 range, uniformly distributed over
+            the 0-1 input range. An empty table is the identity curve.
+        gamma (float): The gamma value of a simple power curve.
+        function_type (int): The parametric curve function type (0-4).
+        parameters (List[float]): The parametric curve parameters.
+    """
+
+    PARAMETER_COUNTS = [1, 3, 4, 5, 7]
+
+    def __init__(
+        self,
+        table: Union[None, np.ndarray] = None,
+        gamma: Union[None, float] = None,
+        function_type: Union[None, int] = None,
+        parameters: Union[None, List[float]] = None,
+    ):
+        self.table = table
+        self.gamma = gamma
+        self.function_type = function_type
+        self.parameters = parameters
+
+    @property
+    def is_identity(self) -> bool:
+        """Return True if this is the identity curve.
+
+        Returns:
+            bool: True if the curve doesn't change the values.
+        """
+        if self.gamma is not None:
+            return self.gamma == 1.0
+        if self.function_type is not None:
+            return self.function_type == 0 and self.parameters[0] == 1.0
+        return self.table is None or len(self.table) < 2
+
+    @classmethod
+    def decode(cls, data: bytes, offset: int = 0) -> "Curve":
+        """Decode the curv or para data at the given offset.
+
+        Args:
+            data (bytes): The raw data.
+            offset (int): The offset of the curve in the data.
+
+        Raises:
+            ValueError: If the data is not a curv or para type.
+
+        Returns:
+            Curve: The decoded curve.
+        """
+        type_signature = bytes(data[offset : offset + 4])
+        if type_signature == b"curv":
+            (count,) = struct.unpack(">I", data[offset + 8 : offset + 12])
+            if count == 0:
+                return cls()
+            values = np.frombuffer(data, dtype=">u2", count=count, offset=offset + 12)
+            if count == 1:
+                return cls(gamma=values[0] / 256.0)
+            return cls(table=values / 65535.0)
+        if type_signature == b"para":
+            (function_type,) = struct.unpack(">H", data[offset + 8 : offset + 10])
+            parameters = s15fixed16(
+                data, cls.PARAMETER_COUNTS[function_type], offset + 12
+            ).tolist()
+            return cls(function_type=function_type, parameters=parameters)
+        raise ValueError(f"Unsupported curve type: {type_signature!r}")
+
+    @property
+    def size(self) -> int:
+        """Return the encoded size of the curve in bytes, without padding.
+
+        Returns:
+            int: The size in bytes.
+        """
+        if self.function_type is not None:
+            return 12 + 4 * len(self.parameters)
+        if self.gamma is not None:
+            return 14
+        return 12 + 2 * (0 if self.table is None else len(self.table))
+
+    def evaluate(self, values: np.ndarray) -> np.ndarray:
+        """Evaluate the curve.
+
+        Args:
+            values (np.ndarray): The input values in 0-1 range.
+
+        Returns:
+            np.ndarray: The output values.
+        """
+        values = np.clip(values, 0.0, 1.0)
+        if self.gamma is not None:
+            return values**self.gamma
+        if self.function_type is not None:
+            return self._evaluate_parametric(values)
+        if self.table is None or len(self.table) < 2:
+            return values
+        grid = np.linspace(0.0, 1.0, len(self.table))
+        return np.interp(values, grid, self.table)
+
+    def evaluate_inverse(self, values: np.ndarray, samples: int = 4096) -> np.ndarray:
+        """Evaluate the inverse of the curve.
+
+        The curve is sampled and inverted by linear interpolation, the curve is
+        assumed to be monotonically increasing.
+
+        Args:
+            values (np.ndarray): The output values in 0-1 range.
+            samples (int): The number of samples used to invert the curve.
+
+        Returns:
+            np.ndarray: The input values.
+        """
+        values = np.clip(values, 0.0, 1.0)
+        if self.is_identity:
+            return values
+        if self.gamma is not None:
+            return values ** (1.0 / self.gamma)
+        grid = np.linspace(0.0, 1.0, samples)
+        curve = np.maximum.accumulate(self.evaluate(grid))
+        return np.interp(values, curve, grid)
+
+    def _evaluate_parametric(self, x: np.ndarray) -> np.ndarray:
+        """Evaluate the parametric curve.
+
+        Args:
+            x (np.ndarray): The input values in 0-1 range.
+
+        Returns:
+            np.ndarray: The output values.
+        """
+        p = self.parameters + [0.0] * (7 - len(self.parameters))
+        g, a, b, c, d, e, f = p
+        if self.function_type == 0:
+            return x**g
+        if self.function_type in [1, 2]:
+            offset = c if self.function_type == 2 else 0.0
+            threshold = -b / a
+            return np.where(
+                x >= threshold, np.maximum(a * x + b, 0.0) ** g + offset, offset
+            )
+        if self.function_type == 3:
+            return np.where(x >= d, np.maximum(a * x + b, 0.0) ** g, c * x)
+        return np.where(x >= d, np.maximum(a * x + b, 0.0) ** g + e, c * x + f)
+
+
+def interpolate_curves(curves: List[Curve], values: np.ndarray) -> np.ndarray:
+    """Apply the given curves to the values channel by channel.
+
+    Args:
+        curves (List[Curve]): The curves.
+        values (np.ndarray): The (N, len(curves)) input values in 0-1 range.
+
+    Returns:
+        np.ndarray: The (N, len(curves)) output values.
+    """
+    output = np.empty_like(values, dtype=np.float64)
+    for i, curve in enumerate(curves):
+        output[:, i] = curve.evaluate(values[:, i])
+    return output
+
+
+def interpolate_curves_inverse(curves: List[Curve], values: np.ndarray) -> np.ndarray:
+    """Apply the inverse of the given curves to the values channel by channel.
+
+    Args:
+        curves (List[Curve]): The curves.
+        values (np.ndarray): The (N, len(curves)) output values in 0-1 range.
+
+    Returns:
+        np.ndarray: The (N, len(curves)) input values.
+    """
+    output = np.empty_like(values, dtype=np.float64)
+    for i, curve in enumerate(curves):
+        output[:, i] = curve.evaluate_inverse(values[:, i])
+    return output
+
+
+def interpolate_clut(clut: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Multi-linear interpolation of the given CLUT.
+
+    Args:
+        clut (np.ndarray): The (g0, g1, ..., gn-1, out) CLUT with values in 0-1 range.
+        values (np.ndarray): The (N, n) input values in 0-1 range.
+
+    Returns:
+        np.ndarray: The (N, out) interpolated values.
+    """
+    input_channels = values.shape[1]
+    grid = np.array(clut.shape[:input_channels])
+    flat = clut.reshape(-1, clut.shape[-1])
+    strides = np.array(
+        [int(np.prod(grid[i + 1 :])) for i in range(input_channels)], dtype=np.intp
+    )
+
+    position = np.clip(values, 0.0, 1.0) * (grid - 1)
+    base = np.minimum(position.astype(np.intp), np.maximum(grid - 2, 0))
+    fraction = position - base
+    base_index = base @ strides
+
+    output = np.zeros((values.shape[0], flat.shape[1]), dtype=np.float64)
+    for corner in itertools.product((0, 1), repeat=input_channels):
+        corner = np.array(corner)
+        weight = np.prod(np.where(corner, fraction, 1.0 - fraction), axis=1)
+        output += weight[:, None] * flat[base_index + corner @ strides]
+    return output
+
+
+class LutTag(object):
+    """A decoded lut8Type (mft1) or lut16Type (mft2) tag.
+
+    Args:
+        type_signature (str): The tag type signature, "mft1" or "mft2".
+        matrix (np.ndarray): The 3x3 matrix.
+        input_curves (List[Curve]): The input curves.
+        clut (np.ndarray): The C contiguous (g, ..., g, out) CLUT in 0-1 range.
+        output_curves (List[Curve]): The output curves.
+    """
+
+    def __init__(
+        self,
+        type_signature: str,
+        matrix: np.ndarray,
+        input_curves: List[Curve],
+        clut: np.ndarray,
+        output_curves: List[Curve],
+    ):
+        self.type_signature = type_signature
+        self.matrix = matrix
+        self.input_curves = input_curves
+        self.clut = clut
+        self.output_curves = output_curves
+
+    @property
+    def input_channels(self) -> int:
+        """Return the number of input channels.
+
+        Returns:
+            int: The number of input channels.
+        """
+        return len(self.input_curves)
+
+    @property
+    def output_channels(self) -> int:
+        """Return the number of output channels.
+
+        Returns:
+            int: The number of output channels.
+        """
+        return len(self.output_curves)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "LutTag":
+        """Decode the given tag data.
+
+        Args:
+            data (bytes): The raw tag data including the type signature.
+
+        Raises:
+            ValueError: If the tag type is not mft1 or mft2.
+
+        Returns:
+            LutTag: The decoded tag.
+        """
+        type_signature = data[:4].decode("latin-1")
+        input_channels, output_channels, grid_points = struct.unpack(
+            ">BBB", data[8:11]
+        )
+        matrix = s15fixed16(data, 9, 12).reshape(3, 3)
+
+        if type_signature == "mft2":
+            input_entries, output_entries = struct.unpack(">HH", data[48:52])
+            dtype = np.dtype(">u2")
+            scale = 65535.0
+            offset = 52
+        elif type_signature == "mft1":
+            input_entries = output_entries = 256
+            dtype = np.dtype("u1")
+            scale = 255.0
+            offset = 48
+        else:
+            raise ValueError(f"Unsupported lut type: {type_signature}")
+
+        def read(count):
+            nonlocal offset
+            values = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += count * dtype.itemsize
+            return values / scale
+
+        input_curves = [Curve(read(input_entries)) for _ in range(input_channels)]
+        clut = np.ascontiguousarray(
+            read(grid_points**input_channels * output_channels).reshape(
+                (grid_points,) * input_channels + (output_channels,)
+            )
+        )
+        output_curves = [Curve(read(output_entries)) for _ in range(output_channels)]
+        return cls(type_signature, matrix, input_curves, clut, output_curves)
+
+    def evaluate(self, values: np.ndarray, apply_matrix: bool = False) -> np.ndarray:
+        """Evaluate the lut for the given input values.
+
+        Args:
+            values (np.ndarray): The (N, input_channels) values in 0-1 range.
+            apply_matrix (bool): Apply the matrix before the input curves. The matrix
+                should only be used when the input is XYZ.
+
+        Returns:
+            np.ndarray: The (N, output_channels) values in 0-1 range.
+        """
+        if apply_matrix:
+            values = np.clip(values @ self.matrix.T, 0.0, 1.0)
+        values = interpolate_curves(self.input_curves, values)
+        values = interpolate_clut(self.clut, values)
+        return interpolate_curves(self.output_curves, values)
+
+
+class LutABTag(object):
+    """A decoded lutAtoBType (mAB) or lutBtoAType (mBA) tag.
+
+    The elements that don't exist in the tag are set to None.
+
+    Args:
+        type_signature (str): The tag type signature, "mAB " or "mBA ".
+        input_channels (int): The number of input channels.
+        output_channels (int): The number of output channels.
+        a_curves (List[Curve]): The A curves.
+        clut (np.ndarray): The C contiguous (g0, ..., gn-1, out) CLUT in 0-1 range.
+        m_curves (List[Curve]): The M curves.
+        matrix (np.ndarray): The 3x4 matrix, the last column being the offsets.
+        b_curves (List[Curve]): The B curves.
+    """
+
+    def __init__(
+        self,
+        type_signature: str,
+        input_channels: int,
+        output_channels: int,
+        a_curves: Union[None, List[Curve]] = None,
+        clut: Union[None, np.ndarray] = None,
+        m_curves: Union[None, List[Curve]] = None,
+        matrix: Union[None, np.ndarray] = None,
+        b_curves: Union[None, List[Curve]] = None,
+    ):
+        self.type_signature = type_signature
+        self.input_channels = input_channels
+        self.output_channels = output_channels
+        self.a_curves = a_curves
+        self.clut = clut
+        self.m_curves = m_curves
+        self.matrix = matrix
+        self.b_curves = b_curves
+
+    @classmethod
+    def decode(cls, data: bytes) -> "LutABTag":
+        """Decode the given tag data.
+
+        Args:
+            data (bytes): The raw tag data including the type signature.
+
+        Returns:
+            LutABTag: The decoded tag.
+        """
+        type_signature = data[:4].decode("latin-1")
+        input_channels, output_channels = struct.unpack(">BB", data[8:10])
+        (
+            b_offset,
+            matrix_offset,
+            m_offset,
+            clut_offset,
+            a_offset,
+        ) = struct.unpack(">5I", data[12:32])
+
+        # A curves are on the device side
+        if type_signature == "mAB ":
+            a_count, m_count = input_channels, output_channels
+            clut_inputs, clut_outputs = input_channels, output_channels
+        else:
+            a_count, m_count = output_channels, input_channels
+            clut_inputs, clut_outputs = input_channels, output_channels
+        b_count = m_count
+
+        def read_curves(offset, count):
+            if not offset:
+                return None
+            curves = []
+            for _ in range(count):
+                curve = Curve.decode(data, offset)
+                curves.append(curve)
+                offset += curve.size + (-curve.size % 4)
+            return curves
+
+        matrix = None
+        if matrix_offset:
+            values = s15fixed16(data, 12, matrix_offset)
+            matrix = np.hstack([values[:9].reshape(3, 3), values[9:, None]])
+
+        clut = None
+        if clut_offset:
+            grid = tuple(data[clut_offset : clut_offset + clut_inputs])
+            precision = data[clut_offset + 16]
+            dtype = np.dtype(">u2") if precision == 2 else np.dtype("u1")
+            count = int(np.prod(grid)) * clut_outputs
+            values = np.frombuffer(
+                data, dtype=dtype, count=count, offset=clut_offset + 20
+            )
+            clut = np.ascontiguousarray(
+                (values / float(np.iinfo(dtype).max)).reshape(grid + (clut_outputs,))
+            )
+
+        return cls(
+            type_signature,
+            input_channels,
+            output_channels,
+            a_curves=read_curves(a_offset, a_count),
+            clut=clut,
+            m_curves=read_curves(m_offset, m_count),
+            matrix=matrix,
+            b_curves=read_curves(b_offset, b_count),
+        )
+
+    def _apply_matrix(self, values: np.ndarray) -> np.ndarray:
+        """Apply the matrix and the offsets.
+
+        Args:
+            values (np.ndarray): The (N, 3) input values.
+
+        Returns:
+            np.ndarray: The (N, 3) output values clipped to 0-1 range.
+        """
+        return np.clip(values @ self.matrix[:, :3].T + self.matrix[:, 3], 0.0, 1.0)
+
+    def evaluate(self, values: np.ndarray, apply_matrix: bool = True) -> np.ndarray:
+        """Evaluate the lut for the given input values.
+
+        Args:
+            values (np.ndarray): The (N, input_channels) values in 0-1 range.
+            apply_matrix (bool): Apply the matrix if it exists, default is True.
+
+        Returns:
+            np.ndarray: The (N, output_channels) values in 0-1 range.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if self.type_signature == "mAB ":
+            steps = [
+                ("curves", self.a_curves),
+                ("clut", self.clut),
+                ("curves", self.m_curves),
+                ("matrix", self.matrix if apply_matrix else None),
+                ("curves", self.b_curves),
+            ]
+        else:
+            steps = [
+                ("curves", self.b_curves),
+                ("matrix", self.matrix if apply_matrix else None),
+                ("curves", self.m_curves),
+                ("clut", self.clut),
+                ("curves", self.a_curves),
+            ]
+
+        for kind, element in steps:
+            if element is None:
+                continue
+            if kind == "curves":
+                values = interpolate_curves(element, values)
+            elif kind == "clut":
+                values = interpolate_clut(element, values)
+            else:
+                values = self._apply_matrix(values)
+        return values
+
+
+def _decode_text_description(data: bytes) -> str:
+    """Decode a textDescriptionType tag.
+
+    Args:
+        data (bytes): The raw tag data.
+
+    Returns:
+        str: The ASCII description.
+    """
+    (count,) = struct.unpack(">I", data[8:12])
+    return data[12 : 12 + count].decode("latin-1").rstrip("\x00")
+
+
+def _decode_multi_localized_unicode(data: bytes) -> str:
+    """Decode a multiLocalizedUnicodeType tag.
+
+    Args:
+        data (bytes): The raw tag data.
+
+    Returns:
+        str: The first record of the tag.
+    """
+    (record_count,) = struct.unpack(">I", data[8:12])
+    if not record_count:
+        return ""
+    length, offset = struct.unpack(">II", data[20:28])
+    return data[offset : offset + length].decode("utf-16-be").rstrip("\x00")
+
+
+def _decode_xyz(data: bytes) -> np.ndarray:
+    """Decode a XYZType tag.
+
+    Args:
+        data (bytes): The raw tag data.
+
+    Returns:
+        np.ndarray: The (3,) XYZ value or (N, 3) XYZ values if there is more than one.
+    """
+    count = (len(data) - 8) // 12
+    values = s15fixed16(data, count * 3, 8).reshape(count, 3)
+    return values[0] if count == 1 else values
+
+
+TAG_TYPE_DECODERS = {
+    "desc": _decode_text_description,
+    "mluc": _decode_multi_localized_unicode,
+    "text": lambda data: data[8:].decode("latin-1").rstrip("\x00"),
+    "XYZ ": _decode_xyz,
+    "sf32": lambda data: s15fixed16(data, (len(data) - 8) // 4, 8),
+    "curv": Curve.decode,
+    "para": Curve.decode,
+    "mft1": LutTag.decode,
+    "mft2": LutTag.decode,
+    "mAB ": LutABTag.decode,
+    "mBA ": LutABTag.decode,
+}
+
+
+class ICCProfile(object):
+    """A lazily decoded ICC profile.
+
+    The file is memory-mapped, the header and the tag table are parsed immediately
+    and the tags are decoded on first access. close() releases the memory map and
+    its file descriptor, the tags accessed afterwards are read from the file without
+    keeping it open.
+
+    Args:
+        path (Union[str, pathlib.Path]): The path of the ICC/ICM file.
+
+    Raises:
+        TypeError: If the given path is not a str or pathlib.Path instance.
+        RuntimeError: If the given path doesn't exist.
+        ValueError: If the given file is not an ICC profile.
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path]):
+        if not path or not isinstance(path, (str, pathlib.Path)):
+            raise TypeError("Please specify a valid path")
+
+        self.path = pathlib.Path(path).expanduser()
+        if not self.path.exists():
+            raise RuntimeError(f"File does not exist!: {self.path}")
+
+        if self.path.stat().st_size < HEADER_SIZE + 4:
+            raise ValueError(f"Not an ICC profile: {self.path}")
+
+        with open(self.path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = self._buffer[:HEADER_SIZE]
+        if header[36:40] != b"acsp":
+            self.close()
+            raise ValueError(f"Not an ICC profile: {self.path}")
+
+        (
+            self.size,
+            cmm,
+            version,
+            device_class,
+            color_space,
+            pcs,
+        ) = struct.unpack(">I4sI4s4s4s", header[:24])
+        self.cmm = cmm.decode("latin-1").strip("\x00 ")
+        self.version = (
+            f"{version >> 24}.{(version >> 20) & 0xF}.{(version >> 16) & 0xF}"
+        )
+        self.device_class = device_class.decode("latin-1")
+        self.color_space = color_space.decode("latin-1").strip()
+        self.pcs = pcs.decode("latin-1").strip()
+        self.created = self._decode_date_time(header[24:36])
+        self.rendering_intent = struct.unpack(">I", header[64:68])[0]
+        self.illuminant = s15fixed16(header, 3, 68)
+        self.creator = header[80:84].decode("latin-1").strip("\x00 ")
+        self.profile_id = header[84:100].hex()
+
+        self.tags: Dict[str, tuple] = {}
+        (tag_count,) = struct.unpack(">I", self._buffer[HEADER_SIZE : HEADER_SIZE + 4])
+        tag_table = self._buffer[HEADER_SIZE + 4 : HEADER_SIZE + 4 + 12 * tag_count]
+        for i in range(tag_count):
+            signature, offset, size = struct.unpack(
+                ">4sII", tag_table[12 * i : 12 * i + 12]
+            )
+            self.tags[signature.decode("latin-1")] = (offset, size)
+
+        self._decoded_tags = {}
+
+    @classmethod
+    def _decode_date_time(cls, data: bytes) -> Union[None, datetime.datetime]:
+        """Decode a dateTimeNumber.
+
+        Args:
+            data (bytes): The 12 bytes of raw data.
+
+        Returns:
+            Union[None, datetime.datetime]: The date time or None if it is not valid.
+        """
+        try:
+            return datetime.datetime(*struct.unpack(">6H", data))
+        except ValueError:
+            return None
+
+    def close(self):
+        """Close the memory map of the file."""
+        if self._buffer is not None and not self._buffer.closed:
+            self._buffer.close()
+
+    def __enter__(self) -> "ICCProfile":
+        """Enter the context.
+
+        Returns:
+            ICCProfile: This profile.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close the memory map when exiting the context."""
+        self.close()
+
+    def __contains__(self, signature: str) -> bool:
+        """Check if the given tag exists.
+
+        Args:
+            signature (str): The tag signature, i.e. "A2B0".
+
+        Returns:
+            bool: True if the tag exists.
+        """
+        return signature in self.tags
+
+    def __getitem__(self, signature: str):
+        """Return the decoded tag.
+
+        Args:
+            signature (str): The tag signature, i.e. "A2B0".
+
+        Returns:
+            Any: The decoded tag.
+        """
+        return self.get_tag(signature)
+
+    def tag_data(self, signature: str) -> bytes:
+        """Return the raw data of the given tag.
+
+        Args:
+            signature (str): The tag signature, i.e. "A2B0".
+
+        Raises:
+            KeyError: If the tag doesn't exist.
+
+        Returns:
+            bytes: The raw tag data.
+        """
+        offset, size = self.tags[signature]
+        if not self._buffer.closed:
+            return self._buffer[offset : offset + size]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def get_tag(self, signature: str):
+        """Decode and return the given tag.
+
+        The decoded tags are cached, so the tag data is decoded only once. The tags
+        with an unknown type are returned as raw bytes.
+
+        Args:
+            signature (str): The tag signature, i.e. "A2B0".
+
+        Raises:
+            KeyError: If the tag doesn't exist.
+
+        Returns:
+            Any: The decoded tag.
+        """
+        if signature not in self._decoded_tags:
+            data = self.tag_data(signature)
+            decoder = TAG_TYPE_DECODERS.get(data[:4].decode("latin-1"))
+            self._decoded_tags[signature] = decoder(data) if decoder else data
+        return self._decoded_tags[signature]
+
+    @property
+    def is_decoded(self) -> Dict[str, bool]:
+        """Return which tags have been decoded.
+
+        Returns:
+            Dict[str, bool]: The tag signatures and their decoded status.
+        """
+        return {signature: signature in self._decoded_tags for signature in self.tags}
+
+    @property
+    def description(self) -> str:
+        """Return the profile description.
+
+        Returns:
+            str: The profile description, empty if there is no desc tag.
+        """
+        return self.get_tag("desc") if "desc" in self.tags else ""
+
+    @property
+    def copyright(self) -> str:
+        """Return the copyright text.
+
+        Returns:
+            str: The copyright text, empty if there is no cprt tag.
+        """
+        return self.get_tag("cprt") if "cprt" in self.tags else ""
+
+    @property
+    def white_point(self) -> np.ndarray:
+        """Return the media white point.
+
+        Returns:
+            np.ndarray: The media white point XYZ, D50 if the profile doesn't have a
+                wtpt tag.
+        """
+        if "wtpt" not in self.tags:
+            return D50.copy()
+        return self.get_tag("wtpt")
+
+    @property
+    def black_point(self) -> np.ndarray:
+        """Return the media black point.
+
+        Returns:
+            np.ndarray: The media black point XYZ, zeros if the profile doesn't have a
+                bkpt tag.
+        """
+        if "bkpt" not in self.tags:
+            return np.zeros(3)
+        return self.get_tag("bkpt")
+
+    @property
+    def is_matrix_shaper(self) -> bool:
+        """Return True if the profile has the matrix/TRC tags of an RGB profile.
+
+        Returns:
+            bool: True if the profile is a matrix/TRC profile.
+        """
+        return all(
+            signature in self.tags
+            for signature in ["rXYZ", "gXYZ", "bXYZ", "rTRC", "gTRC", "bTRC"]
+        )
+
+    @property
+    def colorants(self) -> np.ndarray:
+        """Return the colorant matrix of a matrix/TRC profile.
+
+        Returns:
+            np.ndarray: The 3x3 matrix, the columns being rXYZ, gXYZ and bXYZ.
+        """
+        return np.stack(
+            [self.get_tag(signature) for signature in ["rXYZ", "gXYZ", "bXYZ"]],
+            axis=1,
+        )
+
+    @property
+    def trc_curves(self) -> List[Curve]:
+        """Return the tone reproduction curves of a matrix/TRC profile.
+
+        Returns:
+            List[Curve]: The rTRC, gTRC and bTRC curves.
+        """
+        return [self.get_tag(signature) for signature in ["rTRC", "gTRC", "bTRC"]]
+
+    def _find_lut(self, prefix: str, intent: int) -> str:
+        """Return the tag signature of the lut for the given intent.
+
+        Falls back to the perceptual (0) table as the ICC specification defines.
+
+        Args:
+            prefix (str): The lut prefix, "A2B" or "B2A".
+            intent (int): The rendering intent.
+
+        Raises:
+            ValueError: If the profile doesn't have a lut with the given prefix.
+
+        Returns:
+            str: The tag signature.
+        """
+        for signature in [f"{prefix}{intent}", f"{prefix}0"]:
+            if signature in self.tags:
+                return signature
+        raise ValueError(f"Profile has no {prefix} table: {self.path}")
+
+    def device_to_pcs(self, values: np.ndarray, intent: int = 0) -> np.ndarray:
+        """Convert the given device values to PCS through the AToB table.
+
+        Args:
+            values (np.ndarray): The (N, channels) device values in 0-1 range.
+            intent (int): The rendering intent, 0: perceptual, 1: relative
+                colorimetric, 2: saturation.
+
+        Raises:
+            ValueError: If the profile doesn't have an AToB table.
+
+        Returns:
+            np.ndarray: The (N, 3) PCS values, L*a*b* if the profile PCS is Lab or XYZ
+                in 0-1 range otherwise.
+        """
+        lut = self.get_tag(self._find_lut("A2B", intent))
+        encoded = lut.evaluate(np.asarray(values, dtype=np.float64))
+        return self.decode_pcs(encoded, lut.type_signature)
+
+    def pcs_to_device(self, values: np.ndarray, intent: int = 0) -> np.ndarray:
+        """Convert the given PCS values to device values through the BToA table.
+
+        Args:
+            values (np.ndarray): The (N, 3) PCS values, L*a*b* if the profile PCS is
+                Lab or XYZ in 0-1 range otherwise.
+            intent (int): The rendering intent, 0: perceptual, 1: relative
+                colorimetric, 2: saturation.
+
+        Raises:
+            ValueError: If the profile doesn't have a BToA table.
+
+        Returns:
+            np.ndarray: The (N, channels) device values in 0-1 range.
+        """
+        lut = self.get_tag(self._find_lut("B2A", intent))
+        encoded = self.encode_pcs(values, lut.type_signature)
+        if isinstance(lut, LutTag):
+            # the lut8/lut16 matrix is only used for the XYZ input
+            return lut.evaluate(encoded, apply_matrix=self.pcs == "XYZ")
+        return lut.evaluate(encoded)
+
+    def _pcs_scale(self, type_signature: str) -> tuple:
+        """Return the scale and offset that decodes the normalized PCS values.
+
+        Args:
+            type_signature (str): The lut type signature.
+
+        Returns:
+            (np.ndarray, np.ndarray): The scale and offset, so that
+                ``pcs = normalized * scale + offset``.
+        """
+        if self.pcs == "Lab":
+            if type_signature == "mft2":
+                # the legacy 16-bit encoding uses 0xFF00 for L*=100 and 0x8000 for 0
+                scale = np.array([100.0 / 65280.0, 1 / 256.0, 1 / 256.0]) * 65535.0
+            else:
+                scale = np.array([100.0, 255.0, 255.0])
+            return scale, np.array([0.0, -128.0, -128.0])
+        # XYZ uses u1Fixed15Number encoding
+        return np.full(3, 65535.0 / 32768.0), np.zeros(3)
+
+    def decode_pcs(self, encoded: np.ndarray, type_signature: str) -> np.ndarray:
+        """Decode the normalized lut output to PCS values.
+
+        Args:
+            encoded (np.ndarray): The (N, 3) lut output in 0-1 range.
+            type_signature (str): The lut type signature.
+
+        Returns:
+            np.ndarray: The (N, 3) L*a*b* or XYZ values.
+        """
+        scale, offset = self._pcs_scale(type_signature)
+        return encoded * scale + offset
+
+    def encode_pcs(self, values: np.ndarray, type_signature: str) -> np.ndarray:
+        """Encode the PCS values to normalized lut input.
+
+        Args:
+            values (np.ndarray): The (N, 3) L*a*b* or XYZ values.
+            type_signature (str): The lut type signature.
+
+        Returns:
+            np.ndarray: The (N, 3) lut input in 0-1 range.
+        """
+        scale, offset = self._pcs_scale(type_signature)
+        return np.clip((np.asarray(values, dtype=np.float64) - offset) / scale, 0, 1)
+
+
+def list_profiles(directory: Union[str, pathlib.Path]) -> Iterator[ICCProfile]:
+    """List the ICC profiles in the given directory.
+
+    Only the headers and the tag tables are read and the files are closed right
+    after, so listing many profiles doesn't keep their files open. The tags are read
+    when they are accessed. The files that are not valid ICC profiles are skipped.
+
+    Args:
+        directory (Union[str, pathlib.Path]): The directory to search.
+
+    Yields:
+        ICCProfile: The profiles sorted by file name.
+    """
+    directory = pathlib.Path(directory).expanduser()
+    if not directory.is_dir():
+        return
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() not in PROFILE_EXTENSIONS or not path.is_file():
+            continue
+        try:
+            profile = ICCProfile(path)
+        except ValueError:
+            logger.debug(f"Skipping invalid ICC profile: {path}")
+            continue
+        profile.close()
+        yield profile
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Reading and writing the images that are color corrected.
+
+TIFF files are read and written with the tiff module. JPEG files and the TIFF
+variants the tiff module doesn't support (LZW, PackBits, tiled etc.) are handled
+with Pillow, which is an optional dependency.
+"""
+
+import pathlib
+from typing import Union
+
+import numpy as np
+
+from icc_generator import tiff
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None
+
+
+TIFF_EXTENSIONS = [".tif", ".tiff"]
+JPEG_EXTENSIONS = [".jpg", ".jpeg"]
+JPEG_QUALITY = 95
+
+
+def _require_pillow(path: pathlib.Path):
+    """Raise RuntimeError if Pillow is not installed.
+
+    Args:
+        path (pathlib.Path): The image path that requires Pillow.
+
+    Raises:
+        RuntimeError: If Pillow is not installed.
+    """
+    if Image is None:
+        raise RuntimeError(f"Pillow is required to read/write {path.name}")
+
+
+def read_image(path: Union[str, pathlib.Path]) -> tuple:
+    """Read the given image.
+
+    Args:
+        path (Union[str, pathlib.Path]): The TIFF or JPEG image path.
+
+    Raises:
+        RuntimeError: If the image needs Pillow and it is not installed.
+
+    Returns:
+        (np.ndarray, Union[None, bytes]): The (height, width, channels) uint8 or uint16
+            pixels and the embedded ICC profile data.
+    """
+    path = pathlib.Path(path)
+    if path.suffix.lower() in TIFF_EXTENSIONS:
+        with tiff.TiffReader(path) as reader:
+            if reader.is_supported:
+                return reader.read(), reader.icc_profile
+
+    _require_pillow(path)
+    with Image.open(path) as image:
+        icc_profile = image.info.get("icc_profile")
+        if image.mode not in ["RGB", "RGBA", "CMYK", "L"]:
+            image = image.convert("RGB")
+        pixels = np.asarray(image)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    return pixels, icc_profile
+
+
+def image_size(path: Union[str, pathlib.Path]) -> tuple:
+    """Return the size of the given image without reading the pixels.
+
+    Args:
+        path (Union[str, pathlib.Path]): The TIFF or JPEG image path.
+
+    Raises:
+        RuntimeError: If the image needs Pillow and it is not installed.
+
+    Returns:
+        (int, int): The width and height of the image.
+    """
+    path = pathlib.Path(path)
+    if path.suffix.lower() in TIFF_EXTENSIONS:
+        with tiff.TiffReader(path) as reader:
+            return reader.width, reader.height
+
+    _require_pillow(path)
+    with Image.open(path) as image:
+        return image.size
+
+
+def write_image(
+    path: Union[str, pathlib.Path],
+    pixels: np.ndarray,
+    icc_profile: Union[None, bytes] = None,
+    compression: str = "none",
+):
+    """Write the given pixels to an image file.
+
+    16-bit pixels are reduced to 8-bit when writing JPEG files.
+
+    Args:
+        path (Union[str, pathlib.Path]): The TIFF or JPEG image path.
+        pixels (np.ndarray): The (height, width, channels) uint8 or uint16 pixels.
+        icc_profile (Union[None, bytes]): The ICC profile data to embed.
+        compression (str): The TIFF compression, "none" (default) or "deflate".
+
+    Raises:
+        RuntimeError: If the image needs Pillow and it is not installed.
+    """
+    path = pathlib.Path(path)
+    height, width, channels = pixels.shape
+    if path.suffix.lower() in TIFF_EXTENSIONS:
+        with tiff.TiffWriter(
+            path,
+            width,
+            height,
+            samples_per_pixel=channels,
+            dtype=pixels.dtype,
+            compression=compression,
+            icc_profile=icc_profile,
+        ) as writer:
+            writer.write(pixels)
+        return
+
+    _require_pillow(path)
+    if pixels.dtype == np.uint16:
+        pixels = (pixels >> 8).astype(np.uint8)
+    mode = {1: "L", 3: "RGB", 4: "CMYK"}[channels]
+    image = Image.frombytes(
+        mode, (width, height), np.ascontiguousarray(pixels).tobytes()
+    )
+    options = {"quality": JPEG_QUALITY}
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    image.save(path, **options)
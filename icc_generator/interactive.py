@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""Run the interactive ArgyllCMS tools in a pseudo terminal.
+
+chartread waits for key presses between the strips, so its output can not be read
+through a pipe without breaking the interaction. The command is run in a pseudo
+terminal instead: the output is echoed to the console as is, the key presses are
+forwarded to the process and the output lines are yielded, so they can be parsed
+into progress events while the operator reads the charts.
+"""
+
+import codecs
+import io
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Callable, List, Union
+
+try:
+    import pty
+    import select
+    import termios
+    import tty
+except ImportError:  # Windows
+    pty = None
+
+from icc_generator import logger, output_capture, run_stats
+
+
+POLL_INTERVAL = 0.1
+READ_SIZE = 4096
+ERROR_LINE_COUNT = 10
+
+LINE_SEPARATOR = re.compile(r"[\r\n]")
+
+STRIP = "strip"
+PATCHES = "patches"
+WARNING = "warning"
+ERROR = "error"
+
+STRIP_PASS_PATTERN = re.compile(r"\b[Ss]trip pass (?P<name>[A-Z]{1,2})\b")
+STRIP_INDEX_PATTERN = re.compile(
+    r"\b[Ss]trip (?:pass )?(?:[A-Z]{1,2} )?\(?(?P<index>\d+) of (?P<total>\d+)\b"
+)
+PATCHES_PATTERN = re.compile(r"\b(?P<count>\d+) patches\b")
+WARNING_PATTERN = re.compile(
+    r"misread|unexpected|wrong strip|not read|failed|try again", re.IGNORECASE
+)
+ERROR_PATTERN = re.compile(r"^\w+: Error\b|^Error\b")
+
+
+def _console_fd() -> Union[None, int]:
+    """Return the file descriptor of the console input.
+
+    The input may be a terminal or a pipe, i.e. the key presses of a script or a
+    supervisor driving the process.
+
+    Returns:
+        Union[None, int]: The file descriptor or None if there is no input to read.
+    """
+    try:
+        return sys.stdin.fileno()
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+def _echo(text: str):
+    """Write the given process output to the console.
+
+    Args:
+        text (str): The output.
+    """
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def run_interactive_process(
+    command: List[str],
+    input_fd: Union[None, int] = None,
+    echo: Callable[[str], None] = _echo,
+    capture: Union[None, output_capture.OutputCapture] = None,
+):
+    """Run the given command in a pseudo terminal and yield its output lines.
+
+    The output is echoed as it arrives, including the prompts that don't end with a
+    new line, and the input is forwarded to the process. Both "\\r" and "\\n" end a
+    line, as the progress of the ArgyllCMS tools is updated in place.
+
+    Args:
+        command (List[str]): The command.
+        input_fd (Union[None, int]): The file descriptor to read the input of the
+            process from. Default is the console input, a terminal is put into raw
+            mode so the single key presses are forwarded, a pipe is forwarded as
+            is.
+        echo (Callable[[str], None]): Called with the output as it arrives. Default
+            writes it to sys.stdout.
+        capture (Union[None, output_capture.OutputCapture]): The capture to write
+            the raw output to, i.e. to log the complete session to a file.
+
+    Raises:
+        RuntimeError: If the command return code is not 0.
+
+    Yields:
+        str: The non-empty output lines.
+    """
+    command = [str(argument) for argument in command]
+    if pty is None:
+        # no pseudo terminals, the process uses the console directly
+        return_code = subprocess.call(command)
+        if return_code:
+            raise RuntimeError(f"{command[0]} exited with return code {return_code}")
+        return
+
+    console_fd = None
+    if input_fd is None:
+        input_fd = console_fd = _console_fd()
+
+    started = time.time()
+    master_fd, slave_fd = pty.openpty()
+    try:
+        process = subprocess.Popen(
+            command, stdin=slave_fd, stdout=slave_fd, stderr=slave_fd, close_fds=True
+        )
+    except BaseException:
+        os.close(master_fd)
+        raise
+    finally:
+        os.close(slave_fd)
+
+    console_attributes = None
+    if console_fd is not None and os.isatty(console_fd):
+        console_attributes = termios.tcgetattr(console_fd)
+        tty.setraw(console_fd)
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    last_lines = []
+    buffer = ""
+    try:
+        while True:
+            fds = [master_fd] if input_fd is None else [master_fd, input_fd]
+            readable, _, _ = select.select(fds, [], [], POLL_INTERVAL)
+
+            if input_fd in readable:
+                data = os.read(input_fd, READ_SIZE)
+                if data:
+                    os.write(master_fd, data)
+                else:
+                    # end of input
+                    input_fd = None
+
+            if master_fd in readable:
+                try:
+                    data = os.read(master_fd, READ_SIZE)
+                except OSError:
+                    # Linux raises EIO when the process closes the terminal
+                    data = b""
+                if not data:
+                    break
+                if capture is not None:
+                    capture.write(data)
+                text = decoder.decode(data)
+                echo(text)
+                *lines, buffer = LINE_SEPARATOR.split(buffer + text)
+                for line in lines:
+                    line = line.strip()
+                    if line:
+                        last_lines = (last_lines + [line])[-ERROR_LINE_COUNT:]
+                        yield line
+
+        line = (buffer + decoder.decode(b"", final=True)).strip()
+        if line:
+            last_lines = (last_lines + [line])[-ERROR_LINE_COUNT:]
+            yield line
+        return_code, rusage = run_stats.wait(process)
+        run_stats.collect(command, started, return_code, rusage)
+    finally:
+        if console_attributes is not None:
+            termios.tcsetattr(console_fd, termios.TCSAFLUSH, console_attributes)
+        os.close(master_fd)
+        if capture is not None:
+            capture.close()
+        if process.poll() is None:
+            # the caller stopped iterating
+            process.terminate()
+            process.wait()
+
+    if return_code:
+        # there is an error
+        raise RuntimeError("\n".join(last_lines))
+
+
+class ChartReadEvent(object):
+    """A progress event parsed from the chartread output.
+
+    Args:
+        kind (str): The kind of the event, one of "strip", "patches", "warning" or
+            "error".
+        line (str): The output line.
+        time (float): The time of the event in seconds since the start of the
+            session.
+        strip (Union[None, str]): The strip pass name, e.g. "A", for strip events.
+        index (Union[None, int]): The strip number, starting from 1, for strip
+            events.
+        total (Union[None, int]): The number of strips, if it is reported.
+        count (Union[None, int]): The number of patches for patches events.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        line: str,
+        time: float = 0.0,
+        strip: Union[None, str] = None,
+        index: Union[None, int] = None,
+        total: Union[None, int] = None,
+        count: Union[None, int] = None,
+    ):
+        self.kind = kind
+        self.line = line
+        self.time = time
+        self.strip = strip
+        self.index = index
+        self.total = total
+        self.count = count
+
+    def to_dict(self) -> dict:
+        """Return the event as a dictionary.
+
+        Returns:
+            dict: The event.
+        """
+        return {
+            "kind": self.kind,
+            "line": self.line,
+            "time": self.time,
+            "strip": self.strip,
+            "index": self.index,
+            "total": self.total,
+            "count": self.count,
+        }
+
+
+def strip_index(name: str) -> int:
+    """Return the number of the given strip pass name.
+
+    Args:
+        name (str): The strip pass name, "A" to "Z" then "AA" to "ZZ".
+
+    Returns:
+        int: The strip number starting from 1.
+    """
+    index = 0
+    for letter in name:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index
+
+
+def parse_chartread_line(line: str, time: float = 0.0) -> Union[None, ChartReadEvent]:
+    """Parse the given chartread output line.
+
+    Args:
+        line (str): The output line.
+        time (float): The time of the line in seconds since the start of the session.
+
+    Returns:
+        Union[None, ChartReadEvent]: The event or None if the line is not a progress
+            line.
+    """
+    if not line:
+        return None
+
+    if ERROR_PATTERN.search(line):
+        return ChartReadEvent(ERROR, line, time)
+
+    if WARNING_PATTERN.search(line):
+        return ChartReadEvent(WARNING, line, time)
+
+    name_match = STRIP_PASS_PATTERN.search(line)
+    index_match = STRIP_INDEX_PATTERN.search(line)
+    if name_match or index_match:
+        event = ChartReadEvent(STRIP, line, time)
+        if name_match:
+            event.strip = name_match.group("name")
+            event.index = strip_index(event.strip)
+        if index_match:
+            event.index = int(index_match.group("index"))
+            event.total = int(index_match.group("total"))
+        return event
+
+    patches_match = PATCHES_PATTERN.search(line)
+    if patches_match:
+        return ChartReadEvent(PATCHES, line, time, count=int(patches_match["count"]))
+
+    return None
+
+
+class ChartReadSession(object):
+    """Collects the progress events of a chartread session.
+
+    Args:
+        on_event (Union[None, Callable[[ChartReadEvent], None]]): Called with every
+            event as it is parsed.
+    """
+
+    def __init__(self, on_event: Union[None, Callable[[ChartReadEvent], None]] = None):
+        self.on_event = on_event
+        self.events = []
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    def add_line(self, line: str) -> Union[None, ChartReadEvent]:
+        """Parse the given output line and record the event.
+
+        Args:
+            line (str): The output line.
+
+        Returns:
+            Union[None, ChartReadEvent]: The event or None if the line is not a
+                progress line.
+        """
+        self.duration = time.perf_counter() - self.start
+        event = parse_chartread_line(line, self.duration)
+        if event is None:
+            return None
+
+        self.events.append(event)
+        if event.kind == STRIP:
+            logger.info(
+                f"Reading strip {event.strip or event.index}"
+                + (f" of {event.total}" if event.total else "")
+            )
+        elif event.kind in [WARNING, ERROR]:
+            logger.warning(event.line)
+
+        if self.on_event is not None:
+            self.on_event(event)
+        return event
+
+    def finish(self):
+        """Mark the end of the session."""
+        self.duration = time.perf_counter() - self.start
+
+    def _events(self, kind: str) -> List[ChartReadEvent]:
+        """Return the events of the given kind.
+
+        Args:
+            kind (str): The event kind.
+
+        Returns:
+            List[ChartReadEvent]: The events.
+        """
+        return [event for event in self.events if event.kind == kind]
+
+    @property
+    def strips(self) -> int:
+        """Return the number of strips started in the session.
+
+        Returns:
+            int: The number of distinct strips.
+        """
+        return len({event.index for event in self._events(STRIP)})
+
+    @property
+    def total_strips(self) -> Union[None, int]:
+        """Return the number of strips in the chart if it is reported.
+
+        Returns:
+            Union[None, int]: The number of strips.
+        """
+        totals = [event.total for event in self._events(STRIP) if event.total]
+        return totals[-1] if totals else None
+
+    @property
+    def patches(self) -> Union[None, int]:
+        """Return the last reported patch count.
+
+        Returns:
+            Union[None, int]: The patch count.
+        """
+        events = self._events(PATCHES)
+        return events[-1].count if events else None
+
+    @property
+    def warnings(self) -> List[str]:
+        """Return the misread warnings.
+
+        Returns:
+            List[str]: The warning lines.
+        """
+        return [event.line for event in self._events(WARNING)]
+
+    @property
+    def errors(self) -> List[str]:
+        """Return the error lines.
+
+        Returns:
+            List[str]: The error lines.
+        """
+        return [event.line for event in self._events(ERROR)]
+
+    @property
+    def strips_per_minute(self) -> float:
+        """Return the reading throughput.
+
+        Returns:
+            float: The number of strips read per minute.
+        """
+        if not self.duration:
+            return 0.0
+        return self.strips * 60.0 / self.duration
+
+    def to_dict(self) -> dict:
+        """Return the session summary as a dictionary.
+
+        Returns:
+            dict: The summary.
+        """
+        return {
+            "strips": self.strips,
+            "total_strips": self.total_strips,
+            "patches": self.patches,
+            "warnings": self.warnings,
+            "errors": self.errors,
+            "duration": self.duration,
+            "strips_per_minute": self.strips_per_minute,
+        }
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""Patch layout of the printed charts.
+
+The number of patches that fit on a page is computed from the page size, the page
+margins, the strip geometry of the instrument reading the charts and the resolution
+of the chart images, so any paper size, including the custom cut sheets and rolls,
+is packed with as many patches as printtarg can place on it.
+
+The patches are printed in strips that are read in one pass by the instrument. Every
+strip has some unprinted length at its ends where the instrument starts and stops
+moving, and the chart label takes some space across the strips. The strips are laid
+out along the width or the height of the page, whichever fits more patches. The
+instrument geometries are fitted to the charts printtarg generates for the A4 and
+A3 pages with 2 mm margins at 300 DPI.
+
+The geometry model is only an estimate for the custom paper sizes. The library paper
+sizes keep the patch counts in LIBRARY_PATCH_COUNTS, which printtarg is known to fit
+on a single page, so their charts are never split over more pages than expected.
+"""
+
+import functools
+import math
+from typing import List, Union
+
+from icc_generator import logger
+
+
+DEFAULT_MARGIN = 2
+DEFAULT_DPI = 300
+
+MM_PER_INCH = 25.4
+
+# tolerance of the floating point errors when dividing the lengths
+EPSILON = 1e-6
+
+
+class Instrument(object):
+    """The strip geometry of a chart reading instrument.
+
+    All the lengths are in millimeters.
+
+    Args:
+        name (str): The printtarg instrument name.
+        printtarg_arguments (List[str]): The printtarg arguments selecting the
+            instrument and its patch size.
+        patch_length (float): The length of a patch along the strip.
+        strip_pitch (float): The distance between the neighbouring strips.
+        strip_lead (float): The unprinted length at the ends of every strip.
+        header (float): The space taken by the chart label across the strips.
+        reserved_patches (int): The patch positions of every page that are not
+            used for the measurement patches.
+        strip_width (float): The printed width of the strips, default is the strip
+            pitch.
+        target_instrument (str): The instrument name written in the .ti2 files.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        printtarg_arguments: List[str],
+        patch_length: float,
+        strip_pitch: float,
+        strip_lead: float = 0.0,
+        header: float = 0.0,
+        reserved_patches: int = 0,
+        strip_width: Union[None, float] = None,
+        target_instrument: str = "",
+    ):
+        self.name = name
+        self.printtarg_arguments = printtarg_arguments
+        self.patch_length = patch_length
+        self.strip_pitch = strip_pitch
+        self.strip_lead = strip_lead
+        self.header = header
+        self.reserved_patches = reserved_patches
+        self.strip_width = strip_pitch if strip_width is None else strip_width
+        self.target_instrument = target_instrument
+
+    def __repr__(self) -> str:
+        """Return the representation of the instrument.
+
+        Returns:
+            str: The representation.
+        """
+        return f"Instrument({self.name!r})"
+
+
+# i1Pro strips with the patches scaled to 7 x 8.75 mm
+I1PRO = Instrument(
+    "i1",
+    ["-ii1", "-a 0.875"],
+    patch_length=7.0,
+    strip_pitch=11.75,
+    strip_lead=8.0,
+    header=10.0,
+    strip_width=8.75,
+    target_instrument="GretagMacbeth i1 Pro",
+)
+
+# ColorMunki strips in the high density mode with no limit on the strip length
+COLORMUNKI = Instrument(
+    "CM",
+    ["-iCM", "-h", "-P"],
+    patch_length=9.25,
+    strip_pitch=24.0,
+    strip_lead=36.0,
+    header=10.0,
+    reserved_patches=6,
+    target_instrument="X-Rite ColorMunki",
+)
+
+INSTRUMENTS = {instrument.name: instrument for instrument in [I1PRO, COLORMUNKI]}
+
+# the patches per page of the library paper sizes by instrument
+LIBRARY_PATCH_COUNTS = {
+    "4x6": {"i1": 166, "CM": 52},
+    "11x17": {"i1": 1299, "CM": 406},
+    "A2": {"i1": 2784, "CM": 890},
+    "A3": {"i1": 1392, "CM": 445},
+    "A3R": {"i1": 1392, "CM": 445},
+    "A4": {"i1": 672, "CM": 210},
+    "A4R": {"i1": 672, "CM": 210},
+    "Legal": {"i1": 827, "CM": 258},
+    "Letter": {"i1": 649, "CM": 203},
+    "LetterR": {"i1": 649, "CM": 203},
+}
+
+
+def snap_to_pixels(length: float, dpi: int) -> float:
+    """Return the given length rounded to the whole pixels of the chart image.
+
+    Args:
+        length (float): The length in millimeters.
+        dpi (int): The resolution of the chart image.
+
+    Returns:
+        float: The rounded length in millimeters.
+    """
+    return round(length / MM_PER_INCH * dpi) * MM_PER_INCH / dpi
+
+
+class PageLayout(object):
+    """The strips and the patches of a chart page.
+
+    Args:
+        instrument (Instrument): The instrument.
+        strip_count (int): The number of strips.
+        strip_length (int): The number of patches in a strip.
+        along_width (bool): True if the strips are laid out along the page width.
+        patch_count (Union[None, int]): The number of measurement patches on the
+            page, default is the number of the patch positions that are not
+            reserved.
+    """
+
+    def __init__(
+        self,
+        instrument: Instrument,
+        strip_count: int,
+        strip_length: int,
+        along_width: bool,
+        patch_count: Union[None, int] = None,
+    ):
+        self.instrument = instrument
+        self.strip_count = strip_count
+        self.strip_length = strip_length
+        self.along_width = along_width
+        self._patch_count = patch_count
+
+    @property
+    def capacity(self) -> int:
+        """Return the number of patch positions on the page that are not reserved.
+
+        Returns:
+            int: The patch positions.
+        """
+        return max(
+            self.strip_count * self.strip_length - self.instrument.reserved_patches,
+            0,
+        )
+
+    @property
+    def patch_count(self) -> int:
+        """Return the number of measurement patches on the page.
+
+        Returns:
+            int: The patch count.
+        """
+        if self._patch_count is not None:
+            return self._patch_count
+        return self.capacity
+
+    def with_patch_count(self, patch_count: int) -> "PageLayout":
+        """Return a copy of this layout with the given number of patches per page.
+
+        Args:
+            patch_count (int): The patches per page.
+
+        Raises:
+            ValueError: If the patches don't fit on the page.
+
+        Returns:
+            PageLayout: The copy.
+        """
+        if patch_count > self.capacity:
+            raise ValueError(
+                f"patch_count should be at most {self.capacity} for the "
+                f"{self.instrument.name} strips on the page, not {patch_count}"
+            )
+        return PageLayout(
+            self.instrument,
+            self.strip_count,
+            self.strip_length,
+            self.along_width,
+            patch_count=patch_count,
+        )
+
+    def to_dict(self) -> dict:
+        """Return the layout as a dictionary.
+
+        Returns:
+            dict: The layout.
+        """
+        return {
+            "instrument": self.instrument.name,
+            "strip_count": self.strip_count,
+            "strip_length": self.strip_length,
+            "along_width": self.along_width,
+            "patch_count": self.patch_count,
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def page_layout(
+    width: float,
+    height: float,
+    instrument: Union[str, Instrument],
+    margin: float = DEFAULT_MARGIN,
+    dpi: int = DEFAULT_DPI,
+) -> PageLayout:
+    """Return the layout packing the most patches on the given page.
+
+    The results are memoized, so the same page is laid out once.
+
+    Args:
+        width (float): The page width in millimeters.
+        height (float): The page height in millimeters.
+        instrument (Union[str, Instrument]): The instrument or its printtarg name,
+            "i1" or "CM".
+        margin (float): The page margins in millimeters.
+        dpi (int): The resolution of the chart image.
+
+    Raises:
+        TypeError: If instrument is not a str or Instrument.
+        ValueError: If there is no instrument with the given name, or margin or dpi
+            is not positive.
+
+    Returns:
+        PageLayout: The layout, with no strips if the page is too small.
+    """
+    if isinstance(instrument, str):
+        if instrument not in INSTRUMENTS:
+            names = list(INSTRUMENTS)
+            raise ValueError(
+                f"instrument should be one of {', '.join(names[:-1])} or "
+                f"{names[-1]}, not {instrument}"
+            )
+        instrument = INSTRUMENTS[instrument]
+    if not isinstance(instrument, Instrument):
+        raise TypeError(
+            "instrument should be a str or Instrument, "
+            f"not {instrument.__class__.__name__}"
+        )
+    if margin < 0:
+        raise ValueError(f"margin should be a positive number, not {margin}")
+    if dpi <= 0:
+        raise ValueError(f"dpi should be a positive integer, not {dpi}")
+
+    patch_length = snap_to_pixels(instrument.patch_length, dpi)
+    strip_pitch = snap_to_pixels(instrument.strip_pitch, dpi)
+
+    layouts = []
+    for along_width, length, across in [(True, width, height), (False, height, width)]:
+        strip_length = math.floor(
+            (length - 2 * margin - instrument.strip_lead) / patch_length + EPSILON
+        )
+        strip_count = math.floor(
+            (across - 2 * margin - instrument.header) / strip_pitch + EPSILON
+        )
+        layouts.append(
+            PageLayout(
+                instrument, max(strip_count, 0), max(strip_length, 0), along_width
+            )
+        )
+
+    layout = max(layouts, key=lambda layout: layout.patch_count)
+    logger.debug(
+        f"{width}x{height} mm page layout for {instrument.name}: "
+        f"{layout.strip_count} strips of {layout.strip_length} patches"
+    )
+    return layout
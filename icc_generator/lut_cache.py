@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache of the device link lookup tables.
+
+Building the device link of an image profile and a printer profile is the most costly
+part of a color correction. The tables are stored as .npy files keyed by the content
+hashes of both profiles, the rendering intent and the grid size, so any process
+correcting images with the same profile pair can load the table instead of building
+it again.
+
+The least recently used tables are removed when the total size of the cache exceeds
+the size budget. The modification time of the files is used to track the use, as the
+access time is not reliable on most file systems.
+"""
+
+import hashlib
+import os
+import pathlib
+import uuid
+from typing import Union
+
+import numpy as np
+
+from icc_generator import logger
+
+
+DEFAULT_CACHE_PATH = "~/.cache/ICCGenerator/luts"
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_hash(path: Union[str, pathlib.Path]) -> str:
+    """Return the SHA-256 hash of the given file content.
+
+    Args:
+        path (Union[str, pathlib.Path]): The file path.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LUTCache(object):
+    """A size limited, least recently used on-disk cache of lookup tables.
+
+    Args:
+        path (Union[None, str, pathlib.Path]): The cache directory, default is
+            ~/.cache/ICCGenerator/luts. The directory is created on first write.
+        max_size (int): The maximum total size of the cached tables in bytes.
+
+    Raises:
+        TypeError: If max_size is not an int.
+        ValueError: If max_size is negative.
+    """
+
+    def __init__(
+        self,
+        path: Union[None, str, pathlib.Path] = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        if not isinstance(max_size, int):
+            raise TypeError(
+                f"max_size should be an int, not {max_size.__class__.__name__}"
+            )
+        if max_size < 0:
+            raise ValueError(f"max_size should be a positive integer, not {max_size}")
+
+        self.path = pathlib.Path(path or DEFAULT_CACHE_PATH).expanduser()
+        self.max_size = max_size
+
+    @classmethod
+    def key(
+        cls,
+        source_profile_path: Union[str, pathlib.Path],
+        destination_profile_path: Union[str, pathlib.Path],
+        intent: str,
+        grid_points: int,
+    ) -> str:
+        """Return the cache key of the given transform.
+
+        Args:
+            source_profile_path (Union[str, pathlib.Path]): The source profile path.
+            destination_profile_path (Union[str, pathlib.Path]): The destination
+                profile path.
+            intent (str): The rendering intent letter.
+            grid_points (int): The number of grid points per channel.
+
+        Returns:
+            str: The key.
+        """
+        return hashlib.sha256(
+            ":".join(
+                [
+                    file_hash(source_profile_path),
+                    file_hash(destination_profile_path),
+                    intent,
+                    str(grid_points),
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def _entry_path(self, key: str) -> pathlib.Path:
+        """Return the path of the given entry.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            pathlib.Path: The .npy file path.
+        """
+        return self.path / f"{key}.npy"
+
+    def __contains__(self, key: str) -> bool:
+        """Check if the given key is cached.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            bool: True if the key is cached.
+        """
+        return self._entry_path(key).exists()
+
+    def get(self, key: str) -> Union[None, np.ndarray]:
+        """Return the cached table and mark it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Union[None, np.ndarray]: The table or None if it is not cached or the
+                cached file is not readable.
+        """
+        path = self._entry_path(key)
+        try:
+            lut = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.debug(f"Skipping invalid LUT cache entry: {path}")
+            return None
+        return lut
+
+    def put(self, key: str, lut: np.ndarray):
+        """Store the given table and evict the least recently used ones if needed.
+
+        The file is written to a temporary file first and then renamed, so the other
+        processes never read a partially written table. The temporary file is
+        removed if the table can't be stored.
+
+        Args:
+            key (str): The cache key.
+            lut (np.ndarray): The table.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path / f".{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.save(f, lut, allow_pickle=False)
+            os.replace(temp_path, self._entry_path(key))
+        except BaseException:
+            # i.e. the disk is full or the write is interrupted
+            temp_path.unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def entries(self) -> list:
+        """Return the cached entries, the least recently used first.
+
+        Returns:
+            list: The (path, size, modification time) of the entries.
+        """
+        entries = []
+        if not self.path.is_dir():
+            return entries
+        for path in self.path.glob("*.npy"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # removed by another process
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    @property
+    def size(self) -> int:
+        """Return the total size of the cached tables.
+
+        Returns:
+            int: The size in bytes.
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove the least recently used tables until the cache fits the budget."""
+        entries = self.entries()
+        total_size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total_size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+    def clear(self):
+        """Remove all the cached tables."""
+        for path, _, _ in self.entries():
+            path.unlink(missing_ok=True)
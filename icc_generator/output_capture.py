@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Bounded capture of the external process output.
+
+colprof in verbose mode and long chartread sessions write a lot of output. The
+output is read in large chunks and only the last part of it is kept in memory, in
+a ring buffer, to report the errors. The complete output can be spilled to a log
+file instead. The lines are decoded only when they are consumed, so the memory use
+stays constant however long the process runs.
+"""
+
+import os
+import pathlib
+import re
+from typing import BinaryIO, Iterator, Union
+
+
+DEFAULT_LIMIT = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+LINE_SEPARATOR = re.compile(rb"\r\n|[\r\n]")
+
+
+class OutputCapture(object):
+    """Keeps the last bytes of the process output.
+
+    Args:
+        limit (int): The number of bytes to keep, default is 64 KB.
+        log_path (Union[None, str, pathlib.Path]): The file to write the complete
+            output to, the directory is created if it doesn't exist.
+
+    Raises:
+        TypeError: If limit is not an int.
+        ValueError: If limit is not positive.
+    """
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_LIMIT,
+        log_path: Union[None, str, pathlib.Path] = None,
+    ):
+        if not isinstance(limit, int):
+            raise TypeError(f"limit should be an int, not {limit.__class__.__name__}")
+        if limit < 1:
+            raise ValueError(f"limit should be a positive integer, not {limit}")
+
+        self.limit = limit
+        self.log_path = None if log_path is None else pathlib.Path(log_path)
+        self.size = 0
+        self._buffer = bytearray()
+        self._log_file = None
+
+    def __enter__(self) -> "OutputCapture":
+        """Enter the context.
+
+        Returns:
+            OutputCapture: This capture.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close the log file when exiting the context."""
+        self.close()
+
+    @property
+    def truncated(self) -> bool:
+        """Return True if the start of the output is dropped.
+
+        Returns:
+            bool: True if more than the limit is written.
+        """
+        return self.size > self.limit
+
+    def write(self, data: bytes):
+        """Capture the given output.
+
+        Args:
+            data (bytes): The output.
+        """
+        self.size += len(data)
+        if self.log_path is not None:
+            if self._log_file is None:
+                os.makedirs(self.log_path.parent, exist_ok=True)
+                self._log_file = open(self.log_path, "wb")
+            self._log_file.write(data)
+
+        if len(data) >= self.limit:
+            self._buffer[:] = data[-self.limit :]
+        else:
+            self._buffer += data
+            overflow = len(self._buffer) - self.limit
+            if overflow > 0:
+                del self._buffer[:overflow]
+
+    def tail(self) -> str:
+        """Return the kept output.
+
+        The partial first line is dropped if the output is truncated.
+
+        Returns:
+            str: The last lines of the output, stripped.
+        """
+        data = bytes(self._buffer)
+        if self.truncated:
+            data = data.partition(b"\n")[2]
+        lines = data.decode("utf-8", errors="replace").splitlines()
+        return "\n".join(line.strip() for line in lines)
+
+    def close(self):
+        """Close the log file."""
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+
+def read_lines(
+    stream: BinaryIO, capture: OutputCapture, chunk_size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    """Read the given stream in chunks and yield its lines.
+
+    The lines are split on "\\n", "\\r\\n" and "\\r", so the progress output that
+    rewrites the same line with "\\r" doesn't pile up in memory.
+
+    Args:
+        stream (BinaryIO): The output stream of the process.
+        capture (OutputCapture): The capture to write the output to.
+        chunk_size (int): The maximum number of bytes to read at once.
+
+    Yields:
+        str: The lines, stripped.
+    """
+    fd = stream.fileno()
+    pending = b""
+    while True:
+        data = os.read(fd, chunk_size)
+        if not data:
+            break
+        capture.write(data)
+        data = pending + data
+        carriage_return = b""
+        if data.endswith(b"\r"):
+            # keep it until the next chunk, it may be a "\r\n"
+            data, carriage_return = data[:-1], b"\r"
+        *lines, pending = LINE_SEPARATOR.split(data)
+        pending += carriage_return
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").strip()
+    if pending:
+        yield pending.decode("utf-8", errors="replace").strip()
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""Incremental profiling pipeline.
+
+Runs the stages of an ICCGenerator like ``make``: the command, the ArgyllCMS tool
+version and the content hashes of the inputs and the outputs of every stage are
+recorded in a manifest next to the outputs, and a stage is only run again if any of
+them has changed since its last successful run.
+"""
+
+import functools
+import json
+import os
+import pathlib
+import re
+import subprocess
+import uuid
+from typing import Callable, List, Union
+
+from icc_generator import logger, transform
+from icc_generator.api import ICCGenerator
+from icc_generator.lut_cache import file_hash
+
+
+VERSION_PATTERN = re.compile(r"\bVersion (\S+)")
+VERSION_TIMEOUT = 10
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version(tool: str) -> Union[None, str]:
+    """Return the version of the given ArgyllCMS tool.
+
+    The version is read from the usage message of the tool.
+
+    Args:
+        tool (str): The tool name, e.g. "colprof".
+
+    Returns:
+        Union[None, str]: The version or None if the tool can't be run or doesn't
+            report a version.
+    """
+    try:
+        result = subprocess.run(
+            [tool, "-?"], capture_output=True, timeout=VERSION_TIMEOUT
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    output = (result.stdout + result.stderr).decode("utf-8", errors="replace")
+    match = VERSION_PATTERN.search(output)
+    return match.group(1) if match else None
+
+
+class Stage(object):
+    """A stage of the pipeline.
+
+    Args:
+        name (str): The stage name.
+        run (Callable[[ICCGenerator], None]): Runs the stage.
+        command (Callable[[ICCGenerator], List[str]]): Returns the command.
+        inputs (Callable[[ICCGenerator], List[pathlib.Path]]): Returns the input
+            files.
+        outputs (Callable[[ICCGenerator], List[pathlib.Path]]): Returns the output
+            files.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[ICCGenerator], None],
+        command: Callable[[ICCGenerator], List[str]],
+        inputs: Callable[[ICCGenerator], List[pathlib.Path]],
+        outputs: Callable[[ICCGenerator], List[pathlib.Path]],
+    ):
+        self.name = name
+        self.run = run
+        self.command = command
+        self.inputs = inputs
+        self.outputs = outputs
+
+
+def _target_inputs(icc_generator: ICCGenerator) -> List[pathlib.Path]:
+    """Return the input files of the target stage.
+
+    Args:
+        icc_generator (ICCGenerator): The ICCGenerator.
+
+    Returns:
+        List[pathlib.Path]: The precondition profile if there is one.
+    """
+    if icc_generator.precondition_profile_path:
+        return [pathlib.Path(icc_generator.precondition_profile_path)]
+    return []
+
+
+def _tif_outputs(icc_generator: ICCGenerator) -> List[pathlib.Path]:
+    """Return the output files of the tif stage.
+
+    Args:
+        icc_generator (ICCGenerator): The ICCGenerator.
+
+    Returns:
+        List[pathlib.Path]: The ti2 file and the tif files.
+    """
+    icc_generator.update_tif_files()
+    return [
+        pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti2")
+    ] + icc_generator.tif_files
+
+
+STAGES = [
+    Stage(
+        "target",
+        lambda icc_generator: icc_generator.generate_target(),
+        lambda icc_generator: icc_generator.generate_target_command(),
+        _target_inputs,
+        lambda icc_generator: [
+            pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti1")
+        ],
+    ),
+    Stage(
+        "tif",
+        lambda icc_generator: icc_generator.generate_tif(),
+        lambda icc_generator: icc_generator.generate_tif_command(),
+        lambda icc_generator: [
+            pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti1")
+        ],
+        _tif_outputs,
+    ),
+    Stage(
+        "profile",
+        lambda icc_generator: icc_generator.generate_profile(),
+        lambda icc_generator: icc_generator.generate_profile_command(),
+        lambda icc_generator: [
+            pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti3"),
+            transform.get_image_profile_path("AdobeRGB"),
+        ],
+        lambda icc_generator: [pathlib.Path(icc_generator.check_profile_paths()[1])],
+    ),
+]
+STAGE_NAMES = [stage.name for stage in STAGES]
+
+
+def _hash_files(paths: List[pathlib.Path]) -> dict:
+    """Return the content hashes of the given files.
+
+    Args:
+        paths (List[pathlib.Path]): The file paths.
+
+    Returns:
+        dict: The hashes by the file paths, None for the missing files.
+    """
+    return {str(path): file_hash(path) if path.exists() else None for path in paths}
+
+
+class Pipeline(object):
+    """Runs the stages of an ICCGenerator only if their outputs are out of date.
+
+    Args:
+        icc_generator (ICCGenerator): The ICCGenerator.
+        manifest_path (Union[None, str, pathlib.Path]): The manifest file path,
+            default is the profile path with the profile name and ".pipeline.json"
+            extension.
+
+    Raises:
+        TypeError: If icc_generator is not an ICCGenerator.
+    """
+
+    def __init__(
+        self,
+        icc_generator: ICCGenerator,
+        manifest_path: Union[None, str, pathlib.Path] = None,
+    ):
+        if not isinstance(icc_generator, ICCGenerator):
+            raise TypeError(
+                "icc_generator should be an ICCGenerator, "
+                f"not {icc_generator.__class__.__name__}"
+            )
+        if manifest_path is not None:
+            manifest_path = pathlib.Path(manifest_path)
+        self.icc_generator = icc_generator
+        self._manifest_path = manifest_path
+
+    @property
+    def manifest_path(self) -> pathlib.Path:
+        """Return the manifest file path.
+
+        Returns:
+            pathlib.Path: The manifest file path.
+        """
+        if self._manifest_path is not None:
+            return self._manifest_path
+        return pathlib.Path(
+            f"{self.icc_generator.profile_absolute_full_path}.pipeline.json"
+        )
+
+    def load_manifest(self) -> dict:
+        """Return the recorded stages.
+
+        Returns:
+            dict: The records by the stage names, empty if there is no manifest.
+        """
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(f"Ignoring invalid pipeline manifest: {self.manifest_path}")
+            return {}
+
+    def _save_manifest(self, manifest: dict):
+        """Save the given records to the manifest file.
+
+        Args:
+            manifest (dict): The records by the stage names.
+        """
+        os.makedirs(self.manifest_path.parent, exist_ok=True)
+        temp_path = self.manifest_path.with_name(
+            f".{self.manifest_path.name}.{uuid.uuid4().hex}.tmp"
+        )
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(temp_path, self.manifest_path)
+
+    @classmethod
+    def get_stage(cls, name: str) -> Stage:
+        """Return the stage with the given name.
+
+        Args:
+            name (str): The stage name.
+
+        Raises:
+            TypeError: If name is not a str.
+            ValueError: If there is no stage with the given name.
+
+        Returns:
+            Stage: The stage.
+        """
+        if not isinstance(name, str):
+            raise TypeError(f"stage should be a str, not {name.__class__.__name__}")
+
+        for stage in STAGES:
+            if stage.name == name:
+                return stage
+
+        raise ValueError(
+            f"stage should be one of {', '.join(STAGE_NAMES[:-1])} or "
+            f"{STAGE_NAMES[-1]}, not {name}"
+        )
+
+    def _record(self, stage: Stage) -> dict:
+        """Return the current inputs of the given stage.
+
+        Args:
+            stage (Stage): The stage.
+
+        Returns:
+            dict: The command, the tool version and the input file hashes.
+        """
+        command = [str(argument) for argument in stage.command(self.icc_generator)]
+        return {
+            "command": command,
+            "tool_version": tool_version(command[0]),
+            "inputs": _hash_files(stage.inputs(self.icc_generator)),
+        }
+
+    def is_up_to_date(self, name: str) -> bool:
+        """Check if the outputs of the given stage are up to date.
+
+        Args:
+            name (str): The stage name.
+
+        Returns:
+            bool: True if the stage ran successfully before with the same inputs and
+                its outputs are not changed since.
+        """
+        stage = self.get_stage(name)
+        recorded = self.load_manifest().get(name)
+        if not recorded:
+            return False
+
+        current = self._record(stage)
+        if any(recorded.get(key) != value for key, value in current.items()):
+            return False
+
+        outputs = _hash_files(stage.outputs(self.icc_generator))
+        return None not in outputs.values() and recorded.get("outputs") == outputs
+
+    def outdated(self) -> List[str]:
+        """Return the names of the stages that are not up to date.
+
+        Returns:
+            List[str]: The stage names in the run order.
+        """
+        return [name for name in STAGE_NAMES if not self.is_up_to_date(name)]
+
+    def run(self, name: str, force: bool = False) -> bool:
+        """Run the given stage if its outputs are not up to date.
+
+        Args:
+            name (str): The stage name.
+            force (bool): Run the stage even if its outputs are up to date.
+
+        Raises:
+            RuntimeError: If an input or an output of the stage doesn't exist.
+
+        Returns:
+            bool: True if the stage is run, False if it is skipped.
+        """
+        stage = self.get_stage(name)
+        if not force and self.is_up_to_date(name):
+            logger.info(f"Skipping {name}, the outputs are up to date")
+            return False
+
+        record = self._record(stage)
+        for path, digest in record["inputs"].items():
+            if digest is None:
+                raise RuntimeError(f"File does not exist!: {path}")
+
+        # forget the last run, the outputs are overwritten from now on
+        manifest = self.load_manifest()
+        if manifest.pop(name, None) is not None:
+            self._save_manifest(manifest)
+
+        stage.run(self.icc_generator)
+
+        record["outputs"] = _hash_files(stage.outputs(self.icc_generator))
+        for path, digest in record["outputs"].items():
+            if digest is None:
+                raise RuntimeError(f"File does not exist!: {path}")
+
+        manifest = self.load_manifest()
+        manifest[name] = record
+        self._save_manifest(manifest)
+        return True
+
+    def run_all(
+        self, names: Union[None, List[str]] = None, force: bool = False
+    ) -> List[str]:
+        """Run the given stages in order, skipping the ones that are up to date.
+
+        Args:
+            names (Union[None, List[str]]): The stage names, default is all the
+                stages.
+            force (bool): Run the stages even if their outputs are up to date.
+
+        Returns:
+            List[str]: The names of the stages that are run.
+        """
+        if names is None:
+            names = STAGE_NAMES
+        return [name for name in names if self.run(name, force=force)]
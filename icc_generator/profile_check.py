@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""In process replacement of ArgyllCMS ``profcheck``.
+
+Runs all the device values of a .ti3 file through the A2B table of the profile as one
+batch and compares the result with the measured values by using CIEDE2000.
+"""
+
+import pathlib
+from typing import List, Union
+
+import numpy as np
+
+from icc_generator.cgats import CGATS, CGATSTable, COLUMN_GROUPS
+from icc_generator.colorimetry import D50, delta_e_2000, lab_to_xyz, xyz_to_lab
+from icc_generator.icc import ICCProfile
+
+
+class ProfileCheckReport(object):
+    """The result of a profile check.
+
+    Args:
+        sample_ids (np.ndarray): The (N,) sample ids.
+        device_values (np.ndarray): The (N, channels) device values in 0-100 range.
+        measured_lab (np.ndarray): The (N, 3) measured L*a*b* values.
+        predicted_lab (np.ndarray): The (N, 3) L*a*b* values predicted by the profile.
+    """
+
+    def __init__(
+        self,
+        sample_ids: np.ndarray,
+        device_values: np.ndarray,
+        measured_lab: np.ndarray,
+        predicted_lab: np.ndarray,
+    ):
+        self.sample_ids = sample_ids
+        self.device_values = device_values
+        self.measured_lab = measured_lab
+        self.predicted_lab = predicted_lab
+        self.delta_e = delta_e_2000(measured_lab, predicted_lab)
+
+    def __len__(self) -> int:
+        """Return the number of patches.
+
+        Returns:
+            int: The number of patches.
+        """
+        return len(self.delta_e)
+
+    @property
+    def average(self) -> float:
+        """Return the average dE.
+
+        Returns:
+            float: The average dE.
+        """
+        return float(np.mean(self.delta_e))
+
+    @property
+    def maximum(self) -> float:
+        """Return the maximum dE.
+
+        Returns:
+            float: The maximum dE.
+        """
+        return float(np.max(self.delta_e))
+
+    @property
+    def percentile_95(self) -> float:
+        """Return the 95th percentile of dE.
+
+        Returns:
+            float: The 95th percentile dE.
+        """
+        return float(np.percentile(self.delta_e, 95))
+
+    @property
+    def rms(self) -> float:
+        """Return the RMS dE.
+
+        Returns:
+            float: The RMS dE.
+        """
+        return float(np.sqrt(np.mean(self.delta_e**2)))
+
+    @property
+    def sorted_indices(self) -> np.ndarray:
+        """Return the patch indices sorted by dE, the worst patch being the first.
+
+        Returns:
+            np.ndarray: The sorted indices.
+        """
+        return np.argsort(-self.delta_e, kind="stable")
+
+    def patch(self, index: int) -> dict:
+        """Return the details of the patch with the given index.
+
+        Args:
+            index (int): The patch index.
+
+        Returns:
+            dict: The patch details.
+        """
+        return {
+            "sample_id": self.sample_ids[index].item(),
+            "device_values": self.device_values[index].tolist(),
+            "measured_lab": self.measured_lab[index].tolist(),
+            "predicted_lab": self.predicted_lab[index].tolist(),
+            "delta_e": float(self.delta_e[index]),
+        }
+
+    def worst_patches(self, count: int = 10) -> List[dict]:
+        """Return the worst patches.
+
+        Args:
+            count (int): The number of patches to return.
+
+        Returns:
+            List[dict]: The patch details, sorted by dE in descending order.
+        """
+        return [self.patch(i) for i in self.sorted_indices[:count]]
+
+    def to_dict(self, worst_patch_count: int = 10) -> dict:
+        """Return the summary of the report.
+
+        Args:
+            worst_patch_count (int): The number of worst patches to include.
+
+        Returns:
+            dict: The report summary.
+        """
+        return {
+            "patch_count": len(self),
+            "average": self.average,
+            "maximum": self.maximum,
+            "percentile_95": self.percentile_95,
+            "rms": self.rms,
+            "worst_patches": self.worst_patches(worst_patch_count),
+        }
+
+    def format(self, sort_by_de: bool = False) -> str:
+        """Return the report in a format similar to ``profcheck -v2`` output.
+
+        Args:
+            sort_by_de (bool): Sort by dE value or not. Default is False.
+
+        Returns:
+            str: The formatted report.
+        """
+        indices = self.sorted_indices if sort_by_de else range(len(self))
+        lines = []
+        for i in indices:
+            device = " ".join(f"{v:.4f}" for v in self.device_values[i] / 100.0)
+            predicted = " ".join(f"{v:.6f}" for v in self.predicted_lab[i])
+            measured = " ".join(f"{v:.6f}" for v in self.measured_lab[i])
+            lines.append(
+                f"[{self.delta_e[i]:f}] {self.sample_ids[i]}: {device} -> "
+                f"{predicted} should be {measured}"
+            )
+        lines.append(
+            f"Profile check complete, peak err = {self.maximum:f}, "
+            f"avg err = {self.average:f}, 95% err = {self.percentile_95:f}"
+        )
+        return "\n".join(lines)
+
+
+def check_profile(
+    ti3_path: Union[str, pathlib.Path],
+    icc_path: Union[str, pathlib.Path],
+    absolute: bool = True,
+) -> ProfileCheckReport:
+    """Check the given profile against the measurements in the given .ti3 file.
+
+    Args:
+        ti3_path (Union[str, pathlib.Path]): The .ti3 file path.
+        icc_path (Union[str, pathlib.Path]): The ICC/ICM file path.
+        absolute (bool): Compare absolute colorimetric values (as profcheck does) by
+            using the media white point of the profile. Default is True.
+
+    Raises:
+        ValueError: If the .ti3 file doesn't have device or measurement values.
+
+    Returns:
+        ProfileCheckReport: The report.
+    """
+    table = CGATS.read(ti3_path)[0]
+    with ICCProfile(icc_path) as profile:
+        return _check_profile(table, profile, ti3_path, absolute)
+
+
+def _check_profile(
+    table: CGATSTable,
+    profile: ICCProfile,
+    ti3_path: Union[str, pathlib.Path],
+    absolute: bool,
+) -> ProfileCheckReport:
+    """Check the given profile against the measurements in the given table.
+
+    Args:
+        table (CGATSTable): The .ti3 table.
+        profile (ICCProfile): The profile.
+        ti3_path (Union[str, pathlib.Path]): The .ti3 file path, for error messages.
+        absolute (bool): Compare absolute colorimetric values.
+
+    Raises:
+        ValueError: If the table doesn't have device or measurement values.
+
+    Returns:
+        ProfileCheckReport: The report.
+    """
+    device_fields = COLUMN_GROUPS.get(profile.color_space)
+    if not device_fields or not table.has_columns(device_fields):
+        raise ValueError(
+            f"{ti3_path} doesn't have {profile.color_space} device values"
+        )
+    device_values = table.get_columns(device_fields)
+
+    if table.has_columns(COLUMN_GROUPS["XYZ"]):
+        measured_xyz = table.xyz / 100.0
+    elif table.has_columns(COLUMN_GROUPS["LAB"]):
+        measured_xyz = lab_to_xyz(table.lab)
+    else:
+        raise ValueError(f"{ti3_path} doesn't have XYZ or LAB values")
+
+    pcs = profile.device_to_pcs(device_values / 100.0, intent=1)
+    predicted_xyz = lab_to_xyz(pcs) if profile.pcs == "Lab" else pcs
+
+    # the AToB tables are relative to the media white
+    if absolute:
+        predicted_xyz = predicted_xyz * (profile.white_point / D50)
+    else:
+        measured_xyz = measured_xyz * (D50 / profile.white_point)
+
+    measured_lab = xyz_to_lab(measured_xyz)
+    predicted_lab = xyz_to_lab(predicted_xyz)
+
+    if "SAMPLE_ID" in table:
+        sample_ids = table["SAMPLE_ID"]
+    else:
+        sample_ids = np.arange(1, len(table) + 1)
+
+    return ProfileCheckReport(sample_ids, device_values, measured_lab, predicted_lab)
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""Resource usage of the external processes.
+
+The wall time, the user and system CPU time and the peak resident memory of every
+ArgyllCMS process are measured from the resource usage the kernel reports when the
+process is reaped with os.wait4(). The measurements are tagged with the profiling
+stage, the patch count and the paper size, so the memory use of colprof at high
+patch counts can be used to size the worker nodes.
+
+The ICCGenerator stages run their processes in a recording() context, which
+collects the measurements to a list and optionally appends them to a JSON lines
+log.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import pathlib
+import sys
+import threading
+import time
+from typing import List, Tuple, Union
+
+from icc_generator import logger
+
+
+# the stage names of the tools, used when the caller doesn't tag the stage
+TOOL_STAGES = {
+    "targen": "target",
+    "printtarg": "tif",
+    "chartread": "read",
+    "colprof": "profile",
+    "profcheck": "check",
+    "cctiff": "correct",
+}
+
+_context = contextvars.ContextVar("run_stats_context", default=None)
+
+
+class RunStats(object):
+    """The resource usage of an external process.
+
+    Args:
+        command (List[str]): The command.
+        stage (str): The profiling stage name.
+        return_code (int): The return code of the process.
+        started (float): The start time as a UNIX timestamp.
+        wall_time (float): The wall time in seconds.
+        user_time (Union[None, float]): The user CPU time in seconds, None if it is
+            not available on this platform.
+        system_time (Union[None, float]): The system CPU time in seconds, None if it
+            is not available on this platform.
+        max_rss (Union[None, int]): The peak resident memory in bytes, None if it
+            is not available on this platform.
+        patch_count (Union[None, int]): The patch count of the target.
+        paper_size (Union[None, str]): The paper size name.
+    """
+
+    def __init__(
+        self,
+        command: List[str],
+        stage: str = "",
+        return_code: int = 0,
+        started: float = 0.0,
+        wall_time: float = 0.0,
+        user_time: Union[None, float] = None,
+        system_time: Union[None, float] = None,
+        max_rss: Union[None, int] = None,
+        patch_count: Union[None, int] = None,
+        paper_size: Union[None, str] = None,
+    ):
+        self.command = [str(argument) for argument in command]
+        self.stage = stage
+        self.return_code = return_code
+        self.started = started
+        self.wall_time = wall_time
+        self.user_time = user_time
+        self.system_time = system_time
+        self.max_rss = max_rss
+        self.patch_count = patch_count
+        self.paper_size = paper_size
+
+    @property
+    def tool(self) -> str:
+        """Return the name of the tool.
+
+        Returns:
+            str: The executable name without the path and the extension.
+        """
+        return pathlib.Path(self.command[0]).stem if self.command else ""
+
+    @property
+    def cpu_time(self) -> Union[None, float]:
+        """Return the total CPU time.
+
+        Returns:
+            Union[None, float]: The user and system CPU time in seconds, None if it
+                is not available on this platform.
+        """
+        if self.user_time is None or self.system_time is None:
+            return None
+        return self.user_time + self.system_time
+
+    def to_dict(self) -> dict:
+        """Return the measurement as a dictionary.
+
+        Returns:
+            dict: The measurement.
+        """
+        return {
+            "command": self.command,
+            "tool": self.tool,
+            "stage": self.stage,
+            "return_code": self.return_code,
+            "started": self.started,
+            "wall_time": self.wall_time,
+            "user_time": self.user_time,
+            "system_time": self.system_time,
+            "max_rss": self.max_rss,
+            "patch_count": self.patch_count,
+            "paper_size": self.paper_size,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunStats":
+        """Create a measurement from the given dictionary.
+
+        Args:
+            data (dict): The dictionary created by to_dict().
+
+        Returns:
+            RunStats: The measurement.
+        """
+        return cls(
+            data["command"],
+            stage=data.get("stage", ""),
+            return_code=data.get("return_code", 0),
+            started=data.get("started", 0.0),
+            wall_time=data.get("wall_time", 0.0),
+            user_time=data.get("user_time"),
+            system_time=data.get("system_time"),
+            max_rss=data.get("max_rss"),
+            patch_count=data.get("patch_count"),
+            paper_size=data.get("paper_size"),
+        )
+
+    def __str__(self) -> str:
+        """Return the human readable measurement.
+
+        Returns:
+            str: The measurement.
+        """
+        cpu_time = "n/a" if self.cpu_time is None else f"{self.cpu_time:.2f}s"
+        max_rss = "n/a" if self.max_rss is None else f"{self.max_rss / 2**20:.1f}MiB"
+        return (
+            f"{self.tool} ({self.stage}): wall = {self.wall_time:.2f}s, "
+            f"cpu = {cpu_time}, max rss = {max_rss}"
+        )
+
+
+class RunStatsLog(object):
+    """A JSON lines file of the measurements.
+
+    The measurements are appended from many threads and processes, every line is
+    written with a single write call to a file opened in append mode.
+
+    Args:
+        path (Union[str, pathlib.Path]): The log file path, the directory is
+            created on first write.
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path]):
+        self.path = pathlib.Path(path).expanduser()
+        self._lock = threading.Lock()
+
+    def append(self, stats: RunStats):
+        """Append the given measurement to the log.
+
+        Args:
+            stats (RunStats): The measurement.
+        """
+        line = json.dumps(stats.to_dict()) + "\n"
+        with self._lock:
+            os.makedirs(self.path.parent, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line)
+
+    def read(self) -> List[RunStats]:
+        """Return the logged measurements.
+
+        Returns:
+            List[RunStats]: The measurements in the order they are logged.
+        """
+        if not self.path.exists():
+            return []
+        with open(self.path, "r") as f:
+            return [RunStats.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def _max_rss_bytes(max_rss: int) -> int:
+    """Return the given ru_maxrss value in bytes.
+
+    Args:
+        max_rss (int): The ru_maxrss value, macOS reports bytes and the others
+            kilobytes.
+
+    Returns:
+        int: The peak resident memory in bytes.
+    """
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def wait(process) -> Tuple[int, Union[None, object]]:
+    """Wait for the given process and return its resource usage.
+
+    The process is reaped with os.wait4() where it is available, the return code of
+    the Popen instance is set accordingly.
+
+    Args:
+        process (subprocess.Popen): The process.
+
+    Returns:
+        Tuple[int, Union[None, object]]: The return code and the resource usage of
+            the process, None if it is not available on this platform.
+    """
+    if not hasattr(os, "wait4") or process.returncode is not None:
+        return process.wait(), None
+    while True:
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+            break
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            # reaped somewhere else
+            return process.wait(), None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, rusage
+
+
+def collect(
+    command: List[str], started: float, return_code: int, rusage=None
+) -> RunStats:
+    """Create the measurement of a finished process and record it.
+
+    The measurement is tagged and recorded by the enclosing recording() context,
+    if there is any.
+
+    Args:
+        command (List[str]): The command.
+        started (float): The start time of the process as a UNIX timestamp.
+        return_code (int): The return code of the process.
+        rusage (Union[None, resource.struct_rusage]): The resource usage of the
+            process.
+
+    Returns:
+        RunStats: The measurement.
+    """
+    context = _context.get()
+    tags = {} if context is None else dict(context[0])
+    command = [str(argument) for argument in command]
+    if not tags.get("stage") and command:
+        tags["stage"] = TOOL_STAGES.get(pathlib.Path(command[0]).stem, "")
+
+    stats = RunStats(
+        command,
+        return_code=return_code,
+        started=started,
+        wall_time=time.time() - started,
+        user_time=None if rusage is None else rusage.ru_utime,
+        system_time=None if rusage is None else rusage.ru_stime,
+        max_rss=None if rusage is None else _max_rss_bytes(rusage.ru_maxrss),
+        **tags,
+    )
+    logger.debug(str(stats))
+
+    if context is not None:
+        _, stats_list, log = context
+        if stats_list is not None:
+            stats_list.append(stats)
+        if log is not None:
+            log.append(stats)
+    return stats
+
+
+def record(stats: RunStats) -> RunStats:
+    """Record a measurement taken in an other context, e.g. in a worker process.
+
+    The tags of the enclosing recording() context are used for the ones the
+    measurement doesn't have.
+
+    Args:
+        stats (RunStats): The measurement.
+
+    Returns:
+        RunStats: The measurement.
+    """
+    context = _context.get()
+    if context is None:
+        return stats
+    tags, stats_list, log = context
+    for name, value in tags.items():
+        if value and not getattr(stats, name):
+            setattr(stats, name, value)
+    if stats_list is not None:
+        stats_list.append(stats)
+    if log is not None:
+        log.append(stats)
+    return stats
+
+
+@contextlib.contextmanager
+def recording(
+    stats_list: Union[None, List[RunStats]] = None,
+    log: Union[None, RunStatsLog] = None,
+    stage: str = "",
+    patch_count: Union[None, int] = None,
+    paper_size: Union[None, str] = None,
+):
+    """Record the measurements of the processes run in this context.
+
+    Args:
+        stats_list (Union[None, List[RunStats]]): The list to append the
+            measurements to. A new list is used if skipped.
+        log (Union[None, RunStatsLog]): The log to append the measurements to.
+        stage (str): The profiling stage name, default is the stage of the tool.
+        patch_count (Union[None, int]): The patch count of the target.
+        paper_size (Union[None, str]): The paper size name.
+
+    Yields:
+        List[RunStats]: The measurements.
+    """
+    if stats_list is None:
+        stats_list = []
+    tags = {"stage": stage, "patch_count": patch_count, "paper_size": paper_size}
+    token = _context.set((tags, stats_list, log))
+    try:
+        yield stats_list
+    finally:
+        _context.reset(token)
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""Crash safe state of a profiling session.
+
+The state of every stage of a session, its status, the checksums of the files it
+produced and the last completed stage, is saved to a JSON file in the profile
+folder. The file is written atomically before and after every stage, so a session
+interrupted at any point, even by a crash, can be resumed from the first incomplete
+stage:
+
+- A finished stage is not run again as long as its files are not changed.
+- A stage whose files are missing or changed is run again, and the stages after it
+  are only invalidated if it produces different files.
+- The measurements are never thrown away. An interrupted chart reading session is
+  resumed with the patches already read, and a .ti3 file edited afterwards, i.e. by
+  reading the misread patches again, is accepted as the new measurements.
+- The charts are only needed until they are read, the missing .tif files of a read
+  session, i.e. removed by the cache garbage collector, don't invalidate it.
+"""
+
+import datetime
+import json
+import os
+import pathlib
+import traceback
+import uuid
+from typing import Callable, Dict, List, Union
+
+from icc_generator import logger
+from icc_generator.api import ICCGenerator
+from icc_generator.lut_cache import file_hash
+
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+STAGE_NAMES = ["target", "tif", "read", "profile", "check"]
+
+
+def _target_artifacts(icc_generator: ICCGenerator) -> List[pathlib.Path]:
+    """Return the files of the target stage.
+
+    Args:
+        icc_generator (ICCGenerator): The ICCGenerator.
+
+    Returns:
+        List[pathlib.Path]: The .ti1 file.
+    """
+    return [pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti1")]
+
+
+def _tif_artifacts(icc_generator: ICCGenerator) -> List[pathlib.Path]:
+    """Return the files of the tif stage.
+
+    Args:
+        icc_generator (ICCGenerator): The ICCGenerator.
+
+    Returns:
+        List[pathlib.Path]: The .ti2 file and the charts.
+    """
+    icc_generator.update_tif_files()
+    return [
+        pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti2")
+    ] + icc_generator.tif_files
+
+
+def _read_artifacts(icc_generator: ICCGenerator) -> List[pathlib.Path]:
+    """Return the files of the read stage.
+
+    Args:
+        icc_generator (ICCGenerator): The ICCGenerator.
+
+    Returns:
+        List[pathlib.Path]: The .ti3 file.
+    """
+    return [pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti3")]
+
+
+def _profile_artifacts(icc_generator: ICCGenerator) -> List[pathlib.Path]:
+    """Return the files of the profile stage.
+
+    Args:
+        icc_generator (ICCGenerator): The ICCGenerator.
+
+    Returns:
+        List[pathlib.Path]: The .icc or .icm file.
+    """
+    return [pathlib.Path(icc_generator.check_profile_paths()[1])]
+
+
+ARTIFACTS: Dict[str, Callable[[ICCGenerator], List[pathlib.Path]]] = {
+    "target": _target_artifacts,
+    "tif": _tif_artifacts,
+    "read": _read_artifacts,
+    "profile": _profile_artifacts,
+    "check": lambda icc_generator: [],
+}
+
+
+class SessionState(object):
+    """Runs the stages of a session, saving their state after every change.
+
+    Args:
+        icc_generator (ICCGenerator): The ICCGenerator of the session.
+        state_path (Union[None, str, pathlib.Path]): The state file path, default is
+            the profile path with the profile name and ".state.json" extension.
+
+    Raises:
+        TypeError: If icc_generator is not an ICCGenerator.
+    """
+
+    def __init__(
+        self,
+        icc_generator: ICCGenerator,
+        state_path: Union[None, str, pathlib.Path] = None,
+    ):
+        if not isinstance(icc_generator, ICCGenerator):
+            raise TypeError(
+                "icc_generator should be an ICCGenerator, "
+                f"not {icc_generator.__class__.__name__}"
+            )
+        if state_path is not None:
+            state_path = pathlib.Path(state_path)
+        self.icc_generator = icc_generator
+        self._state_path = state_path
+
+    @property
+    def state_path(self) -> pathlib.Path:
+        """Return the state file path.
+
+        Returns:
+            pathlib.Path: The state file path.
+        """
+        if self._state_path is not None:
+            return self._state_path
+        return pathlib.Path(
+            f"{self.icc_generator.profile_absolute_full_path}.state.json"
+        )
+
+    @classmethod
+    def _validate_stage(cls, name: str):
+        """Validate the given stage name.
+
+        Args:
+            name (str): The stage name.
+
+        Raises:
+            TypeError: If name is not a str.
+            ValueError: If there is no stage with the given name.
+        """
+        if not isinstance(name, str):
+            raise TypeError(f"stage should be a str, not {name.__class__.__name__}")
+        if name not in STAGE_NAMES:
+            raise ValueError(
+                f"stage should be one of {', '.join(STAGE_NAMES[:-1])} or "
+                f"{STAGE_NAMES[-1]}, not {name}"
+            )
+
+    def load(self) -> dict:
+        """Return the saved state.
+
+        Returns:
+            dict: The "last_completed" stage name and the "stages" by their names,
+                every stage has a "status", the "artifacts" checksums by the file
+                paths, the "finished" time and the last "error".
+        """
+        state = {}
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            logger.warning(f"Ignoring invalid session state: {self.state_path}")
+
+        state.setdefault("last_completed", None)
+        stages = state.setdefault("stages", {})
+        for name in STAGE_NAMES:
+            stages.setdefault(
+                name, {"status": PENDING, "artifacts": {}, "finished": None}
+            )
+        return state
+
+    def _save(self, state: dict):
+        """Save the given state atomically.
+
+        The state is written to a temporary file, flushed to the disk and renamed
+        over the state file, so the state file is either the old or the new one.
+
+        Args:
+            state (dict): The state.
+        """
+        os.makedirs(self.state_path.parent, exist_ok=True)
+        temp_path = self.state_path.with_name(
+            f".{self.state_path.name}.{uuid.uuid4().hex}.tmp"
+        )
+        with open(temp_path, "w") as f:
+            json.dump(state, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.state_path)
+
+    def checksums(self, name: str) -> Dict[str, Union[None, str]]:
+        """Return the current checksums of the files of the given stage.
+
+        Args:
+            name (str): The stage name.
+
+        Returns:
+            Dict[str, Union[None, str]]: The checksums by the file paths, None for
+                the missing files.
+        """
+        self._validate_stage(name)
+        return {
+            str(path): file_hash(path) if path.exists() else None
+            for path in ARTIFACTS[name](self.icc_generator)
+        }
+
+    @classmethod
+    def _update_last_completed(cls, state: dict):
+        """Set the last completed stage to the last stage that is done.
+
+        Args:
+            state (dict): The state.
+        """
+        completed = [
+            name for name in STAGE_NAMES if state["stages"][name]["status"] == DONE
+        ]
+        state["last_completed"] = completed[-1] if completed else None
+
+    @classmethod
+    def _charts_are_evicted(
+        cls, state: dict, name: str, checksums: Dict[str, Union[None, str]]
+    ) -> bool:
+        """Check if the only changes of the given stage are the removed charts.
+
+        Args:
+            state (dict): The state.
+            name (str): The stage name.
+            checksums (Dict[str, Union[None, str]]): The current checksums.
+
+        Returns:
+            bool: True if the stage is "tif", the charts are read and only the .tif
+                files are missing.
+        """
+        if name != "tif" or state["stages"]["read"]["status"] != DONE:
+            return False
+        saved = state["stages"][name]["artifacts"]
+        if set(checksums) != set(saved):
+            return False
+        return all(
+            checksum is None and pathlib.Path(path).suffix == ".tif"
+            for path, checksum in checksums.items()
+            if checksum != saved[path]
+        )
+
+    @classmethod
+    def _invalidate_after(cls, state: dict, name: str):
+        """Mark the stages after the given one as pending.
+
+        Args:
+            state (dict): The state.
+            name (str): The stage name.
+        """
+        for later in STAGE_NAMES[STAGE_NAMES.index(name) + 1 :]:
+            if state["stages"][later]["status"] == DONE:
+                logger.info(f"{later} is out of date, the {name} files are changed")
+                state["stages"][later]["status"] = PENDING
+        cls._update_last_completed(state)
+
+    def verify(self) -> dict:
+        """Check the files of the finished stages and update the state.
+
+        A finished stage with missing or changed files is marked as pending. A
+        changed .ti3 file is accepted as the new measurements, invalidating the
+        stages after it, and the missing charts are accepted once they are read.
+
+        Returns:
+            dict: The updated state.
+        """
+        state = self.load()
+        changed = False
+        for name in STAGE_NAMES:
+            stage_state = state["stages"][name]
+            if stage_state["status"] != DONE:
+                continue
+            checksums = self.checksums(name)
+            if checksums == stage_state["artifacts"] or self._charts_are_evicted(
+                state, name, checksums
+            ):
+                continue
+            changed = True
+            if name == "read" and None not in checksums.values():
+                # the measurements are edited, never read the charts again
+                logger.info("The measurements are changed, using the new ones")
+                stage_state["artifacts"] = checksums
+                self._invalidate_after(state, name)
+            else:
+                # the stages after it are invalidated only if it produces different
+                # files when it is run again
+                logger.info(f"{name} is out of date, its files are missing or changed")
+                stage_state["status"] = PENDING
+                self._update_last_completed(state)
+        if changed:
+            self._save(state)
+        return state
+
+    def status(self, name: str) -> str:
+        """Return the status of the given stage.
+
+        Args:
+            name (str): The stage name.
+
+        Returns:
+            str: One of "pending", "running", "done" or "failed". A stage that is
+                still "running" was interrupted.
+        """
+        self._validate_stage(name)
+        return self.load()["stages"][name]["status"]
+
+    def next_stage(self) -> Union[None, str]:
+        """Return the first incomplete stage.
+
+        Returns:
+            Union[None, str]: The stage name or None if all the stages are done.
+        """
+        state = self.verify()
+        for name in STAGE_NAMES:
+            if state["stages"][name]["status"] != DONE:
+                return name
+        return None
+
+    def _run_stage(self, name: str):
+        """Run the given stage.
+
+        Args:
+            name (str): The stage name.
+        """
+        icc_generator = self.icc_generator
+        if name == "target":
+            icc_generator.generate_target()
+        elif name == "tif":
+            icc_generator.generate_tif()
+        elif name == "read":
+            # keep the patches already read if the last session is interrupted
+            ti3_path = _read_artifacts(icc_generator)[0]
+            icc_generator.read_charts(resume=ti3_path.exists())
+        elif name == "profile":
+            icc_generator.generate_profile()
+        else:
+            icc_generator.check_profile()
+
+    def run(self, names: Union[None, List[str]] = None) -> List[str]:
+        """Run the incomplete stages in order.
+
+        Args:
+            names (Union[None, List[str]]): The stage names to run, default is all
+                the stages: target, tif, read, profile and check.
+
+        Raises:
+            RuntimeError: If a stage doesn't produce its files.
+            Exception: The error of the failed stage, which is saved to the state.
+
+        Returns:
+            List[str]: The names of the stages that are run.
+        """
+        if names is None:
+            names = STAGE_NAMES
+        for name in names:
+            self._validate_stage(name)
+
+        state = self.verify()
+        run_stages = []
+        for name in STAGE_NAMES:
+            stage_state = state["stages"][name]
+            if name not in names or stage_state["status"] == DONE:
+                continue
+
+            stage_state["status"] = RUNNING
+            self._save(state)
+            logger.info(f"Running {name}")
+            try:
+                self._run_stage(name)
+                checksums = self.checksums(name)
+                for path, checksum in checksums.items():
+                    if checksum is None:
+                        raise RuntimeError(f"File does not exist!: {path}")
+            except Exception as e:
+                logger.debug(traceback.format_exc())
+                stage_state["status"] = FAILED
+                stage_state["error"] = f"{e.__class__.__name__}: {e}"
+                self._save(state)
+                raise
+
+            if checksums != stage_state["artifacts"]:
+                self._invalidate_after(state, name)
+            stage_state.update(
+                status=DONE,
+                artifacts=checksums,
+                finished=datetime.datetime.now().isoformat(),
+                error=None,
+            )
+            state["last_completed"] = name
+            self._save(state)
+            run_stages.append(name)
+        return run_stages
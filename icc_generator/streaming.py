@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Streaming color correction of TIFF files.
+
+The image is read in bands of rows, transformed and written through a three stage
+pipeline. The reader and the writer run in background threads connected with bounded
+queues, so reading/decompressing, transforming and compressing/writing overlap while
+at most a few bands are in the memory at any time, no matter how large the image is.
+"""
+
+import pathlib
+import queue
+import threading
+from typing import Callable, Iterator, Union
+
+from icc_generator import tiff
+
+
+# the number of bands waiting between the pipeline stages
+DEFAULT_QUEUE_SIZE = 4
+
+# the interval to check if the pipeline has been stopped while waiting on a queue
+POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+def iterate_in_background(iterator: Iterator, queue_size: int) -> Iterator:
+    """Run the given iterator in a background thread.
+
+    The items are passed through a bounded queue, so the background thread stops when
+    the queue is full. Any exception raised by the iterator is raised in the consumer.
+
+    Args:
+        iterator (Iterator): The iterator.
+        queue_size (int): The maximum number of items waiting in the queue.
+
+    Yields:
+        Any: The items of the iterator.
+    """
+    items = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+        except BaseException as error:
+            put(error)
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+class BackgroundWriter(object):
+    """Calls the given write function in a background thread.
+
+    Args:
+        write (Callable): The function that is called with every item.
+        queue_size (int): The maximum number of items waiting in the queue.
+    """
+
+    def __init__(self, write: Callable, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self._write = write
+        self._items = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Write the items until the end of the stream."""
+        while True:
+            item = self._items.get()
+            if item is _DONE:
+                return
+            if self._error is not None:
+                # keep draining the queue so the producer is never blocked
+                continue
+            try:
+                self._write(item)
+            except BaseException as error:
+                self._error = error
+
+    def _raise_error(self):
+        """Raise the error of the background thread if there is any."""
+        if self._error is not None:
+            raise self._error
+
+    def write(self, item):
+        """Queue the given item to be written.
+
+        Args:
+            item (Any): The item.
+        """
+        self._raise_error()
+        self._items.put(item)
+
+    def close(self):
+        """Wait until all the items are written.
+
+        Raises:
+            Exception: The error raised by the write function if there is any.
+        """
+        self._items.put(_DONE)
+        self._thread.join()
+        self._raise_error()
+
+    def abort(self):
+        """Stop writing and wait for the background thread, ignoring any error."""
+        self._error = self._error or RuntimeError("Writing is aborted")
+        self._items.put(_DONE)
+        self._thread.join()
+
+
+def stream_image(
+    color_transform,
+    input_image_path: Union[str, pathlib.Path],
+    output_image_path: Union[str, pathlib.Path],
+    icc_profile: Union[None, bytes] = None,
+    band_size: int = tiff.DEFAULT_BAND_SIZE,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> pathlib.Path:
+    """Color correct the given TIFF image band by band.
+
+    The output uses the same sample type, compression and resolution as the input.
+
+    Args:
+        color_transform (ColorTransform): The transform.
+        input_image_path (Union[str, pathlib.Path]): The input TIFF image path.
+        output_image_path (Union[str, pathlib.Path]): The output TIFF image path.
+        icc_profile (Union[None, bytes]): The ICC profile data to embed.
+        band_size (int): The maximum uncompressed size of the bands in bytes.
+        queue_size (int): The maximum number of bands waiting between the stages.
+
+    Raises:
+        ValueError: If the input TIFF layout is not supported.
+
+    Returns:
+        pathlib.Path: The output image path.
+    """
+    output_image_path = pathlib.Path(output_image_path)
+    with tiff.TiffReader(input_image_path) as reader:
+        if not reader.is_supported:
+            raise ValueError(f"Unsupported TIFF layout: {reader.path}")
+
+        writer = tiff.TiffWriter(
+            output_image_path,
+            reader.width,
+            reader.height,
+            samples_per_pixel=color_transform.output_channels,
+            dtype=reader.dtype,
+            compression="none"
+            if reader.compression == tiff.COMPRESSION_NONE
+            else "deflate",
+            icc_profile=icc_profile,
+            dpi=reader.dpi,
+        )
+        bands = iterate_in_background(reader.iter_bands(band_size), queue_size)
+        background_writer = BackgroundWriter(writer.write, queue_size)
+        try:
+            for _, band in bands:
+                background_writer.write(color_transform.apply_to_pixels(band))
+            background_writer.close()
+        except BaseException:
+            bands.close()
+            background_writer.abort()
+            writer.abort()
+            raise
+        writer.close()
+    return output_image_path
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""colprof parameter sweeps.
+
+Builds profile variants from the same measurements over a grid of colprof quality
+levels, smoothing values and source gamuts, and picks the most accurate one. A random
+subset of the patches is held out of the measurements the variants are built from,
+and every variant is scored by the CIEDE2000 error on the held out patches, so the
+variants over fitting the measurement noise are not rewarded. The best variant is
+then built again from all the measurements as the profile.
+
+The variants are built and scored in parallel in a process pool, the complete colprof
+output of every variant is kept in its folder.
+"""
+
+import itertools
+import os
+import pathlib
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from icc_generator import logger, output_capture, profile_check, run_stats
+from icc_generator.cgats import CGATS, COLUMN_GROUPS, CGATSTable
+
+
+DEFAULT_QUALITIES = ["m", "h"]
+DEFAULT_SMOOTHING_VALUES = [0.25, 0.5, 1.0]
+DEFAULT_SOURCE_PROFILES = ["AdobeRGB", "ProPhoto"]
+DEFAULT_HOLDOUT = 0.1
+
+METRICS = ["average", "rms", "percentile_95", "maximum"]
+SWEEP_FOLDER = "sweep"
+LOG_FILE_NAME = "colprof.log"
+
+
+class SweepVariant(object):
+    """A colprof parameter combination.
+
+    Args:
+        quality (str): The colprof quality level.
+        smoothing (float): The colprof smoothing value.
+        source_profile (str): The source gamut.
+    """
+
+    def __init__(self, quality: str, smoothing: float, source_profile: str):
+        self.quality = quality
+        self.smoothing = smoothing
+        self.source_profile = source_profile
+
+    @property
+    def name(self) -> str:
+        """Return the name of the variant.
+
+        Returns:
+            str: The name, e.g. "qh_r0.5_AdobeRGB".
+        """
+        source_name = pathlib.Path(str(self.source_profile)).stem
+        return f"q{self.quality}_r{self.smoothing}_{source_name}"
+
+    def to_dict(self) -> dict:
+        """Return the variant as a dictionary.
+
+        Returns:
+            dict: The variant.
+        """
+        return {
+            "quality": self.quality,
+            "smoothing": self.smoothing,
+            "source_profile": str(self.source_profile),
+        }
+
+
+class SweepResult(object):
+    """The result of a profile variant.
+
+    Args:
+        variant (SweepVariant): The variant.
+        icc_path (pathlib.Path): The profile path of the variant.
+        report (Union[None, profile_check.ProfileCheckReport]): The check report on
+            the held out patches, None if the variant failed.
+        duration (float): The build and check time in seconds.
+        error (Union[None, str]): The error message if the variant failed.
+    """
+
+    def __init__(
+        self,
+        variant: SweepVariant,
+        icc_path: pathlib.Path,
+        report: Union[None, profile_check.ProfileCheckReport] = None,
+        duration: float = 0.0,
+        error: Union[None, str] = None,
+    ):
+        self.variant = variant
+        self.icc_path = icc_path
+        self.report = report
+        self.duration = duration
+        self.error = error
+
+    @property
+    def succeeded(self) -> bool:
+        """Return True if the variant is built and checked.
+
+        Returns:
+            bool: True if there is no error.
+        """
+        return self.error is None
+
+    def score(self, metric: str = "average") -> float:
+        """Return the score of the variant, lower is better.
+
+        Args:
+            metric (str): The ProfileCheckReport statistic to use.
+
+        Returns:
+            float: The dE statistic, inf if the variant failed.
+        """
+        if not self.succeeded:
+            return float("inf")
+        return getattr(self.report, metric)
+
+    def to_dict(self) -> dict:
+        """Return the result as a dictionary.
+
+        Returns:
+            dict: The result.
+        """
+        data = self.variant.to_dict()
+        data.update(
+            {
+                "name": self.variant.name,
+                "icc_path": str(self.icc_path),
+                "duration": self.duration,
+                "error": self.error,
+                "check": None if self.report is None else self.report.to_dict(0),
+            }
+        )
+        return data
+
+
+class SweepReport(object):
+    """The results of a sweep.
+
+    Args:
+        results (List[SweepResult]): The results in the sweep order.
+        metric (str): The statistic the variants are compared with.
+        duration (float): The wall time of the sweep in seconds.
+    """
+
+    def __init__(self, results: List[SweepResult], metric: str, duration: float):
+        self.results = results
+        self.metric = metric
+        self.duration = duration
+
+    @property
+    def succeeded(self) -> List[SweepResult]:
+        """Return the successful variants.
+
+        Returns:
+            List[SweepResult]: The results.
+        """
+        return [result for result in self.results if result.succeeded]
+
+    @property
+    def failed(self) -> List[SweepResult]:
+        """Return the failed variants.
+
+        Returns:
+            List[SweepResult]: The results.
+        """
+        return [result for result in self.results if not result.succeeded]
+
+    @property
+    def best(self) -> Union[None, SweepResult]:
+        """Return the variant with the lowest score.
+
+        Returns:
+            Union[None, SweepResult]: The best result or None if all the variants
+                failed.
+        """
+        succeeded = self.succeeded
+        if not succeeded:
+            return None
+        return min(succeeded, key=lambda result: result.score(self.metric))
+
+    def to_dict(self) -> dict:
+        """Return the report as a dictionary.
+
+        Returns:
+            dict: The report.
+        """
+        best = self.best
+        return {
+            "metric": self.metric,
+            "duration": self.duration,
+            "best": None if best is None else best.variant.name,
+            "results": [result.to_dict() for result in self.results],
+        }
+
+    def format(self) -> str:
+        """Return the human readable report, the best variant first.
+
+        Returns:
+            str: The report.
+        """
+        lines = []
+        for result in sorted(self.results, key=lambda item: item.score(self.metric)):
+            if result.succeeded:
+                report = result.report
+                lines.append(
+                    f"{result.variant.name}: avg err = {report.average:f}, "
+                    f"95% err = {report.percentile_95:f}, "
+                    f"peak err = {report.maximum:f} ({result.duration:.1f}s)"
+                )
+            else:
+                lines.append(f"{result.variant.name}: failed: {result.error}")
+        best = self.best
+        lines.append(
+            f"Built {len(self.succeeded)} of {len(self.results)} variants in "
+            f"{self.duration:.1f}s, best is "
+            f"{best.variant.name if best is not None else 'none'}"
+        )
+        return "\n".join(lines)
+
+
+def split_measurements(
+    ti3_path: Union[str, pathlib.Path], holdout: float = DEFAULT_HOLDOUT, seed: int = 0
+) -> Tuple[CGATS, CGATS]:
+    """Split the given measurements into the build and the held out subsets.
+
+    The patches with all device values at the minimum or the maximum, i.e. the paper
+    white and the full ink patches, are always kept in the build subset as colprof
+    needs them to find the white and the black points.
+
+    Args:
+        ti3_path (Union[str, pathlib.Path]): The .ti3 file path.
+        holdout (float): The ratio of the held out patches, between 0 and 1.
+        seed (int): The random seed.
+
+    Raises:
+        ValueError: If holdout is not between 0 and 1 or the file doesn't have any
+            device values.
+
+    Returns:
+        Tuple[CGATS, CGATS]: The build and the held out measurements.
+    """
+    if not 0 < holdout < 1:
+        raise ValueError(f"holdout should be between 0 and 1, not {holdout}")
+
+    cgats = CGATS.read(ti3_path)
+    table = cgats[0]
+    device_values = None
+    for color_space in ["RGB", "CMYK"]:
+        if table.has_columns(COLUMN_GROUPS[color_space]):
+            device_values = table.get_columns(COLUMN_GROUPS[color_space])
+            break
+    if device_values is None:
+        raise ValueError(f"{ti3_path} doesn't have any device values")
+
+    extremes = np.all(device_values <= 0, axis=1) | np.all(device_values >= 100, axis=1)
+    candidates = np.flatnonzero(~extremes)
+    rng = np.random.default_rng(seed)
+    held_out = rng.choice(
+        candidates, size=int(round(len(candidates) * holdout)), replace=False
+    )
+    mask = np.zeros(len(table), dtype=bool)
+    mask[held_out] = True
+
+    def subset(selection):
+        sub_table = CGATSTable(
+            table.file_type,
+            table.keywords,
+            table.fields,
+            {field: table.data[field][selection] for field in table.fields},
+        )
+        sub_table.unquoted_keywords = set(table.unquoted_keywords)
+        sub_table.declared_keywords = list(table.declared_keywords)
+        return sub_table
+
+    return (
+        CGATS([subset(~mask)] + list(cgats)[1:]),
+        CGATS([subset(mask)]),
+    )
+
+
+def _build_variant(
+    run_external_process,
+    command: List[str],
+    icc_path: pathlib.Path,
+    holdout_path: pathlib.Path,
+) -> Tuple[
+    Union[None, profile_check.ProfileCheckReport],
+    float,
+    Union[None, str],
+    List[run_stats.RunStats],
+]:
+    """Build and check a profile variant.
+
+    Args:
+        run_external_process (Callable): The ICCGenerator.run_external_process() to
+            run colprof with.
+        command (List[str]): The colprof command.
+        icc_path (pathlib.Path): The profile path colprof writes to.
+        holdout_path (pathlib.Path): The held out measurements.
+
+    Returns:
+        Tuple[Union[None, profile_check.ProfileCheckReport], float, Union[None, str],
+            List[run_stats.RunStats]]: The check report, the duration, the error
+            message if it failed and the resource usage of colprof to be recorded
+            by the caller.
+    """
+    start = time.perf_counter()
+    # the variants may run in other processes, the measurements are returned
+    with run_stats.recording() as stats_list:
+        try:
+            capture = output_capture.OutputCapture(
+                log_path=icc_path.parent / LOG_FILE_NAME
+            )
+            for _ in run_external_process(command, capture=capture):
+                pass
+            report = profile_check.check_profile(holdout_path, icc_path)
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"
+            return None, time.perf_counter() - start, error, stats_list
+    return report, time.perf_counter() - start, None, stats_list
+
+
+def sweep_profiles(
+    icc_generator,
+    qualities: Union[None, List[str]] = None,
+    smoothing_values: Union[None, List[float]] = None,
+    source_profiles: Union[None, List[str]] = None,
+    holdout: float = DEFAULT_HOLDOUT,
+    metric: str = "average",
+    workers: Union[None, int] = None,
+    seed: int = 0,
+) -> SweepReport:
+    """Build profile variants from the measurements and pick the best one.
+
+    The variants are built under the "sweep" folder of the profile path, and the
+    best one is built again from all the measurements to the profile path. The
+    report keeps the scores of the variants on the held out patches.
+
+    Args:
+        icc_generator (ICCGenerator): The ICCGenerator with the measurements.
+        qualities (Union[None, List[str]]): The colprof quality levels, default is
+            "m" and "h".
+        smoothing_values (Union[None, List[float]]): The colprof smoothing values,
+            default is 0.25, 0.5 and 1.0.
+        source_profiles (Union[None, List[str]]): The source gamuts, default is
+            "AdobeRGB" and "ProPhoto".
+        holdout (float): The ratio of the patches to score the variants with.
+        metric (str): The dE statistic to compare the variants with, one of
+            "average", "rms", "percentile_95" or "maximum".
+        workers (Union[None, int]): The number of processes, default is the number
+            of CPUs. 1 builds the variants one by one in this process.
+        seed (int): The random seed to pick the held out patches.
+
+    Raises:
+        RuntimeError: If the .ti3 file doesn't exist or all the variants failed.
+        TypeError: If workers is not an int.
+        ValueError: If metric is not valid or workers is not positive.
+
+    Returns:
+        SweepReport: The results.
+    """
+    if metric not in METRICS:
+        raise ValueError(
+            f"metric should be one of {', '.join(METRICS[:-1])} or {METRICS[-1]}, "
+            f"not {metric}"
+        )
+
+    if workers is not None:
+        if not isinstance(workers, int):
+            raise TypeError(
+                f"workers should be an int, not {workers.__class__.__name__}"
+            )
+        if workers < 1:
+            raise ValueError(f"workers should be a positive integer, not {workers}")
+
+    ti3_path = pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti3")
+    if not ti3_path.exists():
+        raise RuntimeError(f"File does not exist!: {ti3_path}")
+
+    variants = [
+        SweepVariant(quality, smoothing, source_profile)
+        for quality, smoothing, source_profile in itertools.product(
+            qualities or DEFAULT_QUALITIES,
+            smoothing_values or DEFAULT_SMOOTHING_VALUES,
+            source_profiles or DEFAULT_SOURCE_PROFILES,
+        )
+    ]
+
+    start = time.perf_counter()
+    sweep_path = icc_generator.profile_absolute_path / SWEEP_FOLDER
+    os.makedirs(sweep_path, exist_ok=True)
+    build_measurements, holdout_measurements = split_measurements(
+        ti3_path, holdout=holdout, seed=seed
+    )
+    build_path = sweep_path / "build.ti3"
+    holdout_path = sweep_path / "holdout.ti3"
+    build_measurements.write(build_path)
+    holdout_measurements.write(holdout_path)
+
+    # colprof writes *.icm files on Windows
+    icc_path = pathlib.Path(icc_generator.check_profile_paths()[1])
+    extension = icc_path.suffix
+    jobs = []
+    for variant in variants:
+        variant_path = sweep_path / variant.name
+        os.makedirs(variant_path, exist_ok=True)
+        base_path = variant_path / icc_generator.profile_name
+        shutil.copyfile(build_path, f"{base_path}.ti3")
+        command = icc_generator.generate_profile_command(
+            quality=variant.quality,
+            smoothing=variant.smoothing,
+            source_profile=variant.source_profile,
+            base_path=base_path,
+        )
+        jobs.append((variant, command, pathlib.Path(f"{base_path}{extension}")))
+
+    run_external_process = icc_generator.run_external_process
+    with icc_generator.recording_run_stats("profile"):
+        if workers == 1:
+            outcomes = [
+                _build_variant(run_external_process, command, icc_path, holdout_path)
+                for _, command, icc_path in jobs
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(
+                        _build_variant,
+                        run_external_process,
+                        command,
+                        icc_path,
+                        holdout_path,
+                    )
+                    for _, command, icc_path in jobs
+                ]
+                outcomes = [future.result() for future in futures]
+
+        results = []
+        for (variant, _, variant_icc_path), outcome in zip(jobs, outcomes):
+            for stats in outcome[3]:
+                run_stats.record(stats)
+            results.append(SweepResult(variant, variant_icc_path, *outcome[:3]))
+        best = SweepReport(results, metric, 0.0).best
+        if best is None:
+            raise RuntimeError(
+                "All the profile variants failed:\n"
+                + "\n".join(
+                    f"{result.variant.name}: {result.error}" for result in results
+                )
+            )
+
+        # the variants are built without the held out patches, use all of them
+        command = icc_generator.generate_profile_command(
+            quality=best.variant.quality,
+            smoothing=best.variant.smoothing,
+            source_profile=best.variant.source_profile,
+        )
+        if icc_generator.output_commands:
+            print("command: {}".format(" ".join(command)))
+        for output in run_external_process(command):
+            print(output)
+
+    logger.info(f"Using the {best.variant.name} profile variant: {icc_path}")
+    return SweepReport(results, metric, time.perf_counter() - start)
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed store of the generated targets and charts.
+
+Every profiling session is stored in its own folder, so two sessions with the same
+paper size, density, patch counts and precondition profile would generate identical
+targets from scratch. The targen outputs are stored by the hash of the normalized
+targen arguments and the precondition profile content, and the printtarg outputs by
+the hash of the normalized printtarg arguments and the .ti1 file content. The new
+sessions clone the stored files instead of generating them again.
+
+The files are reflinked where the file system supports it and copied otherwise, so
+every session has its own copy on write files and a tool changing the files of one
+session in place can never change the cache or the other sessions. The cache is
+opt-in, set ICCGenerator.target_cache to a TargetCache to use it.
+"""
+
+import hashlib
+import os
+import pathlib
+import re
+import shutil
+import uuid
+from typing import List, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from icc_generator import logger
+from icc_generator.lut_cache import file_hash
+
+
+DEFAULT_CACHE_PATH = "~/.cache/ICCGenerator/targets"
+
+# the Linux ioctl to clone a file on copy-on-write file systems
+FICLONE = 0x40049409
+
+TARGET = "target"
+CHART = "chart"
+
+TARGET_EXTENSIONS = [".ti1"]
+CHART_EXTENSIONS = [".ti2", ".tif"]
+PAGE_PATTERN = re.compile(r"^(?P<stem>.*?)(?P<page>_\d{2})?(?P<extension>\.\w+)$")
+
+
+def _reflink(source: pathlib.Path, destination: pathlib.Path):
+    """Clone the given file, sharing the data blocks with the source.
+
+    Args:
+        source (pathlib.Path): The source file.
+        destination (pathlib.Path): The destination file.
+
+    Raises:
+        OSError: If the file system doesn't support cloning.
+    """
+    if fcntl is None:
+        raise OSError("Reflinks are not supported")
+    with open(source, "rb") as source_file, open(destination, "wb") as f:
+        try:
+            fcntl.ioctl(f.fileno(), FICLONE, source_file.fileno())
+        except OSError:
+            f.close()
+            destination.unlink()
+            raise
+
+
+def clone_file(source: pathlib.Path, destination: pathlib.Path) -> str:
+    """Reflink or copy the given file, whichever works first.
+
+    The files are never hard linked, so changing one of them doesn't change the
+    other. An existing destination file is replaced.
+
+    Args:
+        source (pathlib.Path): The source file.
+        destination (pathlib.Path): The destination file.
+
+    Returns:
+        str: The method used, one of "reflink" or "copy".
+    """
+    destination.unlink(missing_ok=True)
+    try:
+        _reflink(source, destination)
+        return "reflink"
+    except OSError:
+        pass
+    shutil.copyfile(source, destination)
+    return "copy"
+
+
+class TargetCache(object):
+    """Stores the targen and printtarg outputs by the hash of their inputs.
+
+    Args:
+        path (Union[None, str, pathlib.Path]): The cache directory, default is
+            ~/.cache/ICCGenerator/targets. The directory is created on first write.
+    """
+
+    def __init__(self, path: Union[None, str, pathlib.Path] = None):
+        self.path = pathlib.Path(path or DEFAULT_CACHE_PATH).expanduser()
+
+    @classmethod
+    def target_key(
+        cls, icc_generator, precondition_profile_path: Union[None, str] = None
+    ) -> Union[None, str]:
+        """Return the key of the targen outputs of the given ICCGenerator.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+            precondition_profile_path (Union[None, str]): The profile the target is
+                preconditioned with, default is its precondition_profile_path.
+
+        Returns:
+            Union[None, str]: The key or None if the precondition profile doesn't
+                exist.
+        """
+        # the output path is not an input and the precondition profile is
+        # identified by its content
+        command = icc_generator.generate_target_command(precondition_profile_path)
+        arguments = [str(argument) for argument in command[:-1]]
+        if "-c" in arguments:
+            index = arguments.index("-c") + 1
+            if not os.path.isfile(arguments[index]):
+                return None
+            arguments[index] = file_hash(arguments[index])
+        return cls._hash([TARGET] + arguments)
+
+    @classmethod
+    def chart_key(cls, icc_generator) -> Union[None, str]:
+        """Return the key of the printtarg outputs of the given ICCGenerator.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+
+        Returns:
+            Union[None, str]: The key or None if there is no .ti1 file yet.
+        """
+        ti1_path = pathlib.Path(f"{icc_generator.profile_absolute_full_path}.ti1")
+        if not ti1_path.exists():
+            return None
+        command = icc_generator.generate_tif_command()
+        arguments = [str(argument) for argument in command[:-1]]
+        return cls._hash([CHART] + arguments + [file_hash(ti1_path)])
+
+    @classmethod
+    def _hash(cls, arguments: List[str]) -> str:
+        """Return the hash of the given arguments.
+
+        Args:
+            arguments (List[str]): The arguments.
+
+        Returns:
+            str: The hex digest.
+        """
+        return hashlib.sha256("\0".join(arguments).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> pathlib.Path:
+        """Return the directory of the given entry.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            pathlib.Path: The entry directory.
+        """
+        return self.path / key
+
+    def __contains__(self, key: str) -> bool:
+        """Check if the given key is cached.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            bool: True if the key is cached.
+        """
+        return self._entry_path(key).is_dir()
+
+    @classmethod
+    def _outputs(
+        cls, base_path: pathlib.Path, extensions: List[str]
+    ) -> List[pathlib.Path]:
+        """Return the existing output files of the given base path.
+
+        Args:
+            base_path (pathlib.Path): The output path without the extension.
+            extensions (List[str]): The output file extensions, the multi page
+                outputs have a "_NN" suffix before the extension.
+
+        Returns:
+            List[pathlib.Path]: The output files.
+        """
+        if not base_path.parent.is_dir():
+            return []
+        outputs = []
+        for path in sorted(base_path.parent.iterdir()):
+            match = PAGE_PATTERN.match(path.name)
+            if (
+                match
+                and match.group("stem") == base_path.name
+                and match.group("extension") in extensions
+            ):
+                outputs.append(path)
+        return outputs
+
+    def _put(self, key: str, base_path: pathlib.Path, name: str, extensions: list):
+        """Store the output files of the given base path.
+
+        Args:
+            key (str): The cache key.
+            base_path (pathlib.Path): The output path without the extension.
+            name (str): The file name stem in the cache.
+            extensions (list): The output file extensions.
+        """
+        outputs = self._outputs(base_path, extensions)
+        if key in self or {path.suffix for path in outputs} != set(extensions):
+            return
+
+        # fill a temporary folder first so the others never see a partial entry
+        self.path.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path / f".{key}.{uuid.uuid4().hex}.tmp"
+        temp_path.mkdir()
+        try:
+            for path in outputs:
+                suffix = path.name[len(base_path.name) :]
+                clone_file(path, temp_path / f"{name}{suffix}")
+            os.replace(temp_path, self._entry_path(key))
+        except OSError:
+            # stored by another process in the meantime
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+    def _get(self, key: str, base_path: pathlib.Path, name: str) -> List[pathlib.Path]:
+        """Clone the stored files of the given entry to the given base path.
+
+        Args:
+            key (str): The cache key.
+            base_path (pathlib.Path): The output path without the extension.
+            name (str): The file name stem in the cache.
+
+        Returns:
+            List[pathlib.Path]: The cloned files, empty if the key is not cached.
+        """
+        if key not in self:
+            return []
+
+        os.makedirs(base_path.parent, exist_ok=True)
+        outputs = []
+        for path in sorted(self._entry_path(key).iterdir()):
+            suffix = path.name[len(name) :]
+            output_path = base_path.parent / f"{base_path.name}{suffix}"
+            clone_file(path, output_path)
+            outputs.append(output_path)
+        logger.info(f"Using the cached {name} files: {self._entry_path(key)}")
+        return outputs
+
+    def put_target(
+        self, icc_generator, precondition_profile_path: Union[None, str] = None
+    ):
+        """Store the targen outputs of the given ICCGenerator.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+            precondition_profile_path (Union[None, str]): The profile the target is
+                preconditioned with, default is its precondition_profile_path.
+        """
+        key = self.target_key(icc_generator, precondition_profile_path)
+        if key is not None:
+            self._put(
+                key, icc_generator.profile_absolute_full_path, TARGET, TARGET_EXTENSIONS
+            )
+
+    def get_target(
+        self, icc_generator, precondition_profile_path: Union[None, str] = None
+    ) -> List[pathlib.Path]:
+        """Clone the cached targen outputs of the given ICCGenerator.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+            precondition_profile_path (Union[None, str]): The profile the target is
+                preconditioned with, default is its precondition_profile_path.
+
+        Returns:
+            List[pathlib.Path]: The cloned files, empty if they are not cached.
+        """
+        key = self.target_key(icc_generator, precondition_profile_path)
+        if key is None:
+            return []
+        return self._get(key, icc_generator.profile_absolute_full_path, TARGET)
+
+    def put_chart(self, icc_generator):
+        """Store the printtarg outputs of the given ICCGenerator.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+        """
+        key = self.chart_key(icc_generator)
+        if key is not None:
+            self._put(
+                key, icc_generator.profile_absolute_full_path, CHART, CHART_EXTENSIONS
+            )
+
+    def get_chart(self, icc_generator) -> List[pathlib.Path]:
+        """Clone the cached printtarg outputs of the given ICCGenerator.
+
+        Args:
+            icc_generator (ICCGenerator): The ICCGenerator.
+
+        Returns:
+            List[pathlib.Path]: The cloned files, empty if they are not cached.
+        """
+        key = self.chart_key(icc_generator)
+        if key is None:
+            return []
+        return self._get(key, icc_generator.profile_absolute_full_path, CHART)
+
+    def entries(self) -> List[pathlib.Path]:
+        """Return the cached entries.
+
+        Returns:
+            List[pathlib.Path]: The entry directories.
+        """
+        if not self.path.is_dir():
+            return []
+        return sorted(
+            path
+            for path in self.path.iterdir()
+            if path.is_dir() and not path.name.startswith(".")
+        )
+
+    def clear(self):
+        """Remove all the cached entries."""
+        for path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
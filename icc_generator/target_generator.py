@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""In process replacement of ArgyllCMS ``targen`` for the RGB printer targets.
+
+The target is a gray axis from white to black plus fill points spread over the
+device space by farthest point sampling: every new point is the candidate furthest
+from all the points placed so far. The candidates are a slightly jittered lattice
+over the RGB cube, so only the lattice cells around a new point can be closer to it
+than to the earlier points, and the distances are updated just for those cells. This
+keeps the sampling linear in the number of candidates and a 3000 patch target is
+generated in a fraction of a second.
+
+The output only depends on the patch counts and the seed of the lattice jitter, so
+the same settings always produce the same .ti1 file and the charts printed from it
+are shared through the target cache.
+"""
+
+import math
+import pathlib
+from typing import Union
+
+import numpy as np
+
+from icc_generator import transform
+from icc_generator.cgats import CGATS, CGATSTable, COLUMN_GROUPS
+from icc_generator.icc import ICCProfile
+
+
+DEFAULT_SEED = 0
+
+# the number of lattice candidates per fill point
+OVERSAMPLING = 8
+
+# the jitter of the lattice candidates as a fraction of the lattice cell size
+JITTER = 0.25
+
+DESCRIPTOR = "Argyll Calibration Target chart information 1"
+ORIGINATOR = "ICCGenerator target_generator"
+
+RGB_FIELDS = COLUMN_GROUPS["RGB"]
+XYZ_FIELDS = COLUMN_GROUPS["XYZ"]
+
+
+def gray_axis(count: int) -> np.ndarray:
+    """Return the evenly spaced gray steps from white to black.
+
+    Args:
+        count (int): The number of steps, white and black are always included.
+
+    Returns:
+        np.ndarray: The (max(count, 2), 3) RGB values in 0-1 range.
+    """
+    steps = np.linspace(1.0, 0.0, max(count, 2))
+    return np.repeat(steps[:, None], 3, axis=1)
+
+
+def farthest_point_sampling(
+    count: int,
+    fixed: Union[None, np.ndarray] = None,
+    seed: int = DEFAULT_SEED,
+    oversampling: int = OVERSAMPLING,
+) -> np.ndarray:
+    """Return the given number of points spread over the RGB cube.
+
+    Args:
+        count (int): The number of points.
+        fixed (Union[None, np.ndarray]): The (M, 3) points that are already placed,
+            the new points are spread away from them too.
+        seed (int): The seed of the lattice jitter.
+        oversampling (int): The number of lattice candidates per point.
+
+    Returns:
+        np.ndarray: The (count, 3) points in 0-1 range, in the order they are
+            picked.
+    """
+    if count <= 0:
+        return np.empty((0, 3), dtype=np.float64)
+
+    size = max(2, math.ceil((count * oversampling) ** (1 / 3)))
+    cell = 1.0 / (size - 1)
+    indices = np.stack(np.indices((size,) * 3), axis=-1)
+    candidates = indices * cell
+    # jitter the inner lattice points, the faces of the cube are kept in place
+    rng = np.random.default_rng(seed)
+    inner = (indices > 0) & (indices < size - 1)
+    candidates += inner * rng.uniform(-JITTER, JITTER, candidates.shape) * cell
+
+    distances = np.full((size,) * 3, np.inf)
+    if fixed is not None:
+        for point in fixed:
+            np.minimum(
+                distances, ((candidates - point) ** 2).sum(axis=-1), out=distances
+            )
+
+    points = np.empty((count, 3), dtype=np.float64)
+    for i in range(count):
+        index = np.unravel_index(np.argmax(distances), distances.shape)
+        distance = distances[index]
+        point = candidates[index]
+        points[i] = point
+        if np.isinf(distance):
+            window = (slice(None),) * 3
+        else:
+            # the jitter moves a candidate at most JITTER cells away from its
+            # lattice position, so the candidates closer to the new point than to
+            # the earlier ones are within this many cells of it
+            radius = math.floor(math.sqrt(distance) / cell + 2 * JITTER) + 1
+            window = tuple(slice(max(j - radius, 0), j + radius + 1) for j in index)
+        np.minimum(
+            distances[window],
+            ((candidates[window] - point) ** 2).sum(axis=-1),
+            out=distances[window],
+        )
+    return points
+
+
+def generate_device_values(
+    patch_count: int, gray_patch_count: int, seed: int = DEFAULT_SEED
+) -> np.ndarray:
+    """Return the device values of a target.
+
+    Args:
+        patch_count (int): The total number of patches.
+        gray_patch_count (int): The number of gray axis steps.
+        seed (int): The seed of the lattice jitter.
+
+    Raises:
+        TypeError: If patch_count, gray_patch_count or seed is not an int.
+        ValueError: If patch_count is smaller than the number of gray axis steps.
+
+    Returns:
+        np.ndarray: The (patch_count, 3) RGB values in 0-100 range, the gray axis
+            first.
+    """
+    for name, value in [
+        ("patch_count", patch_count),
+        ("gray_patch_count", gray_patch_count),
+        ("seed", seed),
+    ]:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise TypeError(f"{name} should be an int, not {value.__class__.__name__}")
+
+    gray = gray_axis(gray_patch_count)
+    if patch_count < len(gray):
+        raise ValueError(
+            f"patch_count should be at least {len(gray)}, not {patch_count}"
+        )
+    fill = farthest_point_sampling(patch_count - len(gray), fixed=gray, seed=seed)
+    return np.concatenate([gray, fill]) * 100.0
+
+
+def estimate_xyz(
+    device_values: np.ndarray,
+    profile_path: Union[None, str, pathlib.Path] = None,
+) -> np.ndarray:
+    """Return the expected XYZ values of the given device values.
+
+    chartread uses them to detect the misread strips.
+
+    Args:
+        device_values (np.ndarray): The (N, 3) RGB values in 0-100 range.
+        profile_path (Union[None, str, pathlib.Path]): The profile of the printer,
+            default is sRGB.
+
+    Returns:
+        np.ndarray: The (N, 3) XYZ values in 0-100 range.
+    """
+    if profile_path is None:
+        profile_path = transform.get_image_profile_path("sRGB")
+    with ICCProfile(profile_path) as profile:
+        xyz = transform.device_to_xyz(
+            profile, device_values / 100.0, transform.INTENTS["r"]
+        )
+    return xyz * 100.0
+
+
+def build_ti1(
+    device_values: np.ndarray,
+    profile_path: Union[None, str, pathlib.Path] = None,
+) -> CGATS:
+    """Return the .ti1 file of the given device values.
+
+    Args:
+        device_values (np.ndarray): The (N, 3) RGB values in 0-100 range.
+        profile_path (Union[None, str, pathlib.Path]): The profile to estimate the
+            XYZ values with, default is sRGB.
+
+    Returns:
+        CGATS: The patches table and the density extremes table.
+    """
+    # no creation date, the same values always produce the same file
+    keywords = {"DESCRIPTOR": DESCRIPTOR, "ORIGINATOR": ORIGINATOR}
+    xyz = estimate_xyz(device_values, profile_path)
+    white = estimate_xyz(np.full((1, 3), 100.0), profile_path)[0]
+
+    patches = CGATSTable(
+        "CTI1",
+        keywords=dict(
+            keywords,
+            APPROX_WHITE_POINT=" ".join(f"{value:.6f}" for value in white),
+            COLOR_REP="RGB",
+        ),
+    )
+    patches["SAMPLE_ID"] = np.arange(1, len(device_values) + 1)
+    patches.set_columns(RGB_FIELDS, device_values)
+    patches.set_columns(XYZ_FIELDS, xyz)
+
+    # the corners of the device cube
+    corners = np.stack(np.indices((2, 2, 2)), axis=-1).reshape(-1, 3) * 100.0
+    extremes = CGATSTable(
+        "CTI1",
+        keywords=dict(keywords, DENSITY_EXTREME_VALUES=str(len(corners))),
+    )
+    extremes["INDEX"] = np.arange(len(corners))
+    extremes.set_columns(RGB_FIELDS, corners)
+    extremes.set_columns(XYZ_FIELDS, estimate_xyz(corners, profile_path))
+    return CGATS([patches, extremes])
+
+
+def generate_target(
+    base_path: Union[str, pathlib.Path],
+    patch_count: int,
+    gray_patch_count: int,
+    seed: int = DEFAULT_SEED,
+    profile_path: Union[None, str, pathlib.Path] = None,
+) -> pathlib.Path:
+    """Generate the .ti1 file of an RGB printer target.
+
+    Args:
+        base_path (Union[str, pathlib.Path]): The output path without the extension.
+        patch_count (int): The total number of patches.
+        gray_patch_count (int): The number of gray axis steps.
+        seed (int): The seed of the lattice jitter.
+        profile_path (Union[None, str, pathlib.Path]): The profile to estimate the
+            XYZ values with, default is sRGB.
+
+    Returns:
+        pathlib.Path: The .ti1 file path.
+    """
+    device_values = generate_device_values(patch_count, gray_patch_count, seed=seed)
+    ti1_path = pathlib.Path(f"{base_path}.ti1")
+    build_ti1(device_values, profile_path).write(ti1_path)
+    return ti1_path
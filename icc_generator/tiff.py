@@ -0,0 +1,619 @@
+# -*- coding: utf-8 -*-
+"""Minimal baseline TIFF reader and writer working strip by strip.
+
+Supports 8 and 16-bit, chunky (interleaved) images with uncompressed or Deflate
+compressed strips or tiles, which is what ArgyllCMS and most of the print preparation
+tools write. The reader yields the image in bands of rows, decompressing large strips
+incrementally, and the writer appends the strips as they are filled and writes the
+IFD at the end of the file, so an image of any size can be read and written with a
+bounded amount of memory.
+"""
+
+import pathlib
+import struct
+import zlib
+from typing import Iterator, Union
+
+import numpy as np
+
+
+# tag ids
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+PHOTOMETRIC = 262
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+ROWS_PER_STRIP = 278
+STRIP_BYTE_COUNTS = 279
+X_RESOLUTION = 282
+Y_RESOLUTION = 283
+PLANAR_CONFIGURATION = 284
+RESOLUTION_UNIT = 296
+PREDICTOR = 317
+TILE_WIDTH = 322
+TILE_LENGTH = 323
+TILE_OFFSETS = 324
+TILE_BYTE_COUNTS = 325
+EXTRA_SAMPLES = 338
+SAMPLE_FORMAT = 339
+ICC_PROFILE = 34675
+
+# compression ids
+COMPRESSION_NONE = 1
+COMPRESSION_DEFLATE = 8
+COMPRESSION_DEFLATE_OLD = 32946
+
+COMPRESSIONS = {"none": COMPRESSION_NONE, "deflate": COMPRESSION_DEFLATE}
+
+# field types and their sizes
+SHORT = 3
+LONG = 4
+RATIONAL = 5
+UNDEFINED = 7
+TYPE_FORMATS = {1: "B", 2: "c", 3: "H", 4: "I", 5: "II", 6: "b", 7: "B", 8: "h", 9: "i"}
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4}
+
+# photometric interpretations
+PHOTOMETRIC_MINISBLACK = 1
+PHOTOMETRIC_RGB = 2
+PHOTOMETRIC_SEPARATED = 5
+
+DEFAULT_STRIP_SIZE = 256 * 1024
+
+# the uncompressed size of the bands yielded by TiffReader.iter_bands()
+DEFAULT_BAND_SIZE = 4 * 1024 * 1024
+
+# the size of the compressed data read at once while decompressing a strip
+READ_SIZE = 256 * 1024
+
+
+class TiffReader(object):
+    """Reads a baseline TIFF file strip by strip.
+
+    Args:
+        path (Union[str, pathlib.Path]): The TIFF file path.
+
+    Raises:
+        TypeError: If the given path is not a str or pathlib.Path instance.
+        RuntimeError: If the given path doesn't exist.
+        ValueError: If the file is not a supported TIFF file.
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path]):
+        if not path or not isinstance(path, (str, pathlib.Path)):
+            raise TypeError("Please specify a valid path")
+
+        self.path = pathlib.Path(path)
+        if not self.path.exists():
+            raise RuntimeError(f"File does not exist!: {self.path}")
+
+        self._file = open(self.path, "rb")
+        try:
+            self._read_header()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _read_header(self):
+        """Read the header and the first IFD.
+
+        Raises:
+            ValueError: If the file is not a supported TIFF file.
+        """
+        header = self._file.read(8)
+        if header[:2] == b"II":
+            self.byte_order = "<"
+        elif header[:2] == b"MM":
+            self.byte_order = ">"
+        else:
+            raise ValueError(f"Not a TIFF file: {self.path}")
+
+        magic, ifd_offset = struct.unpack(f"{self.byte_order}HI", header[2:8])
+        if magic != 42:
+            raise ValueError(f"Not a TIFF file: {self.path}")
+
+        self.tags = self._read_ifd(ifd_offset)
+
+        self.width = self.tags[IMAGE_WIDTH][0]
+        self.height = self.tags[IMAGE_LENGTH][0]
+        self.samples_per_pixel = self.tags.get(SAMPLES_PER_PIXEL, [1])[0]
+        self.bits_per_sample = self.tags.get(BITS_PER_SAMPLE, [1])[0]
+        self.compression = self.tags.get(COMPRESSION, [COMPRESSION_NONE])[0]
+        self.photometric = self.tags.get(PHOTOMETRIC, [PHOTOMETRIC_RGB])[0]
+        self.predictor = self.tags.get(PREDICTOR, [1])[0]
+        self.planar_configuration = self.tags.get(PLANAR_CONFIGURATION, [1])[0]
+        self.rows_per_strip = min(
+            self.tags.get(ROWS_PER_STRIP, [self.height])[0], self.height
+        )
+        self.strip_offsets = self.tags.get(STRIP_OFFSETS, [])
+        self.strip_byte_counts = self.tags.get(STRIP_BYTE_COUNTS, [])
+        self.tile_width = self.tags.get(TILE_WIDTH, [0])[0]
+        self.tile_length = self.tags.get(TILE_LENGTH, [0])[0]
+        self.tile_offsets = self.tags.get(TILE_OFFSETS, [])
+        self.tile_byte_counts = self.tags.get(TILE_BYTE_COUNTS, [])
+
+        icc_profile = self.tags.get(ICC_PROFILE)
+        self.icc_profile = bytes(icc_profile) if icc_profile else None
+
+    def _read_ifd(self, offset: int) -> dict:
+        """Read the IFD at the given offset.
+
+        Args:
+            offset (int): The IFD offset.
+
+        Returns:
+            dict: The tag ids and their values as lists.
+        """
+        self._file.seek(offset)
+        (entry_count,) = struct.unpack(f"{self.byte_order}H", self._file.read(2))
+        entries = self._file.read(12 * entry_count)
+        tags = {}
+        for i in range(entry_count):
+            tag, field_type, count, value = struct.unpack(
+                f"{self.byte_order}HHI4s", entries[12 * i : 12 * i + 12]
+            )
+            if field_type not in TYPE_FORMATS:
+                continue
+            size = TYPE_SIZES[field_type] * count
+            if size > 4:
+                (value_offset,) = struct.unpack(f"{self.byte_order}I", value)
+                position = self._file.tell()
+                self._file.seek(value_offset)
+                value = self._file.read(size)
+                self._file.seek(position)
+            if field_type in [2, UNDEFINED]:
+                tags[tag] = value[:size]
+                continue
+            values = struct.unpack(
+                f"{self.byte_order}{count * len(TYPE_FORMATS[field_type])}"
+                f"{TYPE_FORMATS[field_type][0]}",
+                value[:size],
+            )
+            tags[tag] = list(values)
+        return tags
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Return the dtype of the samples.
+
+        Returns:
+            np.dtype: uint8 or uint16.
+        """
+        return np.dtype(np.uint16 if self.bits_per_sample == 16 else np.uint8)
+
+    @property
+    def shape(self) -> tuple:
+        """Return the shape of the image.
+
+        Returns:
+            tuple: The (height, width, samples_per_pixel) shape.
+        """
+        return self.height, self.width, self.samples_per_pixel
+
+    @property
+    def is_tiled(self) -> bool:
+        """Return True if the image is stored in tiles.
+
+        Returns:
+            bool: True if the image is tiled.
+        """
+        return bool(self.tile_offsets)
+
+    @property
+    def row_size(self) -> int:
+        """Return the size of an uncompressed row in bytes.
+
+        Returns:
+            int: The row size in bytes.
+        """
+        return self.width * self.samples_per_pixel * self.dtype.itemsize
+
+    @property
+    def dpi(self) -> Union[None, float]:
+        """Return the horizontal resolution in dots per inch.
+
+        Returns:
+            Union[None, float]: The resolution or None if it is not defined.
+        """
+        resolution = self.tags.get(X_RESOLUTION)
+        if not resolution or not resolution[1]:
+            return None
+        dpi = resolution[0] / resolution[1]
+        if self.tags.get(RESOLUTION_UNIT, [2])[0] == 3:
+            # dots per centimeter
+            dpi *= 2.54
+        return dpi
+
+    @property
+    def is_supported(self) -> bool:
+        """Return True if the image can be read by this reader.
+
+        Returns:
+            bool: True if the image layout and compression is supported.
+        """
+        return (
+            self.bits_per_sample in [8, 16]
+            and self.compression
+            in [COMPRESSION_NONE, COMPRESSION_DEFLATE, COMPRESSION_DEFLATE_OLD]
+            and self.predictor in [1, 2]
+            and (self.planar_configuration == 1 or self.samples_per_pixel == 1)
+            and bool(self.strip_offsets or self.tile_offsets)
+        )
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+    def __enter__(self) -> "TiffReader":
+        """Enter the context.
+
+        Returns:
+            TiffReader: This reader.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close the file when exiting the context."""
+        self.close()
+
+    def _decode(self, data: bytes, rows: int, width: int) -> np.ndarray:
+        """Decode the uncompressed rows.
+
+        Args:
+            data (bytes): The uncompressed data.
+            rows (int): The number of rows in the data.
+            width (int): The number of pixels in a row.
+
+        Returns:
+            np.ndarray: The (rows, width, samples_per_pixel) pixels.
+        """
+        dtype = self.dtype.newbyteorder(self.byte_order)
+        count = rows * width * self.samples_per_pixel
+        pixels = np.frombuffer(data, dtype=dtype, count=count).reshape(
+            rows, width, self.samples_per_pixel
+        )
+        if self.predictor == 2:
+            # horizontal differencing, wraps around like the integer arithmetic
+            pixels = np.cumsum(pixels, axis=1, dtype=dtype)
+        return pixels.astype(self.dtype, copy=False)
+
+    def _iter_strip_bands(
+        self, offset: int, byte_count: int, rows: int, band_rows: int
+    ) -> Iterator[np.ndarray]:
+        """Iterate over the given strip in bands of rows.
+
+        Compressed strips are decompressed incrementally, so a strip is never fully
+        loaded to the memory.
+
+        Args:
+            offset (int): The strip offset.
+            byte_count (int): The strip size in the file.
+            rows (int): The number of rows in the strip.
+            band_rows (int): The maximum number of rows in a band.
+
+        Raises:
+            ValueError: If the strip data is truncated.
+
+        Yields:
+            np.ndarray: The (rows, width, samples_per_pixel) pixels of the bands.
+        """
+        if self.compression == COMPRESSION_NONE:
+            for row in range(0, rows, band_rows):
+                count = min(band_rows, rows - row)
+                self._file.seek(offset + row * self.row_size)
+                yield self._decode(
+                    self._file.read(count * self.row_size), count, self.width
+                )
+            return
+
+        decompressor = zlib.decompressobj()
+        remaining = byte_count
+        self._file.seek(offset)
+        buffer = bytearray()
+        for row in range(0, rows, band_rows):
+            count = min(band_rows, rows - row)
+            size = count * self.row_size
+            while len(buffer) < size:
+                if decompressor.unconsumed_tail:
+                    chunk = decompressor.unconsumed_tail
+                elif remaining:
+                    chunk = self._file.read(min(remaining, READ_SIZE))
+                    remaining -= len(chunk)
+                else:
+                    raise ValueError(f"Truncated TIFF strip: {self.path}")
+                buffer += decompressor.decompress(chunk, size - len(buffer))
+            yield self._decode(bytes(buffer[:size]), count, self.width)
+            del buffer[:size]
+
+    def _iter_tile_bands(self) -> Iterator[tuple]:
+        """Iterate over the rows of tiles.
+
+        Yields:
+            (int, np.ndarray): The index of the first row and the (rows, width,
+                samples_per_pixel) pixels of the row of tiles.
+        """
+        tiles_across = -(-self.width // self.tile_width)
+        tile_size = self.tile_length * self.tile_width * self.samples_per_pixel
+        tile_size *= self.dtype.itemsize
+        for row in range(0, self.height, self.tile_length):
+            rows = min(self.tile_length, self.height - row)
+            band = np.empty((rows, self.width, self.samples_per_pixel), self.dtype)
+            first_tile = (row // self.tile_length) * tiles_across
+            for column in range(tiles_across):
+                index = first_tile + column
+                self._file.seek(self.tile_offsets[index])
+                data = self._file.read(self.tile_byte_counts[index])
+                if self.compression != COMPRESSION_NONE:
+                    data = zlib.decompress(data)
+                tile = self._decode(data[:tile_size], self.tile_length, self.tile_width)
+                x = column * self.tile_width
+                band[:, x : x + self.tile_width] = tile[:rows, : self.width - x]
+            yield row, band
+
+    def iter_bands(self, band_size: int = DEFAULT_BAND_SIZE) -> Iterator[tuple]:
+        """Iterate over the image in bands of rows.
+
+        Strips are split to bands of around the given size, the bands of tiled images
+        are the rows of tiles.
+
+        Args:
+            band_size (int): The maximum uncompressed size of a band in bytes, at
+                least one row is always yielded.
+
+        Raises:
+            ValueError: If the image is not supported.
+
+        Yields:
+            (int, np.ndarray): The index of the first row and the (rows, width,
+                samples_per_pixel) pixels of the band.
+        """
+        if not self.is_supported:
+            raise ValueError(f"Unsupported TIFF layout: {self.path}")
+
+        if self.is_tiled:
+            yield from self._iter_tile_bands()
+            return
+
+        band_rows = max(1, band_size // self.row_size)
+        for i, (offset, byte_count) in enumerate(
+            zip(self.strip_offsets, self.strip_byte_counts)
+        ):
+            row = i * self.rows_per_strip
+            rows = min(self.rows_per_strip, self.height - row)
+            for band in self._iter_strip_bands(offset, byte_count, rows, band_rows):
+                yield row, band
+                row += len(band)
+
+    def read(self) -> np.ndarray:
+        """Read the whole image.
+
+        Returns:
+            np.ndarray: The (height, width, samples_per_pixel) pixels.
+        """
+        pixels = np.empty(self.shape, dtype=self.dtype)
+        for row, band in self.iter_bands():
+            pixels[row : row + len(band)] = band
+        return pixels
+
+
+class TiffWriter(object):
+    """Writes a baseline TIFF file strip by strip.
+
+    The rows are buffered until a strip is filled and then written to the file, the
+    IFD is written when the writer is closed.
+
+    Args:
+        path (Union[str, pathlib.Path]): The output path.
+        width (int): The image width.
+        height (int): The image height.
+        samples_per_pixel (int): The number of samples per pixel, i.e. 3 for RGB.
+        dtype (np.dtype): The sample type, uint8 or uint16.
+        compression (str): "none" (default) or "deflate".
+        rows_per_strip (int): The number of rows per strip, default is calculated to
+            have around 256 KB uncompressed strips.
+        icc_profile (bytes): The ICC profile data to embed.
+        dpi (float): The resolution in dots per inch.
+
+    Raises:
+        ValueError: If the dtype or the compression is not supported.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, pathlib.Path],
+        width: int,
+        height: int,
+        samples_per_pixel: int = 3,
+        dtype: np.dtype = np.uint8,
+        compression: str = "none",
+        rows_per_strip: Union[None, int] = None,
+        icc_profile: Union[None, bytes] = None,
+        dpi: Union[None, float] = None,
+    ):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in [np.dtype(np.uint8), np.dtype(np.uint16)]:
+            raise ValueError(f"dtype should be uint8 or uint16, not {self.dtype}")
+
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"compression should be one of none or deflate, not {compression}"
+            )
+
+        self.path = pathlib.Path(path)
+        self.width = width
+        self.height = height
+        self.samples_per_pixel = samples_per_pixel
+        self.compression = compression
+        self.icc_profile = icc_profile
+        self.dpi = dpi
+
+        row_size = width * samples_per_pixel * self.dtype.itemsize
+        if rows_per_strip is None:
+            rows_per_strip = max(1, DEFAULT_STRIP_SIZE // row_size)
+        self.rows_per_strip = min(rows_per_strip, height)
+
+        self.strip_offsets = []
+        self.strip_byte_counts = []
+        self.rows_written = 0
+        self._pending = []
+        self._pending_rows = 0
+
+        self._file = open(self.path, "wb")
+        # the IFD offset is patched when closing
+        self._file.write(b"II" + struct.pack("<HI", 42, 0))
+
+    def __enter__(self) -> "TiffWriter":
+        """Enter the context.
+
+        Returns:
+            TiffWriter: This writer.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close the writer when exiting the context."""
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def write(self, rows: np.ndarray):
+        """Write the given rows.
+
+        Args:
+            rows (np.ndarray): The (rows, width, samples_per_pixel) pixels.
+
+        Raises:
+            ValueError: If the rows doesn't match the image layout or there are more
+                rows than the image height.
+        """
+        rows = np.asarray(rows)
+        if rows.ndim == 2:
+            rows = rows[:, :, None]
+        if rows.shape[1:] != (self.width, self.samples_per_pixel):
+            raise ValueError(
+                f"rows should be of shape (N, {self.width}, "
+                f"{self.samples_per_pixel}), not {rows.shape}"
+            )
+        if self.rows_written + self._pending_rows + len(rows) > self.height:
+            raise ValueError(f"Image has only {self.height} rows")
+
+        self._pending.append(rows.astype(self.dtype, copy=False))
+        self._pending_rows += len(rows)
+        while self._pending_rows >= self.rows_per_strip:
+            self._flush_strip(self.rows_per_strip)
+
+    def _flush_strip(self, row_count: int):
+        """Write the given number of pending rows as a strip.
+
+        Args:
+            row_count (int): The number of rows to write.
+        """
+        pending = self._pending[0]
+        if len(self._pending) > 1:
+            pending = np.concatenate(self._pending)
+        strip, rest = pending[:row_count], pending[row_count:]
+        self._pending = [rest] if len(rest) else []
+        self._pending_rows = len(rest)
+
+        data = np.ascontiguousarray(strip, dtype=self.dtype.newbyteorder("<")).tobytes()
+        if self.compression == "deflate":
+            data = zlib.compress(data, 6)
+
+        self.strip_offsets.append(self._file.tell())
+        self.strip_byte_counts.append(len(data))
+        self._file.write(data)
+        if len(data) % 2:
+            # keep the offsets word aligned
+            self._file.write(b"\x00")
+        self.rows_written += row_count
+
+    def abort(self):
+        """Close and delete the partially written file."""
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+    def close(self):
+        """Flush the pending rows and write the IFD.
+
+        Raises:
+            ValueError: If not all the rows are written.
+        """
+        if self._file.closed:
+            return
+        if self._pending_rows:
+            self._flush_strip(self._pending_rows)
+        if self.rows_written != self.height:
+            self._file.close()
+            raise ValueError(
+                f"Only {self.rows_written} of {self.height} rows are written"
+            )
+
+        photometric = PHOTOMETRIC_MINISBLACK
+        if self.samples_per_pixel >= 4:
+            photometric = PHOTOMETRIC_SEPARATED
+        elif self.samples_per_pixel == 3:
+            photometric = PHOTOMETRIC_RGB
+
+        bits_per_sample = self.dtype.itemsize * 8
+        entries = [
+            (IMAGE_WIDTH, LONG, [self.width]),
+            (IMAGE_LENGTH, LONG, [self.height]),
+            (BITS_PER_SAMPLE, SHORT, [bits_per_sample] * self.samples_per_pixel),
+            (COMPRESSION, SHORT, [COMPRESSIONS[self.compression]]),
+            (PHOTOMETRIC, SHORT, [photometric]),
+            (STRIP_OFFSETS, LONG, self.strip_offsets),
+            (SAMPLES_PER_PIXEL, SHORT, [self.samples_per_pixel]),
+            (ROWS_PER_STRIP, LONG, [self.rows_per_strip]),
+            (STRIP_BYTE_COUNTS, LONG, self.strip_byte_counts),
+            (PLANAR_CONFIGURATION, SHORT, [1]),
+        ]
+        if self.dpi:
+            resolution = [int(round(self.dpi * 1000)), 1000]
+            entries += [
+                (X_RESOLUTION, RATIONAL, resolution),
+                (Y_RESOLUTION, RATIONAL, resolution),
+                (RESOLUTION_UNIT, SHORT, [2]),
+            ]
+        if self.icc_profile:
+            entries.append((ICC_PROFILE, UNDEFINED, self.icc_profile))
+        self._write_ifd(sorted(entries, key=lambda entry: entry[0]))
+        self._file.close()
+
+    def _write_ifd(self, entries: list):
+        """Write the IFD at the end of the file and patch the header.
+
+        Args:
+            entries (list): The (tag, type, values) entries sorted by tag.
+        """
+        ifd_offset = self._file.tell()
+        ifd_offset += ifd_offset % 2
+        data_offset = ifd_offset + 2 + 12 * len(entries) + 4
+
+        ifd = struct.pack("<H", len(entries))
+        extra = b""
+        for tag, field_type, values in entries:
+            if field_type == UNDEFINED:
+                value = bytes(values)
+                count = len(value)
+            else:
+                value_format = TYPE_FORMATS[field_type][0]
+                value = struct.pack(f"<{len(values)}{value_format}", *values)
+                count = len(values) // len(TYPE_FORMATS[field_type])
+            if len(value) <= 4:
+                ifd += struct.pack("<HHI", tag, field_type, count) + value.ljust(
+                    4, b"\x00"
+                )
+            else:
+                ifd += struct.pack(
+                    "<HHII", tag, field_type, count, data_offset + len(extra)
+                )
+                extra += value + b"\x00" * (len(value) % 2)
+        ifd += struct.pack("<I", 0)
+
+        self._file.seek(ifd_offset)
+        self._file.write(ifd + extra)
+        self._file.seek(4)
+        self._file.write(struct.pack("<I", ifd_offset))
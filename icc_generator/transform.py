@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+"""In-process color transforms between ICC profiles.
+
+A ColorTransform is a device link, a 3D lookup table sampled by converting a regular
+grid of source device values through the source profile to the PCS and then through
+the destination profile to the destination device values. The table is then applied
+to the pixels with vectorized tetrahedral interpolation.
+
+Building the table is the costly part, so the transforms are cached per process and
+are rebuilt only if any of the profile files changes. The tables are also stored in an
+on-disk cache (see the lut_cache module) shared by all the processes.
+
+Example:
+
+    from icc_generator import transform
+
+    transform.correct_image(
+        "data/AdobeRGB.icc", "printer.icc", "photo.jpg", "photo_corrected.tif"
+    )
+"""
+
+import functools
+import pathlib
+from typing import Union
+
+import numpy as np
+
+from icc_generator import image, logger, streaming, tiff
+from icc_generator.colorimetry import lab_to_xyz, xyz_to_lab
+from icc_generator.icc import (
+    ICCProfile,
+    interpolate_curves,
+    interpolate_curves_inverse,
+)
+from icc_generator.lut_cache import LUTCache
+
+
+DATA_PATH = pathlib.Path(__file__).parent.parent.absolute() / "data"
+
+# the image profiles shipped in the data folder
+IMAGE_PROFILES = {
+    "adobergb": "AdobeRGB.icc",
+    "srgb": "sRGB.icc",
+    "prophoto": "ProPhoto.icm",
+}
+
+# rendering intent letters (as used by Argyll) to ICC rendering intents
+INTENTS = {"p": 0, "r": 1, "s": 2, "a": 1}
+
+DEFAULT_GRID_POINTS = 33
+
+# the number of pixels converted at once, limits the temporary memory
+CHUNK_SIZE = 1 << 18
+
+TRANSFORM_CACHE_SIZE = 16
+
+# the on-disk cache of the device link tables, set to None to disable it
+disk_cache = LUTCache()
+
+
+def get_image_profile_path(
+    image_profile: Union[None, str, pathlib.Path]
+) -> pathlib.Path:
+    """Return the path of the given image profile.
+
+    Args:
+        image_profile (Union[None, str, pathlib.Path]): One of "sRGB", "AdobeRGB" or
+            "ProPhoto" or a path to an ICC/ICM file, default (None) is "AdobeRGB".
+
+    Raises:
+        TypeError: If image_profile is not a str or pathlib.Path.
+        ValueError: If image_profile is not an existing file or the name of one of
+            the profiles in the data folder.
+
+    Returns:
+        pathlib.Path: The profile path.
+    """
+    if image_profile is None:
+        image_profile = "AdobeRGB"
+
+    if not isinstance(image_profile, (str, pathlib.Path)):
+        raise TypeError(
+            f"image_profile should be one of sRGB, AdobeRGB or ProPhoto, not "
+            f"{image_profile}"
+        )
+
+    image_profile = pathlib.Path(image_profile)
+    if image_profile.is_file():
+        return image_profile
+
+    base_name = image_profile.stem
+    if base_name.lower() not in IMAGE_PROFILES:
+        raise ValueError(
+            f"image_profile should be one of sRGB, AdobeRGB or ProPhoto, not "
+            f"{image_profile}"
+        )
+    return DATA_PATH / IMAGE_PROFILES[base_name.lower()]
+
+
+def tetrahedral_interpolation(lut: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Interpolate the given 3D lookup table with tetrahedral interpolation.
+
+    Every cube of the grid is split into six tetrahedra along its neutral diagonal,
+    so only four grid points are used for every value instead of eight.
+
+    Args:
+        lut (np.ndarray): The (g, g, g, out) lookup table.
+        values (np.ndarray): The (N, 3) input values in 0-1 range.
+
+    Returns:
+        np.ndarray: The (N, out) interpolated values.
+    """
+    grid_points = lut.shape[0]
+    flat = lut.reshape(-1, lut.shape[-1])
+    # 32-bit indices are enough for any practical grid and halve the temporary memory
+    strides = np.array([grid_points * grid_points, grid_points, 1], dtype=np.int32)
+
+    position = np.clip(values, 0.0, 1.0).astype(lut.dtype, copy=False) * (
+        grid_points - 1
+    )
+    base = np.minimum(position.astype(np.int32), np.int32(grid_points - 2))
+    fraction = position - base.astype(lut.dtype)
+    base_index = base @ strides
+
+    fr, fg, fb = fraction[:, 0], fraction[:, 1], fraction[:, 2]
+    high = np.maximum(np.maximum(fr, fg), fb)
+    low = np.minimum(np.minimum(fr, fg), fb)
+    middle = fr + fg + fb - high - low
+
+    # the first vertex steps along the largest fraction, the second one along the two
+    # largest fractions, which is all the channels but the smallest one
+    first = np.where(
+        fr == high, strides[0], np.where(fg == high, strides[1], strides[2])
+    )
+    diagonal = strides[0] + strides[1] + strides[2]
+    second = diagonal - np.where(
+        fb == low, strides[2], np.where(fg == low, strides[1], strides[0])
+    )
+
+    # np.take is considerably faster than fancy indexing for the row gathers
+    output = (1 - high)[:, None] * np.take(flat, base_index, axis=0)
+    output += (high - middle)[:, None] * np.take(flat, base_index + first, axis=0)
+    output += (middle - low)[:, None] * np.take(flat, base_index + second, axis=0)
+    output += low[:, None] * np.take(flat, base_index + diagonal, axis=0)
+    return output
+
+
+def device_to_xyz(profile: ICCProfile, values: np.ndarray, intent: int) -> np.ndarray:
+    """Convert the device values to PCS XYZ through the given profile.
+
+    Args:
+        profile (ICCProfile): The profile.
+        values (np.ndarray): The (N, channels) device values in 0-1 range.
+        intent (int): The ICC rendering intent.
+
+    Returns:
+        np.ndarray: The (N, 3) D50 relative XYZ values in 0-1 range.
+    """
+    if not any(signature.startswith("A2B") for signature in profile.tags):
+        linear = interpolate_curves(profile.trc_curves, values)
+        return linear @ profile.colorants.T
+    pcs = profile.device_to_pcs(values, intent)
+    return lab_to_xyz(pcs) if profile.pcs == "Lab" else pcs
+
+
+def xyz_to_device(profile: ICCProfile, xyz: np.ndarray, intent: int) -> np.ndarray:
+    """Convert the PCS XYZ values to device values through the given profile.
+
+    Args:
+        profile (ICCProfile): The profile.
+        xyz (np.ndarray): The (N, 3) D50 relative XYZ values in 0-1 range.
+        intent (int): The ICC rendering intent.
+
+    Raises:
+        ValueError: If the profile has neither a BToA table nor matrix/TRC tags.
+
+    Returns:
+        np.ndarray: The (N, channels) device values in 0-1 range.
+    """
+    if not any(signature.startswith("B2A") for signature in profile.tags):
+        if not profile.is_matrix_shaper:
+            raise ValueError(f"Profile has no B2A table: {profile.path}")
+        linear = xyz @ np.linalg.inv(profile.colorants).T
+        return interpolate_curves_inverse(profile.trc_curves, linear)
+    pcs = xyz_to_lab(xyz) if profile.pcs == "Lab" else xyz
+    return profile.pcs_to_device(pcs, intent)
+
+
+class ColorTransform(object):
+    """A device link transform applied with tetrahedral interpolation.
+
+    Args:
+        lut (np.ndarray): The (g, g, g, out) lookup table with values in 0-1 range.
+    """
+
+    def __init__(self, lut: np.ndarray):
+        self.lut = np.ascontiguousarray(lut, dtype=np.float32)
+
+    @property
+    def grid_points(self) -> int:
+        """Return the number of grid points per input channel.
+
+        Returns:
+            int: The number of grid points.
+        """
+        return self.lut.shape[0]
+
+    @property
+    def output_channels(self) -> int:
+        """Return the number of output channels.
+
+        Returns:
+            int: The number of output channels.
+        """
+        return self.lut.shape[-1]
+
+    @classmethod
+    def from_profiles(
+        cls,
+        source_profile: ICCProfile,
+        destination_profile: ICCProfile,
+        intent: str = "r",
+        grid_points: int = DEFAULT_GRID_POINTS,
+    ) -> "ColorTransform":
+        """Build the transform from the given RGB source profile to the destination.
+
+        Args:
+            source_profile (ICCProfile): The source (image) profile.
+            destination_profile (ICCProfile): The destination (printer) profile.
+            intent (str): Rendering intent, one of the following:
+
+                p = perceptual, r = relative colorimetric (default)
+                s = saturation, a = absolute colorimetric
+
+            grid_points (int): The number of grid points per channel.
+
+        Raises:
+            ValueError: If the intent is not one of p, r, s, a.
+
+        Returns:
+            ColorTransform: The transform.
+        """
+        if intent not in INTENTS:
+            raise ValueError(f"intent should be one of p, r, s, a, not {intent}")
+
+        grid = np.linspace(0.0, 1.0, grid_points)
+        values = np.stack(np.meshgrid(grid, grid, grid, indexing="ij"), axis=-1)
+        values = values.reshape(-1, 3)
+
+        xyz = device_to_xyz(source_profile, values, INTENTS[intent])
+        if intent == "a":
+            # keep the source media white instead of mapping it to the paper white
+            xyz = (
+                xyz * source_profile.white_point / destination_profile.white_point
+            )
+        device = xyz_to_device(destination_profile, xyz, INTENTS[intent])
+        return cls(
+            np.clip(device, 0.0, 1.0).reshape(
+                (grid_points,) * 3 + (device.shape[-1],)
+            )
+        )
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        """Apply the transform to the given values.
+
+        Args:
+            values (np.ndarray): The (N, 3) input values in 0-1 range.
+
+        Returns:
+            np.ndarray: The (N, output_channels) output values in 0-1 range.
+        """
+        return tetrahedral_interpolation(self.lut, values)
+
+    def apply_to_pixels(self, pixels: np.ndarray) -> np.ndarray:
+        """Apply the transform to the given image pixels.
+
+        The pixels are converted in chunks to limit the temporary memory. Only the
+        first three channels are used, any extra (i.e. alpha) channels are dropped and
+        grayscale pixels are used for all the three channels.
+
+        Args:
+            pixels (np.ndarray): The (..., channels) uint8 or uint16 pixels.
+
+        Returns:
+            np.ndarray: The (..., output_channels) pixels with the same dtype.
+        """
+        maximum = float(np.iinfo(pixels.dtype).max)
+        if pixels.shape[-1] < 3:
+            pixels = np.repeat(pixels[..., :1], 3, axis=-1)
+        rgb = pixels[..., :3].reshape(-1, 3)
+        output = np.empty((len(rgb), self.output_channels), dtype=pixels.dtype)
+        scale = np.float32(1.0 / maximum)
+        for start in range(0, len(rgb), CHUNK_SIZE):
+            chunk = rgb[start : start + CHUNK_SIZE].astype(np.float32) * scale
+            converted = self.apply(chunk) * maximum + 0.5
+            output[start : start + CHUNK_SIZE] = converted
+        return output.reshape(pixels.shape[:-1] + (self.output_channels,))
+
+
+@functools.lru_cache(maxsize=TRANSFORM_CACHE_SIZE)
+def _build_transform(
+    source_profile_path: str,
+    destination_profile_path: str,
+    intent: str,
+    grid_points: int,
+    source_stamp: tuple,
+    destination_stamp: tuple,
+) -> ColorTransform:
+    """Build and cache the transform.
+
+    The stamps are only used as part of the cache key, so the transform is rebuilt if
+    any of the files changes. The table is loaded from the on-disk cache if it has
+    been built before, by this or any other process. The on-disk cache is best
+    effort, the transform is returned even if it can't be stored.
+
+    Args:
+        source_profile_path (str): The source profile path.
+        destination_profile_path (str): The destination profile path.
+        intent (str): The rendering intent letter.
+        grid_points (int): The number of grid points per channel.
+        source_stamp (tuple): The modification time and size of the source profile.
+        destination_stamp (tuple): The modification time and size of the destination
+            profile.
+
+    Returns:
+        ColorTransform: The transform.
+    """
+    key = None
+    if disk_cache is not None:
+        key = disk_cache.key(
+            source_profile_path, destination_profile_path, intent, grid_points
+        )
+        lut = disk_cache.get(key)
+        if lut is not None:
+            return ColorTransform(lut)
+
+    with ICCProfile(source_profile_path) as source_profile, ICCProfile(
+        destination_profile_path
+    ) as destination_profile:
+        color_transform = ColorTransform.from_profiles(
+            source_profile, destination_profile, intent, grid_points
+        )
+
+    if disk_cache is not None:
+        try:
+            disk_cache.put(key, color_transform.lut)
+        except OSError as e:
+            # i.e. the disk is full or the cache folder is read-only
+            logger.warning(f"Can not store the transform in the LUT cache: {e}")
+    return color_transform
+
+
+def _stamp(path: pathlib.Path) -> tuple:
+    """Return the modification time and the size of the given file.
+
+    Args:
+        path (pathlib.Path): The file path.
+
+    Returns:
+        tuple: The modification time in nanoseconds and the size in bytes.
+    """
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_transform(
+    source_profile_path: Union[str, pathlib.Path],
+    destination_profile_path: Union[str, pathlib.Path],
+    intent: str = "r",
+    grid_points: int = DEFAULT_GRID_POINTS,
+) -> ColorTransform:
+    """Return the cached transform between the given profiles.
+
+    Args:
+        source_profile_path (Union[str, pathlib.Path]): The source profile path.
+        destination_profile_path (Union[str, pathlib.Path]): The destination profile
+            path.
+        intent (str): The rendering intent letter, one of p, r, s, a.
+        grid_points (int): The number of grid points per channel.
+
+    Raises:
+        RuntimeError: If any of the profiles doesn't exist.
+
+    Returns:
+        ColorTransform: The transform.
+    """
+    paths = []
+    for path in [source_profile_path, destination_profile_path]:
+        path = pathlib.Path(path).expanduser().resolve()
+        if not path.exists():
+            raise RuntimeError(f"File does not exist!: {path}")
+        paths.append(path)
+
+    return _build_transform(
+        str(paths[0]),
+        str(paths[1]),
+        intent,
+        grid_points,
+        _stamp(paths[0]),
+        _stamp(paths[1]),
+    )
+
+
+def clear_transform_cache():
+    """Clear the in-process transform cache."""
+    _build_transform.cache_clear()
+
+
+def correct_image(
+    source_profile_path: Union[str, pathlib.Path],
+    destination_profile_path: Union[str, pathlib.Path],
+    input_image_path: Union[str, pathlib.Path],
+    output_image_path: Union[str, pathlib.Path],
+    intent: str = "r",
+    grid_points: int = DEFAULT_GRID_POINTS,
+) -> pathlib.Path:
+    """Color correct the given image from the source profile to the destination.
+
+    TIFF to TIFF conversions are streamed band by band, so the memory use doesn't
+    depend on the image size, other images are loaded to the memory. The destination
+    profile is embedded to the output image.
+
+    Args:
+        source_profile_path (Union[str, pathlib.Path]): The image profile path.
+        destination_profile_path (Union[str, pathlib.Path]): The printer profile path.
+        input_image_path (Union[str, pathlib.Path]): The input TIFF/JPEG image path.
+        output_image_path (Union[str, pathlib.Path]): The output TIFF/JPEG image path.
+        intent (str): The rendering intent letter, one of p, r, s, a.
+        grid_points (int): The number of grid points per channel.
+
+    Returns:
+        pathlib.Path: The output image path.
+    """
+    color_transform = get_transform(
+        source_profile_path, destination_profile_path, intent, grid_points
+    )
+    icc_profile = pathlib.Path(destination_profile_path).read_bytes()
+    input_image_path = pathlib.Path(input_image_path)
+    output_image_path = pathlib.Path(output_image_path)
+
+    if all(
+        path.suffix.lower() in image.TIFF_EXTENSIONS
+        for path in [input_image_path, output_image_path]
+    ):
+        with tiff.TiffReader(input_image_path) as reader:
+            is_supported = reader.is_supported
+        if is_supported:
+            return streaming.stream_image(
+                color_transform, input_image_path, output_image_path, icc_profile
+            )
+
+    pixels, _ = image.read_image(input_image_path)
+    image.write_image(
+        output_image_path,
+        color_transform.apply_to_pixels(pixels),
+        icc_profile=icc_profile,
+    )
+    return output_image_path
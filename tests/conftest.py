@@ -2,11 +2,16 @@
 import glob
 import os
 import platform
+import struct
 
+import numpy as np
 import pytest
 import logging
 
+from icc_generator import transform
 from icc_generator.api import ICCGenerator
+from icc_generator.lut_cache import LUTCache
+from icc_generator.target_cache import TargetCache
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -115,3 +120,239 @@ def set_to_macos():
     platform.system = mock_platform_system
     yield None
     platform.system = orig_value
+
+
+def build_icc_profile(tags, device_class=b"prtr", color_space=b"RGB ", pcs=b"Lab "):
+    """Build an ICC profile from the given raw tags.
+
+    Args:
+        tags (dict): The tag signatures (bytes) and the raw tag data (bytes).
+        device_class (bytes): The profile/device class signature.
+        color_space (bytes): The data color space signature.
+        pcs (bytes): The PCS signature.
+
+    Returns:
+        bytes: The ICC profile data.
+    """
+    tag_table = struct.pack(">I", len(tags))
+    tag_data = b""
+    offset = 128 + 4 + 12 * len(tags)
+    for signature, data in tags.items():
+        # tags are 4 byte aligned
+        data += b"\x00" * (-len(data) % 4)
+        tag_table += struct.pack(">4sII", signature, offset + len(tag_data), len(data))
+        tag_data += data
+
+    size = 128 + len(tag_table) + len(tag_data)
+    header = struct.pack(
+        ">I4sI4s4s4s12s4s4sI4s4sQI3i4s",
+        size,
+        b"argl",
+        0x02100000,
+        device_class,
+        color_space,
+        pcs,
+        b"\x00" * 12,
+        b"acsp",
+        b"APPL",
+        0,
+        b"",
+        b"",
+        0,
+        0,
+        int(0.9642 * 65536),
+        int(1.0 * 65536),
+        int(0.8249 * 65536),
+        b"argl",
+    )
+    header += b"\x00" * (128 - len(header))
+    return header + tag_table + tag_data
+
+
+def build_xyz_tag(xyz):
+    """Build an XYZType tag.
+
+    Args:
+        xyz (list): The XYZ values.
+
+    Returns:
+        bytes: The tag data.
+    """
+    return b"XYZ \x00\x00\x00\x00" + struct.pack(
+        ">3i", *[int(round(v * 65536)) for v in xyz]
+    )
+
+
+def build_lut16_tag(clut, input_entries=2, output_entries=2):
+    """Build a lut16Type (mft2) tag with identity curves.
+
+    Args:
+        clut (np.ndarray): The (g, g, g, out) CLUT in 0-1 range.
+        input_entries (int): The number of input curve entries.
+        output_entries (int): The number of output curve entries.
+
+    Returns:
+        bytes: The tag data.
+    """
+    input_channels = clut.ndim - 1
+    output_channels = clut.shape[-1]
+    identity = np.array([[65536, 0, 0], [0, 65536, 0], [0, 0, 65536]], dtype=">i4")
+    data = b"mft2\x00\x00\x00\x00"
+    data += struct.pack(">BBBB", input_channels, output_channels, clut.shape[0], 0)
+    data += identity.tobytes()
+    data += struct.pack(">HH", input_entries, output_entries)
+    data += np.round(
+        np.tile(np.linspace(0, 65535, input_entries), input_channels)
+    ).astype(">u2").tobytes()
+    data += np.round(clut * 65535).astype(">u2").tobytes()
+    data += np.round(
+        np.tile(np.linspace(0, 65535, output_entries), output_channels)
+    ).astype(">u2").tobytes()
+    return data
+
+
+def device_to_lab(rgb):
+    """A linear device RGB (0-1) to L*a*b* function used by the test profiles.
+
+    Args:
+        rgb (np.ndarray): The (..., 3) RGB values in 0-1 range.
+
+    Returns:
+        np.ndarray: The (..., 3) L*a*b* values.
+    """
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    return np.stack(
+        [
+            5.0 + 90.0 * (0.25 * r + 0.65 * g + 0.1 * b),
+            80.0 * (r - g),
+            70.0 * (g - b),
+        ],
+        axis=-1,
+    )
+
+
+def build_printer_a2b_tag():
+    """Build the lut16 AToB tag of the device_to_lab function.
+
+    Returns:
+        bytes: The tag data.
+    """
+    grid_points = 9
+    grid = np.linspace(0.0, 1.0, grid_points)
+    rgb = np.stack(np.meshgrid(grid, grid, grid, indexing="ij"), axis=-1)
+    lab = device_to_lab(rgb)
+    # ICC v2 legacy 16-bit Lab encoding
+    encoded = np.empty_like(lab)
+    encoded[..., 0] = lab[..., 0] / 100.0 * 65280 / 65535
+    encoded[..., 1:] = (lab[..., 1:] + 128.0) / 255.0 * 65280 / 65535
+    return build_lut16_tag(encoded)
+
+
+def build_printer_b2a_tag():
+    """Build the lut16 BToA tag of the device_to_lab function.
+
+    Returns:
+        bytes: The tag data.
+    """
+    grid_points = 17
+    grid = np.linspace(0.0, 1.0, grid_points)
+    encoded = np.stack(np.meshgrid(grid, grid, grid, indexing="ij"), axis=-1)
+    # ICC v2 legacy 16-bit Lab encoding
+    lab = np.empty_like(encoded)
+    lab[..., 0] = encoded[..., 0] * 65535 / 65280 * 100.0
+    lab[..., 1:] = encoded[..., 1:] * 65535 / 256 - 128.0
+    return build_lut16_tag(np.clip(lab_to_device(lab), 0.0, 1.0))
+
+
+def lab_to_device(lab):
+    """The inverse of the device_to_lab function.
+
+    Args:
+        lab (np.ndarray): The (..., 3) L*a*b* values.
+
+    Returns:
+        np.ndarray: The (..., 3) RGB values, not clipped to 0-1 range.
+    """
+    matrix = np.array([[0.25, 0.65, 0.1], [1.0, -1.0, 0.0], [0.0, 1.0, -1.0]])
+    scaled = np.stack(
+        [(lab[..., 0] - 5.0) / 90.0, lab[..., 1] / 80.0, lab[..., 2] / 70.0], axis=-1
+    )
+    return scaled @ np.linalg.inv(matrix).T
+
+
+@pytest.fixture(scope="function")
+def printer_profile_path(tmp_path):
+    """Create a lut16 based RGB printer profile for the device_to_lab function."""
+    path = tmp_path / "printer_profile.icc"
+    path.write_bytes(
+        build_icc_profile(
+            {
+                b"wtpt": build_xyz_tag([0.9642, 1.0, 0.8249]),
+                b"A2B0": build_printer_a2b_tag(),
+            }
+        )
+    )
+    yield path
+
+
+@pytest.fixture(scope="function")
+def rgb_printer_profile_path(tmp_path):
+    """Create a lut16 based RGB printer profile with AToB and BToA tables."""
+    b2a = build_printer_b2a_tag()
+    path = tmp_path / "rgb_printer_profile.icc"
+    path.write_bytes(
+        build_icc_profile(
+            {
+                b"wtpt": build_xyz_tag([0.9642, 1.0, 0.8249]),
+                b"A2B0": build_printer_a2b_tag(),
+                b"B2A0": b2a,
+                b"B2A1": b2a,
+            }
+        )
+    )
+    yield path
+
+
+@pytest.fixture(scope="function", autouse=True)
+def isolate_lut_cache(tmp_path, monkeypatch):
+    """Use a temporary on-disk LUT cache."""
+    lut_cache = LUTCache(tmp_path / "lut_cache")
+    monkeypatch.setattr(transform, "disk_cache", lut_cache)
+    yield lut_cache
+
+
+@pytest.fixture(scope="function")
+def isolate_target_cache(tmp_path, monkeypatch):
+    """Use a temporary target cache."""
+    target_cache = TargetCache(tmp_path / "target_cache")
+    monkeypatch.setattr(ICCGenerator, "target_cache", target_cache)
+    yield target_cache
+
+
+@pytest.fixture(scope="function")
+def fake_argyll(monkeypatch):
+    """Replace the ArgyllCMS tools with fakes that write their output files."""
+    commands = []
+
+    def run_external_process(self, command, shell=False):
+        commands.append(command[0])
+        base_path = command[-1]
+        if command[0] == "targen":
+            with open(f"{base_path}.ti1", "w") as f:
+                f.write(" ".join(command))
+        elif command[0] == "printtarg":
+            with open(f"{base_path}.ti1", "r") as f:
+                ti1 = f.read()
+            for extension in [".ti2", ".tif"]:
+                with open(f"{base_path}{extension}", "w") as f:
+                    f.write(ti1)
+        elif command[0] == "colprof":
+            with open(f"{base_path}.ti3", "r") as f:
+                ti3 = f.read()
+            # colprof writes *.icm files on windows
+            with open(self.check_profile_paths()[1], "w") as f:
+                f.write(ti3)
+        yield ""
+
+    monkeypatch.setattr(ICCGenerator, "run_external_process", run_external_process)
+    yield commands
@@ -1042,6 +1042,81 @@ def test_generate_target_without_precondition_profile_attr(file_collector, patch
     assert precondition_profile_path not in commands[-1]
 
 
+@pytest.fixture(scope="function")
+def saved_sessions(tmp_path):
+    """Create the earlier sessions of a printer with their profiles."""
+
+    def new_session(profile_date, paper_model, paper_finish="Glossy", ink_brand="Ink"):
+        icc_gen = ICCGenerator(
+            paper_model=paper_model, paper_finish=paper_finish, ink_brand=ink_brand
+        )
+        icc_gen.profile_date = profile_date
+        icc_gen._profile_path_template = str(
+            tmp_path / "{printer_brand}_{printer_model}" / "{profile_date}"
+        )
+        icc_gen.target_cache = None
+        return icc_gen
+
+    for profile_date, paper_model, paper_finish, ink_brand in [
+        ("20240110", "Pro", "Glossy", "Ink"),
+        ("20240220", "Plus", "Glossy", "Ink"),
+        ("20240301", "Pro", "Matte", "Ink"),
+        ("20240302", "Pro", "Glossy", "Refill"),
+    ]:
+        icc_gen = new_session(profile_date, paper_model, paper_finish, ink_brand)
+        icc_gen.save_settings()
+        _, icc_path = icc_gen.check_profile_paths()
+        pathlib.Path(icc_path).write_text("profile")
+    yield new_session
+
+
+def test_find_precondition_profile_prefers_the_same_paper(saved_sessions):
+    """The latest profile of the same paper, printer, ink and finish is found."""
+    icc_gen = saved_sessions("20240401", "Pro")
+    profile_path = icc_gen.find_precondition_profile()
+    assert profile_path.parent.name == "20240110"
+
+    # the latest one of a similar paper if the same paper is not profiled yet
+    icc_gen = saved_sessions("20240401", "Lustre")
+    assert icc_gen.find_precondition_profile().parent.name == "20240220"
+
+    icc_gen = saved_sessions("20240401", "Pro", ink_brand="Other")
+    assert icc_gen.find_precondition_profile() is None
+
+
+def test_generate_target_auto_precondition(saved_sessions, patch_run_external_process):
+    """The closest earlier profile is passed to targen with auto_precondition."""
+    icc_gen = saved_sessions("20240401", "Pro")
+    icc_gen.generate_target()
+    assert "-c" not in patch_run_external_process[-1]
+
+    icc_gen.generate_target(auto_precondition=True)
+    command = patch_run_external_process[-1]
+    assert command[command.index("-c") + 1] == str(
+        icc_gen.find_precondition_profile()
+    )
+
+    # the found profile is only used for that target
+    assert icc_gen.precondition_profile_path == ""
+    icc_gen.generate_target()
+    assert "-c" not in patch_run_external_process[-1]
+
+
+def test_find_precondition_profile_uses_the_catalog(
+    saved_sessions, tmp_path, monkeypatch
+):
+    """The profiles are looked up in the catalog if it is set."""
+    from icc_generator.catalog import ProfileCatalog
+
+    catalog = ProfileCatalog(tmp_path / "catalog.sqlite")
+    catalog.index(tmp_path)
+    monkeypatch.setattr(ICCGenerator, "catalog", catalog)
+    icc_gen = saved_sessions("20240401", "Pro")
+    # the sessions are not scanned
+    monkeypatch.setattr(ICCGenerator, "_saved_sessions", None)
+    assert icc_gen.find_precondition_profile().parent.name == "20240110"
+
+
 def test_generate_tif_files_will_generate_tif_files_from_target_file(file_collector):
     """generate_tif_files will generate tif file or files from target file."""
     icc_gen = ICCGenerator()
@@ -1901,7 +1976,8 @@ def test_color_correct_image_image_profile_is_not_a_str(file_collector):
         )
 
     assert (
-        str(cm.value) == "image_profile should be one of sRGB or AdobeRGB, not 123123"
+        str(cm.value)
+        == "image_profile should be one of sRGB, AdobeRGB or ProPhoto, not 123123"
     )
 
 
@@ -1926,7 +2002,8 @@ def test_color_correct_image_image_profile_is_not_correct_enum_value(file_collec
 
     assert (
         str(cm.value)
-        == "image_profile should be one of sRGB or AdobeRGB, not %s" % image_profile
+        == "image_profile should be one of sRGB, AdobeRGB or ProPhoto, not %s"
+        % image_profile
     )
 
 
@@ -1968,7 +2045,7 @@ def test_color_correct_image_image_profile_is_a_path_to_srgb_or_adobergb_file(
     file_collector.append(printer_profile_path)
     file_collector.append(input_image_path)
 
-    image_profile = (HERE / ".." / "sRGB.icc").resolve()
+    image_profile = (HERE / ".." / "data" / "sRGB.icc").resolve()
     intent = "r"
 
     ICCGenerator.color_correct_image(
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Tests for the async_runner module."""
+
+import asyncio
+import sys
+import time
+
+import pytest
+
+from icc_generator import async_runner
+from icc_generator.api import ICCGenerator
+
+
+def python_command(code):
+    """Return a command running the given Python code."""
+    return [sys.executable, "-c", code]
+
+
+def test_run_external_process_async_streams_stdout_and_stderr():
+    """The stdout and stderr lines are yielded as they arrive."""
+    command = python_command(
+        "import sys, time\n"
+        "print('out 1', flush=True)\n"
+        "time.sleep(0.1)\n"
+        "print('err 1', file=sys.stderr, flush=True)\n"
+        "time.sleep(0.1)\n"
+        "print('out 2', flush=True)\n"
+    )
+
+    async def collect():
+        return [
+            line async for line in async_runner.run_external_process_async(command)
+        ]
+
+    assert asyncio.run(collect()) == [
+        ("stdout", "out 1"),
+        ("stderr", "err 1"),
+        ("stdout", "out 2"),
+    ]
+
+
+def test_run_external_process_async_return_code_is_not_zero():
+    """RuntimeError is raised with the stderr output if the command fails."""
+    command = python_command(
+        "import sys\nprint('wrong argument', file=sys.stderr)\nsys.exit(1)"
+    )
+    with pytest.raises(RuntimeError) as cm:
+        asyncio.run(async_runner.run_command(command))
+    assert str(cm.value) == "wrong argument"
+
+
+def test_run_command_timeout(tmp_path):
+    """TimeoutError is raised and the process is terminated if it takes too long."""
+    marker = tmp_path / "finished"
+    command = python_command(
+        f"import time\ntime.sleep(2)\nopen({str(marker)!r}, 'w').close()"
+    )
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError) as cm:
+        asyncio.run(async_runner.run_command(command, timeout=0.2))
+    assert str(cm.value) == f"{sys.executable} did not finish in 0.2 seconds"
+    assert time.perf_counter() - start < 1.5
+
+    time.sleep(2)
+    assert not marker.exists()
+
+
+def test_run_command_cancellation(tmp_path):
+    """The process is terminated if the awaiting task is cancelled."""
+    marker = tmp_path / "finished"
+    command = python_command(
+        f"import time\ntime.sleep(1)\nopen({str(marker)!r}, 'w').close()"
+    )
+
+    async def cancel():
+        task = asyncio.create_task(async_runner.run_command(command))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    time.sleep(1.5)
+    assert not marker.exists()
+
+
+def test_run_command_runs_processes_in_parallel():
+    """Many processes run in parallel in a single event loop."""
+    command = python_command("import time\ntime.sleep(0.5)\nprint('done')")
+
+    async def run_all():
+        return await asyncio.gather(
+            *[async_runner.run_command(command) for _ in range(8)]
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    assert time.perf_counter() - start < 3
+    assert [result.stdout for result in results] == [["done"]] * 8
+    assert all(result.return_code == 0 for result in results)
+
+
+def test_icc_generator_stages_as_coroutines(file_collector, monkeypatch):
+    """The async stages run the same commands as the blocking ones."""
+    commands = []
+
+    async def run_command(command, timeout=None, on_output=None):
+        commands.append((command, timeout))
+        return async_runner.ProcessResult(command, 0, [], [], 0.0)
+
+    monkeypatch.setattr(async_runner, "run_command", run_command)
+    icc_gen = ICCGenerator()
+    file_collector.append(icc_gen.profile_absolute_path)
+
+    async def run_stages():
+        await asyncio.gather(
+            icc_gen.generate_target_async(timeout=10),
+            icc_gen.generate_tif_async(),
+            icc_gen.generate_profile_async(timeout=60),
+            icc_gen.check_profile_async(sort_by_de=True),
+        )
+
+    asyncio.run(run_stages())
+    assert commands == [
+        (icc_gen.generate_target_command(), 10),
+        (icc_gen.generate_tif_command(), None),
+        (icc_gen.generate_profile_command(), 60),
+        (icc_gen.check_profile_command(sort_by_de=True), None),
+    ]
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Tests for the batch module."""
+
+import numpy as np
+import pytest
+
+from icc_generator import batch, image
+from icc_generator.api import ICCGenerator
+
+
+@pytest.fixture(scope="function")
+def image_folder(tmp_path):
+    """Create a folder with a couple of images."""
+    folder = tmp_path / "images"
+    folder.mkdir()
+    pixels = np.random.default_rng(0).integers(0, 255, (8, 12, 3), dtype=np.uint8)
+    for name in ["a.tif", "b.jpg", "c.tiff"]:
+        image.write_image(folder / name, pixels)
+    (folder / "notes.txt").write_text("not an image")
+    yield folder
+
+
+def test_collect_images(image_folder):
+    """Images are collected from directories, files and glob patterns."""
+    paths = batch.collect_images(
+        [image_folder / "c.tiff", image_folder, str(image_folder / "*.jp*g")]
+    )
+    assert [path.name for path in paths] == ["c.tiff", "a.tif", "b.jpg"]
+
+
+def test_collect_images_skips_the_outputs(image_folder):
+    """The outputs of the earlier batches are only collected if given as files."""
+    output_path = image_folder / "a_corrected_1.tif"
+    output_path.write_bytes((image_folder / "a.tif").read_bytes())
+    (image_folder / "d_corrected.tif").write_bytes(b"")
+
+    paths = batch.collect_images([image_folder, str(image_folder / "*.tif")])
+    assert [path.name for path in paths] == [
+        "a.tif",
+        "b.jpg",
+        "c.tiff",
+        "d_corrected.tif",
+    ]
+    assert batch.collect_images([output_path]) == [output_path]
+
+
+def test_collect_images_no_match(tmp_path):
+    """ValueError is raised if an input doesn't match any file."""
+    with pytest.raises(ValueError) as cm:
+        batch.collect_images([str(tmp_path / "*.tif")])
+    assert str(cm.value) == f"No images found: {tmp_path / '*.tif'}"
+
+
+def test_plan_outputs(tmp_path, image_folder):
+    """Output names skip the existing files and the other outputs of the batch."""
+    (image_folder / "a_corrected_1.tif").write_bytes(b"")
+    other_folder = tmp_path / "other"
+    other_folder.mkdir()
+    (other_folder / "a.tif").write_bytes(b"")
+
+    outputs = batch.plan_outputs(
+        [image_folder / "a.tif", image_folder / "b.jpg", other_folder / "a.tif"]
+    )
+    assert outputs == [
+        image_folder / "a_corrected_2.tif",
+        image_folder / "b_corrected_1.jpg",
+        other_folder / "a_corrected_1.tif",
+    ]
+
+    outputs = batch.plan_outputs(
+        [image_folder / "a.tif", other_folder / "a.tif"], tmp_path / "out"
+    )
+    assert outputs == [
+        tmp_path / "out" / "a_corrected_1.tif",
+        tmp_path / "out" / "a_corrected_2.tif",
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_correct_images(tmp_path, image_folder, rgb_printer_profile_path, workers):
+    """The images are corrected and reported in the input order."""
+    report = batch.correct_images(
+        rgb_printer_profile_path,
+        [image_folder],
+        output_dir=tmp_path / "out",
+        image_profile="sRGB",
+        workers=workers,
+    )
+
+    assert report.workers == workers
+    assert [result.output_path.name for result in report.results] == [
+        "a_corrected_1.tif",
+        "b_corrected_1.jpg",
+        "c_corrected_1.tiff",
+    ]
+    assert report.failed == []
+    assert all(result.pixel_count == 96 for result in report.results)
+    assert all(result.output_path.exists() for result in report.results)
+    assert report.images_per_second > 0
+    assert report.to_dict()["succeeded"] == 3
+
+
+def test_correct_images_reports_failures(tmp_path, rgb_printer_profile_path):
+    """The images that can't be corrected are reported and don't stop the batch."""
+    (tmp_path / "broken.tif").write_bytes(b"not a tiff file")
+    image.write_image(tmp_path / "good.tif", np.zeros((2, 2, 3), dtype=np.uint8))
+
+    report = batch.correct_images(rgb_printer_profile_path, [tmp_path], workers=1)
+
+    assert [result.input_path.name for result in report.failed] == ["broken.tif"]
+    assert report.failed[0].error == (
+        f"ValueError: Not a TIFF file: {tmp_path / 'broken.tif'}"
+    )
+    assert len(report.succeeded) == 1
+    assert "Corrected 1 of 2 images" in report.format()
+
+
+def test_correct_images_workers_is_not_valid(rgb_printer_profile_path):
+    """ValueError is raised if workers is not positive."""
+    with pytest.raises(ValueError) as cm:
+        batch.correct_images(rgb_printer_profile_path, [], workers=0)
+    assert str(cm.value) == "workers should be a positive integer, not 0"
+
+
+def test_main(tmp_path, image_folder, rgb_printer_profile_path, capsys):
+    """The command line interface corrects the images and prints the report."""
+    exit_code = batch.main(
+        [
+            str(rgb_printer_profile_path),
+            str(image_folder / "*.tif"),
+            "-o",
+            str(tmp_path / "out"),
+            "-j",
+            "1",
+            "-i",
+            "p",
+        ]
+    )
+    assert exit_code == 0
+    assert (tmp_path / "out" / "a_corrected_1.tif").exists()
+    assert "Corrected 1 of 1 images" in capsys.readouterr().out
+
+
+def test_icc_generator_color_correct_images(image_folder, rgb_printer_profile_path):
+    """ICCGenerator.color_correct_images corrects the images next to the inputs."""
+    report = ICCGenerator.color_correct_images(
+        printer_profile_path=rgb_printer_profile_path,
+        inputs=[str(image_folder / "a.tif")],
+        workers=1,
+    )
+    assert report.results[0].output_path == image_folder / "a_corrected_1.tif"
+    assert report.results[0].output_path.exists()
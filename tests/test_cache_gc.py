@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Tests for the cache_gc module."""
+
+import json
+import os
+import time
+
+import pytest
+
+from icc_generator import cache_gc
+from icc_generator.cache_gc import collect_garbage, parse_size
+
+DAY = 24 * 60 * 60
+
+
+def make_file(path, size, days_ago):
+    """Create a file of the given size last used the given days ago."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0" * size)
+    used = time.time() - days_ago * DAY
+    os.utime(path, (used, used))
+    return path
+
+
+def make_session(path, days_ago, profiled=True, chart_size=1000):
+    """Create the files of a session."""
+    make_file(path / "Profile.ti1", 10, days_ago)
+    make_file(path / "Profile.ti2", 10, days_ago)
+    make_file(path / "Profile_01.tif", chart_size, days_ago)
+    make_file(path / "Profile_02.tif", chart_size, days_ago)
+    make_file(path / "Profile.json", 10, days_ago)
+    if profiled:
+        make_file(path / "Profile.ti3", 10, days_ago)
+        make_file(path / "Profile.icc", 10, days_ago)
+    return path
+
+
+@pytest.fixture(scope="function")
+def cache(tmp_path):
+    """Create a cache with an old, a newer and an unfinished session."""
+    make_file(tmp_path / "catalog.sqlite", 10, 0)
+    old = make_session(tmp_path / "Canon_iX6850" / "20240110", 30)
+    make_file(old / "sweep" / "q-m_r-0.5.icc", 500, 30)
+    newer = make_session(tmp_path / "Canon_iX6850" / "20240220", 10)
+    unfinished = make_session(tmp_path / "Epson_P900" / "20240101", 20, False)
+    yield tmp_path, old, newer, unfinished
+
+
+def test_collect_garbage_removes_the_least_recently_used_first(cache):
+    """The charts of the oldest finished session are removed first."""
+    root, old, newer, unfinished = cache
+    assert collect_garbage("1T", root=root).size == 6640
+
+    report = collect_garbage(4200, root=root)
+    assert [item.path.name for item in report.removed] == [
+        "Profile_01.tif",
+        "Profile_02.tif",
+        "sweep",
+    ]
+    assert report.freed == 2500
+    assert report.within_budget is True
+    assert report.in_progress == [unfinished]
+    assert not (old / "Profile_01.tif").exists()
+    assert not (old / "sweep").exists()
+    assert (newer / "Profile_01.tif").exists()
+    for name in ["Profile.ti1", "Profile.ti2", "Profile.ti3", "Profile.icc"]:
+        assert (old / name).exists()
+
+
+def test_collect_garbage_never_touches_the_sessions_in_progress(cache):
+    """The unfinished, running and recently changed sessions are kept."""
+    root, old, newer, unfinished = cache
+    state_path = old / "Profile.state.json"
+    state_path.write_text(json.dumps({"stages": {"read": {"status": "running"}}}))
+    os.utime(state_path, (time.time() - 30 * DAY,) * 2)
+    os.utime(newer / "Profile.icc")
+
+    report = collect_garbage(0, root=root)
+    assert report.removed == []
+    assert report.within_budget is False
+    assert sorted(report.in_progress) == sorted([old, newer, unfinished])
+    assert "The cache is still over the budget" in report.format()
+
+    report = collect_garbage(0, root=root, min_age=0)
+    assert [item.path.parent for item in report.removed] == [newer, newer]
+
+
+def test_collect_garbage_abandoned_sessions_are_not_in_progress(cache):
+    """The charts of a session not profiled for a long time are removed."""
+    root, old, newer, unfinished = cache
+    abandoned = make_session(root / "Epson_P900" / "20231001", 90, False)
+
+    report = collect_garbage(0, root=root)
+    assert report.in_progress == [unfinished]
+    assert [item.path for item in report.removed][:2] == [
+        abandoned / "Profile_01.tif",
+        abandoned / "Profile_02.tif",
+    ]
+    assert (abandoned / "Profile.ti1").exists()
+
+    report = collect_garbage(0, root=root, max_unprofiled_age=10 * DAY, dry_run=True)
+    assert report.in_progress == []
+    assert [item.path for item in report.removed][:2] == [
+        unfinished / "Profile_01.tif",
+        unfinished / "Profile_02.tif",
+    ]
+
+
+def test_collect_garbage_hard_links_are_freed_with_the_last_link(cache):
+    """A file linked from the target cache is freed when both links are removed."""
+    root, old, newer, unfinished = cache
+    entry = root / "targets" / "key1"
+    entry.mkdir(parents=True)
+    os.link(newer / "Profile_01.tif", entry / "chart_01.tif")
+    os.utime(newer / "Profile_02.tif", (time.time() - 9 * DAY,) * 2)
+    make_file(root / "luts" / "key2.npy", 200, 5)
+    size = collect_garbage("1T", root=root).size
+
+    report = collect_garbage(size - 4500, root=root, dry_run=True)
+    assert [(item.kind, item.freed) for item in report.removed] == [
+        ("chart", 1000),
+        ("chart", 1000),
+        ("sweep", 500),
+        ("chart", 0),
+        ("target_cache", 1000),
+        ("chart", 1000),
+    ]
+    assert (newer / "Profile_01.tif").exists()
+    assert entry.exists()
+
+    collect_garbage(size - 4500, root=root)
+    assert not entry.exists()
+    assert (root / "luts" / "key2.npy").exists()
+
+
+def test_main_dry_run(cache, capsys):
+    """The files that would be removed are printed without removing them."""
+    root, old, newer, unfinished = cache
+    assert cache_gc.main(["5K", "--root", str(root), "--dry-run"]) == 0
+    output = capsys.readouterr().out
+    assert f"Would remove {old / 'Profile_01.tif'} (chart, 1000 B)" in output
+    assert f"Skipped the session in progress: {unfinished}" in output
+    assert (old / "Profile_01.tif").exists()
+
+
+def test_parse_size():
+    """The sizes with the units are converted to bytes."""
+    assert parse_size(100) == 100
+    assert parse_size("1.5K") == 1536
+    assert parse_size("20gb") == 20 * 1024**3
+    with pytest.raises(ValueError) as cm:
+        collect_garbage("lots")
+    assert str(cm.value) == (
+        "budget should be a number with a K, M, G or T suffix, not lots"
+    )
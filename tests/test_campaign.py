@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Tests for the campaign module."""
+
+import json
+import threading
+import time
+
+import pytest
+
+from icc_generator import interactive, pipeline
+from icc_generator.api import ICCGenerator
+from icc_generator.campaign import CampaignJob, ProfilingCampaign
+
+
+class ConcurrencyCounter(object):
+    """Counts the maximum number of concurrent calls by key."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = {}
+        self.maximum = {}
+
+    def __call__(self, key):
+        counter = self
+
+        class Context(object):
+            def __enter__(self):
+                with counter.lock:
+                    counter.current[key] = counter.current.get(key, 0) + 1
+                    counter.maximum[key] = max(
+                        counter.maximum.get(key, 0), counter.current[key]
+                    )
+
+            def __exit__(self, *args):
+                time.sleep(0.02)
+                with counter.lock:
+                    counter.current[key] -= 1
+
+        return Context()
+
+
+@pytest.fixture(scope="function")
+def fake_fleet(tmp_path, monkeypatch, fake_argyll):
+    """Run the campaign stages with fake tools and instruments."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(pipeline, "tool_version", lambda tool: "3.0.0")
+    counter = ConcurrencyCounter()
+    run_external_process = ICCGenerator.run_external_process
+    reads = []
+
+    def counted_run_external_process(self, command, shell=False):
+        with counter("cpu"):
+            yield from run_external_process(self, command, shell)
+
+    def read_charts(self, resume=False, read_mode=0, on_event=None):
+        with counter(self.printer_model), counter("console"):
+            reads.append((self.paper_model, resume))
+            ti3_path = f"{self.profile_absolute_full_path}.ti3"
+            with open(ti3_path, "w") as f:
+                f.write(self.paper_model)
+        return interactive.ChartReadSession()
+
+    monkeypatch.setattr(
+        ICCGenerator, "run_external_process", counted_run_external_process
+    )
+    monkeypatch.setattr(ICCGenerator, "read_charts", read_charts)
+    yield counter, reads
+
+
+def create_jobs(printers, papers):
+    """Create a job for every printer and paper combination."""
+    return [
+        CampaignJob(
+            f"{printer}_{paper}",
+            {"printer_model": printer, "paper_model": paper, "paper_size": "A4"},
+            device=printer,
+        )
+        for printer in printers
+        for paper in papers
+    ]
+
+
+def test_profiling_campaign_job_names_are_not_unique(tmp_path):
+    """ValueError is raised if the job names are not unique."""
+    with pytest.raises(ValueError) as cm:
+        ProfilingCampaign([CampaignJob("a"), CampaignJob("a")], tmp_path / "state")
+    assert str(cm.value) == "Job names should be unique: a"
+
+
+def test_profiling_campaign_core_budget_is_not_valid(tmp_path):
+    """ValueError is raised if core_budget is not positive."""
+    with pytest.raises(ValueError) as cm:
+        ProfilingCampaign([], tmp_path / "state", core_budget=0)
+    assert str(cm.value) == "core_budget should be a positive integer, not 0"
+
+
+def test_profiling_campaign_runs_the_jobs(tmp_path, fake_fleet, fake_argyll):
+    """The CPU bound stages share the core budget, the reads are serialized."""
+    counter, reads = fake_fleet
+    campaign = ProfilingCampaign(
+        create_jobs(["P1", "P2"], ["Glossy", "Matte", "Satin"]),
+        tmp_path / "campaign.json",
+        core_budget=2,
+    )
+
+    state = campaign.run()
+
+    assert campaign.succeeded == list(state)
+    assert campaign.failed == []
+    assert counter.maximum["cpu"] == 2
+    assert counter.maximum["P1"] == 1
+    assert counter.maximum["P2"] == 1
+    # the reads on different devices don't share the console
+    assert counter.maximum["console"] == 1
+    assert len(reads) == 6
+    assert fake_argyll.count("colprof") == 6
+    assert fake_argyll.count("profcheck") == 6
+
+    saved_state = json.loads((tmp_path / "campaign.json").read_text())
+    assert saved_state["P1_Glossy"]["status"] == "done"
+    assert list(saved_state["P1_Glossy"]["stages"]) == [
+        "target",
+        "tif",
+        "read",
+        "profile",
+        "check",
+    ]
+    assert saved_state["P1_Glossy"]["stages"]["read"]["result"]["strips"] == 0
+
+
+def test_profiling_campaign_is_resumed(tmp_path, fake_fleet, fake_argyll, monkeypatch):
+    """A resumed campaign skips the finished stages and keeps the profile path."""
+    manifest_path = tmp_path / "campaign.json"
+    manifest_path.write_text(
+        json.dumps({"jobs": [job.to_dict() for job in create_jobs(["P1"], ["A", "B"])]})
+    )
+    _, reads = fake_fleet
+    original_check_profile = ICCGenerator.check_profile
+
+    def check_profile(self, sort_by_de=False, engine="profcheck"):
+        if self.paper_model == "B":
+            raise RuntimeError("profcheck failed")
+
+    monkeypatch.setattr(ICCGenerator, "check_profile", check_profile)
+    campaign = ProfilingCampaign.from_manifest(manifest_path)
+    campaign.run()
+    assert campaign.succeeded == ["P1_A"]
+    assert campaign.failed == ["P1_B"]
+    assert campaign.state["P1_B"]["error"] == "RuntimeError: profcheck failed"
+    assert campaign.state["P1_B"]["stages"]["check"]["status"] == "failed"
+
+    # resume the campaign later with a new instance
+    monkeypatch.setattr(ICCGenerator, "check_profile", original_check_profile)
+    commands = []
+
+    def run_external_process(self, command, shell=False):
+        commands.append(command)
+        yield ""
+
+    monkeypatch.setattr(ICCGenerator, "run_external_process", run_external_process)
+    resumed = ProfilingCampaign.from_manifest(manifest_path)
+    assert resumed.state_path == tmp_path / "campaign.state.json"
+    resumed.run()
+
+    assert resumed.succeeded == ["P1_A", "P1_B"]
+    assert len(reads) == 2
+    assert [command[0] for command in commands] == ["profcheck"]
+    job_state = campaign.state["P1_B"]
+    assert commands[0][-1].endswith(
+        f"{job_state['profile_date']}_{job_state['profile_time']}.icc"
+    )
+
+
+def test_profiling_campaign_stage_is_not_valid(tmp_path):
+    """ValueError is raised if a stage name is not valid."""
+    campaign = ProfilingCampaign([], tmp_path / "state")
+    with pytest.raises(ValueError) as cm:
+        campaign.run(["print"])
+    assert str(cm.value) == (
+        "stage should be one of target, tif, read, profile or check, not print"
+    )
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Tests for the catalog module."""
+
+import datetime
+import sqlite3
+
+import pytest
+
+from icc_generator.api import ICCGenerator
+from icc_generator.catalog import ProfileCatalog
+
+
+@pytest.fixture(scope="function")
+def catalog(tmp_path, monkeypatch):
+    """Record the sessions to a temp catalog."""
+    catalog = ProfileCatalog(tmp_path / "catalog.sqlite")
+    monkeypatch.setattr(ICCGenerator, "catalog", catalog)
+    yield catalog
+
+
+@pytest.fixture(scope="function")
+def new_session(tmp_path):
+    """Create ICCGenerators writing to temp folders."""
+
+    def new_session(profile_date="20240110", **kwargs):
+        icc_gen = ICCGenerator(**kwargs)
+        icc_gen.profile_date = profile_date
+        icc_gen._profile_path_template = str(
+            tmp_path / "{printer_brand}_{printer_model}" / "{profile_date}"
+        )
+        icc_gen.target_cache = None
+        return icc_gen
+
+    yield new_session
+
+
+def test_sessions_are_recorded(catalog, new_session, fake_argyll):
+    """save_settings and generate_profile record the session and its files."""
+    icc_gen = new_session(printer_brand="Canon", printer_model="iX6850")
+    icc_gen.save_settings()
+    assert len(catalog.find()) == 1
+    assert catalog.find()[0]["quality"] is None
+
+    ti3_path = icc_gen.profile_absolute_path / f"{icc_gen.profile_name}.ti3"
+    ti3_path.write_text("measurements")
+    icc_gen.generate_profile()
+
+    sessions = catalog.find(printer_brand="Canon")
+    assert len(sessions) == 1
+    session = sessions[0]
+    assert session["printer_model"] == "iX6850"
+    assert session["paper_size"] == "A4"
+    assert session["quality"] == "h"
+    assert session["profile_path"] == str(icc_gen.profile_absolute_full_path)
+    assert session["check"] is None
+    assert session["installs"] == []
+    kinds = [artifact["kind"] for artifact in catalog.artifacts(session["id"])]
+    assert kinds == ["icc", "json", "ti3"]
+
+
+def test_check_summary_is_recorded(catalog, new_session, monkeypatch):
+    """The profcheck summary is recorded."""
+
+    def run_external_process(self, command, shell=False):
+        yield "[2.000000] 1: 0 0 0 -> 0 0 0"
+        yield (
+            "Profile check complete, peak err = 2.500000, avg err = 0.750000, "
+            "95% err = 1.800000"
+        )
+
+    monkeypatch.setattr(ICCGenerator, "run_external_process", run_external_process)
+    icc_gen = new_session()
+    icc_gen.check_profile()
+
+    check = catalog.find()[0]["check"]
+    assert check["average"] == 0.75
+    assert check["maximum"] == 2.5
+    assert check["percentile_95"] == 1.8
+
+
+def test_find_filters(catalog, new_session):
+    """The sessions are filtered by printer, paper, date, dE and install."""
+    sessions = [
+        new_session("20240110", printer_model="P1", paper_model="Glossy"),
+        new_session("20240220", printer_model="P1", paper_model="Matte"),
+        new_session("20240315", printer_model="P2", paper_model="Glossy"),
+    ]
+    for icc_gen, average in zip(sessions, [0.5, 1.5, 0.8]):
+        catalog.record_check(icc_gen, average, average * 3)
+    catalog.record_install(sessions[2], "/profiles/p2_glossy.icc")
+
+    def models(**kwargs):
+        return [
+            (session["printer_model"], session["paper_model"])
+            for session in catalog.find(**kwargs)
+        ]
+
+    assert models() == [("P2", "Glossy"), ("P1", "Matte"), ("P1", "Glossy")]
+    assert models(printer_model="P1") == [("P1", "Matte"), ("P1", "Glossy")]
+    assert models(paper_model="Glossy", printer_model="P1") == [("P1", "Glossy")]
+    assert models(date_from="20240201", date_to=datetime.date(2024, 3, 1)) == [
+        ("P1", "Matte")
+    ]
+    assert models(max_average_de=1.0) == [("P2", "Glossy"), ("P1", "Glossy")]
+    assert models(max_peak_de=2.0) == [("P1", "Glossy")]
+    assert models(installed=True) == [("P2", "Glossy")]
+    assert models(installed=False, limit=1) == [("P1", "Matte")]
+    assert catalog.find(installed=True)[0]["installs"] == ["/profiles/p2_glossy.icc"]
+
+
+def test_find_quality_filter(catalog, new_session):
+    """The sessions are filtered by the quality of their profile command."""
+    draft = new_session("20240110", printer_model="P1")
+    final = new_session("20240220", printer_model="P2")
+    catalog.record_session(draft, draft.generate_profile_command(quality="l"))
+    catalog.record_session(final, final.generate_profile_command(quality="u"))
+    # saving the settings again keeps the quality
+    final.save_settings()
+
+    assert [session["printer_model"] for session in catalog.find(quality="l")] == [
+        "P1"
+    ]
+    assert [session["printer_model"] for session in catalog.find(quality="u")] == [
+        "P2"
+    ]
+    assert catalog.find(quality="h") == []
+
+
+def test_earlier_catalogs_get_the_quality_column(tmp_path, new_session):
+    """The quality column is added to the catalogs created without it."""
+    path = tmp_path / "catalog.sqlite"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE sessions (id INTEGER PRIMARY KEY, "
+        "profile_path TEXT NOT NULL UNIQUE, profile_name TEXT NOT NULL, "
+        "printer_brand TEXT, printer_model TEXT, paper_brand TEXT, "
+        "paper_model TEXT, paper_finish TEXT, paper_size TEXT, ink_brand TEXT, "
+        "profile_date TEXT, profile_time TEXT, patch_count INTEGER, "
+        "number_of_pages INTEGER, updated REAL NOT NULL)"
+    )
+    connection.commit()
+    connection.close()
+
+    catalog = ProfileCatalog(path)
+    icc_gen = new_session()
+    catalog.record_session(icc_gen, icc_gen.generate_profile_command(quality="m"))
+    assert catalog.find()[0]["quality"] == "m"
+
+
+def test_index_records_the_saved_sessions(tmp_path, new_session):
+    """The sessions already in the cache are indexed from their settings files."""
+    for printer_model in ["P1", "P2"]:
+        new_session(printer_model=printer_model).save_settings()
+    (tmp_path / "P1.pipeline.json").write_text("{}")
+
+    catalog = ProfileCatalog(tmp_path / "catalog.sqlite")
+    assert catalog.index(tmp_path) == 2
+    assert sorted(session["printer_model"] for session in catalog.find()) == [
+        "P1",
+        "P2",
+    ]
+    # indexing again doesn't duplicate the sessions
+    assert catalog.index(tmp_path) == 2
+    assert len(catalog.find()) == 2
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""Tests for the cgats module."""
+
+import numpy as np
+import pytest
+
+from icc_generator import cgats
+from icc_generator.cgats import CGATS, CGATSTable
+
+
+TI3_DATA = """CTI3
+
+DESCRIPTOR "Argyll Calibration Target chart information 3"
+ORIGINATOR "Argyll chartread"
+CREATED "Sat Feb  6 14:02:00 2021"
+KEYWORD "DEVICE_CLASS"
+DEVICE_CLASS "OUTPUT"
+KEYWORD "COLOR_REP"
+COLOR_REP "RGB_XYZ"
+KEYWORD "SPECTRAL_BANDS"
+SPECTRAL_BANDS "3"
+
+NUMBER_OF_FIELDS 10
+BEGIN_DATA_FORMAT
+SAMPLE_ID RGB_R RGB_G RGB_B XYZ_X XYZ_Y XYZ_Z SPEC_400 SPEC_500
+SPEC_600
+END_DATA_FORMAT
+
+NUMBER_OF_SETS 3
+BEGIN_DATA
+1 100.00 100.00 100.00 90.123 93.456 77.789 81.0 82.0 83.0
+2 0.0000 0.0000 0.0000 1.2340 1.2550 1.0700 1.0 2.0 3.0
+3 100.00 0.0000 0.0000 35.100 18.200 2.3000 10.5 11.5 70.5
+END_DATA
+"""
+
+TI2_DATA = """CTI2
+
+DESCRIPTOR "Argyll Calibration Target chart information 2"
+ORIGINATOR "Argyll printtarg"
+KEYWORD "STEPS_IN_PASS"
+STEPS_IN_PASS "28"
+
+NUMBER_OF_FIELDS 5
+BEGIN_DATA_FORMAT
+SAMPLE_ID SAMPLE_LOC RGB_R RGB_G RGB_B
+END_DATA_FORMAT
+
+NUMBER_OF_SETS 2
+BEGIN_DATA
+1 "A1" 100.00 100.00 100.00
+2 "A2" 0.0000 0.0000 0.0000
+END_DATA
+
+CTI2
+
+DESCRIPTOR "Device Calibration Curves"
+
+NUMBER_OF_FIELDS 2
+BEGIN_DATA_FORMAT
+RGB_I RGB_R
+END_DATA_FORMAT
+
+NUMBER_OF_SETS 2
+BEGIN_DATA
+0.0 0.0
+1.0 1.0
+END_DATA
+"""
+
+
+@pytest.fixture(scope="function")
+def ti3_path(tmp_path):
+    """Create a sample .ti3 file."""
+    path = tmp_path / "sample.ti3"
+    path.write_text(TI3_DATA)
+    yield path
+
+
+@pytest.fixture(scope="function")
+def ti2_path(tmp_path):
+    """Create a sample .ti2 file with two tables."""
+    path = tmp_path / "sample.ti2"
+    path.write_text(TI2_DATA)
+    yield path
+
+
+def test_read_path_is_none():
+    """TypeError is raised if the path is None."""
+    with pytest.raises(TypeError) as cm:
+        CGATS.read(None)
+    assert str(cm.value) == "Please specify a valid path"
+
+
+def test_read_path_does_not_exist(tmp_path):
+    """RuntimeError is raised if the path doesn't exist."""
+    path = tmp_path / "missing.ti3"
+    with pytest.raises(RuntimeError) as cm:
+        CGATS.read(path)
+    assert str(cm.value) == f"File does not exist!: {path}"
+
+
+def test_read_parses_header_keywords(ti3_path):
+    """Header keywords are parsed properly."""
+    table = CGATS.read(ti3_path)[0]
+    assert table.file_type == "CTI3"
+    assert table.keywords["ORIGINATOR"] == "Argyll chartread"
+    assert table.keywords["COLOR_REP"] == "RGB_XYZ"
+    assert "COLOR_REP" in table.declared_keywords
+
+
+def test_read_parses_data_format_spanning_lines(ti3_path):
+    """DATA_FORMAT fields spanning multiple lines are parsed properly."""
+    table = CGATS.read(ti3_path)[0]
+    assert table.fields[-1] == "SPEC_600"
+    assert len(table.fields) == 10
+    assert len(table) == 3
+
+
+def test_read_parses_numeric_columns(ti3_path):
+    """Numeric columns are returned as NumPy arrays."""
+    table = CGATS.read(ti3_path)[0]
+    assert table["SAMPLE_ID"].dtype == np.int64
+    np.testing.assert_allclose(table.rgb[2], [100.0, 0.0, 0.0])
+    np.testing.assert_allclose(table.xyz[0], [90.123, 93.456, 77.789])
+    assert table.rgb.flags["C_CONTIGUOUS"]
+
+
+def test_read_parses_spectral_columns(ti3_path):
+    """Spectral columns are returned in wavelength order."""
+    table = CGATS.read(ti3_path)[0]
+    wavelengths, spectra = table.spectral
+    np.testing.assert_allclose(wavelengths, [400, 500, 600])
+    assert spectra.shape == (3, 3)
+    np.testing.assert_allclose(spectra[2], [10.5, 11.5, 70.5])
+
+
+def test_read_parses_string_columns_and_multiple_tables(ti2_path):
+    """String columns and multiple tables are parsed properly."""
+    data = CGATS.read(ti2_path)
+    assert len(data) == 2
+    assert data[0]["SAMPLE_LOC"].tolist() == ["A1", "A2"]
+    assert data[1].fields == ["RGB_I", "RGB_R"]
+    assert data[1].keywords["DESCRIPTOR"] == "Device Calibration Curves"
+
+
+def test_read_uses_mmap_for_big_files(ti3_path, monkeypatch):
+    """Files bigger than the MMAP_THRESHOLD are parsed through mmap."""
+    monkeypatch.setattr(cgats, "MMAP_THRESHOLD", 0)
+    table = CGATS.read(ti3_path)[0]
+    np.testing.assert_allclose(table.xyz[1], [1.234, 1.255, 1.07])
+
+
+def test_read_raises_value_error_for_broken_data(tmp_path):
+    """ValueError is raised if the data count doesn't match the fields."""
+    path = tmp_path / "broken.ti3"
+    path.write_text(TI3_DATA.replace("3 100.00 0.0000", "3 100.00"))
+    with pytest.raises(ValueError) as cm:
+        CGATS.read(path)
+    assert str(cm.value) == "Data has 29 values which is not a multiple of 10 fields"
+
+
+def test_write_round_trip(ti2_path, ti3_path, tmp_path):
+    """Written files can be read back."""
+    for path in [ti2_path, ti3_path]:
+        data = CGATS.read(path)
+        output_path = tmp_path / f"output{path.suffix}"
+        data.write(output_path)
+        data_read_back = CGATS.read(output_path)
+        assert len(data_read_back) == len(data)
+        for table, table_read_back in zip(data, data_read_back):
+            assert table_read_back.keywords == table.keywords
+            assert table_read_back.fields == table.fields
+            for field in table.fields:
+                if table[field].dtype.kind == "f":
+                    np.testing.assert_allclose(table_read_back[field], table[field])
+                else:
+                    assert table_read_back[field].tolist() == table[field].tolist()
+
+
+def test_write_keeps_the_float_precision(tmp_path):
+    """The float values are read back exactly."""
+    table = CGATSTable(file_type="CTI3")
+    table["SAMPLE_ID"] = np.arange(1, 5)
+    values = np.array([0.1 + 0.2, 95.04715967, 1.2345678901e-7, 100.0])
+    table["XYZ_Y"] = values
+    CGATS([table]).write(tmp_path / "output.ti3")
+    assert CGATS.read(tmp_path / "output.ti3")[0]["XYZ_Y"].tolist() == values.tolist()
+
+
+def test_table_set_columns():
+    """set_columns creates the columns of a new table."""
+    table = CGATSTable(file_type="CTI1")
+    table["SAMPLE_ID"] = np.arange(1, 5)
+    table.set_columns(["RGB_R", "RGB_G", "RGB_B"], np.full((4, 3), 50.0))
+    assert table.fields == ["SAMPLE_ID", "RGB_R", "RGB_G", "RGB_B"]
+    assert table.rgb.shape == (4, 3)
+
+
+def test_table_set_item_with_wrong_length():
+    """ValueError is raised if a new column length doesn't match the table."""
+    table = CGATSTable()
+    table["SAMPLE_ID"] = np.arange(4)
+    with pytest.raises(ValueError) as cm:
+        table["RGB_R"] = np.arange(3)
+    assert str(cm.value) == "RGB_R should have 4 values, not 3"
+
+
+def test_table_get_columns_missing_field(ti3_path):
+    """KeyError is raised for missing fields."""
+    table = CGATS.read(ti3_path)[0]
+    with pytest.raises(KeyError):
+        _ = table.lab
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""Tests for the chart_renderer module."""
+
+import logging
+
+import numpy as np
+import pytest
+
+from icc_generator import chart_renderer, layout, target_generator
+from icc_generator.api import ICCGenerator, PaperSizeLibrary
+from icc_generator.cgats import CGATS
+from icc_generator.tiff import TiffReader
+
+
+@pytest.fixture(scope="function")
+def ti1_base_path(tmp_path):
+    """Create a .ti1 file filling two A4 pages at 72 DPI and a bit of a third."""
+    page_layout = layout.page_layout(210.0, 297.0, "i1", dpi=72)
+    base_path = tmp_path / "chart"
+    target_generator.generate_target(base_path, 2 * page_layout.patch_count + 5, 8)
+    yield base_path
+
+
+def test_strip_label():
+    """The strips are labelled A to Z and then with two letters."""
+    labels = [chart_renderer.strip_label(index) for index in [0, 25, 26, 27, 701]]
+    assert labels == ["A", "Z", "AA", "AB", "ZZ"]
+
+
+def test_render_chart_writes_the_ti2_and_the_pages(ti1_base_path):
+    """The patches are placed on the pages and painted with their device values."""
+    chart = chart_renderer.render_chart(ti1_base_path, 210.0, 297.0, "i1", dpi=72)
+    assert chart.ti2_path == ti1_base_path.parent / "chart.ti2"
+    assert chart.tif_paths == [
+        ti1_base_path.parent / f"chart_{page:02}.tif" for page in [1, 2, 3]
+    ]
+    page_layout = chart.page_layout
+    assert page_layout.along_width is True
+
+    ti1 = CGATS.read(f"{ti1_base_path}.ti1")[0]
+    ti2_file = CGATS.read(chart.ti2_path)
+    ti2 = ti2_file[0]
+    assert ti2.file_type == "CTI2"
+    # the density extremes are passed through
+    assert len(ti2_file) == 2
+    assert ti2_file[1].keywords["DENSITY_EXTREME_VALUES"] == "8"
+    assert ti2.keywords["STEPS_IN_PASS"] == str(page_layout.strip_length)
+    assert ti2.keywords["PASSES_IN_STRIPS2"] == "OO1"
+    assert ti2.keywords["TARGET_INSTRUMENT"] == "GretagMacbeth i1 Pro"
+    assert np.array_equal(ti2.rgb, ti1.rgb)
+    assert np.allclose(ti2.xyz, ti1.xyz)
+    # the patches are shuffled, the gray axis is spread over the chart
+    locations = ti2["SAMPLE_LOC"].tolist()
+    assert len(set(locations)) == len(locations)
+    assert locations[:2] != ["A1", "A2"]
+    # the strips of the next page continue from the strips of the previous one
+    assert [location for location in locations if location[:2] == "AW"] != []
+    assert sorted(location for location in locations if location[:2] == "AW") == [
+        f"AW{step}" for step in range(1, 6)
+    ]
+
+    # the second patch of the second strip on the first page
+    x = chart_renderer.to_pixels(2 + 4 + 7 + 3.5, 72)
+    y = chart_renderer.to_pixels(2 + 10 + 11.75 + 4, 72)
+    with TiffReader(chart.tif_paths[0]) as reader:
+        assert reader.shape == (842, 595, 3)
+        assert reader.dpi == 72
+        pixels = reader.read()
+    index = locations.index("B2")
+    assert pixels[y, x].tolist() == np.round(ti1.rgb[index] * 2.55).tolist()
+    assert pixels[0, 0].tolist() == [255, 255, 255]
+
+    # the strip label is on the left of the strip
+    label = pixels[y - 5 : y + 5, : chart_renderer.to_pixels(2 + 4, 72)]
+    assert (label == 0).all(axis=-1).any()
+    assert (label == 255).all(axis=-1).any()
+
+
+def test_render_chart_without_shuffling(ti1_base_path):
+    """The patches are placed in the .ti1 order if there is no seed."""
+    chart = chart_renderer.render_chart(
+        ti1_base_path, 210.0, 297.0, "i1", dpi=72, workers=1, seed=None
+    )
+    locations = CGATS.read(chart.ti2_path)[0]["SAMPLE_LOC"].tolist()
+    assert locations[:2] == ["A1", "A2"]
+    assert locations[28] == "B1"
+    assert locations[672] == "Y1"
+    assert locations[-1] == "AW5"
+
+
+def test_text_runs():
+    """The labels are drawn from the glyph rows scaled to the image pixels."""
+    runs = chart_renderer.text_runs("AB", scale=2)
+    assert runs[0] == [(2, 8), (12, 20)]
+    assert runs[3] == [(0, 10), (12, 20)]
+    assert chart_renderer.text_width("AB", scale=2) == 22
+
+
+def test_render_chart_in_parallel_matches_in_process(ti1_base_path, tmp_path):
+    """The pages rendered by the workers are the same as the ones rendered here."""
+    chart = chart_renderer.render_chart(
+        ti1_base_path, 210.0, 297.0, "i1", dpi=72, workers=1
+    )
+    pages = [path.read_bytes() for path in chart.tif_paths]
+    parallel_chart = chart_renderer.render_chart(
+        ti1_base_path, 210.0, 297.0, "i1", dpi=72, workers=3
+    )
+    assert parallel_chart.tif_paths == chart.tif_paths
+    assert [path.read_bytes() for path in parallel_chart.tif_paths] == pages
+
+
+def test_render_chart_deflate(ti1_base_path):
+    """The pages compressed with deflate decode to the same pixels."""
+    chart = chart_renderer.render_chart(
+        ti1_base_path, 297.0, 420.0, "CM", dpi=72, workers=1
+    )
+    # the strips of the ColorMunki run along the page height
+    assert chart.page_layout.along_width is False
+    assert len(chart.tif_paths) == 4
+    with TiffReader(chart.tif_paths[0]) as reader:
+        pixels = reader.read()
+    size = chart.tif_paths[0].stat().st_size
+
+    chart = chart_renderer.render_chart(
+        ti1_base_path, 297.0, 420.0, "CM", dpi=72, compression="deflate", workers=1
+    )
+    assert chart.tif_paths[0].stat().st_size < size / 10
+    with TiffReader(chart.tif_paths[0]) as reader:
+        assert np.array_equal(reader.read(), pixels)
+
+    # the first patch of the second strip
+    x = chart_renderer.to_pixels(2 + 10 + 24 + 12, 72)
+    y = chart_renderer.to_pixels(2 + 18 + 4.625, 72)
+    ti1 = CGATS.read(f"{ti1_base_path}.ti1")[0]
+    index = CGATS.read(chart.ti2_path)[0]["SAMPLE_LOC"].tolist().index("B1")
+    assert pixels[y, x].tolist() == np.round(ti1.rgb[index] * 2.55).tolist()
+
+    # the strip label is above the strip
+    label = pixels[: chart_renderer.to_pixels(2 + 18, 72), x - 10 : x + 10]
+    assert (label == 0).all(axis=-1).any()
+
+
+def test_render_chart_ti1_does_not_exist(tmp_path):
+    """RuntimeError is raised if the .ti1 file doesn't exist."""
+    with pytest.raises(RuntimeError) as cm:
+        chart_renderer.render_chart(tmp_path / "missing", 210.0, 297.0, "i1")
+    assert str(cm.value) == f"File does not exist!: {tmp_path / 'missing.ti1'}"
+
+
+def test_generate_tif_native_engine(tmp_path, patch_run_external_process):
+    """The native engine renders the charts without running printtarg."""
+    icc_gen = ICCGenerator()
+    icc_gen._profile_path_template = str(tmp_path / "profile")
+    icc_gen.target_cache = None
+    icc_gen.number_of_pages = 2
+    icc_gen.generate_target(engine="native")
+
+    tif_files = icc_gen.generate_tif(engine="native", workers=2)
+    assert patch_run_external_process == []
+    assert tif_files == icc_gen.tif_files
+    assert [path.name for path in tif_files] == [
+        f"{icc_gen.profile_name}_01.tif",
+        f"{icc_gen.profile_name}_02.tif",
+    ]
+    assert all(path.exists() for path in tif_files)
+    assert (tmp_path / "profile" / f"{icc_gen.profile_name}.ti2").exists()
+
+
+@pytest.mark.parametrize("use_high_density_mode", [True, False])
+@pytest.mark.parametrize("paper_size_name", sorted(layout.LIBRARY_PATCH_COUNTS))
+def test_generate_tif_native_engine_library_paper_sizes(
+    tmp_path, monkeypatch, paper_size_name, use_high_density_mode
+):
+    """The native engine renders all the patches of the library paper sizes."""
+    monkeypatch.setattr(layout, "DEFAULT_DPI", 18)
+    icc_gen = ICCGenerator()
+    icc_gen._profile_path_template = str(tmp_path / "profile")
+    icc_gen.paper_size = PaperSizeLibrary.get_paper_size(paper_size_name)
+    icc_gen.use_high_density_mode = use_high_density_mode
+    # the 52 patches of the ColorMunki 4x6 page don't fit the default gray axis
+    icc_gen.gray_patch_count = 16
+    icc_gen.generate_target(engine="native")
+
+    tif_files = icc_gen.generate_tif(engine="native", workers=1)
+    assert all(path.exists() for path in tif_files)
+    ti2 = CGATS.read(tmp_path / "profile" / f"{icc_gen.profile_name}.ti2")[0]
+    assert len(ti2) == icc_gen.patch_count
+    assert icc_gen.patch_count == (
+        layout.LIBRARY_PATCH_COUNTS[paper_size_name][icc_gen.instrument.name]
+    )
+    capacity = icc_gen.page_layout.capacity
+    assert len(tif_files) == -(-icc_gen.patch_count // capacity)
+
+
+def test_generate_tif_engine_is_not_valid():
+    """ValueError is raised if the engine is not printtarg or native."""
+    icc_gen = ICCGenerator()
+    with pytest.raises(ValueError) as cm:
+        icc_gen.generate_tif(engine="fast")
+    assert str(cm.value) == "engine should be one of printtarg or native, not fast"
+
+
+def test_split_ti1_and_merge_ti2(ti1_base_path, tmp_path, caplog):
+    """The pages split from the .ti1 file are merged with continuous strips."""
+    page_layout = layout.page_layout(210.0, 297.0, "i1", dpi=72)
+    page_base_paths = chart_renderer.split_ti1(
+        f"{ti1_base_path}.ti1", page_layout.patch_count, tmp_path / "page"
+    )
+    assert [path.name for path in page_base_paths] == ["page_01", "page_02", "page_03"]
+    ti1 = CGATS.read(f"{ti1_base_path}.ti1")
+    pages = [CGATS.read(f"{path}.ti1") for path in page_base_paths]
+    assert [len(page[0]) for page in pages] == [672, 672, 5]
+    assert len(pages[2][1]) == len(ti1[1])
+    assert pages[1][0]["SAMPLE_ID"][0] == 673
+
+    for page, page_base_path in zip(pages, page_base_paths):
+        chart_renderer.build_ti2(page, page_layout, seed=None).write(
+            f"{page_base_path}.ti2"
+        )
+    with caplog.at_level(logging.WARNING):
+        merged_path = chart_renderer.merge_ti2(
+            [f"{path}.ti2" for path in page_base_paths], tmp_path / "merged.ti2"
+        )
+    # the pages labelled from "A" again are renumbered
+    assert [record.getMessage() for record in caplog.records] == [
+        "Page 2: chartread strips Y-AV are printed as A-X",
+        "Page 3: chartread strips AW-AW are printed as A-A",
+    ]
+    merged_file = CGATS.read(merged_path)
+    merged = merged_file[0]
+    expected = chart_renderer.build_ti2(ti1, page_layout, seed=None)[0]
+    assert merged["SAMPLE_LOC"].tolist() == expected["SAMPLE_LOC"].tolist()
+    assert merged["SAMPLE_ID"].tolist() == expected["SAMPLE_ID"].tolist()
+    assert merged.keywords["PASSES_IN_STRIPS2"] == "OO1"
+    assert np.array_equal(merged.rgb, ti1[0].rgb)
+    assert len(merged_file[1]) == len(ti1[1])
+
+
+def test_generate_tif_split_pages(
+    tmp_path, monkeypatch, caplog, patch_run_external_process
+):
+    """Every page is rendered on its own with the labels chartread asks for."""
+    monkeypatch.setattr(layout, "DEFAULT_DPI", 72)
+    page_labels = []
+    page_bands = chart_renderer.page_bands
+
+    def record_labels(page_layout, strips, margin, dpi, labels=None):
+        """Record the labels printed on the page."""
+        page_labels.append(labels[: sum(len(strip) > 0 for strip in strips)])
+        return page_bands(page_layout, strips, margin, dpi, labels)
+
+    monkeypatch.setattr(chart_renderer, "page_bands", record_labels)
+    icc_gen = ICCGenerator()
+    icc_gen._profile_path_template = str(tmp_path / "profile")
+    icc_gen.use_high_density_mode = True
+    icc_gen.number_of_pages = 3
+    icc_gen.generate_target(engine="native")
+
+    with caplog.at_level(logging.WARNING):
+        tif_files = icc_gen.generate_tif(split_pages=True, workers=1)
+    assert patch_run_external_process == []
+    assert caplog.records == []
+    assert tif_files == icc_gen.tif_files
+    assert [path.name for path in tif_files] == [
+        f"{icc_gen.profile_name}_{page:02}.tif" for page in [1, 2, 3]
+    ]
+    assert all(path.exists() for path in tif_files)
+    assert not (tmp_path / "profile" / f"{icc_gen.profile_name}_pages").exists()
+
+    ti2 = CGATS.read(tmp_path / "profile" / f"{icc_gen.profile_name}.ti2")[0]
+    assert len(ti2) == icc_gen.patch_count
+    assert ti2["SAMPLE_ID"].tolist() == list(range(1, icc_gen.patch_count + 1))
+    strips = [location.rstrip("0123456789") for location in ti2["SAMPLE_LOC"]]
+    per_page = icc_gen.per_page_patch_count
+    for page, labels in enumerate(page_labels):
+        assert labels == sorted(
+            set(strips[page * per_page : (page + 1) * per_page]),
+            key=chart_renderer.strip_index,
+        )
+    assert page_labels[1][0] == "Y"
+    assert max(chart_renderer.strip_index(strip) for strip in strips) == 71
+
+
+def test_generate_tif_split_pages_in_parallel(tmp_path, monkeypatch):
+    """The pages rendered in parallel are the same as the ones in this process."""
+    monkeypatch.setattr(layout, "DEFAULT_DPI", 72)
+    charts = []
+    for workers in [1, 3]:
+        icc_gen = ICCGenerator()
+        icc_gen._profile_path_template = str(tmp_path / f"profile{workers}")
+        icc_gen.number_of_pages = 3
+        icc_gen.generate_target(engine="native")
+        tif_files = icc_gen.generate_tif(split_pages=True, workers=workers)
+        ti2_path = icc_gen.profile_absolute_path / f"{icc_gen.profile_name}.ti2"
+        charts.append(
+            (ti2_path.read_text(), [path.read_bytes() for path in tif_files])
+        )
+    assert charts[0][1] == charts[1][1]
+    assert charts[0][0] == charts[1][0]
+
+
+def test_render_chart_page_patch_count(ti1_base_path):
+    """The pages are filled up to the given patch count."""
+    chart = chart_renderer.render_chart(
+        ti1_base_path, 210.0, 297.0, "i1", dpi=72, workers=1, page_patch_count=500
+    )
+    assert len(chart.tif_paths) == 3
+    assert chart.page_layout.patch_count == 500
+    ti2 = CGATS.read(chart.ti2_path)[0]
+    assert ti2.keywords["PASSES_IN_STRIPS2"] == "IID"
+
+    with pytest.raises(ValueError) as cm:
+        chart_renderer.render_chart(
+            ti1_base_path, 210.0, 297.0, "i1", dpi=72, page_patch_count=700
+        )
+    assert str(cm.value) == (
+        "patch_count should be at most 672 for the i1 strips on the page, not 700"
+    )
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Tests for the colorimetry module."""
+
+import numpy as np
+import pytest
+
+from icc_generator import colorimetry
+
+
+# a subset of Sharma, Wu & Dalal CIEDE2000 test data
+SHARMA_TEST_DATA = [
+    ([50.0, 2.6772, -79.7751], [50.0, 0.0, -82.7485], 2.0425),
+    ([50.0, 0.0, 0.0], [50.0, -1.0, 2.0], 2.3669),
+    ([50.0, 2.49, -0.001], [50.0, -2.49, 0.0009], 7.1792),
+    ([50.0, 2.5, 0.0], [50.0, 0.0, -2.5], 4.3065),
+    ([50.0, 2.5, 0.0], [73.0, 25.0, -18.0], 27.1492),
+    ([60.2574, -34.0099, 36.2677], [60.4626, -34.1751, 39.4387], 1.2644),
+    ([2.0776, 0.0795, -1.135], [0.9033, -0.0636, -0.5514], 0.9082),
+]
+
+
+def test_xyz_to_lab_white_point():
+    """The reference white is converted to L*=100, a*=b*=0."""
+    np.testing.assert_allclose(
+        colorimetry.xyz_to_lab(colorimetry.D50), [100.0, 0.0, 0.0], atol=1e-10
+    )
+
+
+def test_xyz_to_lab_round_trip():
+    """xyz_to_lab and lab_to_xyz are inverse of each other."""
+    xyz = np.random.default_rng(0).random((100, 3))
+    xyz[0] = [0.001, 0.002, 0.001]  # the linear part of the curve
+    np.testing.assert_allclose(
+        colorimetry.lab_to_xyz(colorimetry.xyz_to_lab(xyz)), xyz, atol=1e-12
+    )
+
+
+def test_lab_to_lch_round_trip():
+    """lab_to_lch and lch_to_lab are inverse of each other."""
+    lab = np.array([[50.0, 3.0, 4.0], [20.0, -10.0, -10.0]])
+    lch = colorimetry.lab_to_lch(lab)
+    np.testing.assert_allclose(lch[0], [50.0, 5.0, np.degrees(np.arctan2(4, 3))])
+    assert lch[1, 2] == pytest.approx(225.0)
+    np.testing.assert_allclose(colorimetry.lch_to_lab(lch), lab, atol=1e-12)
+
+
+def test_xyz_to_lch_round_trip():
+    """xyz_to_lch and lch_to_xyz are inverse of each other."""
+    xyz = np.random.default_rng(1).random((10, 3))
+    np.testing.assert_allclose(
+        colorimetry.lch_to_xyz(colorimetry.xyz_to_lch(xyz)), xyz, atol=1e-12
+    )
+
+
+def test_bradford_matrix_d65_to_d50():
+    """bradford_matrix returns the well known D65 to D50 matrix."""
+    expected = [
+        [1.0478112, 0.0228866, -0.0501270],
+        [0.0295424, 0.9904844, -0.0170491],
+        [-0.0092345, 0.0150436, 0.7521316],
+    ]
+    np.testing.assert_allclose(
+        colorimetry.bradford_matrix(colorimetry.D65, colorimetry.D50),
+        expected,
+        atol=5e-4,
+    )
+
+
+def test_adapt_maps_white_to_white():
+    """adapt maps the source white to the destination white."""
+    np.testing.assert_allclose(
+        colorimetry.adapt(colorimetry.D65, colorimetry.D65), colorimetry.D50
+    )
+    np.testing.assert_allclose(
+        colorimetry.adapt(np.tile(colorimetry.D65, (4, 1)), colorimetry.D65),
+        np.tile(colorimetry.D50, (4, 1)),
+    )
+
+
+def test_delta_e_76():
+    """delta_e_76 is the Euclidean distance."""
+    assert colorimetry.delta_e_76([50.0, 0.0, 0.0], [50.0, 3.0, 4.0]) == 5.0
+
+
+def test_delta_e_94():
+    """delta_e_94 is calculated properly."""
+    assert colorimetry.delta_e_94([50.0, 0.0, 0.0], [50.0, 3.0, 4.0]) == 5.0
+    # lightness difference is weighted by kL
+    assert colorimetry.delta_e_94(
+        [50.0, 0.0, 0.0], [54.0, 0.0, 0.0], colorimetry.DELTA_E_94_TEXTILES
+    ) == pytest.approx(2.0)
+    # chroma difference is weighted by SC = 1 + K1 * C1
+    assert colorimetry.delta_e_94(
+        [50.0, 10.0, 0.0], [50.0, 20.0, 0.0]
+    ) == pytest.approx(10.0 / 1.45)
+
+
+def test_delta_e_2000_sharma_data():
+    """delta_e_2000 matches the Sharma test data."""
+    lab1 = np.array([data[0] for data in SHARMA_TEST_DATA])
+    lab2 = np.array([data[1] for data in SHARMA_TEST_DATA])
+    expected = np.array([data[2] for data in SHARMA_TEST_DATA])
+    np.testing.assert_allclose(
+        colorimetry.delta_e_2000(lab1, lab2), expected, atol=1e-4
+    )
+
+
+def test_delta_e_2000_is_symmetric():
+    """delta_e_2000 is symmetric."""
+    rng = np.random.default_rng(2)
+    lab1 = rng.random((1000, 3)) * [100, 200, 200] - [0, 100, 100]
+    lab2 = lab1 + rng.normal(size=lab1.shape)
+    np.testing.assert_allclose(
+        colorimetry.delta_e_2000(lab1, lab2), colorimetry.delta_e_2000(lab2, lab1)
+    )
+
+
+def test_delta_e_functions_support_broadcasting():
+    """The color difference functions broadcast their inputs."""
+    lab1 = np.zeros((2, 4, 3))
+    lab2 = np.array([0.0, 3.0, 4.0])
+    for function in [
+        colorimetry.delta_e_76,
+        colorimetry.delta_e_94,
+        colorimetry.delta_e_2000,
+    ]:
+        assert function(lab1, lab2).shape == (2, 4)
+    assert colorimetry.delta_e_2000(lab2, lab2).shape == ()
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""Tests for the icc module."""
+
+import struct
+
+import numpy as np
+import pytest
+
+from icc_generator.api import HERE, ICCGenerator
+from icc_generator.icc import Curve, ICCProfile, LutABTag, LutTag, list_profiles
+
+from tests.conftest import build_icc_profile, device_to_lab
+
+DATA_PATH = HERE.parent / "data"
+
+
+def build_curv(values=()):
+    """Build a curveType with the given 16-bit values."""
+    return b"curv\x00\x00\x00\x00" + struct.pack(
+        f">I{len(values)}H", len(values), *values
+    )
+
+
+def build_para(function_type, parameters):
+    """Build a parametricCurveType."""
+    return b"para\x00\x00\x00\x00" + struct.pack(
+        f">HH{len(parameters)}i",
+        function_type,
+        0,
+        *[int(round(p * 65536)) for p in parameters],
+    )
+
+
+def build_lut_ab(type_signature, clut, a_curves, b_curves):
+    """Build a lutAtoBType or lutBtoAType with 2x2x2 16-bit CLUT and no matrix."""
+    data = bytearray(type_signature + b"\x00" * 4 + struct.pack(">BBH", 3, 3, 0))
+    data += b"\x00" * 20
+
+    def pad(chunk):
+        return chunk + b"\x00" * (-len(chunk) % 4)
+
+    b_offset = len(data)
+    data += b"".join(pad(curve) for curve in b_curves)
+    clut_offset = len(data)
+    data += bytes([2, 2, 2] + [0] * 13) + bytes([2, 0, 0, 0])
+    data += pad(np.round(clut * 65535).astype(">u2").tobytes())
+    a_offset = len(data)
+    data += b"".join(pad(curve) for curve in a_curves)
+    data[12:32] = struct.pack(">5I", b_offset, 0, 0, clut_offset, a_offset)
+    return bytes(data)
+
+
+def corners():
+    """Return the (2, 2, 2, 3) device values of a 2x2x2 grid."""
+    grid = np.linspace(0.0, 1.0, 2)
+    return np.stack(np.meshgrid(grid, grid, grid, indexing="ij"), axis=-1)
+
+
+@pytest.fixture(scope="function")
+def v4_profile_path(tmp_path):
+    """Create a profile with mAB and mBA tables."""
+    lab = device_to_lab(corners())
+    encoded = (lab + [0.0, 128.0, 128.0]) / [100.0, 255.0, 255.0]
+    a2b0 = build_lut_ab(
+        b"mAB ", encoded, [build_para(0, [2.0])] * 3, [build_curv()] * 3
+    )
+    b2a0 = build_lut_ab(
+        b"mBA ", corners(), [build_para(0, [0.5])] * 3, [build_curv()] * 3
+    )
+    path = tmp_path / "v4.icc"
+    path.write_bytes(
+        build_icc_profile({b"A2B0": a2b0, b"B2A0": b2a0, b"rTRC": build_curv([512])})
+    )
+    yield path
+
+
+def test_icc_profile_path_is_none():
+    """TypeError is raised if the path is None."""
+    with pytest.raises(TypeError) as cm:
+        ICCProfile(None)
+    assert str(cm.value) == "Please specify a valid path"
+
+
+def test_icc_profile_path_does_not_exist(tmp_path):
+    """RuntimeError is raised if the path doesn't exist."""
+    path = tmp_path / "missing.icc"
+    with pytest.raises(RuntimeError) as cm:
+        ICCProfile(path)
+    assert str(cm.value) == f"File does not exist!: {path}"
+
+
+def test_icc_profile_not_an_icc_file(tmp_path):
+    """ValueError is raised if the file is not an ICC profile."""
+    path = tmp_path / "not_a_profile.icc"
+    path.write_bytes(b"\x00" * 256)
+    with pytest.raises(ValueError) as cm:
+        ICCProfile(path)
+    assert str(cm.value) == f"Not an ICC profile: {path}"
+
+
+def test_icc_profile_header():
+    """The header is parsed properly."""
+    with ICCProfile(DATA_PATH / "ProPhoto.icm") as profile:
+        assert profile.version == "2.2.0"
+        assert profile.device_class == "mntr"
+        assert profile.color_space == "RGB"
+        assert profile.pcs == "XYZ"
+        assert profile.created.year == 2015
+        np.testing.assert_allclose(
+            profile.illuminant, [0.9642, 1.0, 0.8249], atol=1e-4
+        )
+        assert "wtpt" in profile
+
+
+def test_icc_profile_tags_are_decoded_lazily():
+    """The tags are only decoded on first access and then cached."""
+    with ICCProfile(DATA_PATH / "sRGB.icc") as profile:
+        assert not any(profile.is_decoded.values())
+        assert profile.description == "sRGB-elle-V2-srgbtrc.icc"
+        assert profile.is_decoded["desc"] is True
+        assert profile.is_decoded["rTRC"] is False
+        assert profile.get_tag("desc") is profile.get_tag("desc")
+
+
+def test_icc_profile_matrix_shaper_tags():
+    """The colorant and TRC tags are decoded properly."""
+    with ICCProfile(DATA_PATH / "AdobeRGB.icc") as profile:
+        assert profile.is_matrix_shaper
+        assert profile.description == "Adobe RGB (1998)"
+        # the colorants are adapted to D50
+        np.testing.assert_allclose(
+            profile.colorants.sum(axis=1), [0.9642, 1.0, 0.8249], atol=1e-3
+        )
+        assert profile.trc_curves[0].gamma == pytest.approx(2.2, abs=1e-2)
+        assert profile.trc_curves[0].evaluate(np.array([0.5]))[0] == pytest.approx(
+            0.5**2.19921875
+        )
+
+
+def test_icc_profile_lut16_tag(printer_profile_path):
+    """The lut16 A2B0 tag is decoded and evaluated properly."""
+    with ICCProfile(printer_profile_path) as profile:
+        lut = profile["A2B0"]
+        assert isinstance(lut, LutTag)
+        assert lut.clut.shape == (9, 9, 9, 3)
+        assert lut.clut.flags["C_CONTIGUOUS"]
+        rgb = np.random.default_rng(0).random((100, 3))
+        np.testing.assert_allclose(
+            profile.device_to_pcs(rgb), device_to_lab(rgb), atol=1e-2
+        )
+
+
+def test_icc_profile_lut16_has_no_b2a(printer_profile_path):
+    """ValueError is raised if there is no BToA table."""
+    with ICCProfile(printer_profile_path) as profile:
+        with pytest.raises(ValueError) as cm:
+            profile.pcs_to_device(np.zeros((1, 3)))
+    assert str(cm.value) == f"Profile has no B2A table: {printer_profile_path}"
+
+
+def test_icc_profile_lut_ab_tags(v4_profile_path):
+    """The mAB and mBA tags are decoded and evaluated properly."""
+    with ICCProfile(v4_profile_path) as profile:
+        assert isinstance(profile["A2B0"], LutABTag)
+        assert profile["A2B0"].clut.shape == (2, 2, 2, 3)
+        rgb = np.random.default_rng(1).random((50, 3))
+        np.testing.assert_allclose(
+            profile.device_to_pcs(rgb), device_to_lab(rgb**2), atol=1e-2
+        )
+        lab = np.array([[50.0, 0.0, 0.0], [100.0, 127.0, -128.0]])
+        encoded = (lab + [0.0, 128.0, 128.0]) / [100.0, 255.0, 255.0]
+        np.testing.assert_allclose(
+            profile.pcs_to_device(lab, intent=1), encoded**0.5, atol=1e-4
+        )
+        assert profile["rTRC"].gamma == 2.0
+
+
+def test_curve_parametric_types():
+    """The parametric curves are evaluated properly."""
+    x = np.linspace(0.0, 1.0, 11)
+    srgb = Curve(
+        function_type=3,
+        parameters=[2.4, 1 / 1.055, 0.055 / 1.055, 1 / 12.92, 0.04045],
+    )
+    expected = np.where(x >= 0.04045, ((x + 0.055) / 1.055) ** 2.4, x / 12.92)
+    np.testing.assert_allclose(srgb.evaluate(x), expected)
+    offset = Curve(function_type=2, parameters=[1.0, 1.0, 0.0, 0.25])
+    np.testing.assert_allclose(offset.evaluate(x), x + 0.25)
+    assert Curve().is_identity
+    assert Curve(gamma=1.0).is_identity
+    assert not Curve(gamma=2.2).is_identity
+
+
+def test_list_profiles(tmp_path):
+    """list_profiles lists the valid profiles only."""
+    for name in ["sRGB.icc", "ProPhoto.icm"]:
+        (tmp_path / name).write_bytes((DATA_PATH / name).read_bytes())
+    (tmp_path / "broken.icc").write_bytes(b"\x00" * 200)
+    (tmp_path / "notes.txt").write_text("not a profile")
+
+    profiles = list(list_profiles(tmp_path))
+    assert [profile.path.name for profile in profiles] == ["ProPhoto.icm", "sRGB.icc"]
+    assert not any(profiles[0].is_decoded.values())
+
+
+def test_list_profiles_closes_the_files(tmp_path):
+    """The listed profiles don't keep their files open until a tag is read."""
+    for i in range(3):
+        (tmp_path / f"sRGB{i}.icc").write_bytes((DATA_PATH / "sRGB.icc").read_bytes())
+
+    profiles = list(list_profiles(tmp_path))
+    assert all(profile._buffer.closed for profile in profiles)
+    assert [profile.description for profile in profiles] == [
+        "sRGB-elle-V2-srgbtrc.icc"
+    ] * 3
+    assert all(profile._buffer.closed for profile in profiles)
+
+
+def test_list_profiles_directory_does_not_exist(tmp_path):
+    """list_profiles returns nothing if the directory doesn't exist."""
+    assert list(list_profiles(tmp_path / "missing")) == []
+
+
+def test_icc_generator_installed_profiles(tmp_path):
+    """ICCGenerator.installed_profiles lists the profiles in the output_path."""
+    (tmp_path / "sRGB.icc").write_bytes((DATA_PATH / "sRGB.icc").read_bytes())
+    icc_gen = ICCGenerator()
+    icc_gen.output_path = tmp_path
+    profiles = icc_gen.installed_profiles()
+    assert len(profiles) == 1
+    assert profiles[0].description == "sRGB-elle-V2-srgbtrc.icc"
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Tests for the interactive module."""
+
+import functools
+import os
+import sys
+
+import pytest
+
+from icc_generator import interactive
+from icc_generator.api import ICCGenerator
+
+pytestmark = pytest.mark.skipif(
+    interactive.pty is None, reason="pseudo terminals are not supported"
+)
+
+FAKE_CHARTREAD = """\
+import os
+import sys
+
+if os.environ.get("FAKE_CHARTREAD_ERROR"):
+    print("Chart has 69 patches")
+    print(f"chartread: Error - {os.environ['FAKE_CHARTREAD_ERROR']}")
+    sys.exit(1)
+
+print("Chart has 69 patches", flush=True)
+for i, strip in enumerate("ABC"):
+    while True:
+        print(f"Ready to read strip pass {strip} ({i + 1} of 3)")
+        sys.stdout.write("Press enter to read strip: ")
+        sys.stdout.flush()
+        key = sys.stdin.readline().strip()
+        print()
+        if key != "x":
+            break
+        print("Strip read failed due to misread (Too few patches)")
+print("Writing output file", flush=True)
+"""
+
+
+@pytest.fixture(scope="function")
+def fake_chartread(tmp_path, monkeypatch):
+    """Put a scripted chartread to the PATH."""
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    chartread_path = bin_path / "chartread"
+    chartread_path.write_text(f"#!{sys.executable}\n{FAKE_CHARTREAD}")
+    chartread_path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+    yield chartread_path
+
+
+@pytest.fixture(scope="function")
+def key_presses(monkeypatch):
+    """Forward the given key presses to the interactive processes."""
+    read_fd, write_fd = os.pipe()
+
+    def press(keys):
+        os.write(write_fd, keys)
+        os.close(write_fd)
+
+    monkeypatch.setattr(
+        interactive,
+        "run_interactive_process",
+        functools.partial(interactive.run_interactive_process, input_fd=read_fd),
+    )
+    yield press
+    os.close(read_fd)
+
+
+def test_parse_chartread_line():
+    """The chartread output lines are parsed into progress events."""
+    event = interactive.parse_chartread_line("Ready to read strip pass AB (28 of 30)")
+    assert (event.kind, event.strip, event.index, event.total) == (
+        "strip",
+        "AB",
+        28,
+        30,
+    )
+
+    event = interactive.parse_chartread_line("Ready to read strip pass C")
+    assert (event.kind, event.strip, event.index) == ("strip", "C", 3)
+    assert event.total is None
+
+    event = interactive.parse_chartread_line("Chart has 210 patches")
+    assert (event.kind, event.count) == ("patches", 210)
+
+    event = interactive.parse_chartread_line("Strip read failed due to misread")
+    assert event.kind == "warning"
+
+    event = interactive.parse_chartread_line("chartread: Error - No instrument")
+    assert event.kind == "error"
+
+    assert interactive.parse_chartread_line("Writing output file") is None
+    assert interactive.parse_chartread_line("") is None
+
+
+def test_run_interactive_process_forwards_the_input(fake_chartread):
+    """The input is forwarded and the output lines are yielded as they arrive."""
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"\n\n\n")
+    os.close(write_fd)
+    echoed = []
+
+    lines = list(
+        interactive.run_interactive_process(
+            [fake_chartread, "-v", "-H", "target"],
+            input_fd=read_fd,
+            echo=echoed.append,
+        )
+    )
+    os.close(read_fd)
+
+    assert lines[0] == "Chart has 69 patches"
+    assert lines[-1] == "Writing output file"
+    assert "Ready to read strip pass C (3 of 3)" in lines
+    assert "Press enter to read strip:" in "".join(echoed)
+
+
+def test_run_interactive_process_forwards_a_piped_console_input(
+    fake_chartread, monkeypatch
+):
+    """The console input is forwarded when it is a pipe and not a terminal."""
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"x\n\n\n\n")
+    os.close(write_fd)
+
+    def setraw(fd):
+        raise AssertionError("a pipe is put into raw mode")
+
+    monkeypatch.setattr(interactive.tty, "setraw", setraw)
+    with os.fdopen(read_fd, "rb") as stdin:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        lines = list(interactive.run_interactive_process([fake_chartread], echo=len))
+
+    assert lines[-1] == "Writing output file"
+    assert "Strip read failed due to misread (Too few patches)" in lines
+
+
+def test_run_interactive_process_return_code_is_not_zero(fake_chartread, monkeypatch):
+    """RuntimeError is raised with the last output lines if the command fails."""
+    monkeypatch.setenv("FAKE_CHARTREAD_ERROR", "No instrument found")
+    with pytest.raises(RuntimeError) as cm:
+        list(interactive.run_interactive_process([fake_chartread], echo=len))
+    assert str(cm.value) == (
+        "Chart has 69 patches\nchartread: Error - No instrument found"
+    )
+
+
+def test_read_charts_reports_the_progress(
+    file_collector, fake_chartread, key_presses, capsys
+):
+    """read_charts reports the progress events and returns the session summary."""
+    icc_gen = ICCGenerator()
+    file_collector.append(icc_gen.profile_path)
+    events = []
+    key_presses(b"\nx\n\n\n")
+
+    session = icc_gen.read_charts(on_event=events.append)
+
+    assert [event.kind for event in events] == [
+        "patches",
+        "strip",
+        "strip",
+        "warning",
+        "strip",
+        "strip",
+    ]
+    assert session.strips == 3
+    assert session.total_strips == 3
+    assert session.patches == 69
+    assert session.warnings == ["Strip read failed due to misread (Too few patches)"]
+    assert session.errors == []
+    assert session.strips_per_minute > 0
+    assert session.to_dict()["strips"] == 3
+    # the session is echoed to the console
+    assert "Press enter to read strip:" in capsys.readouterr().out
+
+
+def test_read_charts_fails(file_collector, fake_chartread, monkeypatch):
+    """RuntimeError is raised if chartread fails."""
+    icc_gen = ICCGenerator()
+    file_collector.append(icc_gen.profile_path)
+    monkeypatch.setenv("FAKE_CHARTREAD_ERROR", "No instrument found")
+    events = []
+    with pytest.raises(RuntimeError) as cm:
+        icc_gen.read_charts(on_event=events.append)
+    assert str(cm.value).endswith("chartread: Error - No instrument found")
+    assert [event.kind for event in events] == ["patches", "error"]
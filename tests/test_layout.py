@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Tests for the layout module."""
+
+import pytest
+
+from icc_generator import layout
+from icc_generator.api import ICCGenerator, PaperSize, PaperSizeLibrary
+
+
+@pytest.mark.parametrize(
+    "paper_size,instrument,strip_count,strip_length",
+    [
+        [PaperSizeLibrary.A4, "i1", 24, 28],
+        [PaperSizeLibrary.A3, "i1", 24, 58],
+        [PaperSizeLibrary.A4R, "i1", 24, 28],
+        [PaperSizeLibrary.A4, "CM", 8, 27],
+        [PaperSizeLibrary.A3, "CM", 11, 41],
+    ],
+)
+def test_page_layout_strips(paper_size, instrument, strip_count, strip_length):
+    """The strips and the patches per strip are computed from the page geometry."""
+    page_layout = layout.page_layout(paper_size.width, paper_size.height, instrument)
+    assert page_layout.strip_count == strip_count
+    assert page_layout.strip_length == strip_length
+
+
+@pytest.mark.parametrize(
+    "paper_size,patch_count,high_density_patch_count",
+    [
+        [PaperSizeLibrary.p4x6, 52, 166],
+        [PaperSizeLibrary.p11x17, 406, 1299],
+        [PaperSizeLibrary.A2, 890, 2784],
+        [PaperSizeLibrary.A3, 445, 1392],
+        [PaperSizeLibrary.A3R, 445, 1392],
+        [PaperSizeLibrary.A4, 210, 672],
+        [PaperSizeLibrary.A4R, 210, 672],
+        [PaperSizeLibrary.Legal, 258, 827],
+        [PaperSizeLibrary.Letter, 203, 649],
+        [PaperSizeLibrary.LetterR, 203, 649],
+    ],
+)
+def test_per_page_patch_count_library_paper_sizes(
+    paper_size, patch_count, high_density_patch_count
+):
+    """The library paper sizes keep the patch counts printtarg fits on them."""
+    icc_gen = ICCGenerator()
+    icc_gen.paper_size = paper_size
+    icc_gen.use_high_density_mode = False
+    assert icc_gen.per_page_patch_count == patch_count
+    icc_gen.use_high_density_mode = True
+    assert icc_gen.per_page_patch_count == high_density_patch_count
+
+
+def test_per_page_patch_count_all_library_paper_sizes_are_pinned():
+    """Every library paper size has its patch counts."""
+    assert sorted(layout.LIBRARY_PATCH_COUNTS) == sorted(PaperSizeLibrary.paper_sizes)
+    for patch_counts in layout.LIBRARY_PATCH_COUNTS.values():
+        assert sorted(patch_counts) == sorted(layout.INSTRUMENTS)
+
+
+def test_per_page_patch_count_modified_library_paper_size():
+    """A custom size named after a library size is laid out with the geometry."""
+    icc_gen = ICCGenerator()
+    icc_gen.use_high_density_mode = True
+    icc_gen.paper_size = PaperSize(name="A2", width=420.0, height=600.0)
+    page_layout = layout.page_layout(420.0, 600.0, "i1")
+    assert icc_gen.per_page_patch_count == page_layout.patch_count
+    assert icc_gen.per_page_patch_count != 2784
+
+
+def test_page_layout_with_patch_count():
+    """The patches per page are limited to the patch positions on the page."""
+    page_layout = layout.page_layout(210.0, 297.0, "i1")
+    assert page_layout.with_patch_count(600).patch_count == 600
+    assert page_layout.with_patch_count(600).capacity == 672
+    with pytest.raises(ValueError) as cm:
+        page_layout.with_patch_count(700)
+    assert str(cm.value) == (
+        "patch_count should be at most 672 for the i1 strips on the page, not 700"
+    )
+
+
+def test_page_layout_custom_paper_size():
+    """The custom paper sizes are laid out instead of raising a KeyError."""
+    icc_gen = ICCGenerator()
+    icc_gen.paper_size = PaperSize(name="13in Roll", width=330.2, height=1000)
+    icc_gen.use_high_density_mode = True
+    assert icc_gen.page_layout.to_dict() == {
+        "instrument": "i1",
+        "strip_count": 83,
+        "strip_length": 45,
+        "along_width": True,
+        "patch_count": 3735,
+    }
+    assert icc_gen.per_page_patch_count == 3735
+    icc_gen.number_of_pages = 2
+    assert icc_gen.patch_count == 7470
+
+
+def test_page_layout_is_memoized():
+    """The same page is laid out once."""
+    layout.page_layout.cache_clear()
+    first = layout.page_layout(210.0, 297.0, layout.I1PRO)
+    assert layout.page_layout(210.0, 297.0, layout.I1PRO) is first
+    assert layout.page_layout.cache_info().hits == 1
+
+
+def test_page_layout_margins_and_resolution():
+    """The patches are snapped to the pixels and placed within the margins."""
+    assert layout.page_layout(297.0, 420.0, "i1", margin=10).patch_count == 1254
+    # 7 mm patches are 7.06 mm at 72 DPI
+    assert layout.page_layout(297.0, 420.0, "i1", dpi=72).strip_length == 57
+
+
+def test_page_layout_page_is_too_small():
+    """There are no patches on a page smaller than a strip."""
+    page_layout = layout.page_layout(20.0, 20.0, "CM")
+    assert page_layout.strip_count == 0
+    assert page_layout.patch_count == 0
+
+
+def test_page_layout_instrument_is_not_valid():
+    """ValueError is raised if there is no instrument with the given name."""
+    with pytest.raises(ValueError) as cm:
+        layout.page_layout(210.0, 297.0, "DTP20")
+    assert str(cm.value) == "instrument should be one of i1 or CM, not DTP20"
+
+
+def test_generate_tif_command_uses_the_layout_settings():
+    """printtarg is run with the instrument, margins and resolution of the layout."""
+    icc_gen = ICCGenerator()
+    icc_gen.use_high_density_mode = True
+    command = icc_gen.generate_tif_command()
+    assert command[:4] == ["printtarg", "-v", "-ii1", "-a 0.875"]
+    assert "-T300" in command
+    assert "-M2" in command
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Tests for the lut_cache module."""
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from icc_generator import transform
+from icc_generator.api import HERE
+from icc_generator.lut_cache import LUTCache
+
+DATA_PATH = HERE.parent / "data"
+
+
+def test_lut_cache_max_size_is_not_an_int(tmp_path):
+    """TypeError is raised if max_size is not an int."""
+    with pytest.raises(TypeError) as cm:
+        LUTCache(tmp_path, max_size="1MB")
+    assert str(cm.value) == "max_size should be an int, not str"
+
+
+def test_lut_cache_max_size_is_negative(tmp_path):
+    """ValueError is raised if max_size is negative."""
+    with pytest.raises(ValueError) as cm:
+        LUTCache(tmp_path, max_size=-1)
+    assert str(cm.value) == "max_size should be a positive integer, not -1"
+
+
+def test_lut_cache_key_depends_on_the_profile_content(tmp_path):
+    """The key depends on the profile content, the intent and the grid size."""
+    source = DATA_PATH / "sRGB.icc"
+    destination = tmp_path / "printer.icc"
+    shutil.copy(DATA_PATH / "AdobeRGB.icc", destination)
+
+    key = LUTCache.key(source, destination, "r", 33)
+    assert LUTCache.key(source, DATA_PATH / "AdobeRGB.icc", "r", 33) == key
+    assert LUTCache.key(source, destination, "p", 33) != key
+    assert LUTCache.key(source, destination, "r", 17) != key
+
+    destination.write_bytes(destination.read_bytes() + b"\x00")
+    assert LUTCache.key(source, destination, "r", 33) != key
+
+
+def test_lut_cache_put_and_get(tmp_path):
+    """The stored tables are returned back."""
+    lut_cache = LUTCache(tmp_path / "cache")
+    lut = np.random.default_rng(0).random((3, 3, 3, 3)).astype(np.float32)
+    assert lut_cache.get("key") is None
+
+    lut_cache.put("key", lut)
+    assert "key" in lut_cache
+    np.testing.assert_array_equal(lut_cache.get("key"), lut)
+    assert lut_cache.size == (tmp_path / "cache" / "key.npy").stat().st_size
+    assert [path.name for path in (tmp_path / "cache").iterdir()] == ["key.npy"]
+
+
+def test_lut_cache_put_failure_removes_the_temp_file(tmp_path, monkeypatch):
+    """A table that can't be written leaves no temporary file behind."""
+
+    def save(f, lut, allow_pickle=False):
+        f.write(b"partial")
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(np, "save", save)
+    lut_cache = LUTCache(tmp_path / "cache")
+    with pytest.raises(OSError):
+        lut_cache.put("key", np.zeros((3, 3, 3, 3), dtype=np.float32))
+    assert list((tmp_path / "cache").iterdir()) == []
+
+
+def test_lut_cache_invalid_entry(tmp_path):
+    """Invalid entries are treated as cache misses."""
+    lut_cache = LUTCache(tmp_path)
+    (tmp_path / "key.npy").write_bytes(b"not a numpy file")
+    assert lut_cache.get("key") is None
+
+
+def test_lut_cache_evicts_the_least_recently_used_tables(tmp_path):
+    """The least recently used tables are removed to fit the size budget."""
+    lut = np.zeros((9, 9, 9, 3), dtype=np.float32)
+    lut_cache = LUTCache(tmp_path, max_size=2 * (lut.nbytes + 128))
+    lut_cache.put("a", lut)
+    lut_cache.put("b", lut)
+    os.utime(tmp_path / "a.npy", (1000, 1000))
+    os.utime(tmp_path / "b.npy", (2000, 2000))
+
+    # using "a" makes "b" the least recently used one
+    assert lut_cache.get("a") is not None
+    lut_cache.put("c", lut)
+
+    assert "a" in lut_cache
+    assert "b" not in lut_cache
+    assert "c" in lut_cache
+
+    lut_cache.clear()
+    assert lut_cache.entries() == []
+
+
+def test_get_transform_uses_the_disk_cache(
+    tmp_path, rgb_printer_profile_path, isolate_lut_cache, monkeypatch
+):
+    """The transform is not built again if the table is in the disk cache."""
+    transform.clear_transform_cache()
+    source = DATA_PATH / "AdobeRGB.icc"
+    first = transform.get_transform(source, rgb_printer_profile_path)
+    assert len(isolate_lut_cache.entries()) == 1
+
+    def from_profiles(*args, **kwargs):
+        raise AssertionError("the transform is built again")
+
+    # a new process has an empty in-process cache, the profile is in a new path
+    transform.clear_transform_cache()
+    monkeypatch.setattr(transform.ColorTransform, "from_profiles", from_profiles)
+    printer_profile_copy = tmp_path / "printer_copy.icc"
+    shutil.copy(rgb_printer_profile_path, printer_profile_copy)
+
+    second = transform.get_transform(source, printer_profile_copy)
+    assert second is not first
+    np.testing.assert_array_equal(second.lut, first.lut)
+    transform.clear_transform_cache()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Tests for the output_capture module."""
+
+import sys
+
+import pytest
+
+from icc_generator.api import ICCGenerator
+from icc_generator.output_capture import OutputCapture, read_lines
+
+# writes the given number of numbered lines to stderr and fails
+FAILING_TOOL = (
+    "import sys\n"
+    "for i in range(int(sys.argv[1])):\n"
+    "    sys.stderr.write(f'line {i}\\n')\n"
+    "sys.exit(1)\n"
+)
+
+
+def test_output_capture_keeps_the_last_bytes():
+    """Only the last limit bytes are kept, the partial first line is dropped."""
+    capture = OutputCapture(limit=16)
+    for i in range(10):
+        capture.write(f"line {i}\n".encode())
+    assert capture.size == 70
+    assert capture.truncated is True
+    assert capture.tail() == "line 8\nline 9"
+
+
+def test_output_capture_chunk_larger_than_the_limit():
+    """A chunk larger than the limit replaces the buffer."""
+    capture = OutputCapture(limit=8)
+    capture.write(b"first\n")
+    capture.write(b"0123456789\nlast\n")
+    assert capture.tail() == "last"
+
+
+def test_output_capture_limit_is_not_valid():
+    """ValueError is raised if limit is not positive."""
+    with pytest.raises(ValueError) as cm:
+        OutputCapture(limit=0)
+    assert str(cm.value) == "limit should be a positive integer, not 0"
+
+
+def test_output_capture_spills_to_the_log_file(tmp_path):
+    """The complete output is written to the log file."""
+    log_path = tmp_path / "logs" / "colprof.log"
+    with OutputCapture(limit=4, log_path=log_path) as capture:
+        capture.write(b"first line\n")
+        capture.write(b"second line\n")
+    assert log_path.read_bytes() == b"first line\nsecond line\n"
+
+
+def test_read_lines_splits_the_chunks(tmp_path):
+    """The lines split between the chunks are joined."""
+    path = tmp_path / "output.txt"
+    path.write_bytes("Fitting étape 1\r\n\nstep 2\nno new line".encode())
+    capture = OutputCapture()
+    with open(path, "rb") as f:
+        lines = list(read_lines(f, capture, chunk_size=3))
+    assert lines == ["Fitting étape 1", "", "step 2", "no new line"]
+    assert capture.size == path.stat().st_size
+
+
+def test_read_lines_splits_the_carriage_returns(tmp_path):
+    """The progress output rewriting the same line is yielded line by line."""
+    path = tmp_path / "output.txt"
+    path.write_bytes(b"ab\r\n" + b"".join(b"%d%%\r" % i for i in range(100)) + b"done")
+    capture = OutputCapture()
+    with open(path, "rb") as f:
+        lines = list(read_lines(f, capture, chunk_size=3))
+    assert lines == ["ab"] + [f"{i}%" for i in range(100)] + ["done"]
+
+
+def test_run_external_process_error_has_the_last_lines(tmp_path):
+    """The error message has the end of the output and the log has all of it."""
+    command = [sys.executable, "-c", FAILING_TOOL, "10000"]
+    capture = OutputCapture(limit=1024, log_path=tmp_path / "tool.log")
+    lines = []
+    with pytest.raises(RuntimeError) as cm:
+        for line in ICCGenerator.run_external_process(command, capture=capture):
+            lines.append(line)
+
+    assert len(lines) == 10000
+    message = str(cm.value)
+    assert len(message) < 1024
+    assert message.endswith("line 9998\nline 9999")
+    assert not message.startswith("line 0\n")
+    log = (tmp_path / "tool.log").read_text()
+    assert log.startswith("line 0\n")
+    assert log.count("\n") == 10000
+
+
+def test_read_lines_empty_stream(tmp_path):
+    """Nothing is yielded for an empty stream."""
+    path = tmp_path / "output.txt"
+    path.write_bytes(b"")
+    capture = OutputCapture()
+    with open(path, "rb") as f:
+        assert list(read_lines(f, capture)) == []
+    assert capture.size == 0
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Tests for the pipeline module."""
+
+import json
+import os
+
+import pytest
+
+from icc_generator import pipeline
+from icc_generator.api import ICCGenerator
+from icc_generator.pipeline import Pipeline
+
+
+@pytest.fixture(scope="function")
+def tool_versions(monkeypatch):
+    """Patch the ArgyllCMS tool versions."""
+    versions = {}
+    monkeypatch.setattr(
+        pipeline, "tool_version", lambda tool: versions.get(tool, "3.0.0")
+    )
+    yield versions
+
+
+@pytest.fixture(scope="function")
+def icc_gen(tmp_path, fake_argyll, tool_versions):
+    """Create an ICCGenerator writing to a temp folder."""
+    icc_gen = ICCGenerator()
+    icc_gen._profile_path_template = str(tmp_path / "{printer_brand}")
+    # always run the stages
+    icc_gen.target_cache = None
+    yield icc_gen
+
+
+def test_pipeline_icc_generator_is_not_an_icc_generator():
+    """TypeError is raised if icc_generator is not an ICCGenerator."""
+    with pytest.raises(TypeError) as cm:
+        Pipeline("icc_generator")
+    assert str(cm.value) == "icc_generator should be an ICCGenerator, not str"
+
+
+def test_pipeline_stage_is_not_valid(icc_gen):
+    """ValueError is raised if the stage name is not valid."""
+    with pytest.raises(ValueError) as cm:
+        Pipeline(icc_gen).run("colprof")
+    assert str(cm.value) == (
+        "stage should be one of target, tif or profile, not colprof"
+    )
+
+
+def test_pipeline_skips_the_up_to_date_stages(icc_gen, fake_argyll):
+    """The stages are not run again if their inputs and outputs didn't change."""
+    commands = fake_argyll
+    icc_pipeline = Pipeline(icc_gen)
+    assert icc_pipeline.outdated() == ["target", "tif", "profile"]
+
+    assert icc_pipeline.run_all(["target", "tif"]) == ["target", "tif"]
+    assert commands == ["targen", "printtarg"]
+
+    assert icc_pipeline.run_all(["target", "tif"]) == []
+    assert commands == ["targen", "printtarg"]
+    assert icc_pipeline.outdated() == ["profile"]
+
+    manifest = json.loads(icc_pipeline.manifest_path.read_text())
+    assert manifest["target"]["tool_version"] == "3.0.0"
+    assert manifest["target"]["command"][0] == "targen"
+    assert list(manifest["tif"]["inputs"]) == [
+        f"{icc_gen.profile_absolute_full_path}.ti1"
+    ]
+
+    # force runs the stage anyway
+    assert icc_pipeline.run("tif", force=True) is True
+    assert commands == ["targen", "printtarg", "printtarg"]
+
+
+def test_pipeline_reruns_the_stages_with_changed_inputs(
+    icc_gen, fake_argyll, tool_versions
+):
+    """The changed arguments are propagated to the next stages through the files."""
+    commands = fake_argyll
+    icc_pipeline = Pipeline(icc_gen)
+    icc_pipeline.run_all(["target", "tif"])
+
+    icc_gen.gray_patch_count = 64
+    assert icc_pipeline.run_all(["target", "tif"]) == ["target", "tif"]
+
+    # a new tool version runs the stage again, the same output doesn't affect tif
+    tool_versions["targen"] = "3.1.0"
+    assert icc_pipeline.run_all(["target", "tif"]) == ["target"]
+    assert commands == ["targen", "printtarg"] * 2 + ["targen"]
+
+
+def test_pipeline_reruns_the_stages_with_changed_outputs(icc_gen, fake_argyll):
+    """The stages are run again if their outputs are modified or deleted."""
+    commands = fake_argyll
+    icc_pipeline = Pipeline(icc_gen)
+    icc_pipeline.run_all(["target", "tif"])
+
+    icc_gen.tif_files[0].write_text("edited")
+    assert icc_pipeline.outdated() == ["tif", "profile"]
+
+    icc_gen.tif_files[0].unlink()
+    assert icc_pipeline.run_all(["target", "tif"]) == ["tif"]
+
+
+def test_pipeline_input_does_not_exist(icc_gen):
+    """RuntimeError is raised if an input of the stage doesn't exist."""
+    with pytest.raises(RuntimeError) as cm:
+        Pipeline(icc_gen).run("profile")
+    assert str(cm.value) == (
+        f"File does not exist!: {icc_gen.profile_absolute_full_path}.ti3"
+    )
+
+
+def test_pipeline_profile_stage(icc_gen, fake_argyll):
+    """The profile is generated again only if the measurements are changed."""
+    commands = fake_argyll
+    icc_pipeline = Pipeline(icc_gen)
+    icc_pipeline.run_all(["target", "tif"])
+    ti3_path = icc_gen.profile_absolute_path / f"{icc_gen.profile_name}.ti3"
+    ti3_path.write_text("measurements")
+
+    assert icc_pipeline.run_all() == ["profile"]
+    assert icc_pipeline.run_all() == []
+
+    ti3_path.write_text("new measurements")
+    assert icc_pipeline.run_all() == ["profile"]
+    assert commands.count("colprof") == 2
+
+
+def test_pipeline_profile_stage_on_windows(icc_gen, fake_argyll, set_to_windows):
+    """The profile stage is up to date with the *.icm profile on windows."""
+    commands = fake_argyll
+    icc_pipeline = Pipeline(icc_gen)
+    icc_pipeline.run_all(["target", "tif"])
+    ti3_path = icc_gen.profile_absolute_path / f"{icc_gen.profile_name}.ti3"
+    ti3_path.write_text("measurements")
+
+    assert icc_pipeline.run_all() == ["profile"]
+    assert os.path.isfile(f"{icc_gen.profile_absolute_full_path}.icm")
+    assert icc_pipeline.outdated() == []
+    assert icc_pipeline.run_all() == []
+    assert commands.count("colprof") == 1
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Tests for the profile_check module."""
+
+import time
+
+import numpy as np
+import pytest
+
+from icc_generator.api import ICCGenerator
+from icc_generator.cgats import CGATSTable, CGATS
+from icc_generator.colorimetry import lab_to_xyz
+from icc_generator.profile_check import check_profile
+
+from tests.conftest import device_to_lab
+
+
+def write_ti3(path, rgb, lab):
+    """Write a .ti3 file with the given device and measured values."""
+    table = CGATSTable(file_type="CTI3")
+    table.keywords["COLOR_REP"] = "RGB_XYZ"
+    table["SAMPLE_ID"] = np.arange(1, len(rgb) + 1)
+    table.set_columns(["RGB_R", "RGB_G", "RGB_B"], rgb * 100.0)
+    table.set_columns(["XYZ_X", "XYZ_Y", "XYZ_Z"], lab_to_xyz(lab) * 100.0)
+    CGATS([table]).write(path)
+
+
+@pytest.fixture(scope="function")
+def ti3_path(tmp_path):
+    """Create a .ti3 file matching the test printer profile, except patch 5."""
+    rng = np.random.default_rng(0)
+    rgb = rng.random((500, 3))
+    lab = device_to_lab(rgb)
+    lab[4, 0] += 3.0
+    path = tmp_path / "printer_profile.ti3"
+    write_ti3(path, rgb, lab)
+    yield path
+
+
+def test_check_profile_returns_per_patch_delta_e(ti3_path, printer_profile_path):
+    """check_profile returns a dE value per patch."""
+    report = check_profile(ti3_path, printer_profile_path)
+    assert len(report) == 500
+    assert report.delta_e.shape == (500,)
+
+
+def test_check_profile_statistics(ti3_path, printer_profile_path):
+    """check_profile calculates the statistics properly."""
+    report = check_profile(ti3_path, printer_profile_path)
+    assert report.maximum == pytest.approx(report.delta_e[4])
+    assert report.maximum > 1.5
+    assert report.average < 0.1
+    assert report.percentile_95 < 0.1
+
+
+def test_check_profile_worst_patches(ti3_path, printer_profile_path):
+    """worst_patches returns the patches sorted by dE."""
+    report = check_profile(ti3_path, printer_profile_path)
+    worst_patches = report.worst_patches(3)
+    assert len(worst_patches) == 3
+    assert worst_patches[0]["sample_id"] == 5
+    assert worst_patches[0]["delta_e"] >= worst_patches[1]["delta_e"]
+    assert worst_patches[1]["delta_e"] >= worst_patches[2]["delta_e"]
+
+
+def test_check_profile_to_dict(ti3_path, printer_profile_path):
+    """to_dict returns the report summary."""
+    data = check_profile(ti3_path, printer_profile_path).to_dict(worst_patch_count=2)
+    assert data["patch_count"] == 500
+    assert len(data["worst_patches"]) == 2
+    assert data["maximum"] >= data["percentile_95"] >= 0
+
+
+def test_check_profile_format_sorted(ti3_path, printer_profile_path):
+    """format lists the worst patch first when sorted by dE."""
+    output = check_profile(ti3_path, printer_profile_path).format(sort_by_de=True)
+    lines = output.split("\n")
+    assert len(lines) == 501
+    assert "] 5: " in lines[0]
+    assert lines[-1].startswith("Profile check complete, peak err =")
+
+
+def test_check_profile_thousands_of_patches_is_fast(tmp_path, printer_profile_path):
+    """check_profile handles thousands of patches well under a second."""
+    rng = np.random.default_rng(1)
+    rgb = rng.random((5000, 3))
+    path = tmp_path / "big.ti3"
+    write_ti3(path, rgb, device_to_lab(rgb))
+    start = time.perf_counter()
+    report = check_profile(path, printer_profile_path)
+    assert time.perf_counter() - start < 1.0
+    assert report.maximum < 0.1
+
+
+def test_check_profile_without_measurements(tmp_path, printer_profile_path):
+    """ValueError is raised if the .ti3 doesn't have measurements."""
+    table = CGATSTable(file_type="CTI3")
+    table.set_columns(["RGB_R", "RGB_G", "RGB_B"], np.zeros((2, 3)))
+    path = tmp_path / "no_measurements.ti3"
+    CGATS([table]).write(path)
+    with pytest.raises(ValueError) as cm:
+        check_profile(path, printer_profile_path)
+    assert str(cm.value) == f"{path} doesn't have XYZ or LAB values"
+
+
+def test_icc_generator_check_profile_native_engine(
+    ti3_path, printer_profile_path, file_collector, set_to_linux
+):
+    """ICCGenerator.check_profile with engine="native" returns the report."""
+    icc_gen = ICCGenerator()
+    file_collector.append(icc_gen.profile_path)
+    icc_gen.profile_absolute_path.mkdir(parents=True, exist_ok=True)
+    ti3_copy = icc_gen.profile_absolute_path / f"{icc_gen.profile_name}.ti3"
+    icc_copy = icc_gen.profile_absolute_path / f"{icc_gen.profile_name}.icc"
+    ti3_copy.write_bytes(ti3_path.read_bytes())
+    icc_copy.write_bytes(printer_profile_path.read_bytes())
+
+    report = icc_gen.check_profile(sort_by_de=True, engine="native")
+    assert report.worst_patches(1)[0]["sample_id"] == 5
+
+
+def test_icc_generator_check_profile_engine_is_not_a_str():
+    """TypeError is raised if the engine is not a str."""
+    icc_gen = ICCGenerator()
+    with pytest.raises(TypeError) as cm:
+        icc_gen.check_profile(engine=1)
+    assert str(cm.value) == "engine should be a str, not int"
+
+
+def test_icc_generator_check_profile_engine_is_not_valid():
+    """ValueError is raised if the engine is not a valid value."""
+    icc_gen = ICCGenerator()
+    with pytest.raises(ValueError) as cm:
+        icc_gen.check_profile(engine="argyll")
+    assert str(cm.value) == "engine should be one of profcheck or native, not argyll"
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Tests for the run_stats module."""
+
+import json
+import os
+import sys
+
+import pytest
+
+from icc_generator import run_stats
+from icc_generator.api import ICCGenerator
+from icc_generator.run_stats import RunStats, RunStatsLog
+
+# allocates and touches the given number of MiB
+ALLOCATE = "import sys; data = bytearray(int(sys.argv[1]) * 2**20); sys.exit({})"
+
+
+@pytest.fixture(scope="function")
+def fake_colprof(tmp_path, monkeypatch):
+    """Put a colprof to the PATH that allocates 64 MiB."""
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    colprof_path = bin_path / "colprof"
+    colprof_path.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "data = bytearray(64 * 2**20)\n"
+        "sys.stderr.write('Creating profile\\n')\n"
+    )
+    colprof_path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+    yield colprof_path
+
+
+def test_run_external_process_records_the_resource_usage():
+    """The wall time, CPU time and peak memory of the process are recorded."""
+    command = [sys.executable, "-c", ALLOCATE.format(0), "128"]
+    with run_stats.recording(stage="profile", patch_count=210) as stats_list:
+        list(ICCGenerator.run_external_process(command))
+
+    assert len(stats_list) == 1
+    stats = stats_list[0]
+    assert stats.stage == "profile"
+    assert stats.patch_count == 210
+    assert stats.return_code == 0
+    assert stats.wall_time > 0
+    if hasattr(os, "wait4"):
+        assert stats.cpu_time > 0
+        assert stats.max_rss >= 128 * 2**20
+
+
+def test_run_external_process_records_the_failed_processes():
+    """The processes are recorded even if they fail."""
+    command = [sys.executable, "-c", ALLOCATE.format(3), "0"]
+    with run_stats.recording() as stats_list:
+        with pytest.raises(RuntimeError):
+            list(ICCGenerator.run_external_process(command))
+    assert stats_list[0].return_code == 3
+
+
+def test_stages_are_tagged(tmp_path, fake_colprof):
+    """The ICCGenerator stages tag the measurements and append them to the log."""
+    log = RunStatsLog(tmp_path / "logs" / "run_stats.jsonl")
+    icc_gen = ICCGenerator()
+    icc_gen._profile_path_template = str(tmp_path / "profile")
+    icc_gen.run_stats_log = log
+    icc_gen.generate_profile()
+
+    assert len(icc_gen.run_stats) == 1
+    stats = icc_gen.run_stats[0]
+    assert stats.tool == "colprof"
+    assert stats.stage == "profile"
+    assert stats.patch_count == icc_gen.patch_count
+    assert stats.paper_size == "A4"
+
+    lines = log.path.read_text().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["stage"] == "profile"
+    assert log.read()[0].to_dict() == stats.to_dict()
+
+
+def test_the_stage_defaults_to_the_stage_of_the_tool():
+    """The tool name is used to tag the stage if the caller doesn't."""
+    stats = run_stats.collect(["/usr/bin/targen", "-v"], 0.0, 0)
+    assert stats.stage == "target"
+    assert stats.cpu_time is None
+    assert str(stats).startswith("targen (target): wall = ")
+
+
+def test_record_uses_the_tags_of_the_context(tmp_path):
+    """The measurements taken elsewhere get the missing tags of the context."""
+    stats = RunStats(["colprof"], stage="profile")
+    log = RunStatsLog(tmp_path / "run_stats.jsonl")
+    with run_stats.recording(log=log, stage="sweep", patch_count=210) as stats_list:
+        assert run_stats.record(stats) is stats
+    assert stats_list == [stats]
+    assert stats.stage == "profile"
+    assert stats.patch_count == 210
+    assert [item.tool for item in log.read()] == ["colprof"]
+
+
+def test_run_stats_log_read_missing_file(tmp_path):
+    """An empty list is returned if nothing is logged yet."""
+    assert RunStatsLog(tmp_path / "run_stats.jsonl").read() == []
+    assert RunStats.from_dict({"command": ["colprof"]}).tool == "colprof"
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Tests for the session_state module."""
+
+import json
+
+import pytest
+
+from icc_generator import interactive
+from icc_generator.api import ICCGenerator
+from icc_generator.session_state import SessionState
+
+
+@pytest.fixture(scope="function")
+def fake_reads(monkeypatch, fake_argyll):
+    """Replace chartread with a fake that writes the .ti3 file."""
+    reads = []
+
+    def read_charts(self, resume=False, read_mode=0, on_event=None):
+        # a "crash" at the start of the reads interrupts the first read
+        crash = reads == ["crash"]
+        reads.append(resume)
+        ti3_path = self.profile_absolute_path / f"{self.profile_name}.ti3"
+        ti3_path.write_text(f"measurements {len(reads)}")
+        if crash:
+            raise KeyboardInterrupt
+        return interactive.ChartReadSession()
+
+    monkeypatch.setattr(ICCGenerator, "read_charts", read_charts)
+    yield reads
+
+
+@pytest.fixture(scope="function")
+def icc_gen(tmp_path):
+    """Create an ICCGenerator writing to a temp folder."""
+    icc_gen = ICCGenerator()
+    icc_gen._profile_path_template = str(tmp_path / "profile")
+    icc_gen.target_cache = None
+    yield icc_gen
+
+
+def test_session_state_runs_the_stages(icc_gen, fake_argyll, fake_reads):
+    """All the stages are run once and their state is saved."""
+    state = SessionState(icc_gen)
+    assert state.next_stage() == "target"
+    assert state.run() == ["target", "tif", "read", "profile", "check"]
+    assert fake_argyll == ["targen", "printtarg", "colprof", "profcheck"]
+    assert fake_reads == [False]
+
+    saved_state = json.loads(state.state_path.read_text())
+    assert saved_state["last_completed"] == "check"
+    assert all(stage["status"] == "done" for stage in saved_state["stages"].values())
+    assert len(saved_state["stages"]["tif"]["artifacts"]) == 2
+
+    assert state.next_stage() is None
+    assert SessionState(icc_gen).run() == []
+
+
+def test_session_state_resumes_after_a_failure(icc_gen, fake_argyll, fake_reads):
+    """A restarted session picks up at the failed stage without reading again."""
+    run_external_process = ICCGenerator.run_external_process
+
+    def failing_run_external_process(self, command, shell=False):
+        if command[0] == "colprof":
+            raise RuntimeError("colprof: Error - Out of memory")
+        yield from run_external_process(self, command, shell)
+
+    ICCGenerator.run_external_process = failing_run_external_process
+    try:
+        with pytest.raises(RuntimeError):
+            SessionState(icc_gen).run()
+    finally:
+        ICCGenerator.run_external_process = run_external_process
+
+    state = SessionState(icc_gen)
+    assert state.status("profile") == "failed"
+    assert state.load()["stages"]["profile"]["error"] == (
+        "RuntimeError: colprof: Error - Out of memory"
+    )
+    assert state.load()["last_completed"] == "read"
+    assert state.next_stage() == "profile"
+
+    assert state.run() == ["profile", "check"]
+    assert fake_reads == [False]
+
+
+def test_session_state_resumes_an_interrupted_read(icc_gen, fake_reads):
+    """An interrupted chart reading session is resumed with the patches read."""
+    fake_reads.append("crash")
+    with pytest.raises(KeyboardInterrupt):
+        SessionState(icc_gen).run()
+
+    state = SessionState(icc_gen)
+    assert state.status("read") == "running"
+    assert state.next_stage() == "read"
+    assert state.run() == ["read", "profile", "check"]
+    assert fake_reads == ["crash", False, True]
+
+
+def test_session_state_accepts_the_edited_measurements(
+    icc_gen, fake_argyll, fake_reads
+):
+    """An edited .ti3 file invalidates the profile but is never read again."""
+    state = SessionState(icc_gen)
+    state.run()
+    ti3_path = icc_gen.profile_absolute_path / f"{icc_gen.profile_name}.ti3"
+    ti3_path.write_text("fixed measurements")
+
+    assert state.next_stage() == "profile"
+    assert state.status("read") == "done"
+    assert state.run() == ["profile", "check"]
+    assert fake_reads == [False]
+
+
+def test_session_state_regenerated_files_are_not_changed(
+    icc_gen, fake_argyll, fake_reads
+):
+    """The stages after a regenerated stage are kept if its files are the same."""
+    state = SessionState(icc_gen)
+    state.run()
+    (icc_gen.profile_absolute_path / f"{icc_gen.profile_name}.ti2").unlink()
+
+    assert state.next_stage() == "tif"
+    assert state.run() == ["tif"]
+    assert fake_argyll[-1] == "printtarg"
+    assert fake_reads == [False]
+
+
+def test_session_state_accepts_the_evicted_charts(icc_gen, fake_argyll, fake_reads):
+    """The removed charts of a read session are not generated again."""
+    state = SessionState(icc_gen)
+    state.run(["target", "tif"])
+    icc_gen.tif_files[0].unlink()
+    assert state.next_stage() == "tif"
+
+    state.run()
+    icc_gen.tif_files[0].unlink()
+    assert state.next_stage() is None
+    assert state.status("tif") == "done"
+    assert fake_argyll == ["targen", "printtarg", "printtarg", "colprof", "profcheck"]
+
+
+def test_session_state_stage_is_not_valid(icc_gen):
+    """ValueError is raised if the stage name is not valid."""
+    with pytest.raises(ValueError) as cm:
+        SessionState(icc_gen).status("print")
+    assert str(cm.value) == (
+        "stage should be one of target, tif, read, profile or check, not print"
+    )
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Tests for the streaming module."""
+
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from icc_generator import streaming, transform
+from icc_generator.api import HERE
+from icc_generator.tiff import TiffReader, TiffWriter
+
+DATA_PATH = HERE.parent / "data"
+
+
+@pytest.fixture(scope="function")
+def srgb_transform(rgb_printer_profile_path):
+    """Return the transform from sRGB to the test printer profile."""
+    yield transform.get_transform(DATA_PATH / "sRGB.icc", rgb_printer_profile_path)
+
+
+def write_tiff(path, pixels, **kwargs):
+    """Write the given pixels to a TIFF file."""
+    height, width, channels = pixels.shape
+    with TiffWriter(
+        path, width, height, samples_per_pixel=channels, dtype=pixels.dtype, **kwargs
+    ) as writer:
+        writer.write(pixels)
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+@pytest.mark.parametrize("compression", ["none", "deflate"])
+def test_stream_image_matches_the_in_memory_conversion(
+    tmp_path, srgb_transform, dtype, compression
+):
+    """stream_image converts the image as if it is converted at once."""
+    pixels = np.random.default_rng(0).integers(
+        0, np.iinfo(dtype).max, (61, 17, 3), dtype=dtype
+    )
+    input_path = tmp_path / "input.tif"
+    write_tiff(input_path, pixels, compression=compression, dpi=300)
+
+    output_path = streaming.stream_image(
+        srgb_transform,
+        input_path,
+        tmp_path / "output.tif",
+        icc_profile=b"profile",
+        band_size=17 * 3 * 5,
+        queue_size=2,
+    )
+
+    with TiffReader(output_path) as reader:
+        assert reader.dtype == dtype
+        assert reader.compression == (1 if compression == "none" else 8)
+        assert reader.dpi == 300
+        assert reader.icc_profile == b"profile"
+        np.testing.assert_array_equal(
+            reader.read(), srgb_transform.apply_to_pixels(pixels)
+        )
+
+
+def measure_peak_memory(tmp_path, color_transform, height):
+    """Stream a 16-bit image with the given height and return the peak memory."""
+    pixels = np.zeros((height, 1000, 3), dtype=np.uint16)
+    pixels[:] = np.linspace(0, 65535, 1000, dtype=np.uint16)[None, :, None]
+    input_path = tmp_path / f"input_{height}.tif"
+    write_tiff(input_path, pixels, compression="deflate", rows_per_strip=height)
+    del pixels
+
+    tracemalloc.start()
+    try:
+        streaming.stream_image(
+            color_transform,
+            input_path,
+            tmp_path / f"output_{height}.tif",
+            band_size=256 * 1024,
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def test_stream_image_memory_does_not_depend_on_the_image_size(
+    tmp_path, srgb_transform
+):
+    """Only a few bands are held in the memory while streaming."""
+    small_peak = measure_peak_memory(tmp_path, srgb_transform, 500)
+    large_peak = measure_peak_memory(tmp_path, srgb_transform, 3000)
+    # the large image is 18 MB, stored in a single strip
+    assert large_peak < 18e6 / 2
+    assert large_peak < small_peak * 1.5
+
+
+def test_stream_image_removes_the_output_on_errors(tmp_path, srgb_transform):
+    """The partially written output is removed if the conversion fails."""
+    input_path = tmp_path / "input.tif"
+    write_tiff(input_path, np.zeros((10, 10, 3), dtype=np.uint8))
+
+    class FailingTransform(object):
+        output_channels = 3
+
+        def apply_to_pixels(self, pixels):
+            raise RuntimeError("conversion failed")
+
+    output_path = tmp_path / "output.tif"
+    with pytest.raises(RuntimeError) as cm:
+        streaming.stream_image(FailingTransform(), input_path, output_path)
+    assert str(cm.value) == "conversion failed"
+    assert not output_path.exists()
+
+
+def test_iterate_in_background_raises_the_iterator_errors():
+    """The errors of the iterator are raised in the consumer."""
+
+    def numbers():
+        yield 1
+        yield 2
+        raise KeyError("broken")
+
+    items = []
+    with pytest.raises(KeyError):
+        for item in streaming.iterate_in_background(numbers(), 1):
+            items.append(item)
+    assert items == [1, 2]
+
+
+def test_background_writer_raises_the_write_errors():
+    """The errors of the write function are raised when closing."""
+    written = []
+
+    def write(item):
+        if item == 2:
+            raise ValueError("cannot write 2")
+        written.append(item)
+
+    writer = streaming.BackgroundWriter(write, 1)
+    for item in range(5):
+        try:
+            writer.write(item)
+        except ValueError:
+            break
+    with pytest.raises(ValueError) as cm:
+        writer.close()
+    assert str(cm.value) == "cannot write 2"
+    assert written == [0, 1]
+
+
+def test_correct_image_streams_tiff_files(
+    tmp_path, rgb_printer_profile_path, monkeypatch
+):
+    """correct_image streams TIFF to TIFF conversions."""
+    input_path = tmp_path / "input.tif"
+    write_tiff(input_path, np.zeros((4, 4, 3), dtype=np.uint16))
+    calls = []
+    original = streaming.stream_image
+
+    def stream_image(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(streaming, "stream_image", stream_image)
+    transform.correct_image(
+        DATA_PATH / "sRGB.icc",
+        rgb_printer_profile_path,
+        input_path,
+        tmp_path / "output.tif",
+    )
+    assert len(calls) == 1
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Tests for the sweep module."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from icc_generator import sweep
+from icc_generator.api import ICCGenerator
+from icc_generator.cgats import CGATS, CGATSTable
+from icc_generator.colorimetry import lab_to_xyz
+
+from tests.conftest import (
+    build_icc_profile,
+    build_printer_a2b_tag,
+    build_xyz_tag,
+    device_to_lab,
+)
+
+# copies the good profile for -r0.5, fails for -r1.0 and copies the bad one otherwise
+FAKE_COLPROF = """\
+import os
+import shutil
+import sys
+
+arguments = sys.argv[1:]
+if "-r1.0" in arguments:
+    sys.stderr.write("colprof: Error - Fitting failed")
+    sys.exit(1)
+profile = "FAKE_GOOD_PROFILE" if "-r0.5" in arguments else "FAKE_BAD_PROFILE"
+shutil.copyfile(os.environ[profile], f"{arguments[-1]}.icc")
+"""
+
+
+@pytest.fixture(scope="function")
+def fake_colprof(tmp_path, monkeypatch):
+    """Put a scripted colprof to the PATH."""
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    colprof_path = bin_path / "colprof"
+    colprof_path.write_text(f"#!{sys.executable}\n{FAKE_COLPROF}")
+    colprof_path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+
+    for name, white_point in [
+        ("FAKE_GOOD_PROFILE", [0.9642, 1.0, 0.8249]),
+        ("FAKE_BAD_PROFILE", [0.9, 0.95, 0.85]),
+    ]:
+        path = tmp_path / f"{name}.icc"
+        path.write_bytes(
+            build_icc_profile(
+                {b"wtpt": build_xyz_tag(white_point), b"A2B0": build_printer_a2b_tag()}
+            )
+        )
+        monkeypatch.setenv(name, str(path))
+    yield colprof_path
+
+
+@pytest.fixture(scope="function")
+def icc_gen(tmp_path):
+    """Create an ICCGenerator with the measurements of the test printer."""
+    icc_gen = ICCGenerator()
+    icc_gen._profile_path_template = str(tmp_path / "profile")
+    os.makedirs(icc_gen.profile_absolute_path)
+
+    rng = np.random.default_rng(0)
+    rgb = np.concatenate([[[0, 0, 0], [1, 1, 1]], rng.random((198, 3))])
+    table = CGATSTable(file_type="CTI3")
+    table.keywords["COLOR_REP"] = "RGB_XYZ"
+    table["SAMPLE_ID"] = np.arange(1, len(rgb) + 1)
+    table.set_columns(["RGB_R", "RGB_G", "RGB_B"], rgb * 100.0)
+    table.set_columns(
+        ["XYZ_X", "XYZ_Y", "XYZ_Z"], lab_to_xyz(device_to_lab(rgb)) * 100.0
+    )
+    CGATS([table]).write(f"{icc_gen.profile_absolute_full_path}.ti3")
+    yield icc_gen
+
+
+def test_split_measurements(icc_gen):
+    """The white and black patches are never held out."""
+    build, holdout = sweep.split_measurements(
+        f"{icc_gen.profile_absolute_full_path}.ti3", holdout=0.25
+    )
+    build_ids = set(build[0]["SAMPLE_ID"].tolist())
+    holdout_ids = set(holdout[0]["SAMPLE_ID"].tolist())
+    assert len(holdout_ids) == 50
+    assert len(build_ids) == 150
+    assert not build_ids & holdout_ids
+    assert {1, 2} <= build_ids
+    assert holdout[0].keywords["COLOR_REP"] == "RGB_XYZ"
+
+
+def test_split_measurements_holdout_is_not_valid(icc_gen):
+    """ValueError is raised if holdout is not between 0 and 1."""
+    with pytest.raises(ValueError) as cm:
+        sweep.split_measurements(f"{icc_gen.profile_absolute_full_path}.ti3", 1.5)
+    assert str(cm.value) == "holdout should be between 0 and 1, not 1.5"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_generate_profile_sweep_picks_the_best_variant(fake_colprof, icc_gen, workers):
+    """The most accurate variant is used as the profile, the failures are reported."""
+    report = icc_gen.generate_profile_sweep(
+        qualities=["m", "h"], smoothing_values=[0.25, 0.5, 1.0], workers=workers
+    )
+
+    assert len(report.results) == 12
+    assert len(report.failed) == 4
+    assert report.failed[0].error == "RuntimeError: colprof: Error - Fitting failed"
+    assert report.best.variant.smoothing == 0.5
+    assert report.best.score() < 0.1
+    icc_path = icc_gen.profile_absolute_path / f"{icc_gen.profile_name}.icc"
+    assert icc_path.read_bytes() == report.best.icc_path.read_bytes()
+    assert report.to_dict()["best"] == report.best.variant.name
+    log_path = report.failed[0].icc_path.parent / sweep.LOG_FILE_NAME
+    assert log_path.read_text() == "colprof: Error - Fitting failed"
+
+
+def test_generate_profile_sweep_rebuilds_the_best_variant(fake_colprof, icc_gen):
+    """The best variant is built again from all the measurements."""
+    report = icc_gen.generate_profile_sweep(
+        qualities=["h"], smoothing_values=[0.25, 0.5], workers=2
+    )
+
+    assert len(icc_gen.run_stats) == 5
+    assert {stats.stage for stats in icc_gen.run_stats} == {"profile"}
+    assert {stats.patch_count for stats in icc_gen.run_stats} == {
+        icc_gen.patch_count
+    }
+    command = icc_gen.run_stats[-1].command
+    assert command[-1] == str(icc_gen.profile_absolute_full_path)
+    assert "-r0.5" in command
+    assert f"-q{report.best.variant.quality}" in command
+
+
+def test_generate_profile_sweep_records_the_best_quality(
+    fake_colprof, icc_gen, tmp_path, monkeypatch
+):
+    """The quality of the best variant is recorded to the catalog."""
+    from icc_generator.catalog import ProfileCatalog
+
+    catalog = ProfileCatalog(tmp_path / "catalog.sqlite")
+    monkeypatch.setattr(ICCGenerator, "catalog", catalog)
+    report = icc_gen.generate_profile_sweep(
+        qualities=["m"], smoothing_values=[0.5], workers=1
+    )
+    assert report.best.variant.quality == "m"
+    assert len(catalog.find(quality="m")) == 1
+
+
+def test_generate_profile_sweep_all_variants_failed(fake_colprof, icc_gen):
+    """RuntimeError is raised if none of the variants can be built."""
+    with pytest.raises(RuntimeError) as cm:
+        icc_gen.generate_profile_sweep(smoothing_values=[1.0], workers=1)
+    assert str(cm.value).startswith("All the profile variants failed:")
+
+
+def test_generate_profile_sweep_metric_is_not_valid(icc_gen):
+    """ValueError is raised if the metric is not valid."""
+    with pytest.raises(ValueError) as cm:
+        icc_gen.generate_profile_sweep(metric="median")
+    assert str(cm.value) == (
+        "metric should be one of average, rms, percentile_95 or maximum, not median"
+    )
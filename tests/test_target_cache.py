@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Tests for the target_cache module."""
+
+import pytest
+
+from icc_generator import target_cache
+from icc_generator.api import ICCGenerator, PaperSizeLibrary
+from icc_generator.target_cache import TargetCache
+
+
+@pytest.fixture(scope="function")
+def new_session(tmp_path):
+    """Create ICCGenerators for new sessions writing to temp folders."""
+    sessions = []
+
+    def new_session(**kwargs):
+        icc_gen = ICCGenerator(**kwargs)
+        icc_gen._profile_path_template = str(tmp_path / f"session{len(sessions)}")
+        sessions.append(icc_gen)
+        return icc_gen
+
+    yield new_session
+
+
+def test_target_key_depends_on_the_targen_inputs(tmp_path, new_session):
+    """The key depends on the targen arguments and the precondition profile content."""
+    precondition_profile_path = tmp_path / "precondition.icc"
+    precondition_profile_path.write_bytes(b"profile")
+    first = new_session(precondition_profile_path=str(precondition_profile_path))
+    key = TargetCache.target_key(first)
+
+    # the session folder and the profile name are not a part of the key
+    second = new_session(
+        precondition_profile_path=str(precondition_profile_path), paper_brand="Canon"
+    )
+    assert TargetCache.target_key(second) == key
+
+    # the auto preconditioned targets are keyed by the found profile
+    third = new_session(paper_brand="Canon")
+    assert TargetCache.target_key(third) != key
+    assert TargetCache.target_key(third, str(precondition_profile_path)) == key
+
+    second.gray_patch_count = 64
+    assert TargetCache.target_key(second) != key
+
+    precondition_profile_path.write_bytes(b"new profile")
+    assert TargetCache.target_key(first) != key
+
+
+def test_new_sessions_use_the_cached_files(
+    fake_argyll, new_session, isolate_target_cache
+):
+    """The targets and charts are generated once for the same settings."""
+    first = new_session()
+    first.generate_target()
+    first.generate_tif()
+    assert fake_argyll == ["targen", "printtarg"]
+    assert len(isolate_target_cache.entries()) == 2
+
+    second = new_session(paper_brand="Canon")
+    second.generate_target()
+    second.generate_tif()
+    assert fake_argyll == ["targen", "printtarg"]
+
+    for extension in [".ti1", ".ti2", ".tif"]:
+        first_path = first.profile_absolute_path / f"{first.profile_name}{extension}"
+        second_path = second.profile_absolute_path / f"{second.profile_name}{extension}"
+        assert second_path.read_text() == first_path.read_text()
+        assert second_path.stat().st_ino != first_path.stat().st_ino
+    assert second.tif_files[0].exists()
+
+    # a different paper size needs a new chart
+    third = new_session(paper_size=PaperSizeLibrary.A3)
+    third.generate_target()
+    third.generate_tif()
+    assert fake_argyll == ["targen", "printtarg", "targen", "printtarg"]
+
+
+def test_cached_files_are_not_shared(fake_argyll, new_session, isolate_target_cache):
+    """Changing the files of a session in place doesn't change the cache."""
+    first = new_session()
+    first.generate_target()
+    ti1_path = first.profile_absolute_path / f"{first.profile_name}.ti1"
+    target = ti1_path.read_text()
+    with open(ti1_path, "w") as f:
+        f.write("changed in place")
+
+    second = new_session()
+    second.generate_target()
+    assert fake_argyll == ["targen"]
+    second_path = second.profile_absolute_path / f"{second.profile_name}.ti1"
+    assert second_path.read_text() == target
+
+
+def test_the_cache_is_not_used_by_default(fake_argyll, new_session):
+    """The targets are always generated if the cache is not set."""
+    assert ICCGenerator.target_cache is None
+    new_session().generate_target()
+    new_session().generate_target()
+    assert fake_argyll == ["targen", "targen"]
+
+
+def test_missing_outputs_are_not_cached(
+    fake_argyll, new_session, isolate_target_cache, monkeypatch
+):
+    """Nothing is stored if the tool didn't generate all of its outputs."""
+
+    def run_external_process(self, command, shell=False):
+        yield ""
+
+    monkeypatch.setattr(ICCGenerator, "run_external_process", run_external_process)
+    new_session().generate_target()
+    assert isolate_target_cache.entries() == []
+
+
+def test_clone_file_falls_back_to_copy(tmp_path, monkeypatch):
+    """The files are copied if they can't be reflinked."""
+
+    def reflink(source, destination):
+        raise OSError("Reflinks are not supported")
+
+    monkeypatch.setattr(target_cache, "_reflink", reflink)
+    source = tmp_path / "source.ti1"
+    source.write_text("target")
+    destination = tmp_path / "destination.ti1"
+    destination.write_text("old target")
+
+    assert target_cache.clone_file(source, destination) == "copy"
+    assert destination.read_text() == "target"
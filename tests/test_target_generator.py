@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Tests for the target_generator module."""
+
+import numpy as np
+import pytest
+
+from icc_generator import target_generator
+from icc_generator.api import ICCGenerator
+from icc_generator.cgats import CGATS
+
+
+def test_generate_device_values_gray_axis_and_fill():
+    """The gray axis comes first and the rest is spread over the RGB cube."""
+    values = target_generator.generate_device_values(672, 24)
+    assert values.shape == (672, 3)
+    assert np.all(values[:24, 0] == values[:24, 1])
+    assert np.all(values[:24, 1] == values[:24, 2])
+    assert values[0].tolist() == [100.0, 100.0, 100.0]
+    assert values[23].tolist() == [0.0, 0.0, 0.0]
+    assert values.min() >= 0.0
+    assert values.max() <= 100.0
+
+    # the patches are well spread, the cube corners are always picked
+    distances = np.sqrt(((values[:, None] - values[None]) ** 2).sum(axis=-1))
+    np.fill_diagonal(distances, np.inf)
+    assert distances.min() > 5.0
+    corners = {tuple(value) for value in values.tolist() if set(value) <= {0, 100}}
+    assert len(corners) == 8
+
+
+def test_generate_device_values_is_reproducible():
+    """The same seed generates the same values."""
+    values = target_generator.generate_device_values(500, 10, seed=3)
+    assert np.array_equal(
+        values, target_generator.generate_device_values(500, 10, seed=3)
+    )
+    assert not np.array_equal(
+        values, target_generator.generate_device_values(500, 10, seed=4)
+    )
+
+
+def test_generate_device_values_patch_count_is_too_small():
+    """ValueError is raised if the gray axis doesn't fit in the patch count."""
+    with pytest.raises(ValueError) as cm:
+        target_generator.generate_device_values(10, 24)
+    assert str(cm.value) == "patch_count should be at least 24, not 10"
+
+
+def test_generate_target_native_engine(tmp_path, patch_run_external_process):
+    """The native engine writes the .ti1 file without running targen."""
+    icc_gen = ICCGenerator()
+    icc_gen._profile_path_template = str(tmp_path / "profile")
+    icc_gen.target_cache = None
+    icc_gen.generate_target(engine="native")
+    assert patch_run_external_process == []
+
+    ti1_path = tmp_path / "profile" / f"{icc_gen.profile_name}.ti1"
+    ti1 = CGATS.read(ti1_path)
+    assert ti1[0].file_type == "CTI1"
+    assert ti1[0].keywords["COLOR_REP"] == "RGB"
+    assert len(ti1[0]) == icc_gen.patch_count
+    assert ti1[0].xyz[0][1] == pytest.approx(100.0)
+    assert len(ti1[1]) == 8
+
+    content = ti1_path.read_bytes()
+    icc_gen.generate_target(engine="native")
+    assert ti1_path.read_bytes() == content
+
+
+def test_generate_target_engine_is_not_valid():
+    """ValueError is raised if the engine is not targen or native."""
+    icc_gen = ICCGenerator()
+    with pytest.raises(ValueError) as cm:
+        icc_gen.generate_target(engine="fast")
+    assert str(cm.value) == "engine should be one of targen or native, not fast"
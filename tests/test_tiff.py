@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Tests for the tiff module."""
+
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from icc_generator.tiff import TiffReader, TiffWriter
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+@pytest.mark.parametrize("compression", ["none", "deflate"])
+def test_tiff_round_trip(tmp_path, dtype, compression):
+    """TiffWriter writes files that TiffReader reads back."""
+    pixels = np.random.default_rng(0).integers(
+        0, np.iinfo(dtype).max, (37, 23, 3), dtype=dtype
+    )
+    path = tmp_path / "image.tif"
+    with TiffWriter(
+        path, 23, 37, dtype=dtype, compression=compression, rows_per_strip=5
+    ) as writer:
+        writer.write(pixels[:11])
+        writer.write(pixels[11:])
+    assert len(writer.strip_offsets) == 8
+
+    with TiffReader(path) as reader:
+        assert reader.shape == (37, 23, 3)
+        assert reader.dtype == dtype
+        assert reader.rows_per_strip == 5
+        np.testing.assert_array_equal(reader.read(), pixels)
+
+
+def test_tiff_icc_profile_and_resolution(tmp_path):
+    """The ICC profile and the resolution are written."""
+    path = tmp_path / "image.tif"
+    with TiffWriter(path, 4, 2, icc_profile=b"profile", dpi=300) as writer:
+        writer.write(np.zeros((2, 4, 3), dtype=np.uint8))
+
+    with TiffReader(path) as reader:
+        assert reader.icc_profile == b"profile"
+        assert reader.tags[282] == [300000, 1000]
+
+
+def test_tiff_writer_missing_rows(tmp_path):
+    """ValueError is raised if not all the rows are written."""
+    writer = TiffWriter(tmp_path / "image.tif", 4, 2)
+    writer.write(np.zeros((1, 4, 3), dtype=np.uint8))
+    with pytest.raises(ValueError) as cm:
+        writer.close()
+    assert str(cm.value) == "Only 1 of 2 rows are written"
+
+
+def test_tiff_writer_wrong_shape(tmp_path):
+    """ValueError is raised if the rows doesn't match the image width."""
+    with pytest.raises(ValueError) as cm:
+        with TiffWriter(tmp_path / "image.tif", 4, 2) as writer:
+            writer.write(np.zeros((1, 5, 3), dtype=np.uint8))
+    assert str(cm.value) == "rows should be of shape (N, 4, 3), not (1, 5, 3)"
+
+
+def build_tiff(path, entries, data, byte_order=">"):
+    """Write a TIFF file with the given IFD entries and image data.
+
+    Args:
+        path (pathlib.Path): The output path.
+        entries (list): The (tag, type, values) entries, the SHORT and LONG values
+            are written to the IFD, the offsets are relative to the image data.
+        data (bytes): The image data written right after the header.
+        byte_order (str): The byte order, ">" or "<".
+    """
+    data += b"\x00" * (len(data) % 2)
+    ifd_offset = 8 + len(data)
+    extra_offset = ifd_offset + 2 + 12 * len(entries) + 4
+    ifd = struct.pack(f"{byte_order}H", len(entries))
+    extra = b""
+    for tag, field_type, values in entries:
+        value_format = "H" if field_type == 3 else "I"
+        value = struct.pack(f"{byte_order}{len(values)}{value_format}", *values)
+        if len(value) <= 4:
+            value = value.ljust(4, b"\x00")
+        else:
+            extra += value
+            value = struct.pack(
+                f"{byte_order}I", extra_offset + len(extra) - len(value)
+            )
+        ifd += struct.pack(f"{byte_order}HHI", tag, field_type, len(values)) + value
+    ifd += struct.pack(f"{byte_order}I", 0)
+    magic = b"MM" if byte_order == ">" else b"II"
+    path.write_bytes(
+        magic + struct.pack(f"{byte_order}HI", 42, ifd_offset) + data + ifd + extra
+    )
+
+
+def test_tiff_reader_big_endian_predictor(tmp_path):
+    """Big endian files with horizontal differencing are read properly."""
+    pixels = np.arange(2 * 3 * 3, dtype=np.uint16).reshape(2, 3, 3) * 1000
+    differences = np.diff(pixels, axis=1, prepend=0).astype(">u2")
+    data = zlib.compress(differences.tobytes())
+
+    path = tmp_path / "image.tif"
+    build_tiff(
+        path,
+        [
+            (256, 3, [3]),
+            (257, 3, [2]),
+            (258, 3, [16]),
+            (259, 3, [8]),
+            (262, 3, [2]),
+            (273, 4, [8]),
+            (277, 3, [3]),
+            (278, 3, [2]),
+            (279, 4, [len(data)]),
+            (317, 3, [2]),
+        ],
+        data,
+    )
+
+    with TiffReader(path) as reader:
+        np.testing.assert_array_equal(reader.read(), pixels)
+
+
+def test_tiff_reader_tiles(tmp_path):
+    """Tiled files are read in rows of tiles."""
+    pixels = np.random.default_rng(1).integers(0, 255, (3, 5, 3), dtype=np.uint8)
+    padded = np.zeros((4, 8, 3), dtype=np.uint8)
+    padded[:3, :5] = pixels
+    tiles = [
+        padded[y : y + 2, x : x + 4].tobytes() for y in [0, 2] for x in [0, 4]
+    ]
+    offsets = [8 + sum(len(tile) for tile in tiles[:i]) for i in range(4)]
+
+    path = tmp_path / "image.tif"
+    build_tiff(
+        path,
+        [
+            (256, 3, [5]),
+            (257, 3, [3]),
+            (258, 3, [8, 8, 8]),
+            (262, 3, [2]),
+            (277, 3, [3]),
+            (322, 3, [4]),
+            (323, 3, [2]),
+            (324, 4, offsets),
+            (325, 4, [len(tile) for tile in tiles]),
+        ],
+        b"".join(tiles),
+        byte_order="<",
+    )
+
+    with TiffReader(path) as reader:
+        assert reader.is_tiled
+        assert [row for row, _ in reader.iter_bands()] == [0, 2]
+        np.testing.assert_array_equal(reader.read(), pixels)
+
+
+@pytest.mark.parametrize("compression", ["none", "deflate"])
+def test_tiff_reader_splits_large_strips_to_bands(tmp_path, compression):
+    """Large strips are read in bands of the given size."""
+    pixels = np.random.default_rng(2).integers(0, 255, (100, 10, 3), dtype=np.uint8)
+    path = tmp_path / "image.tif"
+    with TiffWriter(
+        path, 10, 100, compression=compression, rows_per_strip=100
+    ) as writer:
+        writer.write(pixels)
+
+    with TiffReader(path) as reader:
+        bands = list(reader.iter_bands(band_size=30 * 7))
+    assert [row for row, _ in bands] == list(range(0, 100, 7))
+    np.testing.assert_array_equal(np.concatenate([band for _, band in bands]), pixels)
+
+
+def test_tiff_reader_not_a_tiff_file(tmp_path):
+    """ValueError is raised if the file is not a TIFF file."""
+    path = tmp_path / "image.tif"
+    path.write_bytes(b"\x00" * 16)
+    with pytest.raises(ValueError) as cm:
+        TiffReader(path)
+    assert str(cm.value) == f"Not a TIFF file: {path}"
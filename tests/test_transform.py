@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Tests for the transform module."""
+
+import os
+
+import numpy as np
+import pytest
+
+from icc_generator import image, transform
+from icc_generator.api import HERE, ICCGenerator
+from icc_generator.icc import ICCProfile
+from icc_generator.tiff import TiffReader
+
+DATA_PATH = HERE.parent / "data"
+
+
+@pytest.fixture(scope="function")
+def clear_transform_cache():
+    """Clear the transform cache before and after the test."""
+    transform.clear_transform_cache()
+    yield
+    transform.clear_transform_cache()
+
+
+def test_tetrahedral_interpolation_is_exact_for_linear_functions():
+    """Tetrahedral interpolation reproduces linear functions and the grid points."""
+    matrix = np.array([[0.2, 0.3, 0.5], [1.0, -0.5, 0.1], [0.0, 0.0, 1.0]])
+    grid = np.linspace(0.0, 1.0, 5)
+    nodes = np.stack(np.meshgrid(grid, grid, grid, indexing="ij"), axis=-1)
+    lut = nodes @ matrix.T
+
+    values = np.random.default_rng(0).random((1000, 3))
+    values[:3] = [[0.0, 0.0, 0.0], [1.0, 1.0, 1.0], [0.5, 0.5, 0.25]]
+    np.testing.assert_allclose(
+        transform.tetrahedral_interpolation(lut, values), values @ matrix.T, atol=1e-12
+    )
+
+
+def test_tetrahedral_interpolation_uses_the_neutral_diagonal():
+    """Neutral values are interpolated from the diagonal grid points only."""
+    lut = np.zeros((2, 2, 2, 1))
+    lut[1, 1, 1] = 1.0
+    values = np.array([[0.3, 0.3, 0.3], [0.5, 0.25, 0.0]])
+    np.testing.assert_allclose(
+        transform.tetrahedral_interpolation(lut, values), [[0.3], [0.0]]
+    )
+
+
+def test_color_transform_matrix_shaper_round_trip():
+    """A matrix/TRC profile to itself is the identity transform."""
+    with ICCProfile(DATA_PATH / "sRGB.icc") as profile:
+        color_transform = transform.ColorTransform.from_profiles(profile, profile)
+    assert color_transform.lut.shape == (33, 33, 33, 3)
+    rgb = np.random.default_rng(1).random((500, 3))
+    np.testing.assert_allclose(color_transform.apply(rgb), rgb, atol=2e-3)
+
+
+def test_color_transform_to_printer_profile(rgb_printer_profile_path):
+    """The transform matches the profile by profile conversion."""
+    rgb = np.random.default_rng(2).random((500, 3))
+    with ICCProfile(DATA_PATH / "AdobeRGB.icc") as source, ICCProfile(
+        rgb_printer_profile_path
+    ) as destination:
+        color_transform = transform.ColorTransform.from_profiles(source, destination)
+        expected = transform.xyz_to_device(
+            destination, transform.device_to_xyz(source, rgb, 1), 1
+        )
+    np.testing.assert_allclose(color_transform.apply(rgb), expected, atol=2e-2)
+
+
+def test_color_transform_intent_is_not_valid(rgb_printer_profile_path):
+    """ValueError is raised if the intent is not one of p, r, s, a."""
+    with ICCProfile(DATA_PATH / "sRGB.icc") as profile:
+        with pytest.raises(ValueError) as cm:
+            transform.ColorTransform.from_profiles(profile, profile, intent="x")
+    assert str(cm.value) == "intent should be one of p, r, s, a, not x"
+
+
+def test_get_transform_is_cached(rgb_printer_profile_path, clear_transform_cache):
+    """get_transform returns the cached transform until the profile changes."""
+    source = DATA_PATH / "sRGB.icc"
+    first = transform.get_transform(source, rgb_printer_profile_path)
+    assert transform.get_transform(source, rgb_printer_profile_path) is first
+    assert transform.get_transform(source, rgb_printer_profile_path, "p") is not first
+
+    stat = rgb_printer_profile_path.stat()
+    os.utime(rgb_printer_profile_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert transform.get_transform(source, rgb_printer_profile_path) is not first
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+def test_correct_image_tiff(tmp_path, rgb_printer_profile_path, dtype):
+    """correct_image converts the TIFF images and embeds the printer profile."""
+    maximum = np.iinfo(dtype).max
+    pixels = np.random.default_rng(3).integers(0, maximum, (20, 30, 3), dtype=dtype)
+    input_path = tmp_path / "input.tif"
+    image.write_image(input_path, pixels)
+
+    output_path = transform.correct_image(
+        DATA_PATH / "AdobeRGB.icc",
+        rgb_printer_profile_path,
+        input_path,
+        tmp_path / "output.tif",
+    )
+
+    color_transform = transform.get_transform(
+        DATA_PATH / "AdobeRGB.icc", rgb_printer_profile_path
+    )
+    expected = color_transform.apply(pixels.reshape(-1, 3) / maximum) * maximum
+    with TiffReader(output_path) as reader:
+        assert reader.dtype == dtype
+        assert reader.icc_profile == rgb_printer_profile_path.read_bytes()
+        np.testing.assert_allclose(
+            reader.read().reshape(-1, 3), expected, atol=maximum * 0.002 + 0.5
+        )
+
+
+def test_correct_image_jpeg(tmp_path, rgb_printer_profile_path):
+    """correct_image reads and writes JPEG files."""
+    input_path = tmp_path / "input.jpg"
+    image.write_image(input_path, np.full((16, 16, 3), 128, dtype=np.uint8))
+
+    output_path = transform.correct_image(
+        DATA_PATH / "sRGB.icc",
+        rgb_printer_profile_path,
+        input_path,
+        tmp_path / "output.jpg",
+    )
+
+    pixels, icc_profile = image.read_image(output_path)
+    assert pixels.shape == (16, 16, 3)
+    assert icc_profile == rgb_printer_profile_path.read_bytes()
+
+
+def test_icc_generator_color_correct_image_native_engine(
+    tmp_path, rgb_printer_profile_path, patch_run_external_process_class_method_version
+):
+    """color_correct_image doesn't call cctiff with the native engine."""
+    input_path = tmp_path / "input.tif"
+    image.write_image(input_path, np.zeros((4, 4, 3), dtype=np.uint8))
+
+    output_path = ICCGenerator.color_correct_image(
+        printer_profile_path=rgb_printer_profile_path,
+        input_image_path=input_path,
+        image_profile="ProPhoto",
+        engine="native",
+    )
+
+    assert output_path == tmp_path / "input_corrected_1.tif"
+    assert output_path.exists()
+    assert patch_run_external_process_class_method_version == []
+
+
+def test_icc_generator_color_correct_image_disk_cache_is_not_writable(
+    tmp_path, rgb_printer_profile_path, isolate_lut_cache, monkeypatch, caplog
+):
+    """The image is corrected even if the transform can't be cached on disk."""
+
+    def put(key, lut):
+        raise OSError("Read-only file system")
+
+    transform.clear_transform_cache()
+    monkeypatch.setattr(isolate_lut_cache, "put", put)
+    input_path = tmp_path / "input.tif"
+    image.write_image(input_path, np.zeros((4, 4, 3), dtype=np.uint8))
+
+    output_path = ICCGenerator.color_correct_image(
+        printer_profile_path=rgb_printer_profile_path,
+        input_image_path=input_path,
+        image_profile="ProPhoto",
+        engine="native",
+    )
+    transform.clear_transform_cache()
+
+    assert output_path.exists()
+    assert isolate_lut_cache.entries() == []
+    assert caplog.messages == [
+        "Can not store the transform in the LUT cache: Read-only file system"
+    ]
+
+
+def test_icc_generator_color_correct_image_engine_is_not_valid(
+    tmp_path, rgb_printer_profile_path
+):
+    """ValueError is raised if the engine is not one of cctiff or native."""
+    with pytest.raises(ValueError) as cm:
+        ICCGenerator.color_correct_image(
+            printer_profile_path=rgb_printer_profile_path,
+            input_image_path=tmp_path / "input.tif",
+            engine="lcms",
+        )
+    assert str(cm.value) == "engine should be one of cctiff or native, not lcms"